@@ -5,9 +5,11 @@ READ-ONLY endpoints for admin dashboards
 import os
 import logging
 from flask import Blueprint, jsonify, request
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+from api.utils.log_tail import tail_lines, detect_level
+
 log = logging.getLogger("levqor.admin.dashboard")
 bp = Blueprint("admin_dashboard", __name__, url_prefix="/api/admin")
 
@@ -361,8 +363,7 @@ def get_admin_activity():
         autopilot_log = Path("/home/runner/workspace-data/autopilot/logs/guardian_health.log")
         if autopilot_log.exists():
             try:
-                content = autopilot_log.read_text()
-                lines = content.strip().split("\n")[-20:]
+                lines = tail_lines(autopilot_log, 20)
                 for line in lines:
                     if line.strip():
                         events.append({
@@ -447,8 +448,7 @@ def get_autopilot_status():
         if guardian_log.exists():
             status["guardian_active"] = True
             try:
-                content = guardian_log.read_text()
-                lines = content.strip().split("\n")
+                lines = tail_lines(guardian_log, 1)
                 if lines:
                     last_line = lines[-1]
                     if "[" in last_line:
@@ -690,6 +690,7 @@ def get_recent_logs():
     """
     GET /api/admin/recent-logs
     Returns recent system logs for Power Panel
+    Query params: level (error|warn|info), since (ISO timestamp)
     """
     auth_error = _require_admin("/api/admin/recent-logs")
     if auth_error:
@@ -697,6 +698,16 @@ def get_recent_logs():
     
     try:
         logs = []
+        level_filter = request.args.get("level")
+        since = None
+        if request.args.get("since"):
+            try:
+                since = datetime.fromisoformat(request.args["since"])
+            except ValueError:
+                return jsonify({"error": "invalid_since"}), 400
+            # Log timestamps are naive UTC; compare like with like
+            if since.tzinfo is not None:
+                since = since.astimezone(timezone.utc).replace(tzinfo=None)
         
         log_files = [
             Path("/home/runner/workspace-data/autopilot/logs/guardian_health.log"),
@@ -708,22 +719,15 @@ def get_recent_logs():
         for log_file in log_files:
             if log_file.exists():
                 try:
-                    lines = log_file.read_text().strip().split("\n")[-10:]
+                    lines = tail_lines(log_file, 10, level=level_filter, since=since)
                     source = log_file.stem
                     for line in lines:
-                        if line.strip():
-                            level = "info"
-                            if "ERROR" in line or "FAIL" in line:
-                                level = "error"
-                            elif "WARN" in line or "WARNING" in line:
-                                level = "warn"
-                            
-                            logs.append({
-                                "level": level,
-                                "message": line.strip()[:200],
-                                "timestamp": datetime.now().isoformat(),
-                                "source": source
-                            })
+                        logs.append({
+                            "level": detect_level(line),
+                            "message": line.strip()[:200],
+                            "timestamp": datetime.now().isoformat(),
+                            "source": source
+                        })
                 except:
                     pass
         
@@ -736,3 +740,32 @@ def get_recent_logs():
     except Exception as e:
         log.exception("Recent logs error")
         return jsonify({"error": "internal_error", "message": str(e)}), 500
+
+
+@bp.get("/profiler")
+def get_profiler_report():
+    """
+    GET /api/admin/profiler
+    Returns sampled per-route span timings: collapsed stacks for flame graphs
+    and top-N slow spans per route
+    Query params: top (int), reset (bool)
+    """
+    auth_error = _require_admin("/api/admin/profiler")
+    if auth_error:
+        return auth_error
+    
+    try:
+        from modules.profiling import get_profile_report, reset_profile
+        
+        top_n = request.args.get("top", type=int)
+        report = get_profile_report(top_n)
+        if request.args.get("reset", "").lower() in ("1", "true", "yes"):
+            reset_profile()
+        
+        return jsonify({
+            **report,
+            "timestamp": datetime.now().isoformat()
+        })
+    except Exception as e:
+        log.exception("Profiler report error")
+        return jsonify({"error": "internal_error", "message": str(e)}), 500
@@ -17,16 +17,29 @@ from typing import Dict, Any, Tuple, List, Optional
 
 log = logging.getLogger("levqor.ai.service")
 
-# Try to import OpenAI client class
-OPENAI_AVAILABLE = False
+# The openai package is located here but only imported when the first client
+# is created; importing it costs more than half a second of cold start
+from modules.lazy_import import module_available
+
+OPENAI_AVAILABLE = module_available("openai")
 OpenAI_Class = None
 
-try:
-    from openai import OpenAI as OpenAI_Class
-    OPENAI_AVAILABLE = True
+if OPENAI_AVAILABLE:
     log.info("OpenAI library available - will use when OPENAI_API_KEY is set")
-except Exception as e:
-    log.warning(f"OpenAI import failed: {e} - using pattern-based fallbacks")
+else:
+    log.warning("OpenAI library not installed - using pattern-based fallbacks")
+
+
+def _load_openai_class():
+    """Import the OpenAI client class on first use."""
+    global OpenAI_Class, OPENAI_AVAILABLE
+    if OpenAI_Class is None and OPENAI_AVAILABLE:
+        try:
+            from openai import OpenAI as OpenAI_Class
+        except Exception as e:
+            log.warning(f"OpenAI import failed: {e} - using pattern-based fallbacks")
+            OPENAI_AVAILABLE = False
+    return OpenAI_Class
 
 
 def is_ai_enabled() -> bool:
@@ -41,7 +54,7 @@ def is_ai_enabled() -> bool:
     Returns:
         bool: True if AI should be used, False for pattern-based fallback
     """
-    if not OPENAI_AVAILABLE or not OpenAI_Class:
+    if not OPENAI_AVAILABLE:
         return False
     
     api_key = os.getenv("OPENAI_API_KEY", "").strip()
@@ -73,7 +86,10 @@ def _get_openai_client():
     
     try:
         # Set timeout at client level (10s for all requests)
-        return OpenAI_Class(api_key=api_key, timeout=10.0)
+        client_class = _load_openai_class()
+        if client_class is None:
+            return None
+        return client_class(api_key=api_key, timeout=10.0)
     except Exception as e:
         log.warning(f"Failed to create OpenAI client: {e}")
         return None
@@ -7,12 +7,11 @@ from flask import jsonify, request, g
 from . import approvals_bp
 
 from modules.approvals import (
-    list_pending_actions,
     approve_action,
     reject_action,
     get_action_by_id
 )
-from modules.approvals.queue import get_approval_stats
+from modules.approvals.queue import get_approval_stats, list_pending_page
 from modules.workflows.models import Workflow, WorkflowStep
 from modules.workflows.storage import create_workflow
 
@@ -23,18 +22,22 @@ log = logging.getLogger("levqor.approvals.api")
 def api_list_approvals():
     """
     GET /api/approvals - List pending approval actions (owner/admin only).
-    Query params: tenant_id, limit
+    Query params: tenant_id, limit, cursor (next_cursor of the previous page)
     """
     try:
         tenant_id = request.args.get('tenant_id') or getattr(g, 'tenant_id', None)
         limit = min(int(request.args.get('limit', 50)), 200)
         
-        actions = list_pending_actions(tenant_id=tenant_id, limit=limit)
+        try:
+            page = list_pending_page(tenant_id=tenant_id, limit=limit, cursor=request.args.get('cursor'))
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
         stats = get_approval_stats(tenant_id=tenant_id)
         
         return jsonify({
-            "actions": actions,
-            "total": len(actions),
+            "actions": page["actions"],
+            "total": len(page["actions"]),
+            "next_cursor": page["next_cursor"],
             "stats": stats
         }), 200
         
@@ -20,14 +20,18 @@ except ImportError:
     def log_error(*args, **kwargs): pass
     def log_performance(*args, **kwargs): pass
 
+# stripe is imported on first use; it is heavy and most requests never need it
+from modules.lazy_import import lazy_module
+
+stripe = lazy_module("stripe")
 try:
-    import stripe
     from modules.stripe_connector import get_stripe_secret_key, is_stripe_configured
-    STRIPE_AVAILABLE = True
+    STRIPE_AVAILABLE = stripe is not None
 except ImportError as e:
-    log.error(f"Stripe SDK not available: {e}")
+    log.error(f"Stripe connector not available: {e}")
     STRIPE_AVAILABLE = False
-    stripe = None
+if not STRIPE_AVAILABLE:
+    log.error("Stripe SDK not available")
 
 
 def ensure_stripe_configured():
@@ -13,10 +13,13 @@ billing_status_bp = Blueprint("billing_status", __name__, url_prefix="/api/billi
 
 SAFE_MODE = True
 
+# stripe is imported on first use (see modules.lazy_import)
+from modules.lazy_import import lazy_module
+
+stripe = lazy_module("stripe")
 try:
-    import stripe
     from modules.stripe_connector import ensure_stripe_configured
-    STRIPE_AVAILABLE = True
+    STRIPE_AVAILABLE = stripe is not None
 except ImportError:
     STRIPE_AVAILABLE = False
 
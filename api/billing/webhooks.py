@@ -1,6 +1,11 @@
 """
 Stripe Webhook Handler
 Processes Stripe webhook events for subscription updates, payments, etc.
+
+Both endpoints only verify the event and record it in the Stripe inbox
+(modules.stripe_inbox), which drops redeliveries by event id; the handlers
+below run afterwards on the inbox worker, in order per customer, with
+retries.
 """
 import os
 import json
@@ -13,14 +18,20 @@ from security_core import audit, config as sec_config
 bp = Blueprint("billing_webhooks", __name__, url_prefix="/api/billing")
 log = logging.getLogger("levqor.webhooks")
 
+# stripe is imported on first use (see modules.lazy_import)
+from modules.lazy_import import lazy_module
+
+stripe = lazy_module("stripe")
 try:
-    import stripe
     from modules.stripe_connector import get_stripe_webhook_secret
-    STRIPE_AVAILABLE = True
+    STRIPE_AVAILABLE = stripe is not None
 except ImportError:
     STRIPE_AVAILABLE = False
+if not STRIPE_AVAILABLE:
     log.warning("Stripe SDK or connector not available for webhooks")
 
+from modules.stripe_inbox import enqueue_event, register_handler
+
 
 @bp.post("/webhook")
 def stripe_webhook():
@@ -34,7 +45,8 @@ def stripe_webhook():
     - invoice.payment_succeeded
     - invoice.payment_failed
     
-    This endpoint verifies the signature and processes events
+    This endpoint verifies the signature and queues the event; it returns
+    once the event is stored
     """
     if not STRIPE_AVAILABLE:
         return jsonify({"error": "stripe_not_configured"}), 500
@@ -60,27 +72,19 @@ def stripe_webhook():
             tolerance=sec_config.STRIPE_TOLERANCE_SECONDS
         )
         
-        # Log the event
         log.info(f"Received webhook event: {event['type']} (id: {event['id']})")
         
-        # Handle different event types
-        event_type = event['type']
-        event_data = event['data']['object']
-        
-        if event_type == 'customer.subscription.created':
-            handle_subscription_created(event_data)
-        elif event_type == 'customer.subscription.updated':
-            handle_subscription_updated(event_data)
-        elif event_type == 'customer.subscription.deleted':
-            handle_subscription_deleted(event_data)
-        elif event_type == 'invoice.payment_succeeded':
-            handle_payment_succeeded(event_data)
-        elif event_type == 'invoice.payment_failed':
-            handle_payment_failed(event_data)
-        else:
-            log.info(f"Unhandled event type: {event_type}")
+        # Queue the verified payload; handlers run on the inbox worker
+        raw_event = json.loads(payload)
+        new = enqueue_event(
+            raw_event["id"],
+            raw_event["type"],
+            raw_event["data"]["object"],
+            created=raw_event.get("created"),
+            source="webhook"
+        )
         
-        return jsonify({"ok": True, "event_type": event_type}), 200
+        return jsonify({"ok": True, "event_type": raw_event["type"], "duplicate": not new}), 200
         
     except ValueError as e:
         log.error(f"Invalid payload: {e}")
@@ -221,9 +225,10 @@ def webhook_event():
     Receive and persist webhook events from the frontend webhook handler.
     This endpoint allows the Next.js Edge webhook to forward events for database persistence.
     Requires valid signature or Stripe event verification for security.
-    """
-    from modules.db_wrapper import execute_query
     
+    Events without a valid signature are retrieved from the Stripe API before
+    they are queued, and only that data is queued.
+    """
     if request.headers.get("X-Webhook-Source") != "stripe":
         return jsonify({"error": "invalid_source"}), 403
     
@@ -231,33 +236,18 @@ def webhook_event():
     event_id_header = request.headers.get("X-Stripe-Event-Id", "")
     raw_body = request.get_data(as_text=True)
     
-    use_stripe_data = False
-    stripe_event_data = None
+    verified = bool(signature) and verify_internal_signature(raw_body, signature)
     
-    if not signature or not verify_internal_signature(raw_body, signature):
-        if event_id_header:
-            stripe_event_data = retrieve_stripe_event_data(event_id_header)
-            if stripe_event_data:
-                log.info(f"Verified event via Stripe API, using Stripe data: {event_id_header}")
-                use_stripe_data = True
-            else:
-                log.warning("Invalid webhook signature and failed Stripe verification")
-                audit.audit_security_event("webhook_event_invalid_signature", {
-                    "event_id": event_id_header[:20] if event_id_header else "unknown",
-                    "ip": request.headers.get("X-Forwarded-For", "").split(",")[0].strip() or request.remote_addr or "unknown"
-                })
-                return jsonify({"error": "invalid_signature"}), 403
-        else:
-            log.warning("Missing signature and event ID for verification")
-            return jsonify({"error": "invalid_signature"}), 403
+    if not verified and not event_id_header.startswith("evt_"):
+        log.warning("Missing signature and event ID for verification")
+        audit.audit_security_event("webhook_event_invalid_signature", {
+            "event_id": event_id_header[:20] if event_id_header else "unknown",
+            "ip": request.headers.get("X-Forwarded-For", "").split(",")[0].strip() or request.remote_addr or "unknown"
+        })
+        return jsonify({"error": "invalid_signature"}), 403
     
     try:
-        if use_stripe_data and stripe_event_data:
-            event_id = stripe_event_data.get("event_id")
-            event_type = stripe_event_data.get("event_type")
-            created = stripe_event_data.get("created")
-            event_data = stripe_event_data.get("data", {})
-        else:
+        if verified:
             data = request.get_json()
             
             if not data:
@@ -265,40 +255,33 @@ def webhook_event():
             
             event_id = data.get("event_id")
             event_type = data.get("event_type")
-            created = data.get("created")
-            event_data = data.get("data", {})
-        
-        if not event_id or not event_type:
-            return jsonify({"error": "missing_event_id_or_type"}), 400
-        
-        log.info(f"[Webhook Event] Persisting: {event_type} (id: {event_id})")
-        
-        execute_query("""
-            INSERT INTO stripe_events (event_id, event_type, created_at, data, processed_at)
-            VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT (event_id) DO NOTHING
-        """, (
-            event_id,
-            event_type,
-            datetime.utcfromtimestamp(created) if created else datetime.utcnow(),
-            json.dumps(event_data),
-            datetime.utcnow()
-        ), fetch=None)
-        
-        if event_type == 'customer.subscription.created':
-            handle_subscription_created(event_data)
-        elif event_type == 'customer.subscription.updated':
-            handle_subscription_updated(event_data)
-        elif event_type == 'customer.subscription.deleted':
-            handle_subscription_deleted(event_data)
-        elif event_type == 'invoice.paid':
-            handle_payment_succeeded(event_data)
-        elif event_type == 'invoice.payment_failed':
-            handle_payment_failed(event_data)
-        elif event_type == 'checkout.session.completed':
-            handle_checkout_completed(event_data)
+            
+            if not event_id or not event_type:
+                return jsonify({"error": "missing_event_id_or_type"}), 400
+            
+            log.info(f"[Webhook Event] Persisting: {event_type} (id: {event_id})")
+            new = enqueue_event(event_id, event_type, data.get("data", {}), created=data.get("created"), source="forwarded")
+        else:
+            stripe_event_data = retrieve_stripe_event_data(event_id_header)
+            if not stripe_event_data:
+                log.warning("Invalid webhook signature and failed Stripe verification")
+                audit.audit_security_event("webhook_event_invalid_signature", {
+                    "event_id": event_id_header[:20],
+                    "ip": request.headers.get("X-Forwarded-For", "").split(",")[0].strip() or request.remote_addr or "unknown"
+                })
+                return jsonify({"error": "invalid_signature"}), 403
+            
+            event_id = stripe_event_data["event_id"]
+            log.info(f"Verified event via Stripe API, using Stripe data: {event_id}")
+            new = enqueue_event(
+                event_id,
+                stripe_event_data["event_type"],
+                stripe_event_data["data"],
+                created=stripe_event_data["created"],
+                source="forwarded"
+            )
         
-        return jsonify({"ok": True, "event_id": event_id}), 200
+        return jsonify({"ok": True, "event_id": event_id, "duplicate": not new}), 200
         
     except Exception as e:
         log.error(f"Error persisting webhook event: {e}")
@@ -316,13 +299,20 @@ def handle_checkout_completed(session):
     log.info(f"Checkout completed: {session_id} for customer {customer_id} (mode: {mode})")
     
     if subscription_id:
-        try:
-            from modules.db_wrapper import execute_query
-            execute_query("""
-                UPDATE users 
-                SET stripe_customer_id = ?, stripe_subscription_id = ?, subscription_status = 'active', updated_at = ?
-                WHERE email = ?
-            """, (customer_id, subscription_id, datetime.utcnow(), customer_email), fetch=None)
-            log.info(f"Updated user {customer_email} with subscription {subscription_id}")
-        except Exception as e:
-            log.error(f"Failed to update user subscription: {e}")
+        # Errors propagate so the inbox retries the event
+        from modules.db_wrapper import execute_query
+        execute_query("""
+            UPDATE users 
+            SET stripe_customer_id = ?, stripe_subscription_id = ?, subscription_status = 'active', updated_at = ?
+            WHERE email = ?
+        """, (customer_id, subscription_id, datetime.utcnow(), customer_email), fetch=None)
+        log.info(f"Updated user {customer_email} with subscription {subscription_id}")
+
+
+register_handler('customer.subscription.created', handle_subscription_created)
+register_handler('customer.subscription.updated', handle_subscription_updated)
+register_handler('customer.subscription.deleted', handle_subscription_deleted)
+register_handler('invoice.payment_succeeded', handle_payment_succeeded)
+register_handler('invoice.paid', handle_payment_succeeded)
+register_handler('invoice.payment_failed', handle_payment_failed)
+register_handler('checkout.session.completed', handle_checkout_completed)
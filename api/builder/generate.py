@@ -13,22 +13,7 @@ builder_bp = Blueprint("builder", __name__, url_prefix="/api/builder")
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
 from modules.db_wrapper import execute, execute_query, commit
-
-
-def ensure_builder_table():
-    execute("""
-        CREATE TABLE IF NOT EXISTS builder_history (
-            id TEXT PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            email TEXT,
-            created_at REAL NOT NULL,
-            prompt TEXT NOT NULL,
-            yaml TEXT NOT NULL,
-            summary TEXT NOT NULL,
-            status TEXT DEFAULT 'active'
-        )
-    """)
-    commit()
+from modules.migrations import ensure_migrated
 
 
 WORKFLOW_TEMPLATES = {
@@ -191,7 +176,7 @@ def save_workflow():
     if not yaml_content:
         return jsonify({"ok": False, "error": "YAML content required"}), 400
     
-    ensure_builder_table()
+    ensure_migrated()
     now = time.time()
     
     workflow_id = str(uuid.uuid4())
@@ -220,7 +205,7 @@ def get_history():
     if not email:
         return jsonify({"ok": False, "error": "Email required"}), 400
     
-    ensure_builder_table()
+    ensure_migrated()
     
     workflows = execute_query("""
         SELECT id, created_at, prompt, yaml, summary, status
@@ -256,7 +241,7 @@ def delete_workflow(workflow_id):
     if not email:
         return jsonify({"ok": False, "error": "Email required"}), 400
     
-    ensure_builder_table()
+    ensure_migrated()
     
     execute("""
         UPDATE builder_history SET status = 'deleted' WHERE id = ? AND email = ?
@@ -3,13 +3,18 @@
 from flask import jsonify, request
 from . import community_bp
 import logging
-import os
-import json
 from datetime import datetime
-import tempfile
+
+from modules.record_store import RecordStore
 
 log = logging.getLogger(__name__)
 
+_submissions = RecordStore(
+    "community_submissions",
+    legacy_path="data/community_submissions/submissions.jsonl",
+    field_map={"type": "category"}
+)
+
 # Badge definitions
 BADGES = [
     {"id": "badge-001", "name": "First Workflow", "icon": "🎯", "description": "Created your first workflow", "rarity": "Common", "requirement": "Create 1 workflow"},
@@ -155,40 +160,7 @@ def submit_workflow():
             "status": "pending_review"
         }
         
-        # Log submission (stub mode - in production, save to DB)
-        log_dir = "data/community_submissions"
-        os.makedirs(log_dir, exist_ok=True)
-        
-        submission_file = os.path.join(log_dir, "submissions.jsonl")
-        
-        # Atomic append pattern: Read existing, append new, write all atomically
-        existing_submissions = []
-        if os.path.exists(submission_file):
-            try:
-                with open(submission_file, 'r') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line:
-                            existing_submissions.append(json.loads(line))
-            except Exception as read_error:
-                log.warning(f"Could not read existing submissions: {read_error}")
-        
-        # Append new submission
-        existing_submissions.append(submission)
-        
-        # Atomic write: temp file + rename (Omega standard)
-        temp_fd, temp_path = tempfile.mkstemp(dir=log_dir, suffix=".tmp")
-        try:
-            with os.fdopen(temp_fd, 'w') as f:
-                for sub in existing_submissions:
-                    f.write(json.dumps(sub) + '\n')
-                f.flush()
-                os.fsync(f.fileno())
-            os.rename(temp_path, submission_file)
-        except Exception as write_error:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            raise write_error
+        _submissions.append(submission)
         
         log.info(f"Community submission: {submission['title']} (category={submission['category']}, language={submission['language']})")
         
@@ -1,21 +1,25 @@
 """
 Consultation Booking Endpoint - MEGA-PHASE 5
 AI-driven consultation scheduling with pre-consultation brief generation
-Stores bookings in JSON file (workspace-data/consultations.json)
+Stores bookings in the record store (imported once from workspace-data/consultations.json)
 """
 from flask import Blueprint, request, jsonify
 import logging
-import json
 import os
 import re
+import uuid
 from datetime import datetime
 from pathlib import Path
 
+from modules.record_store import RecordStore
+
 bp = Blueprint("consultation_book", __name__, url_prefix="/api/consultations/book")
 log = logging.getLogger("levqor.consultations.book")
 
 CONSULTATIONS_FILE = Path("workspace-data/consultations.json")
 
+_bookings = RecordStore("consultations", legacy_path=str(CONSULTATIONS_FILE), id_field="booking_id")
+
 
 @bp.post("/")
 def book_consultation():
@@ -95,8 +99,8 @@ def book_consultation():
         from api.metrics.app import increment_consultation_booked
         increment_consultation_booked()
         
-        # Generate booking ID
-        booking_id = f"CONS-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+        # Generate booking ID (unique: bookings in the same second must not collide)
+        booking_id = f"CONS-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
         
         # Create booking record with REAL data for follow-ups
         # Only mask PII in logs, NOT in storage
@@ -111,7 +115,7 @@ def book_consultation():
             "status": "scheduled"
         }
         
-        # Store in JSON file
+        # Store in the record store
         _save_booking(booking)
         
         # Generate AI pre-consultation brief
@@ -139,22 +143,9 @@ def book_consultation():
 
 
 def _save_booking(booking: dict):
-    """Thread-safe JSON file append"""
+    """Append a booking (single insert, safe across workers)"""
     try:
-        # Read existing
-        if CONSULTATIONS_FILE.exists():
-            with open(CONSULTATIONS_FILE, 'r') as f:
-                bookings = json.load(f)
-        else:
-            bookings = []
-        
-        # Append
-        bookings.append(booking)
-        
-        # Write back
-        with open(CONSULTATIONS_FILE, 'w') as f:
-            json.dump(bookings, f, indent=2)
-    
+        _bookings.append(booking)
     except Exception as e:
         log.error(f"Error saving booking: {e}")
         raise
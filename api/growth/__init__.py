@@ -13,7 +13,8 @@ from modules.growth_loops import (
     get_share_stats,
     get_template_copy_stats,
     get_viral_coefficient,
-    get_growth_leaderboard
+    get_growth_leaderboard,
+    get_workflow_share_stats
 )
 
 log = logging.getLogger("levqor.api.growth")
@@ -104,6 +105,21 @@ def stats():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@growth_loops_bp.route("/workflow/<workflow_id>/stats", methods=["GET"])
+def workflow_stats(workflow_id: str):
+    """GET /api/growth/workflow/<workflow_id>/stats - Get share statistics for one workflow."""
+    try:
+        result = get_workflow_share_stats(workflow_id)
+        
+        return jsonify({
+            "success": True,
+            **result
+        }), 200
+    except Exception as e:
+        log.error(f"Error getting workflow share stats: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 @growth_loops_bp.route("/template-stats", methods=["GET"])
 def template_stats():
     """GET /api/growth/template-stats - Get template copy statistics."""
@@ -173,42 +173,18 @@ def get_revenue_slice() -> Dict[str, Any]:
         }
     
     try:
-        now = time.time()
-        cutoff_7d = now - (7 * 24 * 3600)
-        cutoff_14d = now - (14 * 24 * 3600)
-        cutoff_30d = now - (30 * 24 * 3600)
+        from modules.analytics.windowed import get_window_counts
         
-        leads_7 = execute_query("""
-            SELECT COUNT(*) as cnt FROM sales_leads WHERE created_at >= ?
-        """, (cutoff_7d,), fetch='one') or {}
-        
-        leads_14 = execute_query("""
-            SELECT COUNT(*) as cnt FROM sales_leads WHERE created_at >= ?
-        """, (cutoff_14d,), fetch='one') or {}
-        
-        leads_30 = execute_query("""
-            SELECT COUNT(*) as cnt FROM sales_leads WHERE created_at >= ?
-        """, (cutoff_30d,), fetch='one') or {}
-        
-        dfy_7 = execute_query("""
-            SELECT COUNT(*) as cnt FROM dfy_requests WHERE created_at >= ?
-        """, (cutoff_7d,), fetch='one') or {}
-        
-        dfy_14 = execute_query("""
-            SELECT COUNT(*) as cnt FROM dfy_requests WHERE created_at >= ?
-        """, (cutoff_14d,), fetch='one') or {}
-        
-        dfy_30 = execute_query("""
-            SELECT COUNT(*) as cnt FROM dfy_requests WHERE created_at >= ?
-        """, (cutoff_30d,), fetch='one') or {}
+        leads = get_window_counts("sales_leads")
+        dfy = get_window_counts("dfy_requests")
         
         return {
-            "leads_7d": leads_7.get('cnt', 0) or 0,
-            "leads_14d": leads_14.get('cnt', 0) or 0,
-            "leads_30d": leads_30.get('cnt', 0) or 0,
-            "dfy_7d": dfy_7.get('cnt', 0) or 0,
-            "dfy_14d": dfy_14.get('cnt', 0) or 0,
-            "dfy_30d": dfy_30.get('cnt', 0) or 0
+            "leads_7d": leads["7d"],
+            "leads_14d": leads["14d"],
+            "leads_30d": leads["30d"],
+            "dfy_7d": dfy["7d"],
+            "dfy_14d": dfy["14d"],
+            "dfy_30d": dfy["30d"]
         }
         
     except Exception as e:
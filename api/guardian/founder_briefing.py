@@ -52,27 +52,15 @@ def get_revenue_24h_and_7d() -> Dict[str, Any]:
     try:
         now = time.time()
         cutoff_24h = now - (24 * 3600)
-        cutoff_7d = now - (7 * 24 * 3600)
         
-        leads_24h_result = execute_query("""
-            SELECT COUNT(*) as cnt FROM sales_leads WHERE created_at >= ?
-        """, (cutoff_24h,), fetch='one') or {}
-        leads_24h = leads_24h_result.get('cnt', 0) or 0
-        
-        leads_7d_result = execute_query("""
-            SELECT COUNT(*) as cnt FROM sales_leads WHERE created_at >= ?
-        """, (cutoff_7d,), fetch='one') or {}
-        leads_7d = leads_7d_result.get('cnt', 0) or 0
-        
-        dfy_24h_result = execute_query("""
-            SELECT COUNT(*) as cnt FROM dfy_requests WHERE created_at >= ?
-        """, (cutoff_24h,), fetch='one') or {}
-        dfy_24h = dfy_24h_result.get('cnt', 0) or 0
+        from modules.analytics.windowed import get_window_counts
         
-        dfy_7d_result = execute_query("""
-            SELECT COUNT(*) as cnt FROM dfy_requests WHERE created_at >= ?
-        """, (cutoff_7d,), fetch='one') or {}
-        dfy_7d = dfy_7d_result.get('cnt', 0) or 0
+        leads = get_window_counts("sales_leads")
+        dfy = get_window_counts("dfy_requests")
+        leads_24h = leads["24h"]
+        leads_7d = leads["7d"]
+        dfy_24h = dfy["24h"]
+        dfy_7d = dfy["7d"]
         
         top_sources_rows = execute_query("""
             SELECT source, COUNT(*) as cnt FROM sales_leads 
@@ -7,6 +7,7 @@ import time
 import logging
 from flask import Blueprint, jsonify
 from modules.db_wrapper import execute_query
+from modules.analytics.windowed import get_window_counts, STANDARD_WINDOWS
 
 log = logging.getLogger("levqor.guardian.revenue_summary")
 
@@ -20,10 +21,13 @@ def get_leads_snapshot(days: int = 30) -> dict:
     try:
         cutoff = time.time() - (days * 24 * 3600)
         
-        total = execute_query("""
-            SELECT COUNT(*) as cnt FROM sales_leads WHERE created_at >= ?
-        """, (cutoff,), fetch='one') or {}
-        total_leads = total.get('cnt', 0) or 0
+        if f"{days}d" in STANDARD_WINDOWS:
+            total_leads = get_window_counts("sales_leads")[f"{days}d"]
+        else:
+            total = execute_query("""
+                SELECT COUNT(*) as cnt FROM sales_leads WHERE created_at >= ?
+            """, (cutoff,), fetch='one') or {}
+            total_leads = total.get('cnt', 0) or 0
         
         by_stage_rows = execute_query("""
             SELECT stage, COUNT(*) as cnt FROM sales_leads 
@@ -53,10 +57,13 @@ def get_dfy_snapshot(days: int = 30) -> dict:
     try:
         cutoff = time.time() - (days * 24 * 3600)
         
-        total = execute_query("""
-            SELECT COUNT(*) as cnt FROM dfy_requests WHERE created_at >= ?
-        """, (cutoff,), fetch='one') or {}
-        total_requests = total.get('cnt', 0) or 0
+        if f"{days}d" in STANDARD_WINDOWS:
+            total_requests = get_window_counts("dfy_requests")[f"{days}d"]
+        else:
+            total = execute_query("""
+                SELECT COUNT(*) as cnt FROM dfy_requests WHERE created_at >= ?
+            """, (cutoff,), fetch='one') or {}
+            total_requests = total.get('cnt', 0) or 0
         
         by_status_rows = execute_query("""
             SELECT status, COUNT(*) as cnt FROM dfy_requests 
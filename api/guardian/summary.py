@@ -5,10 +5,11 @@ Returns compact JSON payload - no sensitive raw data exposed.
 """
 import os
 import json
+import time
 import logging
 from datetime import datetime
 from flask import Blueprint, jsonify
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Iterable, Iterator, Optional
 
 log = logging.getLogger("levqor.guardian")
 
@@ -57,17 +58,30 @@ def _read_recent_telemetry(max_lines: int = 500, max_age_minutes: int = 60) -> L
     return entries
 
 
-def _aggregate_telemetry(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+def _iter_ring_telemetry(max_age_minutes: int = 60) -> Optional[Iterator[Dict[str, Any]]]:
     """
-    Aggregate telemetry entries into summary metrics.
-    Returns compact JSON suitable for AI analysis.
+    Iterate recent telemetry from the shared ring written by all workers.
+    Returns None if the ring is unavailable so callers can fall back to the log file.
     """
-    if not entries:
-        return {
-            "status": "no_data",
-            "message": "No telemetry data in the specified time window"
-        }
+    try:
+        from api.telemetry.events import TELEMETRY_RING_FILE
+        from api.telemetry.ring import get_ring
+    except ImportError:
+        return None
+    
+    ring = get_ring(TELEMETRY_RING_FILE)
+    if ring is None:
+        return None
     
+    cutoff_ms = int(time.time() * 1000) - (max_age_minutes * 60 * 1000)
+    return ring.iter_recent(cutoff_ms)
+
+
+def _aggregate_telemetry(entries: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregate telemetry entries into summary metrics in a single pass.
+    Returns compact JSON suitable for AI analysis.
+    """
     event_counts: Dict[str, int] = {}
     error_counts: Dict[str, int] = {}
     error_types: Dict[str, int] = {}
@@ -77,8 +91,10 @@ def _aggregate_telemetry(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
     
     total_events = 0
     total_errors = 0
+    entries_analyzed = 0
     
     for entry in entries:
+        entries_analyzed += 1
         entry_type = entry.get("t", "unknown")
         
         if entry_type == "event":
@@ -111,6 +127,12 @@ def _aggregate_telemetry(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
                 perf_data[endpoint] = []
             perf_data[endpoint].append(duration)
     
+    if not entries_analyzed:
+        return {
+            "status": "no_data",
+            "message": "No telemetry data in the specified time window"
+        }
+    
     perf_summary = {}
     for endpoint, durations in perf_data.items():
         if durations:
@@ -161,7 +183,7 @@ def _aggregate_telemetry(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
             "total_events": total_events,
             "total_errors": total_errors,
             "error_rate_percent": error_rate,
-            "entries_analyzed": len(entries)
+            "entries_analyzed": entries_analyzed
         },
         "events_by_type": event_counts,
         "errors_by_location": error_counts,
@@ -194,7 +216,9 @@ def guardian_summary():
     }
     """
     try:
-        entries = _read_recent_telemetry(max_lines=500, max_age_minutes=60)
+        entries = _iter_ring_telemetry(max_age_minutes=60)
+        if entries is None:
+            entries = _read_recent_telemetry(max_lines=500, max_age_minutes=60)
         
         aggregated = _aggregate_telemetry(entries)
         
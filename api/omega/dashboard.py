@@ -8,6 +8,8 @@ from pathlib import Path
 import logging
 from datetime import datetime
 
+from api.utils.log_tail import read_last_entry
+
 bp = Blueprint("omega_dashboard", __name__, url_prefix="/api/omega")
 log = logging.getLogger("levqor.api.omega.dashboard")
 
@@ -22,10 +24,9 @@ def parse_monitor_log():
         return None
     
     try:
-        content = MONITOR_LOG.read_text()
-        entries = content.split("========================================")
-        if len(entries) > 1:
-            last_entry = entries[-1].strip()
+        # Seek back from the end to the last separator instead of reading the whole log
+        last_entry = read_last_entry(MONITOR_LOG, "========================================")
+        if last_entry is not None:
             lines = last_entry.split("\n")
             
             status_data = {}
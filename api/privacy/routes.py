@@ -3,17 +3,21 @@ Privacy & Data Rights API Routes
 Implements endpoints for GDPR data subject requests
 """
 import logging
-import json
 import re
+import uuid
 from datetime import datetime
 from pathlib import Path
 from flask import request, jsonify
 from . import privacy_bp
 
+from modules.record_store import RecordStore
+
 log = logging.getLogger("levqor.privacy")
 
 REQUESTS_FILE = Path("workspace-data/privacy_requests.json")
 
+_privacy_requests = RecordStore("privacy_requests", legacy_path=str(REQUESTS_FILE), id_field="id")
+
 
 def mask_email(email):
     """Mask email for logging: test***@example.com"""
@@ -50,44 +54,22 @@ def validate_email(email):
 
 def atomic_append_request(request_type, email):
     """
-    Atomically append privacy request to JSON file
-    Uses temp file + rename pattern from omega operators
+    Append a privacy request to the record store
+    A single insert, so concurrent workers cannot drop each other's requests
     """
-    REQUESTS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    
-    # Read existing records
-    if REQUESTS_FILE.exists():
-        try:
-            with REQUESTS_FILE.open("r") as f:
-                records = json.load(f)
-        except (json.JSONDecodeError, IOError) as e:
-            log.error(f"Error reading privacy requests file: {e}")
-            records = []
-    else:
-        records = []
-    
-    # Create new record
     record = {
-        "id": f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{len(records):04d}",
+        "id": f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}",
         "type": request_type,
         "email": email,
         "received_at": datetime.utcnow().isoformat() + "Z",
         "status": "pending"
     }
     
-    records.append(record)
-    
-    # Atomic write: temp file then rename
-    temp_file = REQUESTS_FILE.parent / f"{REQUESTS_FILE.name}.tmp"
     try:
-        with temp_file.open("w") as f:
-            json.dump(records, f, indent=2)
-        temp_file.rename(REQUESTS_FILE)
+        _privacy_requests.append(record)
         log.info(f"Privacy request recorded: type={request_type} email={mask_email(email)}")
         return True, record["id"]
     except Exception as e:
-        if temp_file.exists():
-            temp_file.unlink()
         log.error(f"Error writing privacy request: {e}")
         raise e
 
@@ -259,30 +241,12 @@ def requests_summary():
     NOTE: Protect with auth in production.
     """
     try:
-        if not REQUESTS_FILE.exists():
-            return jsonify({
-                "success": True,
-                "total": 0,
-                "by_type": {},
-                "by_status": {}
-            }), 200
-        
-        with REQUESTS_FILE.open("r") as f:
-            records = json.load(f)
-        
-        by_type = {}
-        by_status = {}
-        
-        for record in records:
-            req_type = record.get("type", "unknown")
-            status = record.get("status", "unknown")
-            
-            by_type[req_type] = by_type.get(req_type, 0) + 1
-            by_status[status] = by_status.get(status, 0) + 1
+        by_type = _privacy_requests.count_by("type")
+        by_status = _privacy_requests.count_by("status")
         
         return jsonify({
             "success": True,
-            "total": len(records),
+            "total": sum(by_type.values()),
             "by_type": by_type,
             "by_status": by_status
         }), 200
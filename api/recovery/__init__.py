@@ -25,13 +25,13 @@ def get_status():
     """GET /api/recovery/status - Get recovery system status."""
     try:
         stats = get_recovery_stats()
-        pending = get_pending_recoveries()
+        pending = get_pending_recoveries(limit=10)
         
         return jsonify({
             "success": True,
             "stats": stats,
-            "pending_count": len(pending),
-            "pending": pending[:10]
+            "pending_count": stats["pending"],
+            "pending": pending
         }), 200
     except Exception as e:
         log.error(f"Error getting recovery status: {e}")
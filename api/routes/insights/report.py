@@ -1,51 +1,92 @@
 """
 Insights Report Generation API
-Generates PDF reports and uploads to Google Drive
+Queues PDF reports (rendered in the background, uploaded to Google Drive)
+and serves finished or cached reports
 """
-from flask import Blueprint, jsonify
-from datetime import datetime
+from flask import Blueprint, jsonify, request, send_file
 import sys
 import os
 
 # Add modules to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 
-from modules.data_insights.aggregator import aggregate
-from modules.data_insights.report_builder import build_pdf
-from modules.data_insights.uploader import upload_pdf
+from modules.report_jobs import submit_report, get_job, get_artifact_path
+from tenant.context import get_tenant_id
 
 bp = Blueprint('insights_report', __name__, url_prefix="/api/insights")
 
-@bp.post("/report")
-def generate_report():
-    """
-    Generate quarterly insights report
-    
-    Returns:
-        JSON with Drive link and KPIs
-    """
+
+def _job_response(job):
+    """200 with the result for finished jobs, 202 with a status URL otherwise"""
+    body = {
+        "ok": job["status"] != "failed",
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "cached": job.get("cached", False),
+        "status_url": f"/api/insights/report/{job['job_id']}"
+    }
+    if job["status"] == "succeeded":
+        body.update(job["result"] or {})
+        body["size_bytes"] = job["size_bytes"]
+        body["download_url"] = f"/api/insights/report/{job['job_id']}/download"
+        return jsonify(body), 200
+    if job["status"] == "failed":
+        body["error"] = "report_generation_failed"
+        body["message"] = job["error"]
+        return jsonify(body), 500
+    return jsonify(body), 202
+
+
+def _submit(kind, params):
+    data = request.get_json(silent=True) or {}
     try:
-        # Aggregate data
-        kpis = aggregate(period_days=90)
-        
-        # Build PDF
-        pdf_bytes = build_pdf(kpis)
-        
-        # Upload to Drive
-        filename = f"Levqor_Insights_{datetime.utcnow().date().isoformat()}.pdf"
-        drive_link = upload_pdf(pdf_bytes, filename)
-        
-        return jsonify({
-            "ok": True,
-            "drive_link": drive_link,
-            "kpis": kpis,
-            "filename": filename,
-            "size_bytes": len(pdf_bytes)
-        }), 200
-        
+        job = submit_report(kind, tenant_id=get_tenant_id(), params=params(data))
     except Exception as e:
         return jsonify({
             "ok": False,
             "error": "report_generation_failed",
             "message": str(e)
         }), 500
+    return _job_response(job)
+
+
+@bp.post("/report")
+def generate_report():
+    """
+    Queue a quarterly insights report
+
+    Body (optional): {"period_days": 90}
+
+    Returns:
+        202 with job_id/status_url, or 200 with Drive link and KPIs when an
+        identical report for unchanged data already exists
+    """
+    return _submit("insights", lambda data: {"period_days": int(data.get("period_days", 90))})
+
+
+@bp.post("/evidence-pack")
+def generate_evidence_pack():
+    """
+    Queue an integrity evidence pack PDF (one render per day, then cached)
+    """
+    return _submit("evidence_pack", lambda data: {})
+
+
+@bp.get("/report/<job_id>")
+def report_status(job_id):
+    """Status of a report job; includes the result once finished"""
+    job = get_job(job_id)
+    if not job:
+        return jsonify({"ok": False, "error": "not_found"}), 404
+    return _job_response(job)
+
+
+@bp.get("/report/<job_id>/download")
+def download_report(job_id):
+    """The rendered PDF of a finished job"""
+    path = get_artifact_path(job_id)
+    if not path:
+        return jsonify({"ok": False, "error": "not_ready"}), 404
+    job = get_job(job_id)
+    filename = (job["result"] or {}).get("filename") or os.path.basename(path)
+    return send_file(os.path.abspath(path), mimetype="application/pdf", as_attachment=True, download_name=filename)
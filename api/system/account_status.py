@@ -21,12 +21,16 @@ except ImportError:
 bp = Blueprint("account_status", __name__, url_prefix="/api/system")
 log = logging.getLogger("levqor.account_status")
 
+# stripe is imported on first use (see modules.lazy_import)
+from modules.lazy_import import lazy_module
+
+stripe = lazy_module("stripe")
 try:
-    import stripe
     from modules.stripe_connector import ensure_stripe_configured
-    STRIPE_AVAILABLE = True
+    STRIPE_AVAILABLE = stripe is not None
 except ImportError:
     STRIPE_AVAILABLE = False
+if not STRIPE_AVAILABLE:
     log.warning("Stripe not available for account status checks")
 
 try:
@@ -1,10 +1,9 @@
 """
 Levqor Autopilot Telemetry - Event Logging
 Lightweight telemetry collection using only standard library.
-Writes JSON lines to rotating local log file + stdout.
+Writes JSON lines to rotating local log file + stdout via a background sink.
 """
 import os
-import json
 import logging
 import threading
 from time import time
@@ -12,10 +11,13 @@ from datetime import datetime
 from collections import defaultdict
 from typing import Dict, Any, Optional
 
+from .sink import create_sink_from_env
+
 log = logging.getLogger("levqor.telemetry")
 
 TELEMETRY_LOG_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "logs")
 TELEMETRY_LOG_FILE = os.path.join(TELEMETRY_LOG_DIR, "telemetry.log")
+TELEMETRY_RING_FILE = os.path.join(TELEMETRY_LOG_DIR, "telemetry.ring")
 MAX_LOG_SIZE_BYTES = 10 * 1024 * 1024  # 10MB before rotation
 MAX_LOG_FILES = 5
 
@@ -29,47 +31,14 @@ _stats: Dict[str, Any] = {
 }
 
 
-def _ensure_log_dir():
-    """Ensure telemetry log directory exists."""
-    try:
-        os.makedirs(TELEMETRY_LOG_DIR, exist_ok=True)
-    except Exception as e:
-        log.warning(f"Failed to create telemetry log dir: {e}")
-
-
-def _rotate_log_if_needed():
-    """Rotate log file if it exceeds max size."""
-    try:
-        if os.path.exists(TELEMETRY_LOG_FILE):
-            size = os.path.getsize(TELEMETRY_LOG_FILE)
-            if size >= MAX_LOG_SIZE_BYTES:
-                for i in range(MAX_LOG_FILES - 1, 0, -1):
-                    old_file = f"{TELEMETRY_LOG_FILE}.{i}"
-                    new_file = f"{TELEMETRY_LOG_FILE}.{i + 1}"
-                    if os.path.exists(old_file):
-                        if i + 1 >= MAX_LOG_FILES:
-                            os.remove(old_file)
-                        else:
-                            os.rename(old_file, new_file)
-                os.rename(TELEMETRY_LOG_FILE, f"{TELEMETRY_LOG_FILE}.1")
-    except Exception as e:
-        log.warning(f"Log rotation failed: {e}")
+_sink = create_sink_from_env(
+    TELEMETRY_LOG_FILE, MAX_LOG_SIZE_BYTES, MAX_LOG_FILES, ring_path=TELEMETRY_RING_FILE
+)
 
 
 def _write_telemetry_line(entry: Dict[str, Any]):
-    """Write a single telemetry entry to log file and stdout."""
-    _ensure_log_dir()
-    _rotate_log_if_needed()
-    
-    line = json.dumps(entry, separators=(',', ':'), default=str)
-    
-    print(f"TELEMETRY {line}", flush=True)
-    
-    try:
-        with open(TELEMETRY_LOG_FILE, "a") as f:
-            f.write(line + "\n")
-    except Exception as e:
-        log.warning(f"Failed to write telemetry log: {e}")
+    """Hand a telemetry entry to the background sink (no file I/O on the caller)."""
+    _sink.submit(entry)
 
 
 def log_event(event_type: str, payload: Optional[Dict[str, Any]] = None, endpoint: Optional[str] = None):
@@ -196,6 +165,7 @@ def get_telemetry_stats() -> Dict[str, Any]:
             "errors_by_location": dict(_stats["errors"]),
             "performance": perf_summary,
             "languages": dict(_stats["languages"]),
+            "sink": _sink.get_stats(),
             "generated_at": datetime.utcnow().isoformat() + "Z"
         }
 
@@ -0,0 +1,247 @@
+"""
+Levqor Telemetry Ring - Shared-Memory Recent Telemetry
+Fixed-size memory-mapped ring buffer of pre-parsed telemetry records.
+
+Every worker process maps the same file (logs/telemetry.ring). Writers
+append compact fixed-width binary records under an advisory lock; readers
+never lock. Each slot carries its sequence number, written last, and the
+reader re-checks it after copying the slot, so a slot that is overwritten
+mid-read is skipped instead of returned torn.
+
+Because the ring is shared and independent of telemetry.log rotation, a
+summary sees events from every worker, and aggregating over it needs no
+file reads or JSON parsing.
+
+Layout:
+    header (32 bytes): magic, slot_count, slot_size, head sequence
+    slots  (slot_count * 128 bytes): see SLOT_STRUCT
+"""
+import os
+import mmap
+import struct
+import logging
+import threading
+from typing import Dict, Any, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+log = logging.getLogger("levqor.telemetry.ring")
+
+RING_MAGIC = b"LVQRING1"
+HEADER_STRUCT = struct.Struct("<8sIIQ8x")
+HEAD_OFFSET = 16
+
+KIND_EVENT = 1
+KIND_ERROR = 2
+KIND_PERF = 3
+_KIND_BY_TYPE = {"event": KIND_EVENT, "error": KIND_ERROR, "perf": KIND_PERF}
+_TYPE_BY_KIND = {v: k for k, v in _KIND_BY_TYPE.items()}
+
+# seq, ts_ms, kind, status, duration_ms, name, detail, language
+#   event: name=event type, detail=endpoint
+#   error: name=location,   detail=error type
+#   perf:  name=endpoint
+SLOT_STRUCT = struct.Struct("<QQBxHf48p40p8p")
+SLOT_SIZE = 128
+SEQ_STRUCT = struct.Struct("<Q")
+
+DEFAULT_SLOTS = int(os.environ.get("TELEMETRY_RING_SLOTS", "4096"))
+
+
+def _clip(value: Optional[str], size: int) -> bytes:
+    if not value:
+        return b""
+    # Pascal strings carry one length byte
+    return str(value).encode("utf-8")[:size - 1]
+
+
+def encode_record(seq: int, entry: Dict[str, Any]) -> Optional[bytes]:
+    """Pack a telemetry entry into a slot, or None if its type is unknown."""
+    kind = _KIND_BY_TYPE.get(entry.get("t"))
+    if kind is None:
+        return None
+
+    status = 0
+    duration = 0.0
+    language = None
+    if kind == KIND_EVENT:
+        name, detail = entry.get("event"), entry.get("endpoint")
+        data = entry.get("data")
+        if isinstance(data, dict):
+            language = data.get("language")
+    elif kind == KIND_ERROR:
+        name, detail = entry.get("location"), entry.get("error_type")
+    else:
+        name, detail = entry.get("endpoint"), None
+        status = int(entry.get("status", 0) or 0) & 0xFFFF
+        duration = float(entry.get("duration_ms", 0.0) or 0.0)
+
+    return SLOT_STRUCT.pack(
+        seq,
+        int(entry.get("ts", 0)),
+        kind,
+        status,
+        duration,
+        _clip(name, 48),
+        _clip(detail, 40),
+        _clip(language, 8)
+    )
+
+
+def decode_record(raw: bytes) -> Dict[str, Any]:
+    """Unpack a slot into the same dict shape as a telemetry.log entry."""
+    seq, ts, kind, status, duration, name, detail, language = SLOT_STRUCT.unpack_from(raw)
+    entry_type = _TYPE_BY_KIND.get(kind, "unknown")
+    name = name.decode("utf-8", errors="replace") or None
+    detail = detail.decode("utf-8", errors="replace") or None
+
+    if kind == KIND_EVENT:
+        entry = {"t": entry_type, "ts": ts, "event": name, "endpoint": detail}
+        if language:
+            entry["data"] = {"language": language.decode("utf-8", errors="replace")}
+        return entry
+    if kind == KIND_ERROR:
+        return {"t": entry_type, "ts": ts, "location": name, "error_type": detail}
+    return {"t": entry_type, "ts": ts, "endpoint": name, "duration_ms": round(duration, 2), "status": status}
+
+
+class TelemetryRing:
+    """Memory-mapped ring shared by all processes that open the same path."""
+
+    def __init__(self, path: str, slots: int = DEFAULT_SLOTS):
+        self.path = path
+        self._local_lock = threading.Lock()
+        self._lock_fh = None
+        self._map = None
+        self._open(slots)
+
+    def _acquire(self):
+        self._local_lock.acquire()
+        if fcntl is not None:
+            fcntl.flock(self._lock_fh.fileno(), fcntl.LOCK_EX)
+
+    def _release(self):
+        if fcntl is not None:
+            fcntl.flock(self._lock_fh.fileno(), fcntl.LOCK_UN)
+        self._local_lock.release()
+
+    def _open(self, slots: int):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock_fh = open(self.path + ".lock", "a")
+
+        self._acquire()
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                size = os.fstat(fd).st_size
+                header = os.pread(fd, HEADER_STRUCT.size, 0) if size >= HEADER_STRUCT.size else b""
+                valid = False
+                if header:
+                    magic, file_slots, slot_size, _ = HEADER_STRUCT.unpack(header)
+                    valid = (
+                        magic == RING_MAGIC
+                        and slot_size == SLOT_SIZE
+                        and size == HEADER_STRUCT.size + file_slots * SLOT_SIZE
+                    )
+                    if valid:
+                        slots = file_slots
+
+                if not valid:
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, HEADER_STRUCT.size + slots * SLOT_SIZE)
+                    os.pwrite(fd, HEADER_STRUCT.pack(RING_MAGIC, slots, SLOT_SIZE, 0), 0)
+
+                self._map = mmap.mmap(fd, HEADER_STRUCT.size + slots * SLOT_SIZE)
+            finally:
+                os.close(fd)
+        finally:
+            self._release()
+
+        self.slots = slots
+
+    def _head(self) -> int:
+        return SEQ_STRUCT.unpack_from(self._map, HEAD_OFFSET)[0]
+
+    def _slot_offset(self, seq: int) -> int:
+        return HEADER_STRUCT.size + (seq % self.slots) * SLOT_SIZE
+
+    def append_batch(self, entries: List[Dict[str, Any]]) -> int:
+        """Append entries under the writer lock. Returns the number stored."""
+        if not entries:
+            return 0
+
+        stored = 0
+        self._acquire()
+        try:
+            head = self._head()
+            for entry in entries:
+                seq = head + 1
+                record = encode_record(seq, entry)
+                if record is None:
+                    continue
+                offset = self._slot_offset(seq)
+                # Invalidate the slot, write the payload, then publish the seq
+                SEQ_STRUCT.pack_into(self._map, offset, 0)
+                self._map[offset + SEQ_STRUCT.size:offset + SLOT_STRUCT.size] = record[SEQ_STRUCT.size:]
+                SEQ_STRUCT.pack_into(self._map, offset, seq)
+                head = seq
+                stored += 1
+            SEQ_STRUCT.pack_into(self._map, HEAD_OFFSET, head)
+        finally:
+            self._release()
+        return stored
+
+    def iter_recent(self, since_ms: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        Yield records newest first with ts >= since_ms. Lock-free; slots
+        overwritten during the read are skipped.
+        """
+        head = self._head()
+        oldest = max(1, head - self.slots + 1)
+        for seq in range(head, oldest - 1, -1):
+            offset = self._slot_offset(seq)
+            raw = self._map[offset:offset + SLOT_STRUCT.size]
+            if SEQ_STRUCT.unpack_from(raw)[0] != seq:
+                continue
+            entry = decode_record(raw)
+            if SEQ_STRUCT.unpack_from(self._map, offset)[0] != seq:
+                continue
+            # Writers flush in batches, so timestamps are only roughly
+            # ordered across processes; filter rather than stop early
+            if entry["ts"] >= since_ms:
+                yield entry
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._lock_fh is not None:
+            self._lock_fh.close()
+            self._lock_fh = None
+
+
+_ring: Optional[TelemetryRing] = None
+_ring_pid: Optional[int] = None
+_ring_failed = False
+_ring_init_lock = threading.Lock()
+
+
+def get_ring(path: str) -> Optional[TelemetryRing]:
+    """Return this process's mapping of the ring, or None if unavailable."""
+    global _ring, _ring_pid, _ring_failed
+    if _ring_pid == os.getpid() and (_ring is not None or _ring_failed):
+        return _ring
+    with _ring_init_lock:
+        if _ring_pid != os.getpid():
+            _ring_pid = os.getpid()
+            _ring_failed = False
+            try:
+                _ring = TelemetryRing(path)
+            except Exception as e:
+                log.warning(f"Telemetry ring unavailable: {e}")
+                _ring = None
+                _ring_failed = True
+    return _ring
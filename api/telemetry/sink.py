@@ -0,0 +1,392 @@
+"""
+Levqor Telemetry Sink - Buffered Background Writer
+Moves telemetry file I/O off the request thread.
+
+Request threads only serialize the entry and put it on a bounded queue.
+A dedicated writer thread keeps the log file open and writes in batches:
+a batch is written once it holds TELEMETRY_BATCH_SIZE entries or
+TELEMETRY_FLUSH_INTERVAL seconds after its first entry arrived. Before each
+batch the path is stat()ed once (not per line), so rotation by another
+process is noticed and the size check sees every writer's bytes. Writes
+from several worker processes are serialized with an advisory lock on a
+sidecar lock file, which also coordinates rotation. Each batch is also
+appended to the shared telemetry ring (see ring.py) that backs the
+recent-window guardian summary.
+
+Configuration (environment):
+    TELEMETRY_QUEUE_SIZE        Max buffered entries (default 10000)
+    TELEMETRY_BATCH_SIZE        Max entries written per batch (default 256)
+    TELEMETRY_FLUSH_INTERVAL    Max seconds an entry waits for its batch (default 0.5)
+    TELEMETRY_DROP_POLICY       drop_new | drop_oldest | block (default drop_new)
+    TELEMETRY_STDOUT            "1" to mirror lines to stdout (default 1)
+    TELEMETRY_PERF_FORMAT       jsonl | binary (default jsonl)
+"""
+import os
+import json
+import queue
+import struct
+import atexit
+import logging
+import threading
+from time import monotonic
+from typing import Dict, Any, List, Optional, Iterator
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+from .ring import TelemetryRing, get_ring
+
+log = logging.getLogger("levqor.telemetry.sink")
+
+DROP_NEW = "drop_new"
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+DROP_POLICIES = (DROP_NEW, DROP_OLDEST, BLOCK)
+
+# Binary perf record: ts_ms (uint64), duration_ms (float32), status (uint16),
+# endpoint length (uint16), followed by the UTF-8 endpoint bytes.
+PERF_RECORD_HEADER = struct.Struct("<QfHH")
+PERF_SEGMENT_MAGIC = b"LVQPERF1"
+
+_STOP = object()
+
+
+class _RotatingFile:
+    """
+    Append-only file handle with size-based rotation.
+
+    Other worker processes append to and rotate the same file, so every
+    write stats the path once under the lock: a rotated-away file is
+    reopened and the size check uses the real size.
+    """
+
+    def __init__(self, path: str, max_bytes: int, max_files: int, binary_header: Optional[bytes] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.binary_header = binary_header
+        self._fh = None
+        self._lock_fh = None
+        self._inode = None
+        self._size = 0
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._fh = open(self.path, "ab")
+        st = os.fstat(self._fh.fileno())
+        self._inode = st.st_ino
+        self._size = st.st_size
+        if self.binary_header and st.st_size == 0:
+            self._fh.write(self.binary_header)
+            self._size += len(self.binary_header)
+
+    def _acquire(self):
+        if fcntl is None:
+            return
+        if self._lock_fh is None:
+            self._lock_fh = open(self.path + ".lock", "a")
+        fcntl.flock(self._lock_fh.fileno(), fcntl.LOCK_EX)
+
+    def _release(self):
+        if fcntl is not None and self._lock_fh is not None:
+            fcntl.flock(self._lock_fh.fileno(), fcntl.LOCK_UN)
+
+    def _reopen_if_rotated(self):
+        """Reopen if another process rotated the file away from under us."""
+        try:
+            st = os.stat(self.path)
+            if st.st_ino == self._inode:
+                self._size = st.st_size
+                return
+        except FileNotFoundError:
+            pass
+        self._fh.close()
+        self._open()
+
+    def _rotate(self):
+        self._fh.close()
+        for i in range(self.max_files - 1, 0, -1):
+            old_file = f"{self.path}.{i}"
+            new_file = f"{self.path}.{i + 1}"
+            if os.path.exists(old_file):
+                if i + 1 >= self.max_files:
+                    os.remove(old_file)
+                else:
+                    os.rename(old_file, new_file)
+        os.rename(self.path, f"{self.path}.1")
+        self._open()
+
+    def write(self, data: bytes):
+        if self._fh is None:
+            self._open()
+
+        self._acquire()
+        try:
+            self._reopen_if_rotated()
+            if self._size + len(data) >= self.max_bytes:
+                self._rotate()
+            self._fh.write(data)
+            # Flush while holding the lock so batches from different
+            # processes never interleave inside the file
+            self._fh.flush()
+            self._size += len(data)
+        finally:
+            self._release()
+
+    def close(self):
+        if self._fh is not None:
+            try:
+                self._fh.close()
+            finally:
+                self._fh = None
+        if self._lock_fh is not None:
+            self._lock_fh.close()
+            self._lock_fh = None
+
+
+class TelemetrySink:
+    """
+    Queue-backed telemetry writer with a dedicated background thread.
+
+    The writer thread is started lazily and restarted after fork, so the
+    sink is safe to create at import time under preloading servers.
+    """
+
+    def __init__(
+        self,
+        log_file: str,
+        max_bytes: int,
+        max_files: int,
+        queue_size: int = 10000,
+        batch_size: int = 256,
+        flush_interval: float = 0.5,
+        drop_policy: str = DROP_NEW,
+        mirror_stdout: bool = True,
+        perf_format: str = "jsonl",
+        ring_path: Optional[str] = None
+    ):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+
+        self.log_file = log_file
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.mirror_stdout = mirror_stdout
+        self.perf_format = perf_format
+        self.perf_file = os.path.splitext(log_file)[0] + "-perf.bin"
+        self.ring_path = ring_path
+
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"enqueued": 0, "written": 0, "dropped": 0, "batches": 0, "write_errors": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._thread = threading.Thread(
+                target=self._run, name="telemetry-sink", daemon=True
+            )
+            self._thread.start()
+
+    def submit(self, entry: Dict[str, Any]) -> bool:
+        """
+        Enqueue an entry for writing. Never performs file I/O.
+
+        Returns:
+            False if the entry was dropped under the configured policy.
+        """
+        self._ensure_started()
+        q = self._queue
+
+        if self.drop_policy == BLOCK:
+            q.put(entry)
+            self._count("enqueued")
+            return True
+
+        try:
+            q.put_nowait(entry)
+            self._count("enqueued")
+            return True
+        except queue.Full:
+            pass
+
+        if self.drop_policy == DROP_OLDEST:
+            try:
+                q.get_nowait()
+                self._count("dropped")
+                q.put_nowait(entry)
+                self._count("enqueued")
+                return True
+            except (queue.Empty, queue.Full):
+                pass
+
+        self._count("dropped")
+        return False
+
+    def _drain_batch(self, first: Any) -> List[Any]:
+        """Collect up to batch_size items, waiting at most flush_interval after the first."""
+        batch = [first]
+        deadline = monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and first is not _STOP:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - monotonic()))
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is _STOP:
+                break
+        return batch
+
+    def _run(self):
+        text_file = _RotatingFile(self.log_file, self.max_bytes, self.max_files)
+        perf_file = None
+        if self.perf_format == "binary":
+            perf_file = _RotatingFile(
+                self.perf_file, self.max_bytes, self.max_files, binary_header=PERF_SEGMENT_MAGIC
+            )
+        ring = get_ring(self.ring_path) if self.ring_path else None
+
+        try:
+            while True:
+                batch = self._drain_batch(self._queue.get())
+                stop = any(e is _STOP for e in batch)
+                entries = [e for e in batch if e is not _STOP]
+                if entries:
+                    self._write_batch(entries, text_file, perf_file, ring)
+                if stop:
+                    return
+        finally:
+            text_file.close()
+            if perf_file is not None:
+                perf_file.close()
+
+    def _write_batch(
+        self,
+        entries: List[Dict[str, Any]],
+        text_file: _RotatingFile,
+        perf_file: Optional[_RotatingFile],
+        ring: Optional[TelemetryRing]
+    ):
+        lines = []
+        perf_records = []
+        for entry in entries:
+            if perf_file is not None and entry.get("t") == "perf":
+                perf_records.append(encode_perf_record(entry))
+                continue
+            lines.append(json.dumps(entry, separators=(',', ':'), default=str))
+
+        if ring is not None:
+            try:
+                ring.append_batch(entries)
+            except Exception as e:
+                log.warning(f"Failed to append telemetry to ring: {e}")
+
+        try:
+            if lines:
+                payload = "\n".join(lines) + "\n"
+                if self.mirror_stdout:
+                    print("".join(f"TELEMETRY {line}\n" for line in lines), end="", flush=True)
+                text_file.write(payload.encode("utf-8"))
+            if perf_records:
+                perf_file.write(b"".join(perf_records))
+            self._count("written", len(entries))
+            self._count("batches")
+        except Exception as e:
+            self._count("write_errors")
+            log.warning(f"Failed to write telemetry batch: {e}")
+
+    def flush(self, timeout: float = 5.0):
+        """Stop the writer after draining everything queued so far."""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        pending = self._queue.qsize() if self._queue is not None else 0
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return {**stats, "pending": pending, "drop_policy": self.drop_policy}
+
+
+def encode_perf_record(entry: Dict[str, Any]) -> bytes:
+    """Pack a perf telemetry entry into the compact binary segment format."""
+    endpoint = (entry.get("endpoint") or "").encode("utf-8")[:65535]
+    return PERF_RECORD_HEADER.pack(
+        int(entry.get("ts", 0)),
+        float(entry.get("duration_ms", 0.0)),
+        int(entry.get("status", 0)) & 0xFFFF,
+        len(endpoint)
+    ) + endpoint
+
+
+def read_perf_segment(path: str) -> Iterator[Dict[str, Any]]:
+    """Decode a binary perf segment back into perf telemetry entries."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(PERF_SEGMENT_MAGIC):
+        raise ValueError(f"Not a telemetry perf segment: {path}")
+
+    offset = len(PERF_SEGMENT_MAGIC)
+    header_size = PERF_RECORD_HEADER.size
+    while offset + header_size <= len(data):
+        ts, duration_ms, status, length = PERF_RECORD_HEADER.unpack_from(data, offset)
+        offset += header_size
+        endpoint = data[offset:offset + length].decode("utf-8", errors="replace")
+        offset += length
+        yield {
+            "t": "perf",
+            "ts": ts,
+            "endpoint": endpoint,
+            "duration_ms": round(duration_ms, 2),
+            "status": status
+        }
+
+
+def create_sink_from_env(
+    log_file: str,
+    max_bytes: int,
+    max_files: int,
+    ring_path: Optional[str] = None
+) -> TelemetrySink:
+    """Build a sink configured from TELEMETRY_* environment variables."""
+    drop_policy = os.environ.get("TELEMETRY_DROP_POLICY", DROP_NEW)
+    if drop_policy not in DROP_POLICIES:
+        log.warning(f"Unknown TELEMETRY_DROP_POLICY={drop_policy}, using {DROP_NEW}")
+        drop_policy = DROP_NEW
+
+    sink = TelemetrySink(
+        log_file=log_file,
+        max_bytes=max_bytes,
+        max_files=max_files,
+        queue_size=int(os.environ.get("TELEMETRY_QUEUE_SIZE", "10000")),
+        batch_size=int(os.environ.get("TELEMETRY_BATCH_SIZE", "256")),
+        flush_interval=float(os.environ.get("TELEMETRY_FLUSH_INTERVAL", "0.5")),
+        drop_policy=drop_policy,
+        mirror_stdout=os.environ.get("TELEMETRY_STDOUT", "1") == "1",
+        perf_format=os.environ.get("TELEMETRY_PERF_FORMAT", "jsonl"),
+        ring_path=ring_path
+    )
+    atexit.register(sink.flush)
+    return sink
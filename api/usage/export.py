@@ -1,76 +1,139 @@
-from flask import Blueprint, Response
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 import csv
 import io
+import os
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+
+from tenant.context import TENANT_HEADERS, get_tenant_id
 
 bp = Blueprint('usage_export', __name__)
 logger = logging.getLogger(__name__)
 
+CSV_FIELDS = ["date", "workflows", "runs", "api_calls", "ai_credits"]
+DEFAULT_EXPORT_DAYS = 30
+USAGE_EXPORT_MAX_DAYS = int(os.environ.get("USAGE_EXPORT_MAX_DAYS", "366"))
+
+
+def _is_authorized(req):
+    """Check if request has valid admin token"""
+    token = (req.headers.get("Authorization") or "").replace("Bearer ", "")
+    admin_token = os.getenv("ADMIN_TOKEN", "")
+    return token and token == admin_token
+
+
+def _tenant_scope(req):
+    """Tenant from the request's tenant context, or None (all tenants) without a tenant header."""
+    if any(req.headers.get(header) for header in TENANT_HEADERS):
+        return get_tenant_id()
+    return None
+
+
+def _parse_range(args):
+    """
+    Resolve start/end (YYYY-MM-DD, inclusive) from query args.
+    Defaults to the last DEFAULT_EXPORT_DAYS days ending today (UTC).
+    Ranges longer than USAGE_EXPORT_MAX_DAYS are rejected.
+    """
+    today = datetime.now(timezone.utc).date()
+    end = datetime.strptime(args["end"], "%Y-%m-%d").date() if args.get("end") else today
+    if args.get("start"):
+        start = datetime.strptime(args["start"], "%Y-%m-%d").date()
+    else:
+        days = int(args.get("days", DEFAULT_EXPORT_DAYS))
+        if days < 1:
+            raise ValueError("days must be at least 1")
+        start = end - timedelta(days=days - 1)
+    if start > end:
+        raise ValueError("start must not be after end")
+    if (end - start).days >= USAGE_EXPORT_MAX_DAYS:
+        raise ValueError(f"range must not exceed {USAGE_EXPORT_MAX_DAYS} days")
+    return start, end
+
+
+def _take(buffer):
+    line = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+    return line
+
+
+def _stream_csv(first_row, rows):
+    """Yield the header, then one CSV line per row; only one row is held at a time."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    yield _take(buffer)
+
+    if first_row is None:
+        logger.info("CSV_EXPORT: Streamed 0 rows")
+        return
+
+    writer.writerow(first_row)
+    yield _take(buffer)
+    count = 1
+    try:
+        for row in rows:
+            writer.writerow(row)
+            yield _take(buffer)
+            count += 1
+    except Exception as e:
+        # Status and headers are already sent; end the file where it stopped
+        logger.error(f"CSV_EXPORT_ERROR: stream aborted after {count} rows: {str(e)}")
+        return
+    logger.info(f"CSV_EXPORT: Streamed {count} rows")
+
+
 @bp.route('/api/usage/export', methods=['GET'])
 def export_usage_csv():
-    """Export usage data as CSV with safety hardening."""
-    
+    """
+    Export per-day usage as CSV, streamed row by row.
+
+    Requires: Authorization: Bearer <ADMIN_TOKEN>
+
+    Query params:
+        start, end  - inclusive YYYY-MM-DD range (end defaults to today, UTC)
+        days        - range length when start is omitted (default 30)
+
+    With a tenant header (see tenant.context) only that tenant's workflows,
+    API calls and credits are counted; without one, all tenants are.
+    """
+    if not _is_authorized(request):
+        return jsonify({"error": "unauthorized"}), 401
+
     try:
-        # TODO: Query actual usage data from database
-        # For now, generate sample data with None-safety
-        
-        raw_data = [
-            {
-                "date": (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d"),
-                "workflows": max(0, 10 - i),
-                "runs": max(0, 150 - (i * 10)),
-                "ai_credits": max(0, 500 - (i * 50))
-            }
-            for i in range(30)
-        ]
-        
-        # Safety: Ensure all values are valid, coerce None to 0
-        data = []
-        for row in raw_data:
-            try:
-                safe_row = {
-                    "date": row.get("date", datetime.now().strftime("%Y-%m-%d")),
-                    "workflows": int(row.get("workflows") or 0),
-                    "runs": int(row.get("runs") or 0),
-                    "ai_credits": int(row.get("ai_credits") or 0)
-                }
-                data.append(safe_row)
-            except (ValueError, TypeError) as e:
-                logger.warning(f"CSV_EXPORT_ROW_SKIP: Invalid row data: {e}")
-                continue
-        
-        # Always return at least the header
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=["date", "workflows", "runs", "ai_credits"])
-        writer.writeheader()
-        
-        # Write rows if any
-        if data:
-            writer.writerows(data)
-        
-        logger.info(f"CSV_EXPORT: Generated {len(data)} rows")
-        
-        response = Response(
-            output.getvalue(),
+        start, end = _parse_range(request.args)
+    except (ValueError, TypeError, OverflowError) as e:
+        return jsonify({"error": f"Invalid date range: {e}"}), 400
+
+    tenant_id = _tenant_scope(request)
+
+    try:
+        from modules.usage_rollups import iter_daily_usage
+
+        rows = iter_daily_usage(start, end, tenant_id=tenant_id)
+        # Pull the first row here so database errors still get the fallback below
+        first_row = next(rows, None)
+        filename = f"usage_{start.isoformat()}_{end.isoformat()}.csv"
+
+        return Response(
+            stream_with_context(_stream_csv(first_row, rows)),
             mimetype="text/csv; charset=utf-8",
             headers={
-                "Content-Disposition": f"attachment; filename=usage_30d.csv",
+                "Content-Disposition": f"attachment; filename={filename}",
                 "Cache-Control": "no-cache, no-store, must-revalidate"
             }
         )
-        
-        return response
-        
+
     except Exception as e:
         logger.error(f"CSV_EXPORT_ERROR: {str(e)}")
         # Return minimal valid CSV even on error
         output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=["date", "workflows", "runs", "ai_credits"])
+        writer = csv.DictWriter(output, fieldnames=CSV_FIELDS)
         writer.writeheader()
-        
+
         return Response(
             output.getvalue(),
             mimetype="text/csv; charset=utf-8",
-            headers={"Content-Disposition": "attachment; filename=usage_30d.csv"}
+            headers={"Content-Disposition": "attachment; filename=usage.csv"}
         )
@@ -0,0 +1,167 @@
+"""
+Levqor - Tail-Reading Log Access
+Reads the end of append-only log files without loading the whole file.
+
+Log files under logs/ and workspace-data/ grow for the lifetime of the
+deployment. Everything here seeks from the end of the file in fixed-size
+blocks, so reading the last N lines or the last entry costs O(N) regardless
+of how large the file has become.
+"""
+
+import logging
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional, Union
+
+log = logging.getLogger("levqor.log_tail")
+
+DEFAULT_BLOCK_SIZE = 8192
+
+_TIMESTAMP_RE = re.compile(
+    r"^\[?(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?)"
+)
+
+PathLike = Union[str, os.PathLike]
+
+
+def iter_lines_reverse(path: PathLike, block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[str]:
+    """
+    Yield lines of a file from last to first.
+
+    Reads backwards in blocks of block_size bytes; only as many blocks as
+    needed to produce the consumed lines are ever read. Trailing newlines
+    are stripped and undecodable bytes are replaced.
+
+    Args:
+        path: Log file path
+        block_size: Bytes read per seek step
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            chunk = f.read(read_size) + remainder
+
+            lines = chunk.split(b"\n")
+            # The first piece may be a partial line; keep it for the next block
+            remainder = lines.pop(0)
+
+            for raw in reversed(lines):
+                yield raw.decode("utf-8", errors="replace").rstrip("\r")
+
+        yield remainder.decode("utf-8", errors="replace").rstrip("\r")
+
+
+def detect_level(line: str) -> str:
+    """Classify a free-form log line as error, warn or info."""
+    if "ERROR" in line or "FAIL" in line:
+        return "error"
+    if "WARN" in line:
+        return "warn"
+    return "info"
+
+
+def parse_line_timestamp(line: str) -> Optional[datetime]:
+    """
+    Parse a leading ISO-8601 timestamp from a log line.
+
+    Accepts both "[2025-01-01T12:00:00] ..." and "2025-01-01 12:00:00 ..."
+    forms. Returns None if the line does not start with a timestamp.
+    """
+    match = _TIMESTAMP_RE.match(line.strip())
+    if not match:
+        return None
+    try:
+        return datetime.fromisoformat(match.group(1).replace(" ", "T"))
+    except ValueError:
+        return None
+
+
+def tail_lines(
+    path: PathLike,
+    n: int = 10,
+    level: Optional[str] = None,
+    since: Optional[datetime] = None,
+    block_size: int = DEFAULT_BLOCK_SIZE
+) -> List[str]:
+    """
+    Return the last n non-empty lines of a file in chronological order.
+
+    Args:
+        path: Log file path
+        n: Maximum number of lines to return
+        level: Only keep lines whose detect_level() matches ("error", "warn", "info")
+        since: Stop scanning at the first line with a timestamp older than this.
+            Lines without a timestamp are kept.
+        block_size: Bytes read per seek step
+
+    Returns:
+        List of lines, oldest first. Empty if the file does not exist.
+    """
+    if n <= 0 or not Path(path).exists():
+        return []
+
+    collected: List[str] = []
+    for line in iter_lines_reverse(path, block_size):
+        if not line.strip():
+            continue
+
+        if since is not None:
+            ts = parse_line_timestamp(line)
+            if ts is not None and ts < since:
+                break
+
+        if level is not None and detect_level(line) != level:
+            continue
+
+        collected.append(line)
+        if len(collected) >= n:
+            break
+
+    collected.reverse()
+    return collected
+
+
+def read_last_entry(
+    path: PathLike,
+    separator: str,
+    block_size: int = DEFAULT_BLOCK_SIZE
+) -> Optional[str]:
+    """
+    Return the text after the last separator line in a multi-line entry log.
+
+    Scans backwards only until the separator is found, so the cost is
+    proportional to the size of the last entry rather than the file.
+
+    Args:
+        path: Log file path
+        separator: Line content that starts each entry
+        block_size: Bytes read per seek step
+
+    Returns:
+        Entry text (without the separator), or None if the file does not
+        exist or contains no separator.
+    """
+    if not Path(path).exists():
+        return None
+
+    entry_lines: List[str] = []
+    for line in iter_lines_reverse(path, block_size):
+        if line.strip() == separator:
+            entry_lines.reverse()
+            return "\n".join(entry_lines).strip()
+        entry_lines.append(line)
+
+    return None
+
+
+# Verification commands:
+# python -c "from api.utils.log_tail import tail_lines; print(tail_lines('logs/admin_api.log', 5))"
+# python -c "from api.utils.log_tail import read_last_entry; print(read_last_entry('workspace-data/omega_self_monitor.log', '=' * 40))"
@@ -13,6 +13,7 @@ from modules.workflows.storage import (
     update_workflow, delete_workflow
 )
 from modules.workflows.runner import WorkflowRunner
+from modules.workflows.engine import is_async_mode, submit_workflow_run
 from modules.workflows.events import get_workflow_runs, get_workflow_events
 
 log = logging.getLogger("levqor.workflows.api")
@@ -142,7 +143,10 @@ def api_update_workflow(workflow_id: str):
 def api_run_workflow(workflow_id: str):
     """
     POST /api/workflows/<id>/run - Trigger a manual workflow run (Class B: logged).
-    Body: { context? }
+    Body: { context?, async? }
+    
+    With async (or WORKFLOW_EXECUTION_MODE=async) the run is handed to the
+    durable engine and 202 is returned immediately; poll /runs/<run_id>/events.
     """
     try:
         workflow = get_workflow_by_id(workflow_id)
@@ -153,6 +157,15 @@ def api_run_workflow(workflow_id: str):
         data = request.get_json() or {}
         context = data.get('context', {})
         
+        if data.get('async', is_async_mode()):
+            run_id = submit_workflow_run(workflow, context)
+            log.info(f"Workflow run submitted (Class B, async): {workflow_id} -> run_id={run_id}")
+            return jsonify({
+                "run_id": run_id,
+                "status": "running",
+                "mode": "async"
+            }), 202
+        
         runner = WorkflowRunner(workflow, context)
         result = runner.run()
         
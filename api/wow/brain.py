@@ -2,47 +2,17 @@
 WOW-OS Brain Engine
 Real-time AI OS engine for user state tracking and personalization
 """
-import os
-import time
-import json
-import uuid
 from flask import Blueprint, request, jsonify
 
 brain_bp = Blueprint("wow_brain", __name__, url_prefix="/api/wow/brain")
 
-from modules.db_wrapper import execute, execute_query, commit
-
-
-def ensure_brain_table():
-    execute("""
-        CREATE TABLE IF NOT EXISTS user_brain_state (
-            user_id TEXT PRIMARY KEY,
-            email TEXT UNIQUE,
-            updated_at REAL NOT NULL,
-            json_state TEXT NOT NULL
-        )
-    """)
-    commit()
-
-
-def get_default_state():
-    return {
-        "version": 1,
-        "onboarding_complete": False,
-        "onboarding_step": 0,
-        "first_workflow_created": False,
-        "templates_viewed": [],
-        "builder_sessions": 0,
-        "ai_interactions": 0,
-        "last_activity": None,
-        "preferences": {
-            "theme": "dark",
-            "notifications": True,
-            "ai_suggestions": True
-        },
-        "milestones": [],
-        "events": []
-    }
+from modules.wow_brain import (
+    get_default_state,
+    record_brain_event,
+    get_brain_summary,
+    get_brain_state,
+    reset_brain_state
+)
 
 
 @brain_bp.route("/event", methods=["POST"])
@@ -59,72 +29,15 @@ def record_event():
     if not event_type:
         return jsonify({"ok": False, "error": "Event type required"}), 400
     
-    ensure_brain_table()
-    now = time.time()
-    
-    existing = execute_query(
-        "SELECT * FROM user_brain_state WHERE email = ?", (email,), fetch='one'
-    )
-    
-    if existing:
-        state = json.loads(existing["json_state"])
-    else:
-        state = get_default_state()
-    
-    event = {
-        "type": event_type,
-        "data": event_data,
-        "timestamp": now
-    }
-    
-    if "events" not in state:
-        state["events"] = []
-    state["events"].append(event)
-    state["events"] = state["events"][-100:]
-    
-    state["last_activity"] = now
-    state["ai_interactions"] = state.get("ai_interactions", 0) + 1
-    
-    if event_type == "onboarding_step_complete":
-        state["onboarding_step"] = max(
-            state.get("onboarding_step", 0), 
-            event_data.get("step", 0) + 1
-        )
-    elif event_type == "onboarding_complete":
-        state["onboarding_complete"] = True
-        if "onboarding" not in state.get("milestones", []):
-            state.setdefault("milestones", []).append("onboarding")
-    elif event_type == "workflow_created":
-        state["first_workflow_created"] = True
-        if "first_workflow" not in state.get("milestones", []):
-            state.setdefault("milestones", []).append("first_workflow")
-    elif event_type == "template_viewed":
-        template_id = event_data.get("template_id")
-        if template_id and template_id not in state.get("templates_viewed", []):
-            state.setdefault("templates_viewed", []).append(template_id)
-    elif event_type == "builder_session_start":
-        state["builder_sessions"] = state.get("builder_sessions", 0) + 1
-    
-    json_state = json.dumps(state)
-    
-    if existing:
-        execute(
-            "UPDATE user_brain_state SET json_state = ?, updated_at = ? WHERE email = ?",
-            (json_state, now, email)
-        )
-    else:
-        user_id = str(uuid.uuid4())
-        execute(
-            "INSERT INTO user_brain_state (user_id, email, updated_at, json_state) VALUES (?, ?, ?, ?)",
-            (user_id, email, now, json_state)
-        )
-    
-    commit()
+    try:
+        state_version = record_brain_event(email, event_type, event_data)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
     
     return jsonify({
         "ok": True,
         "event_recorded": event_type,
-        "state_version": state.get("version", 1)
+        "state_version": state_version
     })
 
 
@@ -136,18 +49,14 @@ def get_state():
     if not email:
         return jsonify({"ok": False, "error": "Email required"}), 400
     
-    ensure_brain_table()
-    
-    existing = execute_query(
-        "SELECT * FROM user_brain_state WHERE email = ?", (email,), fetch='one'
-    )
+    state = get_brain_state(email)
     
-    if existing:
-        state = json.loads(existing["json_state"])
+    if state:
+        updated_at = state.pop("updated_at")
         return jsonify({
             "ok": True,
             "state": state,
-            "updated_at": existing["updated_at"]
+            "updated_at": updated_at
         })
     
     default = get_default_state()
@@ -166,20 +75,15 @@ def get_recommendations():
     if not email:
         return jsonify({"ok": False, "error": "Email required"}), 400
     
-    ensure_brain_table()
-    
-    existing = execute_query(
-        "SELECT * FROM user_brain_state WHERE email = ?", (email,), fetch='one'
-    )
-    
-    if existing:
-        state = json.loads(existing["json_state"])
-    else:
-        state = get_default_state()
+    summary = get_brain_summary(email) or {}
+    onboarding_complete = bool(summary.get("onboarding_complete"))
+    first_workflow_created = summary.get("first_workflow_at") is not None
+    templates_viewed = summary.get("templates_viewed", 0)
+    builder_sessions = summary.get("builder_sessions", 0)
     
     recommendations = []
     
-    if not state.get("onboarding_complete"):
+    if not onboarding_complete:
         recommendations.append({
             "id": "complete_onboarding",
             "title": "Complete Your Setup",
@@ -189,7 +93,7 @@ def get_recommendations():
             "type": "onboarding"
         })
     
-    if not state.get("first_workflow_created"):
+    if not first_workflow_created:
         recommendations.append({
             "id": "create_first_workflow",
             "title": "Create Your First Workflow",
@@ -199,7 +103,7 @@ def get_recommendations():
             "type": "builder"
         })
     
-    if len(state.get("templates_viewed", [])) < 3:
+    if templates_viewed < 3:
         recommendations.append({
             "id": "explore_templates",
             "title": "Explore Templates",
@@ -209,7 +113,7 @@ def get_recommendations():
             "type": "templates"
         })
     
-    if state.get("builder_sessions", 0) == 0:
+    if builder_sessions == 0:
         recommendations.append({
             "id": "try_ai_builder",
             "title": "Try the AI Builder",
@@ -223,10 +127,10 @@ def get_recommendations():
         "ok": True,
         "recommendations": recommendations,
         "state_summary": {
-            "onboarding_complete": state.get("onboarding_complete", False),
-            "workflows_created": state.get("first_workflow_created", False),
-            "templates_explored": len(state.get("templates_viewed", [])),
-            "ai_interactions": state.get("ai_interactions", 0)
+            "onboarding_complete": onboarding_complete,
+            "workflows_created": first_workflow_created,
+            "templates_explored": templates_viewed,
+            "ai_interactions": summary.get("ai_interactions", 0)
         }
     })
 
@@ -240,29 +144,7 @@ def reset_state():
     if not email:
         return jsonify({"ok": False, "error": "Email required"}), 400
     
-    ensure_brain_table()
-    now = time.time()
-    
-    default = get_default_state()
-    json_state = json.dumps(default)
-    
-    existing = execute_query(
-        "SELECT * FROM user_brain_state WHERE email = ?", (email,), fetch='one'
-    )
-    
-    if existing:
-        execute(
-            "UPDATE user_brain_state SET json_state = ?, updated_at = ? WHERE email = ?",
-            (json_state, now, email)
-        )
-    else:
-        user_id = str(uuid.uuid4())
-        execute(
-            "INSERT INTO user_brain_state (user_id, email, updated_at, json_state) VALUES (?, ?, ?, ?)",
-            (user_id, email, now, json_state)
-        )
-    
-    commit()
+    default = reset_brain_state(email)
     
     return jsonify({
         "ok": True,
@@ -8,10 +8,13 @@ from .usage import (
     get_runs_count,
     get_failure_rate
 )
+from .windowed import get_window_counts, invalidate_kpi_cache
 
 __all__ = [
     'get_workflow_analytics',
     'get_workflows_count',
     'get_runs_count',
-    'get_failure_rate'
+    'get_failure_rate',
+    'get_window_counts',
+    'invalidate_kpi_cache'
 ]
@@ -0,0 +1,99 @@
+"""
+Windowed KPI Counts
+Single-scan conditional aggregation for "created in the last N days" counts.
+
+The CEO, founder, revenue and admin analytics endpoints all count rows of
+the same tables over overlapping time windows, often seconds apart. Each
+table is scanned once for every standard window (SUM(CASE WHEN ...)) and
+the result is memoized for a short TTL, so those endpoints share one query.
+"""
+import os
+import time
+import logging
+import threading
+from typing import Dict, Tuple
+
+from modules.db_wrapper import execute_query
+
+log = logging.getLogger("levqor.analytics.windowed")
+
+KPI_CACHE_TTL_SECONDS = float(os.environ.get("KPI_CACHE_TTL_SECONDS", "30"))
+
+# Window label -> length in seconds
+STANDARD_WINDOWS: Dict[str, int] = {
+    "24h": 24 * 3600,
+    "7d": 7 * 24 * 3600,
+    "14d": 14 * 24 * 3600,
+    "30d": 30 * 24 * 3600,
+}
+
+# Tables with a numeric epoch created_at column that may be counted here
+KPI_TABLES = {"sales_leads", "dfy_requests", "users", "referrals"}
+
+_cache_lock = threading.Lock()
+_cache: Dict[str, Tuple[float, Dict[str, int]]] = {}
+
+
+def _query_window_counts(table: str, now: float) -> Dict[str, int]:
+    labels = list(STANDARD_WINDOWS)
+    columns = ",\n               ".join(
+        f"SUM(CASE WHEN created_at >= ? THEN 1 ELSE 0 END) AS w_{label}"
+        for label in labels
+    )
+    params = tuple(now - STANDARD_WINDOWS[label] for label in labels)
+
+    row = execute_query(f"""
+        SELECT COUNT(*) AS total,
+               {columns}
+        FROM {table}
+    """, params, fetch='one') or {}
+
+    counts = {"total": int(row.get("total") or 0)}
+    for label in labels:
+        counts[label] = int(row.get(f"w_{label}") or 0)
+    return counts
+
+
+def get_window_counts(table: str, use_cache: bool = True) -> Dict[str, int]:
+    """
+    Count rows of a table in every standard window with one scan.
+
+    Args:
+        table: One of KPI_TABLES
+        use_cache: Serve a memoized result younger than KPI_CACHE_TTL_SECONDS
+
+    Returns:
+        Dict with "total" plus one key per STANDARD_WINDOWS label
+        ("24h", "7d", "14d", "30d")
+
+    Raises:
+        The database error if the query fails (failures are not cached)
+    """
+    if table not in KPI_TABLES:
+        raise ValueError(f"Unsupported KPI table: {table}")
+
+    now = time.time()
+    if use_cache:
+        with _cache_lock:
+            cached = _cache.get(table)
+        if cached and cached[0] > now:
+            return dict(cached[1])
+
+    try:
+        counts = _query_window_counts(table, now)
+    except Exception as e:
+        log.error(f"Error computing window counts for {table}: {e}")
+        raise
+
+    with _cache_lock:
+        _cache[table] = (now + KPI_CACHE_TTL_SECONDS, counts)
+    return dict(counts)
+
+
+def invalidate_kpi_cache(table: str = None):
+    """Drop memoized counts for one table, or all tables."""
+    with _cache_lock:
+        if table is None:
+            _cache.clear()
+        else:
+            _cache.pop(table, None)
@@ -5,6 +5,7 @@ Approval queue for Class C (critical) actions
 from .queue import (
     enqueue_action,
     list_pending_actions,
+    list_pending_page,
     approve_action,
     reject_action,
     get_action_by_id
@@ -13,6 +14,7 @@ from .queue import (
 __all__ = [
     'enqueue_action',
     'list_pending_actions',
+    'list_pending_page',
     'approve_action',
     'reject_action',
     'get_action_by_id'
@@ -1,68 +1,63 @@
 """
 Approval Queue - MEGA PHASE v16
 DB-backed queue for pending actions requiring approval
+
+Per-tenant pending/approved/rejected totals are kept in approval_counters,
+updated in the same transaction as each enqueue/approve/reject, so the
+dashboard stats are a single row read. get_approval_stats(exact=True)
+recounts from approval_queue in one conditional-aggregate pass instead.
+
+Pending listings are keyset-paginated on (created_at, id); see
+list_pending_page.
 """
 import uuid
 import time
 import json
 import logging
-from typing import Dict, Any, Optional, List
-from modules.db_wrapper import execute_query, get_db_type
+from typing import Dict, Any, Optional, List, Tuple
+from modules.db_wrapper import execute_query, execute, commit, rollback
+from modules.migrations import ensure_migrated
 
 log = logging.getLogger("levqor.approvals.queue")
 
 APPROVALS_TABLE = "approval_queue"
 
+_STATUSES = ("pending", "approved", "rejected")
 
-def _ensure_table():
-    """Ensure approval queue table exists."""
-    db_type = get_db_type()
-    
-    if db_type == "postgresql":
-        execute_query("""
-            CREATE TABLE IF NOT EXISTS approval_queue (
-                id VARCHAR(64) PRIMARY KEY,
-                action_type VARCHAR(64) NOT NULL,
-                payload TEXT NOT NULL,
-                reason TEXT,
-                impact_level VARCHAR(8) NOT NULL DEFAULT 'C',
-                status VARCHAR(32) NOT NULL DEFAULT 'pending',
-                owner_id VARCHAR(64),
-                tenant_id VARCHAR(64) DEFAULT 'default',
-                created_at REAL DEFAULT EXTRACT(EPOCH FROM NOW()),
-                processed_at REAL,
-                processed_by VARCHAR(64)
-            )
-        """, commit=True)
-    else:
-        execute_query("""
-            CREATE TABLE IF NOT EXISTS approval_queue (
-                id TEXT PRIMARY KEY,
-                action_type TEXT NOT NULL,
-                payload TEXT NOT NULL,
-                reason TEXT,
-                impact_level TEXT NOT NULL DEFAULT 'C',
-                status TEXT NOT NULL DEFAULT 'pending',
-                owner_id TEXT,
-                tenant_id TEXT DEFAULT 'default',
-                created_at REAL DEFAULT (strftime('%s', 'now')),
-                processed_at REAL,
-                processed_by TEXT
-            )
-        """, commit=True)
-
-
-_table_initialized = False
-
-
-def _init_table():
-    global _table_initialized
-    if not _table_initialized:
+
+def _bump_counters(tenant_id: Optional[str], **deltas: int):
+    """Apply deltas to a tenant's counters row (caller commits)."""
+    columns = [c for c in _STATUSES if deltas.get(c)]
+    execute_query(
+        f"""INSERT INTO approval_counters (tenant_id, {", ".join(columns)})
+            VALUES (?, {", ".join("?" for _ in columns)})
+            ON CONFLICT (tenant_id) DO UPDATE SET
+            {", ".join(f"{c} = approval_counters.{c} + excluded.{c}" for c in columns)}""",
+        (tenant_id or "default",) + tuple(deltas[c] for c in columns),
+        fetch=None
+    )
+
+
+def _decode_payload(row) -> Dict[str, Any]:
+    action = dict(row)
+    if 'payload' in action:
         try:
-            _ensure_table()
-            _table_initialized = True
-        except Exception as e:
-            log.warning(f"Could not initialize approval queue table: {e}")
+            action['payload'] = json.loads(action['payload'])
+        except json.JSONDecodeError:
+            pass
+    return action
+
+
+def encode_cursor(action: Dict[str, Any]) -> str:
+    return f"{action['created_at']}:{action['id']}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """Raises ValueError for a malformed cursor."""
+    created_at, sep, action_id = cursor.partition(":")
+    if not sep or not action_id:
+        raise ValueError("Invalid cursor")
+    return float(created_at), action_id
 
 
 def enqueue_action(
@@ -77,7 +72,7 @@ def enqueue_action(
     Add an action to the approval queue.
     Returns the action ID.
     """
-    _init_table()
+    ensure_migrated()
     
     action_id = str(uuid.uuid4())
     payload_json = json.dumps(payload)
@@ -88,48 +83,56 @@ def enqueue_action(
                (id, action_type, payload, reason, impact_level, status, owner_id, tenant_id)
                VALUES (?, ?, ?, ?, ?, 'pending', ?, ?)""",
             (action_id, action_type, payload_json, reason, impact_level, owner_id, tenant_id),
-            commit=True
+            fetch=None
         )
+        _bump_counters(tenant_id, pending=1)
+        commit()
         log.info(f"Action enqueued for approval: {action_id} (type={action_type})")
         return action_id
     except Exception as e:
         log.error(f"Failed to enqueue action: {e}")
+        rollback()
         raise
 
 
-def list_pending_actions(tenant_id: str = None, limit: int = 100) -> List[Dict[str, Any]]:
-    """List pending actions in the approval queue."""
-    _init_table()
+def list_pending_page(
+    tenant_id: str = None,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    One page of pending actions, newest first.
+    Pass the returned next_cursor to get the following page; it is None on
+    the last page. Raises ValueError for a malformed cursor.
+    """
+    ensure_migrated()
+    
+    query = "SELECT * FROM approval_queue WHERE status = 'pending'"
+    params: List[Any] = []
+    if tenant_id:
+        query += " AND tenant_id = ?"
+        params.append(tenant_id)
+    if cursor:
+        created_at, action_id = decode_cursor(cursor)
+        # The plain range keeps the index seek; the OR only breaks ties
+        query += " AND created_at <= ? AND (created_at < ? OR id < ?)"
+        params += [created_at, created_at, action_id]
+    query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
     
+    rows = execute_query(query, tuple(params), fetch='all') or []
+    actions = [_decode_payload(row) for row in rows[:limit]]
+    
+    return {
+        "actions": actions,
+        "next_cursor": encode_cursor(actions[-1]) if len(rows) > limit else None
+    }
+
+
+def list_pending_actions(tenant_id: str = None, limit: int = 100, cursor: Optional[str] = None) -> List[Dict[str, Any]]:
+    """List pending actions in the approval queue."""
     try:
-        if tenant_id:
-            result = execute_query(
-                """SELECT * FROM approval_queue 
-                   WHERE status = 'pending' AND tenant_id = ?
-                   ORDER BY created_at DESC LIMIT ?""",
-                (tenant_id, limit),
-                fetch='all'
-            )
-        else:
-            result = execute_query(
-                """SELECT * FROM approval_queue 
-                   WHERE status = 'pending'
-                   ORDER BY created_at DESC LIMIT ?""",
-                (limit,),
-                fetch='all'
-            )
-        
-        actions = []
-        for row in (result or []):
-            action = dict(row)
-            if 'payload' in action:
-                try:
-                    action['payload'] = json.loads(action['payload'])
-                except json.JSONDecodeError:
-                    pass
-            actions.append(action)
-        
-        return actions
+        return list_pending_page(tenant_id=tenant_id, limit=limit, cursor=cursor)["actions"]
     except Exception as e:
         log.error(f"Failed to list pending actions: {e}")
         return []
@@ -137,7 +140,7 @@ def list_pending_actions(tenant_id: str = None, limit: int = 100) -> List[Dict[s
 
 def get_action_by_id(action_id: str) -> Optional[Dict[str, Any]]:
     """Get an action by ID."""
-    _init_table()
+    ensure_migrated()
     
     try:
         result = execute_query(
@@ -149,38 +152,44 @@ def get_action_by_id(action_id: str) -> Optional[Dict[str, Any]]:
         if not result:
             return None
         
-        action = dict(result)
-        if 'payload' in action:
-            try:
-                action['payload'] = json.loads(action['payload'])
-            except json.JSONDecodeError:
-                pass
-        
-        return action
+        return _decode_payload(result)
     except Exception as e:
         log.error(f"Failed to get action: {e}")
         return None
 
 
+def _set_status(action_id: str, status: str, processed_by: str) -> bool:
+    """Move a pending action to status; False if it was not pending."""
+    row = execute_query("SELECT tenant_id FROM approval_queue WHERE id = ?", (action_id,), fetch='one')
+    if not row:
+        return False
+    
+    updated = execute(
+        """UPDATE approval_queue 
+           SET status = ?, processed_at = ?, processed_by = ?
+           WHERE id = ? AND status = 'pending'""",
+        (status, time.time(), processed_by, action_id)
+    ).rowcount == 1
+    if updated:
+        _bump_counters(row['tenant_id'], pending=-1, **{status: 1})
+    commit()
+    return updated
+
+
 def approve_action(action_id: str, processed_by: str = "") -> bool:
     """
     Approve an action.
     Returns True if successful.
     """
-    _init_table()
+    ensure_migrated()
     
     try:
-        execute_query(
-            """UPDATE approval_queue 
-               SET status = 'approved', processed_at = ?, processed_by = ?
-               WHERE id = ? AND status = 'pending'""",
-            (time.time(), processed_by, action_id),
-            commit=True
-        )
+        _set_status(action_id, "approved", processed_by)
         log.info(f"Action approved: {action_id}")
         return True
     except Exception as e:
         log.error(f"Failed to approve action: {e}")
+        rollback()
         return False
 
 
@@ -189,63 +198,68 @@ def reject_action(action_id: str, processed_by: str = "", reason: str = "") -> b
     Reject an action.
     Returns True if successful.
     """
-    _init_table()
+    ensure_migrated()
     
     try:
-        execute_query(
-            """UPDATE approval_queue 
-               SET status = 'rejected', processed_at = ?, processed_by = ?
-               WHERE id = ? AND status = 'pending'""",
-            (time.time(), processed_by, action_id),
-            commit=True
-        )
+        _set_status(action_id, "rejected", processed_by)
         log.info(f"Action rejected: {action_id}")
         return True
     except Exception as e:
         log.error(f"Failed to reject action: {e}")
+        rollback()
         return False
 
 
-def get_approval_stats(tenant_id: str = None) -> Dict[str, int]:
-    """Get approval queue statistics."""
-    _init_table()
+def get_approval_stats(tenant_id: str = None, exact: bool = False) -> Dict[str, int]:
+    """
+    Get approval queue statistics.
+    Reads the maintained counters; exact=True recounts approval_queue in a
+    single conditional-aggregate query.
+    """
+    ensure_migrated()
     
     try:
+        if exact:
+            query = """SELECT
+                   SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END) AS pending,
+                   SUM(CASE WHEN status = 'approved' THEN 1 ELSE 0 END) AS approved,
+                   SUM(CASE WHEN status = 'rejected' THEN 1 ELSE 0 END) AS rejected
+               FROM approval_queue"""
+        else:
+            query = """SELECT SUM(pending) AS pending, SUM(approved) AS approved, SUM(rejected) AS rejected
+               FROM approval_counters"""
+        
         if tenant_id:
-            pending = execute_query(
-                "SELECT COUNT(*) as count FROM approval_queue WHERE status = 'pending' AND tenant_id = ?",
-                (tenant_id,),
-                fetch='one'
-            )
-            approved = execute_query(
-                "SELECT COUNT(*) as count FROM approval_queue WHERE status = 'approved' AND tenant_id = ?",
-                (tenant_id,),
-                fetch='one'
-            )
-            rejected = execute_query(
-                "SELECT COUNT(*) as count FROM approval_queue WHERE status = 'rejected' AND tenant_id = ?",
-                (tenant_id,),
-                fetch='one'
-            )
+            row = execute_query(query + " WHERE tenant_id = ?", (tenant_id,), fetch='one')
         else:
-            pending = execute_query(
-                "SELECT COUNT(*) as count FROM approval_queue WHERE status = 'pending'",
-                fetch='one'
-            )
-            approved = execute_query(
-                "SELECT COUNT(*) as count FROM approval_queue WHERE status = 'approved'",
-                fetch='one'
-            )
-            rejected = execute_query(
-                "SELECT COUNT(*) as count FROM approval_queue WHERE status = 'rejected'",
-                fetch='one'
-            )
+            row = execute_query(query, fetch='one')
         
-        return {
-            "pending": pending.get('count', 0) if pending else 0,
-            "approved": approved.get('count', 0) if approved else 0,
-            "rejected": rejected.get('count', 0) if rejected else 0
-        }
+        return {status: int((row or {}).get(status) or 0) for status in _STATUSES}
     except Exception as e:
         log.error(f"Failed to get approval stats: {e}")
         return {"pending": 0, "approved": 0, "rejected": 0}
+
+
+def rebuild_approval_counters() -> Dict[str, int]:
+    """Recompute approval_counters from approval_queue (repairs drift). Returns the new totals."""
+    ensure_migrated()
+    
+    try:
+        execute_query("DELETE FROM approval_counters", fetch=None)
+        execute_query(
+            """INSERT INTO approval_counters (tenant_id, pending, approved, rejected)
+               SELECT COALESCE(tenant_id, 'default'),
+                      SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END),
+                      SUM(CASE WHEN status = 'approved' THEN 1 ELSE 0 END),
+                      SUM(CASE WHEN status = 'rejected' THEN 1 ELSE 0 END)
+               FROM approval_queue
+               GROUP BY COALESCE(tenant_id, 'default')""",
+            fetch=None
+        )
+        commit()
+    except Exception as e:
+        log.error(f"Failed to rebuild approval counters: {e}")
+        rollback()
+        raise
+    
+    return get_approval_stats()
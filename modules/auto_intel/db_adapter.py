@@ -3,14 +3,14 @@ Intelligence Layer Database Adapter
 Production-ready PostgreSQL integration for intelligence modules
 """
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
 from datetime import datetime
 from typing import List, Dict, Optional, Any
 import json
 
 def get_connection():
     """Get PostgreSQL connection for production"""
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
     return psycopg2.connect(
         os.environ.get("DATABASE_URL"),
         cursor_factory=RealDictCursor
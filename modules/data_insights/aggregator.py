@@ -33,7 +33,7 @@ def fetch_api_usage_agg(since: str) -> Dict[str, Any]:
         
         return {
             "users": row[0] if row else 0,
-            "calls": row[1] if row else 0,
+            "calls": (row[1] or 0) if row else 0,
             "avg_per_user": round(row[2], 2) if row and row[2] else 0
         }
     except Exception as e:
@@ -57,6 +57,23 @@ def get_revenue_summary(since: str) -> Dict[str, Any]:
         "by_product": {}
     }
 
+def data_watermark(period_days: int = 90) -> str:
+    """
+    Cheap fingerprint of the data behind aggregate(period_days).
+    Changes when the window moves (daily) or developer key usage changes.
+    """
+    today = datetime.utcnow().date().isoformat()
+    try:
+        db = get_db_connection()
+        cursor = db.cursor()
+        cursor.execute("SELECT COUNT(*), MAX(created_at), MAX(last_used_at) FROM developer_keys")
+        row = cursor.fetchone()
+        db.close()
+        return f"{today}:{period_days}:{row[0]}:{row[1]}:{row[2]}"
+    except Exception as e:
+        print(f"Error fetching insights watermark: {e}")
+        return f"{today}:{period_days}"
+
 def aggregate(period_days: int = 90) -> Dict[str, Any]:
     """
     Aggregate all metrics for insights report
@@ -6,13 +6,11 @@ import io
 from datetime import datetime
 from typing import Dict, Any
 
-try:
-    from reportlab.lib.pagesizes import A4
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.units import inch
-    REPORTLAB_AVAILABLE = True
-except ImportError:
-    REPORTLAB_AVAILABLE = False
+from modules.lazy_import import module_available
+
+# reportlab itself is imported inside build_pdf, only when a report is built
+REPORTLAB_AVAILABLE = module_available("reportlab")
+if not REPORTLAB_AVAILABLE:
     print("⚠️ reportlab not installed - PDF generation disabled")
 
 def build_pdf(kpis: Dict[str, Any]) -> bytes:
@@ -34,6 +32,10 @@ def build_pdf(kpis: Dict[str, Any]) -> bytes:
         text += f"Uptime: {kpis.get('uptime_avg', 0)}%\n"
         return text.encode('utf-8')
     
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.units import inch
+    
     buf = io.BytesIO()
     c = canvas.Canvas(buf, pagesize=A4)
     width, height = A4
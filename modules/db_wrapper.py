@@ -8,6 +8,8 @@ import sqlite3
 import logging
 from typing import Optional, Any, Tuple, List
 
+from modules.profiling import span
+
 log = logging.getLogger("levqor.db")
 
 import threading
@@ -122,7 +124,7 @@ def convert_query_placeholders(query: str, db_type: str) -> str:
         return query.replace('?', '%s')
     return query
 
-def execute_query(query: str, params: Optional[Tuple] = None, fetch: str = 'all') -> Any:
+def execute_query(query: str, params: Optional[Tuple] = None, fetch: str = 'all', commit: bool = False) -> Any:
     """
     Execute query with automatic placeholder conversion
     
@@ -130,6 +132,7 @@ def execute_query(query: str, params: Optional[Tuple] = None, fetch: str = 'all'
         query: SQL query with ? placeholders
         params: Query parameters tuple
         fetch: 'all', 'one', or None (for INSERT/UPDATE/DELETE)
+        commit: Commit the transaction after the statement
     
     Returns:
         Query results or None
@@ -143,36 +146,36 @@ def execute_query(query: str, params: Optional[Tuple] = None, fetch: str = 'all'
     cursor = db.cursor()
     
     try:
-        if params:
-            cursor.execute(converted_query, params)
-        else:
-            cursor.execute(converted_query)
+        with span("db.query"):
+            if params:
+                cursor.execute(converted_query, params)
+            else:
+                cursor.execute(converted_query)
         
+        result = None
         if fetch == 'all':
-            result = cursor.fetchall()
-            # Convert to list of dicts for consistency
-            if db_type == 'postgresql':
+            # Statements without a result set (INSERT/UPDATE/DDL) have no description
+            if cursor.description is None:
+                result = []
+            elif db_type == 'postgresql':
                 # Manually convert tuples to dicts using cursor.description
-                if cursor.description:
-                    columns = [desc[0] for desc in cursor.description]
-                    return [dict(zip(columns, row)) for row in result]
-                return []
+                columns = [desc[0] for desc in cursor.description]
+                result = [dict(zip(columns, row)) for row in cursor.fetchall()]
             else:
-                return [dict(row) for row in result]
-        elif fetch == 'one':
-            result = cursor.fetchone()
-            if result is None:
-                return None
-            if db_type == 'postgresql':
-                # Manually convert tuple to dict using cursor.description
-                if cursor.description:
+                result = [dict(row) for row in cursor.fetchall()]
+        elif fetch == 'one' and cursor.description is not None:
+            row = cursor.fetchone()
+            if row is not None:
+                if db_type == 'postgresql':
+                    # Manually convert tuple to dict using cursor.description
                     columns = [desc[0] for desc in cursor.description]
-                    return dict(zip(columns, result))
-                return None
-            else:
-                return dict(result)
-        else:
-            return None
+                    result = dict(zip(columns, row))
+                else:
+                    result = dict(row)
+        
+        if commit:
+            db.commit()
+        return result
             
     except Exception as e:
         log.error(f"Query execution error: {e}")
@@ -181,6 +184,38 @@ def execute_query(query: str, params: Optional[Tuple] = None, fetch: str = 'all'
         db.rollback()
         raise
 
+def execute_many(query: str, params_seq: List[Tuple], commit: bool = False) -> int:
+    """
+    Execute one statement for many parameter tuples (cursor.executemany)
+
+    Args:
+        query: SQL query with ? placeholders
+        params_seq: Sequence of parameter tuples
+        commit: Commit the transaction after the batch
+
+    Returns:
+        Number of parameter tuples executed
+    """
+    if not params_seq:
+        return 0
+
+    db = get_db()
+    converted_query = convert_query_placeholders(query, get_db_type())
+    cursor = db.cursor()
+
+    try:
+        with span("db.query"):
+            cursor.executemany(converted_query, params_seq)
+        if commit:
+            db.commit()
+        return len(params_seq)
+    except Exception as e:
+        log.error(f"Batch execution error: {e}")
+        log.error(f"Query: {converted_query}")
+        log.error(f"Batch size: {len(params_seq)}")
+        db.rollback()
+        raise
+
 def execute(query: str, params: Optional[Tuple] = None):
     """
     Execute query with automatic placeholder conversion
@@ -195,10 +230,11 @@ def execute(query: str, params: Optional[Tuple] = None):
     cursor = db.cursor()
     
     try:
-        if params:
-            cursor.execute(converted_query, params)
-        else:
-            cursor.execute(converted_query)
+        with span("db.query"):
+            if params:
+                cursor.execute(converted_query, params)
+            else:
+                cursor.execute(converted_query)
         return cursor
     except Exception as e:
         log.error(f"Execute error: {e}")
@@ -2,7 +2,7 @@
 Governance Module
 Partner auditing, policy enforcement, and quarterly reviews
 """
-from .audit import run_full_audit, audit_partner
+from .audit import run_full_audit, audit_partner, audit_partners_batch
 from .review_cycle import (
     get_partners_due_for_review,
     generate_review_report,
@@ -13,6 +13,7 @@ from .review_cycle import (
 __all__ = [
     "run_full_audit",
     "audit_partner",
+    "audit_partners_batch",
     "get_partners_due_for_review",
     "generate_review_report",
     "send_review_notifications",
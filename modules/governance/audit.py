@@ -6,7 +6,7 @@ import sqlite3
 import os
 from time import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import json
 
 def get_db():
@@ -20,62 +20,42 @@ def load_policy() -> Dict[str, Any]:
     with open(policy_path, 'r') as f:
         return json.load(f)
 
-def audit_partner(partner_id: str) -> Dict[str, Any]:
+PARTNER_COLUMNS = "id, name, email, webhook_url, is_verified, is_active, created_at"
+
+AUDIT_NOTIFY_WORKERS = int(os.environ.get("AUDIT_NOTIFY_WORKERS", "8"))
+
+def evaluate_partner(
+    partner: tuple,
+    listings_stats: tuple,
+    sales_stats: tuple,
+    policy: Dict[str, Any],
+    now: datetime = None
+) -> Dict[str, Any]:
     """
-    Audit a single partner for compliance
+    Apply compliance policy to one partner's pre-fetched aggregates
     
     Args:
-        partner_id: Partner UUID
+        partner: Row of PARTNER_COLUMNS
+        listings_stats: (count, total_downloads, avg_rating) for active listings
+        sales_stats: (count, total_amount_cents) for marketplace orders
+        policy: Loaded governance policy
+        now: Reference time for review cycle checks
         
     Returns:
         Audit report dict
     """
-    db = get_db()
-    cursor = db.cursor()
-    
-    # Get partner info
-    cursor.execute("""
-        SELECT id, name, email, webhook_url, is_verified,
-               is_active, created_at
-        FROM partners
-        WHERE id = ?
-    """, (partner_id,))
-    
-    partner = cursor.fetchone()
-    
-    if not partner:
-        return {"error": "partner_not_found"}
+    if now is None:
+        now = datetime.now()
     
     pid, name, email, webhook_url, is_verified, is_active, created_at = partner
     
-    # Get partner's listings
-    cursor.execute("""
-        SELECT COUNT(*), SUM(downloads), AVG(rating)
-        FROM listings
-        WHERE partner_id = ? AND is_active = 1
-    """, (partner_id,))
-    
-    listings_stats = cursor.fetchone()
     total_listings = listings_stats[0] or 0
     total_downloads = listings_stats[1] or 0
     avg_rating = listings_stats[2]
     
-    # Get sales history
-    cursor.execute("""
-        SELECT COUNT(*), SUM(amount_cents)
-        FROM marketplace_orders
-        WHERE partner_id = ?
-    """, (partner_id,))
-    
-    sales_stats = cursor.fetchone()
     total_sales = sales_stats[0] or 0
     total_revenue_cents = sales_stats[1] or 0
     
-    db.close()
-    
-    # Load policy for compliance checks
-    policy = load_policy()
-    
     # Compliance checks
     issues = []
     warnings = []
@@ -95,10 +75,10 @@ def audit_partner(partner_id: str) -> Dict[str, Any]:
     # Check if review is due
     review_cycle_days = policy["review_cycle_days"]
     created_dt = datetime.fromtimestamp(created_at)
-    days_since_creation = (datetime.now() - created_dt).days
+    days_since_creation = (now - created_dt).days
     review_due = days_since_creation >= review_cycle_days
     
-    audit_report = {
+    return {
         "partner_id": pid,
         "partner_name": name,
         "email": email,
@@ -116,63 +96,166 @@ def audit_partner(partner_id: str) -> Dict[str, Any]:
         "audit_timestamp": datetime.utcnow().isoformat(),
         "status": "compliant" if not issues else "issues_found"
     }
-    
-    return audit_report
 
-def run_full_audit() -> Dict[str, Any]:
+def audit_partner(partner_id: str) -> Dict[str, Any]:
     """
-    Run audit on all verified partners
+    Audit a single partner for compliance
     
+    Args:
+        partner_id: Partner UUID
+        
     Returns:
-        Audit summary
+        Audit report dict
     """
     db = get_db()
     cursor = db.cursor()
     
-    # Get all verified active partners
+    # Get partner info
+    cursor.execute(f"""
+        SELECT {PARTNER_COLUMNS}
+        FROM partners
+        WHERE id = ?
+    """, (partner_id,))
+    
+    partner = cursor.fetchone()
+    
+    if not partner:
+        db.close()
+        return {"error": "partner_not_found"}
+    
+    # Get partner's listings
     cursor.execute("""
-        SELECT id, name
+        SELECT COUNT(*), SUM(downloads), AVG(rating)
+        FROM listings
+        WHERE partner_id = ? AND is_active = 1
+    """, (partner_id,))
+    
+    listings_stats = cursor.fetchone()
+    
+    # Get sales history
+    cursor.execute("""
+        SELECT COUNT(*), SUM(amount_cents)
+        FROM marketplace_orders
+        WHERE partner_id = ?
+    """, (partner_id,))
+    
+    sales_stats = cursor.fetchone()
+    
+    db.close()
+    
+    return evaluate_partner(partner, listings_stats, sales_stats, load_policy())
+
+def audit_partners_batch(cursor) -> List[Tuple[tuple, Dict[str, Any]]]:
+    """
+    Audit all verified active partners with set-based queries
+    
+    Runs one query for partners and one grouped aggregate each for listings
+    and orders, joins them in memory and evaluates policy over the batch.
+    Query count is constant regardless of the number of partners.
+    
+    Returns:
+        List of (partner row, audit report) tuples
+    """
+    cursor.execute(f"""
+        SELECT {PARTNER_COLUMNS}
         FROM partners
         WHERE is_verified = 1 AND is_active = 1
     """)
-    
     partners = cursor.fetchall()
     
-    audit_results = []
-    issues_count = 0
-    compliant_count = 0
+    if not partners:
+        return []
     
-    for partner_id, partner_name in partners:
-        report = audit_partner(partner_id)
-        audit_results.append(report)
-        
-        if report.get("status") == "compliant":
-            compliant_count += 1
-        else:
-            issues_count += 1
-        
-        # Send audit notification to partner
-        try:
-            from modules.partner_api.hooks import trigger_partner_event
-            cursor.execute("""
-                SELECT id, name, webhook_url
-                FROM partners
-                WHERE id = ?
-            """, (partner_id,))
-            p = cursor.fetchone()
-            if p and p[2]:  # Has webhook
-                partner_dict = {"id": p[0], "name": p[1], "webhook_url": p[2]}
-                trigger_partner_event(
-                    partner_dict,
-                    "audit.completed",
-                    {
-                        "audit_date": datetime.utcnow().isoformat(),
-                        "status": report["status"],
-                        "issues_count": len(report["compliance_issues"])
-                    }
-                )
-        except Exception as e:
-            print(f"⚠️ Failed to notify partner {partner_name}: {e}")
+    cursor.execute("""
+        SELECT l.partner_id, COUNT(*), SUM(l.downloads), AVG(l.rating)
+        FROM listings l
+        JOIN partners p ON p.id = l.partner_id
+        WHERE l.is_active = 1 AND p.is_verified = 1 AND p.is_active = 1
+        GROUP BY l.partner_id
+    """)
+    listings_by_partner = {row[0]: row[1:] for row in cursor.fetchall()}
+    
+    cursor.execute("""
+        SELECT o.partner_id, COUNT(*), SUM(o.amount_cents)
+        FROM marketplace_orders o
+        JOIN partners p ON p.id = o.partner_id
+        WHERE p.is_verified = 1 AND p.is_active = 1
+        GROUP BY o.partner_id
+    """)
+    sales_by_partner = {row[0]: row[1:] for row in cursor.fetchall()}
+    
+    policy = load_policy()
+    now = datetime.now()
+    empty_listings = (0, 0, None)
+    empty_sales = (0, 0)
+    
+    return [
+        (
+            partner,
+            evaluate_partner(
+                partner,
+                listings_by_partner.get(partner[0], empty_listings),
+                sales_by_partner.get(partner[0], empty_sales),
+                policy,
+                now
+            )
+        )
+        for partner in partners
+    ]
+
+def _notify_audit_completed(partner: tuple, report: Dict[str, Any]) -> bool:
+    """Send the audit.completed webhook for one partner"""
+    from modules.partner_api.hooks import trigger_partner_event
+    
+    pid, name, _, webhook_url = partner[:4]
+    try:
+        return trigger_partner_event(
+            {"id": pid, "name": name, "webhook_url": webhook_url},
+            "audit.completed",
+            {
+                "audit_date": datetime.utcnow().isoformat(),
+                "status": report["status"],
+                "issues_count": len(report["compliance_issues"])
+            }
+        )
+    except Exception as e:
+        print(f"⚠️ Failed to notify partner {name}: {e}")
+        return False
+
+def dispatch_audit_notifications(audited: List[tuple], max_workers: int = None) -> int:
+    """
+    Send audit webhooks concurrently to partners that have a webhook URL
+    
+    Returns:
+        Number of successful deliveries
+    """
+    targets = [(partner, report) for partner, report in audited if partner[3]]
+    if not targets:
+        return 0
+    
+    from concurrent.futures import ThreadPoolExecutor
+    
+    workers = min(max_workers or AUDIT_NOTIFY_WORKERS, len(targets))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="audit-notify") as pool:
+        results = list(pool.map(lambda t: _notify_audit_completed(*t), targets))
+    
+    return sum(1 for ok in results if ok)
+
+def run_full_audit() -> Dict[str, Any]:
+    """
+    Run audit on all verified partners
+    
+    Returns:
+        Audit summary
+    """
+    db = get_db()
+    cursor = db.cursor()
+    
+    audited = audit_partners_batch(cursor)
+    audit_results = [report for _, report in audited]
+    
+    compliant_count = sum(1 for r in audit_results if r.get("status") == "compliant")
+    issues_count = len(audit_results) - compliant_count
     
     # Log audit to database
     audit_id = f"audit_{int(time())}"
@@ -193,7 +276,7 @@ def run_full_audit() -> Dict[str, Any]:
     """, (
         audit_id,
         time(),
-        len(partners),
+        len(audited),
         issues_count,
         compliant_count,
         json.dumps(audit_results)
@@ -202,12 +285,16 @@ def run_full_audit() -> Dict[str, Any]:
     db.commit()
     db.close()
     
+    # Send audit notifications to partners (concurrently, after the DB work is done)
+    notified = dispatch_audit_notifications(audited)
+    
     summary = {
         "audit_id": audit_id,
         "timestamp": datetime.utcnow().isoformat(),
-        "total_partners_audited": len(partners),
+        "total_partners_audited": len(audited),
         "compliant": compliant_count,
         "issues_found": issues_count,
+        "partners_notified": notified,
         "audit_results": audit_results
     }
     
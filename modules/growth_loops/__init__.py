@@ -1,6 +1,12 @@
 """
 Growth Loops Module - V10 Completion
 Sharing, copy-to-template, referrals, viral mechanics.
+
+Shares and template copies are stored in the database. Every write also
+bumps the aggregates it affects (per share type, per user, per workflow,
+distinct counters) with atomic count = count + n upserts in the same
+transaction, so stats, viral coefficient and leaderboard reads never scan
+events: the leaderboard is the top-k of the growth_user_stats points index.
 """
 import time
 import logging
@@ -8,8 +14,18 @@ from typing import Dict, Any, List, Optional
 from dataclasses import dataclass, field
 import uuid
 
+from modules.db_wrapper import execute_query, execute, commit
+from modules.migrations import ensure_migrated
+
 log = logging.getLogger("levqor.growth_loops")
 
+# Scope of the all-users rows in growth_share_stats
+GLOBAL_SCOPE = "*"
+
+CLICK_POINTS = 1
+CONVERSION_POINTS = 10
+TEMPLATE_COPY_POINTS = 5
+
 
 @dataclass
 class ShareEvent:
@@ -32,11 +48,57 @@ class TemplateCopy:
     created_at: float = field(default_factory=time.time)
 
 
-_share_events: List[ShareEvent] = []
-_template_copies: List[TemplateCopy] = []
+def _bump(table: str, key: Dict[str, Any], **deltas: int):
+    """Atomically add deltas to one aggregate row, creating it if needed."""
+    columns = list(key) + list(deltas)
+    updates = ", ".join(f"{c} = {table}.{c} + excluded.{c}" for c in deltas)
+    execute_query(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+        f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates}",
+        tuple(key.values()) + tuple(deltas.values()),
+        fetch=None
+    )
+
+
+def _add_distinct(kind: str, member: str, counter: str):
+    """Add member to a set and bump its counter only if it was not there yet."""
+    cursor = execute(
+        "INSERT INTO growth_distinct (kind, member) VALUES (?, ?) ON CONFLICT (kind, member) DO NOTHING",
+        (kind, member)
+    )
+    if cursor.rowcount == 1:
+        _bump("growth_counters", {"name": counter}, value=1)
+
+
+def _counters() -> Dict[str, int]:
+    rows = execute_query("SELECT name, value FROM growth_counters") or []
+    return {row["name"]: int(row["value"]) for row in rows}
+
+
+def _bump_share_stats(event: ShareEvent, **deltas: int):
+    for scope in (event.shared_by, GLOBAL_SCOPE):
+        _bump("growth_share_stats", {"scope": scope, "share_type": event.share_type}, **deltas)
+    _bump("growth_workflow_stats", {"workflow_id": event.workflow_id}, **deltas)
+
+
+def _get_share(share_id: str) -> Optional[ShareEvent]:
+    ensure_migrated()
+    row = execute_query("SELECT * FROM growth_shares WHERE id = ?", (share_id,), fetch="one")
+    if row is None:
+        return None
+    return ShareEvent(
+        id=row["id"],
+        workflow_id=row["workflow_id"],
+        shared_by=row["shared_by"],
+        share_type=row["share_type"],
+        created_at=row["created_at"],
+        clicks=int(row["clicks"]),
+        conversions=int(row["conversions"])
+    )
 
 
 def create_share_link(workflow_id: str, user_id: str, share_type: str = "link") -> Dict[str, Any]:
+    ensure_migrated()
     event = ShareEvent(
         id=str(uuid.uuid4()),
         workflow_id=workflow_id,
@@ -44,7 +106,15 @@ def create_share_link(workflow_id: str, user_id: str, share_type: str = "link")
         share_type=share_type
     )
     
-    _share_events.append(event)
+    execute_query(
+        "INSERT INTO growth_shares (id, workflow_id, shared_by, share_type, created_at) VALUES (?, ?, ?, ?, ?)",
+        (event.id, event.workflow_id, event.shared_by, event.share_type, event.created_at),
+        fetch=None
+    )
+    _bump_share_stats(event, shares=1)
+    _bump("growth_user_stats", {"user_id": user_id}, shares=1)
+    _add_distinct("sharer", user_id, "sharers")
+    commit()
     
     share_url = f"https://levqor.ai/shared/{event.id}"
     
@@ -59,21 +129,31 @@ def create_share_link(workflow_id: str, user_id: str, share_type: str = "link")
 
 
 def record_share_click(share_id: str) -> Dict[str, Any]:
-    for event in _share_events:
-        if event.id == share_id:
-            event.clicks += 1
-            return {"success": True, "clicks": event.clicks}
+    event = _get_share(share_id)
+    if event is None:
+        return {"success": False, "error": "Share not found"}
     
-    return {"success": False, "error": "Share not found"}
+    execute_query("UPDATE growth_shares SET clicks = clicks + 1 WHERE id = ?", (share_id,), fetch=None)
+    _bump_share_stats(event, clicks=1)
+    _bump("growth_user_stats", {"user_id": event.shared_by}, clicks=1, points=CLICK_POINTS)
+    row = execute_query("SELECT clicks FROM growth_shares WHERE id = ?", (share_id,), fetch="one")
+    commit()
+    
+    return {"success": True, "clicks": int(row["clicks"])}
 
 
 def record_share_conversion(share_id: str) -> Dict[str, Any]:
-    for event in _share_events:
-        if event.id == share_id:
-            event.conversions += 1
-            return {"success": True, "conversions": event.conversions}
+    event = _get_share(share_id)
+    if event is None:
+        return {"success": False, "error": "Share not found"}
+    
+    execute_query("UPDATE growth_shares SET conversions = conversions + 1 WHERE id = ?", (share_id,), fetch=None)
+    _bump_share_stats(event, conversions=1)
+    _bump("growth_user_stats", {"user_id": event.shared_by}, conversions=1, points=CONVERSION_POINTS)
+    row = execute_query("SELECT conversions FROM growth_shares WHERE id = ?", (share_id,), fetch="one")
+    commit()
     
-    return {"success": False, "error": "Share not found"}
+    return {"success": True, "conversions": int(row["conversions"])}
 
 
 def copy_as_template(
@@ -82,6 +162,7 @@ def copy_as_template(
     copied_by: str,
     template_name: str
 ) -> Dict[str, Any]:
+    ensure_migrated()
     copy = TemplateCopy(
         id=str(uuid.uuid4()),
         source_workflow_id=workflow_id,
@@ -90,7 +171,18 @@ def copy_as_template(
         template_name=template_name
     )
     
-    _template_copies.append(copy)
+    execute_query(
+        "INSERT INTO growth_template_copies (id, source_workflow_id, source_owner, copied_by, template_name, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (copy.id, copy.source_workflow_id, copy.source_owner, copy.copied_by, copy.template_name, copy.created_at),
+        fetch=None
+    )
+    _bump("growth_user_stats", {"user_id": source_owner}, template_copies=1, points=TEMPLATE_COPY_POINTS)
+    _bump("growth_workflow_stats", {"workflow_id": workflow_id}, template_copies=1)
+    _bump("growth_counters", {"name": "template_copies"}, value=1)
+    _add_distinct("workflow_copied", workflow_id, "workflows_copied")
+    _add_distinct("user_copying", copied_by, "users_copying")
+    commit()
     
     log.info(f"Workflow {workflow_id} copied as template by {copied_by}")
     
@@ -103,21 +195,24 @@ def copy_as_template(
 
 
 def get_share_stats(user_id: Optional[str] = None) -> Dict[str, Any]:
-    events = _share_events
-    if user_id:
-        events = [e for e in events if e.shared_by == user_id]
-    
-    total_shares = len(events)
-    total_clicks = sum(e.clicks for e in events)
-    total_conversions = sum(e.conversions for e in events)
-    
-    by_type = {}
-    for e in events:
-        if e.share_type not in by_type:
-            by_type[e.share_type] = {"shares": 0, "clicks": 0, "conversions": 0}
-        by_type[e.share_type]["shares"] += 1
-        by_type[e.share_type]["clicks"] += e.clicks
-        by_type[e.share_type]["conversions"] += e.conversions
+    ensure_migrated()
+    rows = execute_query(
+        "SELECT share_type, shares, clicks, conversions FROM growth_share_stats WHERE scope = ?",
+        (user_id or GLOBAL_SCOPE,)
+    ) or []
+    
+    by_type = {
+        row["share_type"]: {
+            "shares": int(row["shares"]),
+            "clicks": int(row["clicks"]),
+            "conversions": int(row["conversions"])
+        }
+        for row in rows
+    }
+    
+    total_shares = sum(t["shares"] for t in by_type.values())
+    total_clicks = sum(t["clicks"] for t in by_type.values())
+    total_conversions = sum(t["conversions"] for t in by_type.values())
     
     return {
         "total_shares": total_shares,
@@ -128,28 +223,48 @@ def get_share_stats(user_id: Optional[str] = None) -> Dict[str, Any]:
     }
 
 
+def get_workflow_share_stats(workflow_id: str) -> Dict[str, Any]:
+    ensure_migrated()
+    row = execute_query("SELECT * FROM growth_workflow_stats WHERE workflow_id = ?", (workflow_id,), fetch="one")
+    return {
+        "workflow_id": workflow_id,
+        "shares": int(row["shares"]) if row else 0,
+        "clicks": int(row["clicks"]) if row else 0,
+        "conversions": int(row["conversions"]) if row else 0,
+        "template_copies": int(row["template_copies"]) if row else 0
+    }
+
+
 def get_template_copy_stats() -> Dict[str, Any]:
+    ensure_migrated()
+    counters = _counters()
+    recent = execute_query(
+        "SELECT id, template_name, created_at FROM growth_template_copies ORDER BY created_at DESC LIMIT ?",
+        (10,)
+    ) or []
+    
     return {
-        "total_copies": len(_template_copies),
-        "unique_workflows_copied": len(set(c.source_workflow_id for c in _template_copies)),
-        "unique_users_copying": len(set(c.copied_by for c in _template_copies)),
+        "total_copies": counters.get("template_copies", 0),
+        "unique_workflows_copied": counters.get("workflows_copied", 0),
+        "unique_users_copying": counters.get("users_copying", 0),
         "recent_copies": [
             {
-                "id": c.id,
-                "template_name": c.template_name,
-                "created_at": c.created_at
+                "id": c["id"],
+                "template_name": c["template_name"],
+                "created_at": c["created_at"]
             }
-            for c in sorted(_template_copies, key=lambda x: x.created_at, reverse=True)[:10]
+            for c in recent
         ]
     }
 
 
 def get_viral_coefficient() -> Dict[str, Any]:
-    if not _share_events:
+    totals = get_share_stats()
+    if totals["total_shares"] == 0:
         return {"viral_coefficient": 0, "status": "no_data"}
     
-    total_users = len(set(e.shared_by for e in _share_events))
-    total_conversions = sum(e.conversions for e in _share_events)
+    total_users = _counters().get("sharers", 0)
+    total_conversions = totals["total_conversions"]
     
     k_factor = total_conversions / total_users if total_users > 0 else 0
     
@@ -162,29 +277,23 @@ def get_viral_coefficient() -> Dict[str, Any]:
 
 
 def get_growth_leaderboard(limit: int = 10) -> List[Dict[str, Any]]:
-    user_stats = {}
-    
-    for event in _share_events:
-        if event.shared_by not in user_stats:
-            user_stats[event.shared_by] = {"shares": 0, "clicks": 0, "conversions": 0, "points": 0}
-        
-        user_stats[event.shared_by]["shares"] += 1
-        user_stats[event.shared_by]["clicks"] += event.clicks
-        user_stats[event.shared_by]["conversions"] += event.conversions
-        user_stats[event.shared_by]["points"] += (event.clicks * 1) + (event.conversions * 10)
-    
-    for copy in _template_copies:
-        if copy.source_owner not in user_stats:
-            user_stats[copy.source_owner] = {"shares": 0, "clicks": 0, "conversions": 0, "points": 0}
-        user_stats[copy.source_owner]["points"] += 5
-    
-    sorted_users = sorted(user_stats.items(), key=lambda x: x[1]["points"], reverse=True)[:limit]
+    ensure_migrated()
+    rows = execute_query(
+        "SELECT user_id, shares, clicks, conversions, points FROM growth_user_stats "
+        "ORDER BY points DESC LIMIT ?",
+        (limit,)
+    ) or []
     
     return [
         {
             "rank": i + 1,
-            "user_id": user_id,
-            "stats": stats
+            "user_id": row["user_id"],
+            "stats": {
+                "shares": int(row["shares"]),
+                "clicks": int(row["clicks"]),
+                "conversions": int(row["conversions"]),
+                "points": int(row["points"])
+            }
         }
-        for i, (user_id, stats) in enumerate(sorted_users)
+        for i, row in enumerate(rows)
     ]
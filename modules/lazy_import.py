@@ -0,0 +1,66 @@
+"""
+Lazy SDK Imports for Levqor Backend
+Defers heavy third-party imports (openai, stripe, reportlab, psycopg2) until
+first use, so importing run.py does not pay for SDKs a cold-started worker
+may never touch.
+
+Usage:
+    from modules.lazy_import import lazy_module, module_available
+
+    stripe = lazy_module("stripe")      # nothing imported yet
+    STRIPE_AVAILABLE = module_available("stripe")
+    ...
+    stripe.checkout.Session.create(...) # imported here, once
+
+Availability is checked with importlib.util.find_spec, which locates the
+package without executing it.
+"""
+import importlib
+import importlib.util
+import threading
+from types import ModuleType
+from typing import Optional
+
+
+def module_available(name: str) -> bool:
+    """True if a module can be imported, without importing it."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class LazyModule(ModuleType):
+    """Module proxy that imports the real module on first attribute access."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_lock"] = threading.Lock()
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self) -> ModuleType:
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            with self.__dict__["_lazy_lock"]:
+                module = self.__dict__["_lazy_module"]
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value):
+        # e.g. stripe.api_key = ... must reach the real module
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_module(name: str) -> Optional[LazyModule]:
+    """Return a lazy proxy for a module, or None if it is not installed."""
+    if not module_available(name):
+        return None
+    return LazyModule(name)
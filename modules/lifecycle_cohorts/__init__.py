@@ -0,0 +1,175 @@
+"""
+Lifecycle Cohorts
+Day-based marketing nudges computed from users.created_at.
+
+A user is on lifecycle day N when their signup (UTC date) is N days
+before today. For each milestone day a tick scans one signup-date range on
+idx_users_created, in keyset batches, so its cost follows the number of
+users due today rather than the size of the users table.
+
+Every due (user, milestone) pair is recorded in lifecycle_sends before it
+is reported; the primary key makes that the idempotency key, so a retried
+or concurrent tick returns only pairs no earlier tick emitted.
+
+Usage:
+    from modules.lifecycle_cohorts import run_lifecycle_tick
+    result = run_lifecycle_tick()
+    for event in result["events"]:
+        ...
+"""
+import os
+import json
+import time
+import calendar
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Any, Iterator, List, Optional
+
+from modules.db_wrapper import execute_query, execute, commit, rollback
+from modules.migrations import ensure_migrated
+
+log = logging.getLogger("levqor.lifecycle_cohorts")
+
+LIFECYCLE_BATCH_SIZE = int(os.environ.get("LIFECYCLE_BATCH_SIZE", "500"))
+
+# Lifecycle day -> banner shown to the user
+LIFECYCLE_MILESTONES: Dict[int, str] = {
+    1: "quick_start",
+    3: "workflow_suggestions",
+    6: "upgrade_benefits",
+    7: "trial_ending",
+    10: "dfy_upsell",
+    30: "roi_summary",
+}
+
+
+def _utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _epoch(day: date) -> float:
+    return float(calendar.timegm(day.timetuple()))
+
+
+def _tier(meta: Optional[str]) -> str:
+    try:
+        return (json.loads(meta) if meta else {}).get("tier") or "trial"
+    except (ValueError, AttributeError):
+        return "trial"
+
+
+def iter_signup_cohort(signup_day: date, batch_size: int = None) -> Iterator[Dict[str, Any]]:
+    """Users who signed up on signup_day (UTC), in (created_at, id) order."""
+    batch_size = batch_size or LIFECYCLE_BATCH_SIZE
+    lo, hi = _epoch(signup_day), _epoch(signup_day + timedelta(days=1))
+    last = None
+    while True:
+        if last is None:
+            rows = execute_query(
+                "SELECT id, created_at, meta FROM users WHERE created_at >= ? AND created_at < ? "
+                "ORDER BY created_at, id LIMIT ?",
+                (lo, hi, batch_size)
+            ) or []
+        else:
+            rows = execute_query(
+                "SELECT id, created_at, meta FROM users WHERE created_at >= ? AND created_at < ? "
+                "AND (created_at > ? OR id > ?) ORDER BY created_at, id LIMIT ?",
+                (last["created_at"], hi, last["created_at"], last["id"], batch_size)
+            ) or []
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1]
+
+
+def _claim_sends(rows: List[tuple]) -> List[bool]:
+    """Insert (user_id, day, banner, tick_date, created_at) rows; True where the row is new."""
+    claimed = []
+    try:
+        for row in rows:
+            cursor = execute(
+                "INSERT INTO lifecycle_sends (user_id, lifecycle_day, banner_type, tick_date, created_at) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (user_id, lifecycle_day) DO NOTHING",
+                row
+            )
+            claimed.append(cursor.rowcount == 1)
+        commit()
+    except Exception:
+        rollback()
+        raise
+    return claimed
+
+
+def _emit(batch: List[Dict[str, Any]], today: date, now: float, events: List[Dict[str, Any]]) -> int:
+    claimed = _claim_sends([
+        (e["user_id"], e["lifecycle_day"], e["banner_type"], today.isoformat(), now) for e in batch
+    ])
+    events.extend(e for e, new in zip(batch, claimed) if new)
+    return claimed.count(False)
+
+
+def run_lifecycle_tick(today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Bucket users by lifecycle milestone and emit the events due today.
+
+    Returns:
+        {"day_buckets": {"day_N": users due}, "events": [new events],
+         "skipped": pairs already emitted by an earlier tick, "tick_date"}
+    """
+    ensure_migrated()
+    today = today or _utc_today()
+    now = time.time()
+    created_at = datetime.utcnow().isoformat()
+
+    day_buckets = {f"day_{day}": 0 for day in LIFECYCLE_MILESTONES}
+    events: List[Dict[str, Any]] = []
+    skipped = 0
+
+    for day, banner_type in LIFECYCLE_MILESTONES.items():
+        batch: List[Dict[str, Any]] = []
+        for user in iter_signup_cohort(today - timedelta(days=day)):
+            day_buckets[f"day_{day}"] += 1
+            batch.append({
+                "user_id": user["id"],
+                "lifecycle_day": day,
+                "banner_type": banner_type,
+                "tier": _tier(user["meta"]),
+                "idempotency_key": f"{user['id']}:{day}",
+                "created_at": created_at
+            })
+            if len(batch) >= LIFECYCLE_BATCH_SIZE:
+                skipped += _emit(batch, today, now, events)
+                batch = []
+        if batch:
+            skipped += _emit(batch, today, now, events)
+
+    log.info(f"Lifecycle tick {today.isoformat()}: buckets={day_buckets}, events={len(events)}, skipped={skipped}")
+
+    return {
+        "tick_date": today.isoformat(),
+        "day_buckets": day_buckets,
+        "events": events,
+        "skipped": skipped
+    }
+
+
+def get_user_lifecycle_day(user_id: str, today: Optional[date] = None) -> Optional[Dict[str, Any]]:
+    """Lifecycle day and banner for one user; None if the user or their signup date is unknown."""
+    row = execute_query("SELECT created_at FROM users WHERE id = ?", (user_id,), fetch="one")
+    if not row or row["created_at"] is None:
+        return None
+
+    signup_day = datetime.fromtimestamp(float(row["created_at"]), tz=timezone.utc).date()
+    lifecycle_day = ((today or _utc_today()) - signup_day).days
+    return {
+        "lifecycle_day": lifecycle_day,
+        "banner_type": LIFECYCLE_MILESTONES.get(lifecycle_day, "none")
+    }
+
+
+__all__ = [
+    "LIFECYCLE_MILESTONES",
+    "iter_signup_cohort",
+    "run_lifecycle_tick",
+    "get_user_lifecycle_day",
+]
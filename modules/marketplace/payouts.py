@@ -3,12 +3,16 @@ Stripe Connect Payouts System
 Handles automated revenue sharing with partners
 """
 import os
-import stripe
 from time import time
 import sqlite3
 from typing import Optional, Dict, Any
 
-stripe.api_key = os.environ.get("STRIPE_SECRET_KEY", "").strip()
+from modules.lazy_import import LazyModule
+
+# Imported on first payout rather than when the marketplace blueprint loads
+stripe = LazyModule("stripe")
+
+STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY", "").strip()
 
 def get_db():
     """Get database connection"""
@@ -53,11 +57,12 @@ def create_payout(
     Returns:
         Stripe Transfer object or None if failed
     """
-    if not stripe.api_key:
+    if not STRIPE_SECRET_KEY:
         print("⚠️ Stripe API key not configured")
         return None
     
     try:
+        stripe.api_key = STRIPE_SECRET_KEY
         transfer = stripe.Transfer.create(
             amount=amount_cents,
             currency="usd",
@@ -0,0 +1,163 @@
+"""
+Levqor Schema Migrations
+Versioned schema changes applied once, at startup, instead of per-call
+CREATE TABLE IF NOT EXISTS checks scattered across modules.
+
+Applied versions are recorded in schema_migrations. Each migration runs in
+its own transaction under a cross-process lock (pg_advisory_xact_lock on
+PostgreSQL, BEGIN IMMEDIATE on SQLite), so concurrent workers starting at
+the same time apply every version exactly once.
+
+Usage:
+    from modules.migrations import run_migrations
+    run_migrations()            # at startup (run.py)
+
+    from modules.migrations import ensure_migrated
+    ensure_migrated()           # cheap guard for code paths used outside run.py
+"""
+import time
+import logging
+import threading
+from typing import Dict, Any, List, Optional
+
+from modules.db_wrapper import get_db, get_db_type
+
+from .versions import Migration, MIGRATIONS
+from .plan_check import HOT_QUERIES, explain_query, find_unindexed_queries
+
+log = logging.getLogger("levqor.migrations")
+
+# Arbitrary constant shared by every worker for pg_advisory_xact_lock
+MIGRATION_LOCK_ID = 7_104_532_001
+
+_migrated = False
+_migrate_lock = threading.Lock()
+
+
+def _ensure_migrations_table(conn, db_type: str):
+    cursor = conn.cursor()
+    if db_type == "postgresql":
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at REAL NOT NULL
+            )
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at REAL NOT NULL
+            )
+        """)
+    conn.commit()
+
+
+def _applied_versions(cursor) -> set:
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _apply(conn, db_type: str, migration: Migration) -> bool:
+    """Apply one migration in its own locked transaction. Returns True if applied."""
+    cursor = conn.cursor()
+    placeholder = "%s" if db_type == "postgresql" else "?"
+    try:
+        if db_type == "postgresql":
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            statements = migration.postgresql
+        else:
+            cursor.execute("BEGIN IMMEDIATE")
+            statements = migration.sqlite
+
+        # Another worker may have applied it while we waited for the lock
+        if migration.version in _applied_versions(cursor):
+            conn.rollback()
+            return False
+
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.execute(
+            f"INSERT INTO schema_migrations (version, name, applied_at) "
+            f"VALUES ({placeholder}, {placeholder}, {placeholder})",
+            (migration.version, migration.name, time.time())
+        )
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def run_migrations(migrations: Optional[List[Migration]] = None) -> Dict[str, Any]:
+    """
+    Apply all pending migrations in version order.
+
+    Returns:
+        Dict with applied versions, current version and elapsed time
+    """
+    global _migrated
+    migrations = sorted(migrations or MIGRATIONS, key=lambda m: m.version)
+    start = time.time()
+
+    with _migrate_lock:
+        conn = get_db()
+        db_type = get_db_type()
+        _ensure_migrations_table(conn, db_type)
+
+        cursor = conn.cursor()
+        already = _applied_versions(cursor)
+        conn.commit()
+
+        applied = []
+        for migration in migrations:
+            if migration.version in already:
+                continue
+            if _apply(conn, db_type, migration):
+                log.info(f"Applied migration {migration.version}: {migration.name}")
+                applied.append(migration.version)
+
+        _migrated = True
+
+    current = max([m.version for m in migrations] + [0])
+    return {
+        "applied": applied,
+        "current_version": current,
+        "db_type": db_type,
+        "elapsed_ms": round((time.time() - start) * 1000, 2)
+    }
+
+
+def ensure_migrated():
+    """Run pending migrations once per process; later calls are a flag check."""
+    if _migrated:
+        return
+    try:
+        run_migrations()
+    except Exception as e:
+        log.warning(f"Could not apply schema migrations: {e}")
+
+
+def get_schema_version() -> int:
+    """Highest applied migration version, or 0 if none."""
+    conn = get_db()
+    _ensure_migrations_table(conn, get_db_type())
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(version) FROM schema_migrations")
+    row = cursor.fetchone()
+    conn.commit()
+    return int(row[0] or 0) if row else 0
+
+
+__all__ = [
+    "Migration",
+    "MIGRATIONS",
+    "HOT_QUERIES",
+    "run_migrations",
+    "ensure_migrated",
+    "get_schema_version",
+    "explain_query",
+    "find_unindexed_queries",
+]
@@ -0,0 +1,226 @@
+"""
+Query Plan Check
+Runs EXPLAIN over the hot query shapes and reports any that would scan a
+whole table (or sort without an index) instead of using one of the indexes
+added by the migrations.
+
+SQLite:     EXPLAIN QUERY PLAN, flags "SCAN <table>" without an index and
+            ORDER BY sorts done in a temp B-tree. GROUP BY temp B-trees are
+            expected for aggregates and are not flagged.
+PostgreSQL: EXPLAIN with enable_seqscan off, flags any remaining Seq Scan.
+            With seq scans discouraged, one is only chosen when no usable
+            index exists, so small CI tables do not cause false positives.
+"""
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from modules.db_wrapper import get_db, get_db_type, convert_query_placeholders
+
+log = logging.getLogger("levqor.migrations.plan_check")
+
+# name -> (query, representative params); keep in sync with the call sites
+HOT_QUERIES: Dict[str, Tuple[str, tuple]] = {
+    "workflow_events.by_run": (
+        "SELECT * FROM workflow_events WHERE run_id = ? ORDER BY created_at ASC",
+        ("run-1",),
+    ),
+    "workflow_runs.recent": (
+        "SELECT * FROM workflow_runs ORDER BY started_at DESC LIMIT ?",
+        (20,),
+    ),
+    "workflow_runs.by_workflow": (
+        "SELECT * FROM workflow_runs WHERE workflow_id = ? ORDER BY started_at DESC LIMIT ?",
+        ("wf-1", 20),
+    ),
+    "workflows.by_tenant": (
+        "SELECT * FROM workflows WHERE tenant_id = ? ORDER BY created_at DESC LIMIT ?",
+        ("default", 100),
+    ),
+    "workflows.by_owner": (
+        "SELECT * FROM workflows WHERE owner_id = ? ORDER BY created_at DESC LIMIT ?",
+        ("user-1", 100),
+    ),
+    "approval_queue.pending": (
+        "SELECT * FROM approval_queue WHERE status = 'pending' ORDER BY created_at DESC LIMIT ?",
+        (100,),
+    ),
+    "approval_queue.pending_page": (
+        "SELECT * FROM approval_queue WHERE status = 'pending' AND created_at <= ? "
+        "AND (created_at < ? OR id < ?) ORDER BY created_at DESC, id DESC LIMIT ?",
+        (0.0, 0.0, "id-1", 100),
+    ),
+    "approval_queue.pending_by_tenant": (
+        "SELECT * FROM approval_queue WHERE status = 'pending' AND tenant_id = ? "
+        "ORDER BY created_at DESC, id DESC LIMIT ?",
+        ("default", 100),
+    ),
+    "approval_queue.pending_by_tenant_page": (
+        "SELECT * FROM approval_queue WHERE status = 'pending' AND tenant_id = ? AND created_at <= ? "
+        "AND (created_at < ? OR id < ?) ORDER BY created_at DESC, id DESC LIMIT ?",
+        ("default", 0.0, 0.0, "id-1", 100),
+    ),
+    "builder_history.by_email": (
+        "SELECT id, created_at, prompt, yaml, summary, status FROM builder_history "
+        "WHERE email = ? AND status = 'active' ORDER BY created_at DESC",
+        ("user@example.com",),
+    ),
+    "workflow_run_state.due": (
+        "SELECT run_id FROM workflow_run_state WHERE status = 'parked' AND resume_at <= ? "
+        "ORDER BY resume_at LIMIT ?",
+        (0.0, 100),
+    ),
+    "usage_daily_rollups.range": (
+        "SELECT day, SUM(workflows), SUM(runs), SUM(api_calls), SUM(ai_credits) FROM usage_daily_rollups "
+        "WHERE day >= ? AND day <= ? GROUP BY day ORDER BY day",
+        ("2025-01-01", "2025-01-31"),
+    ),
+    "usage_daily_rollups.tenant_range": (
+        "SELECT day, SUM(workflows), SUM(runs), SUM(api_calls), SUM(ai_credits) FROM usage_daily_rollups "
+        "WHERE tenant_id = ? AND day >= ? AND day <= ? GROUP BY day ORDER BY day",
+        ("default", "2025-01-01", "2025-01-31"),
+    ),
+    "tenant_states.due_deletions": (
+        "SELECT tenant_id FROM tenant_states WHERE status = 'pending_deletion' "
+        "AND scheduled_deletion_at <= ? ORDER BY scheduled_deletion_at LIMIT ?",
+        (0.0, 100),
+    ),
+    "tenant_audit_log.by_tenant": (
+        "SELECT * FROM tenant_audit_log WHERE tenant_id = ? ORDER BY created_at DESC LIMIT ?",
+        ("default", 100),
+    ),
+    "tenant_audit_log.recent": (
+        "SELECT * FROM tenant_audit_log ORDER BY created_at DESC LIMIT ?",
+        (100,),
+    ),
+    "growth_user_stats.leaderboard": (
+        "SELECT user_id, shares, clicks, conversions, points FROM growth_user_stats "
+        "ORDER BY points DESC LIMIT ?",
+        (10,),
+    ),
+    "growth_template_copies.recent": (
+        "SELECT id, template_name, created_at FROM growth_template_copies ORDER BY created_at DESC LIMIT ?",
+        (10,),
+    ),
+    "recovery_events.due": (
+        "SELECT id, status, next_attempt_at FROM recovery_events WHERE status = 'pending' "
+        "AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+        (0.0, 50),
+    ),
+    "workflow_runs.stalled": (
+        "SELECT id, workflow_id FROM workflow_runs WHERE started_at < ? AND status = 'running' "
+        "ORDER BY started_at LIMIT ?",
+        (0.0, 100),
+    ),
+    "store_records.by_email": (
+        "SELECT data FROM store_records WHERE collection = ? AND email = ? ORDER BY seq DESC LIMIT ?",
+        ("privacy_requests", "user@example.com", 100),
+    ),
+    "store_records.by_user": (
+        "SELECT data FROM store_records WHERE collection = ? AND user_id = ? ORDER BY seq DESC LIMIT ?",
+        ("lifecycle_events", "user-1", 100),
+    ),
+    "store_records.recent": (
+        "SELECT data FROM store_records WHERE collection = ? ORDER BY seq DESC LIMIT ?",
+        ("consultations", 100),
+    ),
+    "users.signup_cohort": (
+        "SELECT id, created_at, meta FROM users WHERE created_at >= ? AND created_at < ? "
+        "ORDER BY created_at, id LIMIT ?",
+        (0.0, 86400.0, 500),
+    ),
+    "report_jobs.by_cache_key": (
+        "SELECT * FROM report_jobs WHERE cache_key = ? AND status = ? ORDER BY created_at DESC LIMIT 1",
+        ("key-1", "succeeded"),
+    ),
+    "user_brain_events.recent": (
+        "SELECT event_type, data, created_at FROM user_brain_events WHERE email = ? ORDER BY id DESC LIMIT ?",
+        ("user@example.com", 100),
+    ),
+    "user_brain_events.prune": (
+        "SELECT id FROM user_brain_events WHERE email = ? ORDER BY id DESC LIMIT 1 OFFSET ?",
+        ("user@example.com", 100),
+    ),
+    "user_brain_templates.by_email": (
+        "SELECT template_id FROM user_brain_templates WHERE email = ? ORDER BY viewed_at",
+        ("user@example.com",),
+    ),
+    "stripe_webhook_inbox.due_heads": (
+        "SELECT event_id, ordering_key, status, next_attempt_at FROM stripe_webhook_inbox e "
+        "WHERE status = ? AND next_attempt_at <= ? AND NOT EXISTS ("
+        "SELECT 1 FROM stripe_webhook_inbox o WHERE o.ordering_key = e.ordering_key AND o.settled = 0 "
+        "AND (o.received_at < e.received_at OR (o.received_at = e.received_at AND o.event_id < e.event_id))"
+        ") ORDER BY next_attempt_at LIMIT ?",
+        ("pending", 0.0, 20),
+    ),
+    "stripe_webhook_inbox.head": (
+        "SELECT event_id, ordering_key, status, next_attempt_at FROM stripe_webhook_inbox "
+        "WHERE ordering_key = ? AND settled = 0 ORDER BY received_at, event_id LIMIT 1",
+        ("cus_1",),
+    ),
+    "telemetry_logs.recent": (
+        "SELECT * FROM telemetry_logs WHERE created_at >= ? ORDER BY created_at DESC LIMIT ?",
+        (0.0, 100),
+    ),
+    "telemetry_logs.errors_since": (
+        "SELECT error_type, error_message, COUNT(*) AS cnt FROM telemetry_logs "
+        "WHERE created_at >= ? AND level = 'error' GROUP BY error_type, error_message",
+        (0.0,),
+    ),
+}
+
+
+def explain_query(query: str, params: tuple = ()) -> List[str]:
+    """Return the plan for a query as a list of text lines."""
+    conn = get_db()
+    db_type = get_db_type()
+    cursor = conn.cursor()
+    sql = convert_query_placeholders(query, db_type)
+
+    try:
+        if db_type == "postgresql":
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {sql}", params)
+            return [row[0] for row in cursor.fetchall()]
+
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        # Rows are (id, parent, notused, detail)
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        conn.rollback()
+
+
+def _plan_problems(plan: List[str], db_type: str) -> List[str]:
+    problems = []
+    for line in plan:
+        text = line.strip()
+        if db_type == "postgresql":
+            if "Seq Scan" in text:
+                problems.append(text)
+        elif text.startswith("SCAN") and "INDEX" not in text:
+            problems.append(text)
+        elif "USE TEMP B-TREE" in text and "ORDER BY" in text:
+            problems.append(text)
+    return problems
+
+
+def find_unindexed_queries(queries: Optional[Dict[str, Tuple[str, tuple]]] = None) -> List[Dict[str, Any]]:
+    """
+    EXPLAIN every hot query and return those whose plan is not index-driven.
+
+    Returns:
+        List of {"name", "query", "problems", "plan"} dicts; empty when every
+        query uses an index.
+    """
+    db_type = get_db_type()
+    failures = []
+    for name, (query, params) in (queries or HOT_QUERIES).items():
+        try:
+            plan = explain_query(query, params)
+        except Exception as e:
+            failures.append({"name": name, "query": query, "problems": [f"EXPLAIN failed: {e}"], "plan": []})
+            continue
+
+        problems = _plan_problems(plan, db_type)
+        if problems:
+            failures.append({"name": name, "query": query, "problems": problems, "plan": plan})
+    return failures
@@ -0,0 +1,1034 @@
+"""
+Schema Migrations - Version Definitions
+Ordered, append-only list of schema changes. Never edit a released
+migration; add a new version instead.
+
+Each migration carries separate statement lists for SQLite and PostgreSQL.
+Statements use IF NOT EXISTS so a migration can be safely re-applied to a
+database whose tables were created by the old ad-hoc helpers.
+"""
+from dataclasses import dataclass, field
+from typing import List
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    sqlite: List[str] = field(default_factory=list)
+    postgresql: List[str] = field(default_factory=list)
+
+
+def _both(*statements: str) -> List[str]:
+    return list(statements)
+
+
+# --- 1: tables previously created by per-module _ensure_table helpers ---
+
+_CORE_TABLES_SQLITE = [
+    """
+    CREATE TABLE IF NOT EXISTS workflows (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        description TEXT,
+        steps TEXT NOT NULL,
+        owner_id TEXT,
+        tenant_id TEXT DEFAULT 'default',
+        is_active INTEGER DEFAULT 0,
+        schedule_config TEXT,
+        created_at REAL DEFAULT (strftime('%s', 'now')),
+        updated_at REAL DEFAULT (strftime('%s', 'now'))
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS workflow_runs (
+        id TEXT PRIMARY KEY,
+        workflow_id TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        started_at REAL NOT NULL,
+        ended_at REAL,
+        context TEXT,
+        result TEXT,
+        error TEXT,
+        created_at REAL DEFAULT (strftime('%s', 'now'))
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS workflow_events (
+        id TEXT PRIMARY KEY,
+        run_id TEXT NOT NULL,
+        workflow_id TEXT NOT NULL,
+        step_id TEXT,
+        event_type TEXT NOT NULL,
+        payload TEXT,
+        created_at REAL DEFAULT (strftime('%s', 'now'))
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS approval_queue (
+        id TEXT PRIMARY KEY,
+        action_type TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        reason TEXT,
+        impact_level TEXT NOT NULL DEFAULT 'C',
+        status TEXT NOT NULL DEFAULT 'pending',
+        owner_id TEXT,
+        tenant_id TEXT DEFAULT 'default',
+        created_at REAL DEFAULT (strftime('%s', 'now')),
+        processed_at REAL,
+        processed_by TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_brain_state (
+        user_id TEXT PRIMARY KEY,
+        email TEXT UNIQUE,
+        updated_at REAL NOT NULL,
+        json_state TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS builder_history (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        email TEXT,
+        created_at REAL NOT NULL,
+        prompt TEXT NOT NULL,
+        yaml TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        status TEXT DEFAULT 'active'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS telemetry_logs (
+        id TEXT PRIMARY KEY,
+        source TEXT NOT NULL DEFAULT 'backend',
+        level TEXT NOT NULL DEFAULT 'info',
+        event_type TEXT,
+        message TEXT,
+        endpoint TEXT,
+        duration_ms REAL,
+        status_code INTEGER,
+        error_type TEXT,
+        error_message TEXT,
+        metadata TEXT,
+        created_at REAL NOT NULL
+    )
+    """,
+]
+
+_CORE_TABLES_POSTGRESQL = [
+    """
+    CREATE TABLE IF NOT EXISTS workflows (
+        id VARCHAR(64) PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        description TEXT,
+        steps TEXT NOT NULL,
+        owner_id VARCHAR(64),
+        tenant_id VARCHAR(64) DEFAULT 'default',
+        is_active BOOLEAN DEFAULT FALSE,
+        schedule_config TEXT,
+        created_at REAL DEFAULT EXTRACT(EPOCH FROM NOW()),
+        updated_at REAL DEFAULT EXTRACT(EPOCH FROM NOW())
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS workflow_runs (
+        id VARCHAR(64) PRIMARY KEY,
+        workflow_id VARCHAR(64) NOT NULL,
+        status VARCHAR(32) NOT NULL DEFAULT 'pending',
+        started_at REAL NOT NULL,
+        ended_at REAL,
+        context TEXT,
+        result TEXT,
+        error TEXT,
+        created_at REAL DEFAULT EXTRACT(EPOCH FROM NOW())
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS workflow_events (
+        id VARCHAR(64) PRIMARY KEY,
+        run_id VARCHAR(64) NOT NULL,
+        workflow_id VARCHAR(64) NOT NULL,
+        step_id VARCHAR(64),
+        event_type VARCHAR(64) NOT NULL,
+        payload TEXT,
+        created_at REAL DEFAULT EXTRACT(EPOCH FROM NOW())
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS approval_queue (
+        id VARCHAR(64) PRIMARY KEY,
+        action_type VARCHAR(64) NOT NULL,
+        payload TEXT NOT NULL,
+        reason TEXT,
+        impact_level VARCHAR(8) NOT NULL DEFAULT 'C',
+        status VARCHAR(32) NOT NULL DEFAULT 'pending',
+        owner_id VARCHAR(64),
+        tenant_id VARCHAR(64) DEFAULT 'default',
+        created_at REAL DEFAULT EXTRACT(EPOCH FROM NOW()),
+        processed_at REAL,
+        processed_by VARCHAR(64)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_brain_state (
+        user_id TEXT PRIMARY KEY,
+        email TEXT UNIQUE,
+        updated_at REAL NOT NULL,
+        json_state TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS builder_history (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        email TEXT,
+        created_at REAL NOT NULL,
+        prompt TEXT NOT NULL,
+        yaml TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        status TEXT DEFAULT 'active'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS telemetry_logs (
+        id VARCHAR(64) PRIMARY KEY,
+        source VARCHAR(32) NOT NULL DEFAULT 'backend',
+        level VARCHAR(16) NOT NULL DEFAULT 'info',
+        event_type VARCHAR(128),
+        message TEXT,
+        endpoint TEXT,
+        duration_ms REAL,
+        status_code INTEGER,
+        error_type VARCHAR(128),
+        error_message TEXT,
+        metadata TEXT,
+        created_at REAL NOT NULL
+    )
+    """,
+]
+
+# --- 2: composite indexes matching the hot query shapes ---
+#   get_workflow_events:   WHERE run_id = ? ORDER BY created_at
+#   get_workflow_runs:     [WHERE workflow_id = ?] ORDER BY started_at DESC
+#   list_workflows:        WHERE tenant_id|owner_id = ? ORDER BY created_at DESC
+#   get_scheduled_workflows: WHERE is_active = ? ORDER BY created_at DESC
+#   list_pending_actions:  WHERE status = 'pending' ORDER BY created_at DESC
+#   builder history:       WHERE email = ? AND status = 'active' ORDER BY created_at DESC
+#   guardian telemetry:    WHERE created_at >= ? [AND level = ?]
+
+_HOT_PATH_INDEXES = _both(
+    "CREATE INDEX IF NOT EXISTS idx_workflow_events_run_created ON workflow_events(run_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_workflow_runs_started ON workflow_runs(started_at)",
+    "CREATE INDEX IF NOT EXISTS idx_workflow_runs_workflow_started ON workflow_runs(workflow_id, started_at)",
+    "CREATE INDEX IF NOT EXISTS idx_workflows_tenant_created ON workflows(tenant_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_workflows_owner_created ON workflows(owner_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_workflows_active_created ON workflows(is_active, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_approval_queue_status_created ON approval_queue(status, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_builder_history_email_status_created ON builder_history(email, status, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_telemetry_logs_created ON telemetry_logs(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_telemetry_logs_level_created ON telemetry_logs(level, created_at)",
+)
+
+# --- 3: durable state of runs executed by the async workflow engine ---
+# (DOUBLE PRECISION on PostgreSQL: REAL is 4 bytes there, too coarse for
+# epoch timestamps used as timers and leases)
+
+_RUN_STATE_SQLITE = [
+    """
+    CREATE TABLE IF NOT EXISTS workflow_run_state (
+        run_id TEXT PRIMARY KEY,
+        workflow_id TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'running',
+        resume_at REAL,
+        state TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_workflow_run_state_status_resume ON workflow_run_state(status, resume_at)",
+]
+
+_RUN_STATE_POSTGRESQL = [
+    """
+    CREATE TABLE IF NOT EXISTS workflow_run_state (
+        run_id VARCHAR(64) PRIMARY KEY,
+        workflow_id VARCHAR(64) NOT NULL,
+        status VARCHAR(32) NOT NULL DEFAULT 'running',
+        resume_at DOUBLE PRECISION,
+        state TEXT NOT NULL,
+        updated_at DOUBLE PRECISION NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_workflow_run_state_status_resume ON workflow_run_state(status, resume_at)",
+]
+
+# --- 4: pre-aggregated daily usage for the CSV export ---
+# usage_daily_rollups holds one row per (day, tenant). api_calls and
+# ai_credits are a ledger written as tenant usage is metered; workflows/runs
+# are filled in when the day is closed and recorded in usage_rollup_days,
+# which also keeps the day's platform-wide API call count.
+
+_USAGE_ROLLUPS_SQLITE = [
+    """
+    CREATE TABLE IF NOT EXISTS usage_daily_rollups (
+        day TEXT NOT NULL,
+        tenant_id TEXT NOT NULL,
+        workflows INTEGER NOT NULL DEFAULT 0,
+        runs INTEGER NOT NULL DEFAULT 0,
+        api_calls INTEGER NOT NULL DEFAULT 0,
+        ai_credits REAL NOT NULL DEFAULT 0,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (day, tenant_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS usage_rollup_days (
+        day TEXT PRIMARY KEY,
+        api_calls INTEGER NOT NULL DEFAULT 0,
+        rolled_up_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_usage_daily_rollups_tenant_day ON usage_daily_rollups(tenant_id, day)",
+]
+
+_USAGE_ROLLUPS_POSTGRESQL = [
+    """
+    CREATE TABLE IF NOT EXISTS usage_daily_rollups (
+        day VARCHAR(10) NOT NULL,
+        tenant_id VARCHAR(255) NOT NULL,
+        workflows INTEGER NOT NULL DEFAULT 0,
+        runs INTEGER NOT NULL DEFAULT 0,
+        api_calls INTEGER NOT NULL DEFAULT 0,
+        ai_credits DOUBLE PRECISION NOT NULL DEFAULT 0,
+        updated_at DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (day, tenant_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS usage_rollup_days (
+        day VARCHAR(10) PRIMARY KEY,
+        api_calls INTEGER NOT NULL DEFAULT 0,
+        rolled_up_at DOUBLE PRECISION NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_usage_daily_rollups_tenant_day ON usage_daily_rollups(tenant_id, day)",
+]
+
+# --- 5: persisted per-tenant usage counters (write-behind metering) ---
+
+_TENANT_USAGE_SQLITE = [
+    """
+    CREATE TABLE IF NOT EXISTS tenant_usage_counters (
+        tenant_id TEXT PRIMARY KEY,
+        workflow_runs INTEGER NOT NULL DEFAULT 0,
+        api_calls INTEGER NOT NULL DEFAULT 0,
+        ai_credits_used REAL NOT NULL DEFAULT 0,
+        errors_count INTEGER NOT NULL DEFAULT 0,
+        storage_bytes INTEGER NOT NULL DEFAULT 0,
+        run_limit INTEGER NOT NULL DEFAULT 1000,
+        api_limit INTEGER NOT NULL DEFAULT 10000,
+        ai_credits_limit REAL NOT NULL DEFAULT 100.0,
+        is_blocked INTEGER NOT NULL DEFAULT 0,
+        block_reason TEXT,
+        last_activity REAL,
+        updated_at REAL NOT NULL
+    )
+    """,
+]
+
+_TENANT_USAGE_POSTGRESQL = [
+    """
+    CREATE TABLE IF NOT EXISTS tenant_usage_counters (
+        tenant_id VARCHAR(255) PRIMARY KEY,
+        workflow_runs BIGINT NOT NULL DEFAULT 0,
+        api_calls BIGINT NOT NULL DEFAULT 0,
+        ai_credits_used DOUBLE PRECISION NOT NULL DEFAULT 0,
+        errors_count BIGINT NOT NULL DEFAULT 0,
+        storage_bytes BIGINT NOT NULL DEFAULT 0,
+        run_limit INTEGER NOT NULL DEFAULT 1000,
+        api_limit INTEGER NOT NULL DEFAULT 10000,
+        ai_credits_limit DOUBLE PRECISION NOT NULL DEFAULT 100.0,
+        is_blocked BOOLEAN NOT NULL DEFAULT FALSE,
+        block_reason TEXT,
+        last_activity DOUBLE PRECISION,
+        updated_at DOUBLE PRECISION NOT NULL
+    )
+    """,
+]
+
+# --- 6: durable tenant lifecycle state and audit log ---
+#   due deletions:  WHERE status = 'pending_deletion' AND scheduled_deletion_at <= ?
+#   audit log:      [WHERE tenant_id = ?] ORDER BY created_at DESC; retention by created_at
+
+_TENANT_LIFECYCLE_SQLITE = [
+    """
+    CREATE TABLE IF NOT EXISTS tenant_states (
+        tenant_id TEXT PRIMARY KEY,
+        status TEXT NOT NULL DEFAULT 'active',
+        created_at REAL NOT NULL,
+        suspended_at REAL,
+        deleted_at REAL,
+        scheduled_deletion_at REAL,
+        suspension_reason TEXT,
+        deletion_reason TEXT,
+        data_retained INTEGER NOT NULL DEFAULT 1,
+        updated_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tenant_audit_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tenant_id TEXT NOT NULL,
+        action TEXT NOT NULL,
+        details TEXT,
+        created_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_tenant_states_status_deletion ON tenant_states(status, scheduled_deletion_at)",
+    "CREATE INDEX IF NOT EXISTS idx_tenant_audit_log_tenant_created ON tenant_audit_log(tenant_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_tenant_audit_log_created ON tenant_audit_log(created_at)",
+]
+
+_TENANT_LIFECYCLE_POSTGRESQL = [
+    """
+    CREATE TABLE IF NOT EXISTS tenant_states (
+        tenant_id VARCHAR(255) PRIMARY KEY,
+        status VARCHAR(32) NOT NULL DEFAULT 'active',
+        created_at DOUBLE PRECISION NOT NULL,
+        suspended_at DOUBLE PRECISION,
+        deleted_at DOUBLE PRECISION,
+        scheduled_deletion_at DOUBLE PRECISION,
+        suspension_reason TEXT,
+        deletion_reason TEXT,
+        data_retained BOOLEAN NOT NULL DEFAULT TRUE,
+        updated_at DOUBLE PRECISION NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tenant_audit_log (
+        id BIGSERIAL PRIMARY KEY,
+        tenant_id VARCHAR(255) NOT NULL,
+        action VARCHAR(64) NOT NULL,
+        details TEXT,
+        created_at DOUBLE PRECISION NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_tenant_states_status_deletion ON tenant_states(status, scheduled_deletion_at)",
+    "CREATE INDEX IF NOT EXISTS idx_tenant_audit_log_tenant_created ON tenant_audit_log(tenant_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_tenant_audit_log_created ON tenant_audit_log(created_at)",
+]
+
+# --- 7: growth-loop shares with incrementally maintained aggregates ---
+#   growth_share_stats: per (user_id | '*', share_type) totals
+#   growth_user_stats:  leaderboard rows, ORDER BY points DESC LIMIT k
+#   growth_distinct:    set membership behind the distinct counters
+
+_GROWTH_SQLITE = [
+    """
+    CREATE TABLE IF NOT EXISTS growth_shares (
+        id TEXT PRIMARY KEY,
+        workflow_id TEXT NOT NULL,
+        shared_by TEXT NOT NULL,
+        share_type TEXT NOT NULL,
+        clicks INTEGER NOT NULL DEFAULT 0,
+        conversions INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS growth_template_copies (
+        id TEXT PRIMARY KEY,
+        source_workflow_id TEXT NOT NULL,
+        source_owner TEXT,
+        copied_by TEXT NOT NULL,
+        template_name TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS growth_share_stats (
+        scope TEXT NOT NULL,
+        share_type TEXT NOT NULL,
+        shares INTEGER NOT NULL DEFAULT 0,
+        clicks INTEGER NOT NULL DEFAULT 0,
+        conversions INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (scope, share_type)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS growth_user_stats (
+        user_id TEXT PRIMARY KEY,
+        shares INTEGER NOT NULL DEFAULT 0,
+        clicks INTEGER NOT NULL DEFAULT 0,
+        conversions INTEGER NOT NULL DEFAULT 0,
+        template_copies INTEGER NOT NULL DEFAULT 0,
+        points INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS growth_workflow_stats (
+        workflow_id TEXT PRIMARY KEY,
+        shares INTEGER NOT NULL DEFAULT 0,
+        clicks INTEGER NOT NULL DEFAULT 0,
+        conversions INTEGER NOT NULL DEFAULT 0,
+        template_copies INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS growth_distinct (
+        kind TEXT NOT NULL,
+        member TEXT NOT NULL,
+        PRIMARY KEY (kind, member)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS growth_counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_growth_user_stats_points ON growth_user_stats(points)",
+    "CREATE INDEX IF NOT EXISTS idx_growth_template_copies_created ON growth_template_copies(created_at)",
+]
+
+_GROWTH_POSTGRESQL = [
+    """
+    CREATE TABLE IF NOT EXISTS growth_shares (
+        id VARCHAR(64) PRIMARY KEY,
+        workflow_id VARCHAR(255) NOT NULL,
+        shared_by VARCHAR(255) NOT NULL,
+        share_type VARCHAR(32) NOT NULL,
+        clicks BIGINT NOT NULL DEFAULT 0,
+        conversions BIGINT NOT NULL DEFAULT 0,
+        created_at DOUBLE PRECISION NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS growth_template_copies (
+        id VARCHAR(64) PRIMARY KEY,
+        source_workflow_id VARCHAR(255) NOT NULL,
+        source_owner VARCHAR(255),
+        copied_by VARCHAR(255) NOT NULL,
+        template_name TEXT NOT NULL,
+        created_at DOUBLE PRECISION NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS growth_share_stats (
+        scope VARCHAR(255) NOT NULL,
+        share_type VARCHAR(32) NOT NULL,
+        shares BIGINT NOT NULL DEFAULT 0,
+        clicks BIGINT NOT NULL DEFAULT 0,
+        conversions BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (scope, share_type)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS growth_user_stats (
+        user_id VARCHAR(255) PRIMARY KEY,
+        shares BIGINT NOT NULL DEFAULT 0,
+        clicks BIGINT NOT NULL DEFAULT 0,
+        conversions BIGINT NOT NULL DEFAULT 0,
+        template_copies BIGINT NOT NULL DEFAULT 0,
+        points BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS growth_workflow_stats (
+        workflow_id VARCHAR(255) PRIMARY KEY,
+        shares BIGINT NOT NULL DEFAULT 0,
+        clicks BIGINT NOT NULL DEFAULT 0,
+        conversions BIGINT NOT NULL DEFAULT 0,
+        template_copies BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS growth_distinct (
+        kind VARCHAR(32) NOT NULL,
+        member VARCHAR(255) NOT NULL,
+        PRIMARY KEY (kind, member)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS growth_counters (
+        name VARCHAR(64) PRIMARY KEY,
+        value BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_growth_user_stats_points ON growth_user_stats(points)",
+    "CREATE INDEX IF NOT EXISTS idx_growth_template_copies_created ON growth_template_copies(created_at)",
+]
+
+# --- 8: durable recovery retry queue ---
+#   due retries:  WHERE status = ? AND next_attempt_at <= ? ORDER BY next_attempt_at
+#   (next_attempt_at doubles as the lease expiry while an attempt is running)
+
+_RECOVERY_SQLITE = [
+    """
+    CREATE TABLE IF NOT EXISTS recovery_events (
+        id TEXT PRIMARY KEY,
+        workflow_id TEXT NOT NULL,
+        run_id TEXT,
+        step_id TEXT,
+        error_type TEXT,
+        error_message TEXT,
+        attempt INTEGER NOT NULL DEFAULT 1,
+        status TEXT NOT NULL DEFAULT 'pending',
+        next_attempt_at REAL NOT NULL,
+        config TEXT,
+        last_error TEXT,
+        escalated INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        resolved_at REAL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS recovery_counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_recovery_events_status_next ON recovery_events(status, next_attempt_at)",
+    "CREATE INDEX IF NOT EXISTS idx_recovery_events_run ON recovery_events(run_id)",
+]
+
+_RECOVERY_POSTGRESQL = [
+    """
+    CREATE TABLE IF NOT EXISTS recovery_events (
+        id VARCHAR(64) PRIMARY KEY,
+        workflow_id VARCHAR(255) NOT NULL,
+        run_id VARCHAR(64),
+        step_id VARCHAR(255),
+        error_type VARCHAR(128),
+        error_message TEXT,
+        attempt INTEGER NOT NULL DEFAULT 1,
+        status VARCHAR(32) NOT NULL DEFAULT 'pending',
+        next_attempt_at DOUBLE PRECISION NOT NULL,
+        config TEXT,
+        last_error TEXT,
+        escalated BOOLEAN NOT NULL DEFAULT FALSE,
+        created_at DOUBLE PRECISION NOT NULL,
+        resolved_at DOUBLE PRECISION
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS recovery_counters (
+        name VARCHAR(64) PRIMARY KEY,
+        value BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_recovery_events_status_next ON recovery_events(status, next_attempt_at)",
+    "CREATE INDEX IF NOT EXISTS idx_recovery_events_run ON recovery_events(run_id)",
+]
+
+# --- 9: tenant-scoped approval listing and maintained approval counters ---
+# Pending listings page by (created_at, id), so id closes both indexes;
+# (status, created_at, id) supersedes the version 2 (status, created_at) index.
+# approval_counters holds one row per tenant, kept in step with
+# approval_queue by modules.approvals.queue; the backfill seeds it from the
+# rows that exist when the migration runs.
+
+_APPROVAL_COUNTERS_BACKFILL = """
+    INSERT INTO approval_counters (tenant_id, pending, approved, rejected)
+    SELECT COALESCE(tenant_id, 'default'),
+           SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END),
+           SUM(CASE WHEN status = 'approved' THEN 1 ELSE 0 END),
+           SUM(CASE WHEN status = 'rejected' THEN 1 ELSE 0 END)
+    FROM approval_queue
+    GROUP BY COALESCE(tenant_id, 'default')
+    ON CONFLICT (tenant_id) DO NOTHING
+"""
+
+_APPROVAL_INDEX_SQLITE = [
+    "CREATE INDEX IF NOT EXISTS idx_approval_queue_tenant_status_created ON approval_queue(tenant_id, status, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_approval_queue_status_created_id ON approval_queue(status, created_at, id)",
+    "DROP INDEX IF EXISTS idx_approval_queue_status_created",
+    """
+    CREATE TABLE IF NOT EXISTS approval_counters (
+        tenant_id TEXT PRIMARY KEY,
+        pending INTEGER NOT NULL DEFAULT 0,
+        approved INTEGER NOT NULL DEFAULT 0,
+        rejected INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    _APPROVAL_COUNTERS_BACKFILL,
+]
+
+_APPROVAL_INDEX_POSTGRESQL = [
+    "CREATE INDEX IF NOT EXISTS idx_approval_queue_tenant_status_created ON approval_queue(tenant_id, status, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_approval_queue_status_created_id ON approval_queue(status, created_at, id)",
+    "DROP INDEX IF EXISTS idx_approval_queue_status_created",
+    """
+    CREATE TABLE IF NOT EXISTS approval_counters (
+        tenant_id VARCHAR(255) PRIMARY KEY,
+        pending BIGINT NOT NULL DEFAULT 0,
+        approved BIGINT NOT NULL DEFAULT 0,
+        rejected BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+    _APPROVAL_COUNTERS_BACKFILL,
+]
+
+# --- 10: append-only record store for the former JSON-file side databases ---
+# One row per record; email/user_id/type/status are copied out of the JSON
+# document on append so lookups use the secondary indexes below.
+
+_RECORD_STORE_SQLITE = [
+    """
+    CREATE TABLE IF NOT EXISTS store_records (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        collection TEXT NOT NULL,
+        record_id TEXT,
+        email TEXT,
+        user_id TEXT,
+        type TEXT,
+        status TEXT,
+        data TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        UNIQUE (collection, record_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS store_imports (
+        collection TEXT NOT NULL,
+        source TEXT NOT NULL,
+        records INTEGER NOT NULL DEFAULT 0,
+        imported_at REAL NOT NULL,
+        PRIMARY KEY (collection, source)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_store_records_collection_seq ON store_records(collection, seq)",
+    "CREATE INDEX IF NOT EXISTS idx_store_records_email ON store_records(collection, email, seq)",
+    "CREATE INDEX IF NOT EXISTS idx_store_records_user ON store_records(collection, user_id, seq)",
+    "CREATE INDEX IF NOT EXISTS idx_store_records_type ON store_records(collection, type, seq)",
+]
+
+_RECORD_STORE_POSTGRESQL = [
+    """
+    CREATE TABLE IF NOT EXISTS store_records (
+        seq BIGSERIAL PRIMARY KEY,
+        collection VARCHAR(64) NOT NULL,
+        record_id VARCHAR(255),
+        email VARCHAR(255),
+        user_id VARCHAR(255),
+        type VARCHAR(64),
+        status VARCHAR(64),
+        data TEXT NOT NULL,
+        created_at DOUBLE PRECISION NOT NULL,
+        UNIQUE (collection, record_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS store_imports (
+        collection VARCHAR(64) NOT NULL,
+        source VARCHAR(512) NOT NULL,
+        records INTEGER NOT NULL DEFAULT 0,
+        imported_at DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (collection, source)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_store_records_collection_seq ON store_records(collection, seq)",
+    "CREATE INDEX IF NOT EXISTS idx_store_records_email ON store_records(collection, email, seq)",
+    "CREATE INDEX IF NOT EXISTS idx_store_records_user ON store_records(collection, user_id, seq)",
+    "CREATE INDEX IF NOT EXISTS idx_store_records_type ON store_records(collection, type, seq)",
+]
+
+# --- 11: lifecycle cohorts (signup-date range scans, idempotent sends) ---
+
+_LIFECYCLE_COHORTS_SQLITE = [
+    "CREATE INDEX IF NOT EXISTS idx_users_created ON users(created_at, id)",
+    """
+    CREATE TABLE IF NOT EXISTS lifecycle_sends (
+        user_id TEXT NOT NULL,
+        lifecycle_day INTEGER NOT NULL,
+        banner_type TEXT NOT NULL,
+        tick_date TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        PRIMARY KEY (user_id, lifecycle_day)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_lifecycle_sends_tick ON lifecycle_sends(tick_date)",
+]
+
+_LIFECYCLE_COHORTS_POSTGRESQL = [
+    "CREATE INDEX IF NOT EXISTS idx_users_created ON users(created_at, id)",
+    """
+    CREATE TABLE IF NOT EXISTS lifecycle_sends (
+        user_id VARCHAR(255) NOT NULL,
+        lifecycle_day INTEGER NOT NULL,
+        banner_type VARCHAR(64) NOT NULL,
+        tick_date VARCHAR(10) NOT NULL,
+        created_at DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (user_id, lifecycle_day)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_lifecycle_sends_tick ON lifecycle_sends(tick_date)",
+]
+
+# --- 12: background report jobs (PDF exports) and their cached artifacts ---
+
+_REPORT_JOBS_SQLITE = [
+    """
+    CREATE TABLE IF NOT EXISTS report_jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        tenant_id TEXT NOT NULL,
+        params TEXT,
+        cache_key TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        artifact_path TEXT,
+        size_bytes INTEGER,
+        result TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_report_jobs_cache ON report_jobs(cache_key, status, created_at)",
+]
+
+_REPORT_JOBS_POSTGRESQL = [
+    """
+    CREATE TABLE IF NOT EXISTS report_jobs (
+        id VARCHAR(64) PRIMARY KEY,
+        kind VARCHAR(64) NOT NULL,
+        tenant_id VARCHAR(255) NOT NULL,
+        params TEXT,
+        cache_key VARCHAR(64) NOT NULL,
+        status VARCHAR(32) NOT NULL DEFAULT 'queued',
+        artifact_path TEXT,
+        size_bytes BIGINT,
+        result TEXT,
+        error TEXT,
+        created_at DOUBLE PRECISION NOT NULL,
+        started_at DOUBLE PRECISION,
+        finished_at DOUBLE PRECISION
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_report_jobs_cache ON report_jobs(cache_key, status, created_at)",
+]
+
+# --- 13: WOW brain event log and materialized per-user summary ---
+
+_WOW_BRAIN_SQLITE = [
+    """
+    CREATE TABLE IF NOT EXISTS user_brain_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT NOT NULL,
+        event_type TEXT NOT NULL,
+        data TEXT,
+        created_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_user_brain_events_email ON user_brain_events(email, id)",
+    """
+    CREATE TABLE IF NOT EXISTS user_brain_summary (
+        email TEXT PRIMARY KEY,
+        onboarding_complete INTEGER NOT NULL DEFAULT 0,
+        onboarding_step INTEGER NOT NULL DEFAULT 0,
+        onboarding_at REAL,
+        first_workflow_at REAL,
+        templates_viewed INTEGER NOT NULL DEFAULT 0,
+        builder_sessions INTEGER NOT NULL DEFAULT 0,
+        ai_interactions INTEGER NOT NULL DEFAULT 0,
+        last_activity REAL,
+        preferences TEXT,
+        updated_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_brain_templates (
+        email TEXT NOT NULL,
+        template_id TEXT NOT NULL,
+        viewed_at REAL NOT NULL,
+        PRIMARY KEY (email, template_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_user_brain_templates_viewed ON user_brain_templates(email, viewed_at)",
+]
+
+_WOW_BRAIN_POSTGRESQL = [
+    """
+    CREATE TABLE IF NOT EXISTS user_brain_events (
+        id BIGSERIAL PRIMARY KEY,
+        email VARCHAR(255) NOT NULL,
+        event_type VARCHAR(64) NOT NULL,
+        data TEXT,
+        created_at DOUBLE PRECISION NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_user_brain_events_email ON user_brain_events(email, id)",
+    """
+    CREATE TABLE IF NOT EXISTS user_brain_summary (
+        email VARCHAR(255) PRIMARY KEY,
+        onboarding_complete INTEGER NOT NULL DEFAULT 0,
+        onboarding_step INTEGER NOT NULL DEFAULT 0,
+        onboarding_at DOUBLE PRECISION,
+        first_workflow_at DOUBLE PRECISION,
+        templates_viewed INTEGER NOT NULL DEFAULT 0,
+        builder_sessions INTEGER NOT NULL DEFAULT 0,
+        ai_interactions INTEGER NOT NULL DEFAULT 0,
+        last_activity DOUBLE PRECISION,
+        preferences TEXT,
+        updated_at DOUBLE PRECISION NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_brain_templates (
+        email VARCHAR(255) NOT NULL,
+        template_id VARCHAR(255) NOT NULL,
+        viewed_at DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (email, template_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_user_brain_templates_viewed ON user_brain_templates(email, viewed_at)",
+]
+
+# --- 14: Stripe webhook inbox (dedup by event id, ordered async handling) ---
+
+_STRIPE_INBOX_SQLITE = [
+    """
+    CREATE TABLE IF NOT EXISTS stripe_webhook_inbox (
+        event_id TEXT PRIMARY KEY,
+        event_type TEXT NOT NULL,
+        ordering_key TEXT NOT NULL,
+        source TEXT NOT NULL,
+        payload TEXT,
+        status TEXT NOT NULL DEFAULT 'pending',
+        settled INTEGER NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL,
+        last_error TEXT,
+        stripe_created REAL NOT NULL,
+        received_at REAL NOT NULL,
+        processed_at REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_stripe_inbox_due ON stripe_webhook_inbox(status, next_attempt_at)",
+    "CREATE INDEX IF NOT EXISTS idx_stripe_inbox_order ON stripe_webhook_inbox(ordering_key, settled, received_at)",
+]
+
+_STRIPE_INBOX_POSTGRESQL = [
+    """
+    CREATE TABLE IF NOT EXISTS stripe_webhook_inbox (
+        event_id VARCHAR(255) PRIMARY KEY,
+        event_type VARCHAR(128) NOT NULL,
+        ordering_key VARCHAR(255) NOT NULL,
+        source VARCHAR(32) NOT NULL,
+        payload TEXT,
+        status VARCHAR(32) NOT NULL DEFAULT 'pending',
+        settled INTEGER NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at DOUBLE PRECISION NOT NULL,
+        last_error TEXT,
+        stripe_created DOUBLE PRECISION NOT NULL,
+        received_at DOUBLE PRECISION NOT NULL,
+        processed_at DOUBLE PRECISION
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_stripe_inbox_due ON stripe_webhook_inbox(status, next_attempt_at)",
+    "CREATE INDEX IF NOT EXISTS idx_stripe_inbox_order ON stripe_webhook_inbox(ordering_key, settled, received_at)",
+]
+
+# --- 15: Stripe inbox heads ordered by (received_at, event_id) ---
+
+_STRIPE_INBOX_HEAD_INDEX = [
+    "CREATE INDEX IF NOT EXISTS idx_stripe_inbox_head ON stripe_webhook_inbox(ordering_key, settled, received_at, event_id)",
+    "DROP INDEX IF EXISTS idx_stripe_inbox_order",
+]
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        version=1,
+        name="create_workflow_approval_brain_builder_telemetry_tables",
+        sqlite=_CORE_TABLES_SQLITE,
+        postgresql=_CORE_TABLES_POSTGRESQL,
+    ),
+    Migration(
+        version=2,
+        name="add_hot_path_indexes",
+        sqlite=_HOT_PATH_INDEXES,
+        postgresql=_HOT_PATH_INDEXES,
+    ),
+    Migration(
+        version=3,
+        name="create_workflow_run_state",
+        sqlite=_RUN_STATE_SQLITE,
+        postgresql=_RUN_STATE_POSTGRESQL,
+    ),
+    Migration(
+        version=4,
+        name="create_usage_daily_rollups",
+        sqlite=_USAGE_ROLLUPS_SQLITE,
+        postgresql=_USAGE_ROLLUPS_POSTGRESQL,
+    ),
+    Migration(
+        version=5,
+        name="create_tenant_usage_counters",
+        sqlite=_TENANT_USAGE_SQLITE,
+        postgresql=_TENANT_USAGE_POSTGRESQL,
+    ),
+    Migration(
+        version=6,
+        name="create_tenant_states_and_audit_log",
+        sqlite=_TENANT_LIFECYCLE_SQLITE,
+        postgresql=_TENANT_LIFECYCLE_POSTGRESQL,
+    ),
+    Migration(
+        version=7,
+        name="create_growth_loop_tables",
+        sqlite=_GROWTH_SQLITE,
+        postgresql=_GROWTH_POSTGRESQL,
+    ),
+    Migration(
+        version=8,
+        name="create_recovery_queue",
+        sqlite=_RECOVERY_SQLITE,
+        postgresql=_RECOVERY_POSTGRESQL,
+    ),
+    Migration(
+        version=9,
+        name="index_approval_queue_by_tenant",
+        sqlite=_APPROVAL_INDEX_SQLITE,
+        postgresql=_APPROVAL_INDEX_POSTGRESQL,
+    ),
+    Migration(
+        version=10,
+        name="create_record_store",
+        sqlite=_RECORD_STORE_SQLITE,
+        postgresql=_RECORD_STORE_POSTGRESQL,
+    ),
+    Migration(
+        version=11,
+        name="create_lifecycle_cohorts",
+        sqlite=_LIFECYCLE_COHORTS_SQLITE,
+        postgresql=_LIFECYCLE_COHORTS_POSTGRESQL,
+    ),
+    Migration(
+        version=12,
+        name="create_report_jobs",
+        sqlite=_REPORT_JOBS_SQLITE,
+        postgresql=_REPORT_JOBS_POSTGRESQL,
+    ),
+    Migration(
+        version=13,
+        name="create_wow_brain_event_log",
+        sqlite=_WOW_BRAIN_SQLITE,
+        postgresql=_WOW_BRAIN_POSTGRESQL,
+    ),
+    Migration(
+        version=14,
+        name="create_stripe_webhook_inbox",
+        sqlite=_STRIPE_INBOX_SQLITE,
+        postgresql=_STRIPE_INBOX_POSTGRESQL,
+    ),
+    Migration(
+        version=15,
+        name="index_stripe_inbox_heads",
+        sqlite=_STRIPE_INBOX_HEAD_INDEX,
+        postgresql=_STRIPE_INBOX_HEAD_INDEX,
+    ),
+]
@@ -0,0 +1,291 @@
+"""
+Sampling Request Profiler for Levqor Backend
+Opt-in per-request span timing: DB queries, outbound HTTP (Stripe, OpenAI,
+other hosts) and template/JSON rendering.
+
+Disabled unless PROFILER_ENABLED=1. When enabled, a PROFILER_SAMPLE_RATE
+fraction of requests is profiled; unsampled requests only pay for one
+context-variable lookup per span.
+
+Aggregates are kept per process:
+    - collapsed stacks ("GET /route;db.query;..." -> self time in µs),
+      directly consumable by flamegraph tooling
+    - per-route request counts and total time
+    - top-N slowest spans per route
+"""
+import os
+import time
+import heapq
+import random
+import logging
+import threading
+import contextvars
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlparse
+
+log = logging.getLogger("levqor.profiling")
+
+PROFILER_ENABLED = os.environ.get("PROFILER_ENABLED", "0") == "1"
+PROFILER_SAMPLE_RATE = float(os.environ.get("PROFILER_SAMPLE_RATE", "0.05"))
+PROFILER_TOP_N = int(os.environ.get("PROFILER_TOP_N", "10"))
+
+_HOST_LABELS = {
+    "api.stripe.com": "stripe",
+    "files.stripe.com": "stripe",
+    "api.openai.com": "openai",
+}
+
+_current: contextvars.ContextVar = contextvars.ContextVar("levqor_profile", default=None)
+
+_agg_lock = threading.Lock()
+_collapsed: Dict[str, float] = {}
+_routes: Dict[str, Dict[str, Any]] = {}
+_slow_spans: Dict[str, List] = {}
+
+_http_instrumented = False
+
+
+class _Frame:
+    __slots__ = ("name", "start", "child_time")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.child_time = 0.0
+
+
+class RequestProfile:
+    """Span stack for one sampled request."""
+
+    def __init__(self, route: str):
+        self.route = route
+        self.stack: List[_Frame] = [_Frame(route)]
+        self.self_times: Dict[str, float] = {}
+        self.spans: List[tuple] = []
+
+    def push(self, name: str):
+        self.stack.append(_Frame(name))
+
+    def pop(self):
+        if len(self.stack) <= 1:
+            return
+        path = ";".join(f.name for f in self.stack)
+        frame = self.stack.pop()
+        elapsed = time.perf_counter() - frame.start
+        self.stack[-1].child_time += elapsed
+        self.self_times[path] = self.self_times.get(path, 0.0) + (elapsed - frame.child_time)
+        self.spans.append((elapsed, frame.name))
+
+    def finish(self) -> float:
+        while len(self.stack) > 1:
+            self.pop()
+        root = self.stack[0]
+        elapsed = time.perf_counter() - root.start
+        self.self_times[root.name] = self.self_times.get(root.name, 0.0) + (elapsed - root.child_time)
+        return elapsed
+
+
+class span:
+    """
+    Time a block as a named span of the current sampled request.
+
+    Usage:
+        with span("db.query"):
+            cursor.execute(...)
+    """
+    __slots__ = ("name", "profile")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.profile = None
+
+    def __enter__(self):
+        profile = _current.get()
+        if profile is not None:
+            self.profile = profile
+            profile.push(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profile is not None:
+            self.profile.pop()
+        return False
+
+
+def start_request(route: str, sample_rate: Optional[float] = None) -> Optional[RequestProfile]:
+    """Begin profiling the current request if it is sampled."""
+    rate = PROFILER_SAMPLE_RATE if sample_rate is None else sample_rate
+    if random.random() >= rate:
+        _current.set(None)
+        return None
+    profile = RequestProfile(route)
+    _current.set(profile)
+    return profile
+
+
+def finish_request(route: Optional[str] = None):
+    """Close the current request profile and merge it into the aggregates."""
+    profile = _current.get()
+    if profile is None:
+        return
+    _current.set(None)
+    total = profile.finish()
+
+    if route and route != profile.route:
+        # Route became known after matching; re-key the root frame
+        old = profile.route
+        profile.self_times = {
+            (route + path[len(old):] if path.startswith(old) else path): t
+            for path, t in profile.self_times.items()
+        }
+        profile.route = route
+
+    _record(profile, total)
+
+
+def _record(profile: RequestProfile, total: float):
+    route = profile.route
+    with _agg_lock:
+        for path, seconds in profile.self_times.items():
+            _collapsed[path] = _collapsed.get(path, 0.0) + seconds * 1_000_000
+
+        stats = _routes.setdefault(route, {"samples": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stats["samples"] += 1
+        stats["total_ms"] += total * 1000
+        stats["max_ms"] = max(stats["max_ms"], total * 1000)
+
+        heap = _slow_spans.setdefault(route, [])
+        for elapsed, name in profile.spans:
+            item = (elapsed * 1000, name, time.time())
+            if len(heap) < PROFILER_TOP_N:
+                heapq.heappush(heap, item)
+            elif item[0] > heap[0][0]:
+                heapq.heapreplace(heap, item)
+
+
+def get_profile_report(top_n: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Return aggregated profile data.
+
+    collapsed: list of "frame;frame;frame value" lines (value in µs of self
+    time), sorted by value, ready for flamegraph.pl / speedscope.
+    """
+    limit = top_n or PROFILER_TOP_N
+    with _agg_lock:
+        collapsed = sorted(_collapsed.items(), key=lambda kv: kv[1], reverse=True)
+        routes = {}
+        for route, stats in _routes.items():
+            slow = sorted(_slow_spans.get(route, []), reverse=True)[:limit]
+            routes[route] = {
+                "samples": stats["samples"],
+                "avg_ms": round(stats["total_ms"] / stats["samples"], 2) if stats["samples"] else 0,
+                "max_ms": round(stats["max_ms"], 2),
+                "top_spans": [
+                    {"span": name, "duration_ms": round(ms, 2), "at": ts}
+                    for ms, name, ts in slow
+                ]
+            }
+
+    return {
+        "enabled": PROFILER_ENABLED,
+        "sample_rate": PROFILER_SAMPLE_RATE,
+        "collapsed": [f"{path} {int(us)}" for path, us in collapsed],
+        "routes": routes
+    }
+
+
+def reset_profile():
+    """Clear all aggregated profile data."""
+    with _agg_lock:
+        _collapsed.clear()
+        _routes.clear()
+        _slow_spans.clear()
+
+
+def _http_span_name(url: str) -> str:
+    host = urlparse(str(url)).hostname or "unknown"
+    return _HOST_LABELS.get(host, f"http:{host}")
+
+
+def instrument_http_clients():
+    """Wrap requests (used by stripe) and httpx (used by openai) in spans."""
+    global _http_instrumented
+    if _http_instrumented:
+        return
+    _http_instrumented = True
+
+    try:
+        import requests
+
+        original_request = requests.Session.request
+
+        def profiled_request(self, method, url, *args, **kwargs):
+            if _current.get() is None:
+                return original_request(self, method, url, *args, **kwargs)
+            with span(_http_span_name(url)):
+                return original_request(self, method, url, *args, **kwargs)
+
+        requests.Session.request = profiled_request
+    except ImportError:
+        pass
+
+    try:
+        import httpx
+
+        original_send = httpx.Client.send
+
+        def profiled_send(self, request, *args, **kwargs):
+            if _current.get() is None:
+                return original_send(self, request, *args, **kwargs)
+            with span(_http_span_name(request.url)):
+                return original_send(self, request, *args, **kwargs)
+
+        httpx.Client.send = profiled_send
+    except ImportError:
+        pass
+
+
+def init_profiler(app):
+    """
+    Hook the sampling profiler into a Flask app.
+    Called from run.py right after app creation; no-op unless enabled.
+    """
+    if not PROFILER_ENABLED:
+        return
+
+    from flask import request, before_render_template, template_rendered
+    from flask.json.provider import DefaultJSONProvider
+
+    instrument_http_clients()
+
+    @app.before_request
+    def _profiler_start():
+        start_request(f"{request.method} {request.path}")
+
+    @app.teardown_request
+    def _profiler_finish(exc=None):
+        rule = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        finish_request(f"{request.method} {rule}")
+
+    def _template_start(sender, template, context, **extra):
+        profile = _current.get()
+        if profile is not None:
+            profile.push(f"render.template:{template.name}")
+
+    def _template_end(sender, template, context, **extra):
+        profile = _current.get()
+        if profile is not None:
+            profile.pop()
+
+    before_render_template.connect(_template_start, app, weak=False)
+    template_rendered.connect(_template_end, app, weak=False)
+
+    if type(app.json) is DefaultJSONProvider:
+        class _ProfiledJSONProvider(DefaultJSONProvider):
+            def response(self, *args, **kwargs):
+                with span("render.json"):
+                    return super().response(*args, **kwargs)
+
+        app.json = _ProfiledJSONProvider(app)
+
+    log.info(f"Request profiler enabled (sample_rate={PROFILER_SAMPLE_RATE})")
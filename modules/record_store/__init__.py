@@ -0,0 +1,293 @@
+"""
+Record Store
+Append-only storage for small side databases (consultation bookings,
+privacy requests, lifecycle events, community submissions) that used to be
+JSON files rewritten in full on every append.
+
+Each collection is a set of rows in store_records. Appends are a single
+INSERT, so their cost does not grow with history and concurrent workers
+cannot overwrite each other. email, user_id, type and status are copied
+out of the record into indexed columns for lookups; the record itself is
+kept as JSON and returned unchanged.
+
+Compaction (retention) deletes the oldest rows of a collection beyond
+max_records in one transaction, so a crash leaves either the old or the
+compacted collection. Stores with a legacy_path import that JSON/JSONL file
+once, on first use; store_imports records the import so every worker skips
+it afterwards.
+
+Usage:
+    from modules.record_store import RecordStore
+    bookings = RecordStore("consultations", legacy_path="workspace-data/consultations.json",
+                           id_field="booking_id")
+    bookings.append({"booking_id": "c-1", "email": "a@example.com"})
+    bookings.find(email="a@example.com")
+"""
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Iterator
+
+from modules.db_wrapper import execute_query, execute, execute_many, commit, rollback
+from modules.migrations import ensure_migrated
+
+log = logging.getLogger("levqor.record_store")
+
+RECORD_STORE_COMPACT_EVERY = int(os.environ.get("RECORD_STORE_COMPACT_EVERY", "100"))
+
+INDEXED_FIELDS = ("email", "user_id", "type", "status")
+
+_INSERT_SQL = f"""
+    INSERT INTO store_records (collection, record_id, {", ".join(INDEXED_FIELDS)}, data, created_at)
+    VALUES (?, ?, {", ".join("?" for _ in INDEXED_FIELDS)}, ?, ?)
+"""
+
+
+class RecordStore:
+    """
+    One named collection of JSON records.
+
+    Args:
+        collection: Collection name (store_records.collection)
+        legacy_path: JSON array or JSONL file to import once on first use
+        id_field: Record key holding a unique id (enables get())
+        field_map: Indexed column -> record key, for records that name
+            them differently (e.g. {"type": "category"})
+        max_records: Keep only the newest max_records (compacted every
+            RECORD_STORE_COMPACT_EVERY appends per process)
+    """
+
+    def __init__(
+        self,
+        collection: str,
+        legacy_path: Optional[str] = None,
+        id_field: Optional[str] = None,
+        field_map: Optional[Dict[str, str]] = None,
+        max_records: Optional[int] = None
+    ):
+        self.collection = collection
+        self.legacy_path = Path(legacy_path) if legacy_path else None
+        self.id_field = id_field
+        self.field_map = {f: (field_map or {}).get(f, f) for f in INDEXED_FIELDS}
+        self.max_records = max_records
+        self._ready = False
+        self._ready_lock = threading.Lock()
+        self._appends = 0
+
+    def _ensure_ready(self):
+        if self._ready:
+            return
+        with self._ready_lock:
+            if self._ready:
+                return
+            ensure_migrated()
+            if self.legacy_path is not None:
+                self.import_legacy()
+            self._ready = True
+
+    def _row(self, record: Dict[str, Any], created_at: float) -> tuple:
+        record_id = record.get(self.id_field) if self.id_field else None
+        keys = tuple(
+            None if record.get(key) is None else str(record.get(key))
+            for key in self.field_map.values()
+        )
+        return (
+            (self.collection, None if record_id is None else str(record_id))
+            + keys
+            + (json.dumps(record), created_at)
+        )
+
+    def append(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Append one record. Raises if id_field duplicates an existing record."""
+        self._ensure_ready()
+        execute_query(_INSERT_SQL, self._row(record, time.time()), fetch=None, commit=True)
+        self._after_append(1)
+        return record
+
+    def append_many(self, records: List[Dict[str, Any]]) -> int:
+        """Append several records in one transaction."""
+        if not records:
+            return 0
+        self._ensure_ready()
+        now = time.time()
+        written = execute_many(_INSERT_SQL, [self._row(r, now) for r in records], commit=True)
+        self._after_append(len(records))
+        return written
+
+    def _after_append(self, count: int):
+        if not self.max_records:
+            return
+        self._appends += count
+        if self._appends >= RECORD_STORE_COMPACT_EVERY:
+            self._appends = 0
+            try:
+                self.compact()
+            except Exception as e:
+                log.warning(f"Record store compaction failed for {self.collection}: {e}")
+
+    def get(self, record_id: str) -> Optional[Dict[str, Any]]:
+        self._ensure_ready()
+        row = execute_query(
+            "SELECT data FROM store_records WHERE collection = ? AND record_id = ?",
+            (self.collection, str(record_id)),
+            fetch="one"
+        )
+        return json.loads(row["data"]) if row else None
+
+    def _where(self, filters: Dict[str, Any]):
+        unknown = set(filters) - set(INDEXED_FIELDS)
+        if unknown:
+            raise ValueError(f"Not an indexed field: {', '.join(sorted(unknown))}")
+        clause = "collection = ?"
+        params: List[Any] = [self.collection]
+        for field_name, value in filters.items():
+            if value is not None:
+                clause += f" AND {field_name} = ?"
+                params.append(str(value))
+        return clause, params
+
+    def find(self, limit: int = 100, **filters) -> List[Dict[str, Any]]:
+        """Newest records first, filtered by indexed fields (email=, user_id=, type=, status=)."""
+        self._ensure_ready()
+        clause, params = self._where(filters)
+        rows = execute_query(
+            f"SELECT data FROM store_records WHERE {clause} ORDER BY seq DESC LIMIT ?",
+            tuple(params + [limit])
+        ) or []
+        return [json.loads(row["data"]) for row in rows]
+
+    def count(self, **filters) -> int:
+        self._ensure_ready()
+        clause, params = self._where(filters)
+        row = execute_query(f"SELECT COUNT(*) AS n FROM store_records WHERE {clause}", tuple(params), fetch="one")
+        return int((row or {}).get("n") or 0)
+
+    def count_by(self, field_name: str) -> Dict[str, int]:
+        """Record counts grouped by an indexed field (None is reported as "unknown")."""
+        if field_name not in INDEXED_FIELDS:
+            raise ValueError(f"Not an indexed field: {field_name}")
+        self._ensure_ready()
+        rows = execute_query(
+            f"SELECT {field_name} AS k, COUNT(*) AS n FROM store_records WHERE collection = ? GROUP BY {field_name}",
+            (self.collection,)
+        ) or []
+        return {(row["k"] if row["k"] is not None else "unknown"): int(row["n"]) for row in rows}
+
+    def iter_records(self, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """All records, oldest first, read in batches."""
+        self._ensure_ready()
+        last_seq = 0
+        while True:
+            rows = execute_query(
+                "SELECT seq, data FROM store_records WHERE collection = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (self.collection, last_seq, batch_size)
+            ) or []
+            for row in rows:
+                yield json.loads(row["data"])
+            if len(rows) < batch_size:
+                return
+            last_seq = rows[-1]["seq"]
+
+    def compact(self, keep_last: Optional[int] = None) -> int:
+        """Delete all but the newest keep_last (default max_records) records. Returns rows deleted."""
+        keep_last = self.max_records if keep_last is None else keep_last
+        if keep_last is None:
+            return 0
+        self._ensure_ready()
+
+        boundary = execute_query(
+            "SELECT seq FROM store_records WHERE collection = ? ORDER BY seq DESC LIMIT 1 OFFSET ?",
+            (self.collection, keep_last),
+            fetch="one"
+        )
+        if not boundary:
+            return 0
+
+        deleted = execute(
+            "DELETE FROM store_records WHERE collection = ? AND seq <= ?",
+            (self.collection, boundary["seq"])
+        ).rowcount
+        commit()
+        if deleted:
+            log.info(f"Compacted {self.collection}: {deleted} records removed, {keep_last} kept")
+        return deleted
+
+    def import_legacy(self) -> int:
+        """
+        Import legacy_path once (JSON array, or JSONL for .jsonl files).
+        The import marker and the records commit together, so a crash
+        mid-import is retried in full and concurrent workers import once.
+        """
+        ensure_migrated()
+        path = self.legacy_path
+        if path is None or not path.exists():
+            return 0
+
+        try:
+            with path.open("r") as f:
+                if path.suffix == ".jsonl":
+                    records = [json.loads(line) for line in f if line.strip()]
+                else:
+                    records = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            log.error(f"Cannot import {path} into {self.collection}: {e}")
+            return 0
+        skipped = len(records)
+        records = [r for r in records if isinstance(r, dict)]
+        skipped -= len(records)
+        if skipped:
+            log.warning(f"Skipping {skipped} non-object entries in {path}")
+        duplicates = self._log_duplicate_ids(records, path)
+
+        try:
+            claimed = execute(
+                "INSERT INTO store_imports (collection, source, records, imported_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (collection, source) DO NOTHING",
+                (self.collection, str(path), len(records), time.time())
+            ).rowcount == 1
+            if not claimed:
+                rollback()
+                return 0
+
+            mtime = path.stat().st_mtime
+            execute_many(
+                _INSERT_SQL.rstrip() + " ON CONFLICT (collection, record_id) DO NOTHING",
+                [self._row(r, mtime) for r in records]
+            )
+            commit()
+        except Exception:
+            rollback()
+            raise
+
+        imported = len(records) - duplicates
+        log.info(f"Imported {imported} records from {path} into {self.collection}")
+        return imported
+
+    def _log_duplicate_ids(self, records: List[Dict[str, Any]], path: Path) -> int:
+        # Rows repeating an id_field value are dropped by the import's ON CONFLICT
+        if not self.id_field:
+            return 0
+        seen = set()
+        duplicates = []
+        for record in records:
+            record_id = record.get(self.id_field)
+            if record_id is None:
+                continue
+            if str(record_id) in seen:
+                duplicates.append(str(record_id))
+            seen.add(str(record_id))
+        if duplicates:
+            log.warning(
+                f"Skipping {len(duplicates)} records in {path} with duplicate {self.id_field}: "
+                f"{', '.join(duplicates[:20])}"
+            )
+        return len(duplicates)
+
+
+__all__ = [
+    "RecordStore",
+    "INDEXED_FIELDS",
+]
@@ -1,16 +1,41 @@
 """
 Recovery Engine Module - V10 Completion
 Retry/Auto-Recovery with backoff, escalation, and healing.
+
+Failures are stored in recovery_events as a delay queue: calculate_backoff
+sets next_attempt_at instead of sleeping, and due events are claimed in
+batches (conditional UPDATE, so each attempt runs on exactly one worker)
+and retried on a bounded thread pool. While an attempt runs,
+next_attempt_at holds its lease, which a keeper thread renews every
+RECOVERY_LEASE_SECONDS / 3 for as long as the attempt runs; an attempt
+whose worker died is claimed again once the lease expires.
+
+Consumers:
+    RecoveryWorker          - background poller (RECOVERY_WORKER_ENABLED)
+    process_recovery_queue  - drains due events once (API, scheduler job)
+    heal_stalled_workflows  - enqueues runs stuck in 'running', then drains
 """
+import os
 import time
+import uuid
 import logging
 import json
-from typing import Dict, Any, Optional, List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Callable, Tuple
 from dataclasses import dataclass, field, asdict
 from enum import Enum
 
+from modules.db_wrapper import execute_query, execute, commit
+from modules.migrations import ensure_migrated
+
 log = logging.getLogger("levqor.recovery")
 
+RECOVERY_WORKERS = int(os.environ.get("RECOVERY_WORKERS", "4"))
+RECOVERY_POLL_SECONDS = float(os.environ.get("RECOVERY_POLL_SECONDS", "1"))
+RECOVERY_LEASE_SECONDS = float(os.environ.get("RECOVERY_LEASE_SECONDS", "300"))
+RECOVERY_CLAIM_BATCH = int(os.environ.get("RECOVERY_CLAIM_BATCH", "20"))
+
 
 class RetryStatus(str, Enum):
     PENDING = "pending"
@@ -42,6 +67,8 @@ class RecoveryEvent:
     created_at: float = field(default_factory=time.time)
     resolved_at: Optional[float] = None
     escalated: bool = False
+    next_attempt_at: Optional[float] = None
+    last_error: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -50,8 +77,14 @@ class RecoveryEvent:
         }
 
 
-_recovery_queue: List[RecoveryEvent] = []
-_recovery_history: List[RecoveryEvent] = []
+_ACTIVE_STATUSES = (RetryStatus.PENDING.value, RetryStatus.RETRYING.value)
+
+_retry_handler: Optional[Callable[[RecoveryEvent], Tuple[bool, Optional[str]]]] = None
+
+# Leases of attempts running in this process: event id -> lease expiry
+_leases: Dict[str, float] = {}
+_leases_lock = threading.Lock()
+_lease_keeper: Optional[threading.Thread] = None
 
 
 def calculate_backoff(attempt: int, config: RetryConfig) -> float:
@@ -59,14 +92,76 @@ def calculate_backoff(attempt: int, config: RetryConfig) -> float:
     return min(delay, config.max_delay_seconds)
 
 
+def _bump(name: str, amount: int = 1):
+    execute_query(
+        "INSERT INTO recovery_counters (name, value) VALUES (?, ?) "
+        "ON CONFLICT (name) DO UPDATE SET value = recovery_counters.value + excluded.value",
+        (name, amount),
+        fetch=None
+    )
+
+
+def _event_from_row(row: Dict[str, Any]) -> RecoveryEvent:
+    return RecoveryEvent(
+        id=row["id"],
+        workflow_id=row["workflow_id"],
+        run_id=row["run_id"],
+        step_id=row["step_id"],
+        error_type=row["error_type"],
+        error_message=row["error_message"],
+        attempt=int(row["attempt"]),
+        status=RetryStatus(row["status"]),
+        created_at=row["created_at"],
+        resolved_at=row["resolved_at"],
+        escalated=bool(row["escalated"]),
+        next_attempt_at=row["next_attempt_at"],
+        last_error=row["last_error"]
+    )
+
+
+def _config_from_row(row: Dict[str, Any]) -> RetryConfig:
+    try:
+        return RetryConfig(**json.loads(row["config"] or "{}"))
+    except (TypeError, ValueError):
+        return RetryConfig()
+
+
+def register_retry_handler(handler: Callable[[RecoveryEvent], Tuple[bool, Optional[str]]]):
+    """Replace the retry action; handler(event) returns (succeeded, error)."""
+    global _retry_handler
+    _retry_handler = handler
+
+
+def _rerun_workflow(event: RecoveryEvent) -> Tuple[bool, Optional[str]]:
+    """Default retry action: run the workflow again with the failed run's context."""
+    from modules.workflows.runner import run_workflow
+    
+    context = {}
+    if event.run_id:
+        row = execute_query("SELECT context FROM workflow_runs WHERE id = ?", (event.run_id,), fetch="one")
+        if row and row["context"]:
+            try:
+                context = json.loads(row["context"])
+            except ValueError:
+                context = {}
+    
+    result = run_workflow(event.workflow_id, context)
+    if result.status in ("completed", "pending_approval"):
+        return True, None
+    return False, result.error or f"Run ended with status {result.status}"
+
+
 def record_failure(
     workflow_id: str,
     run_id: str,
     step_id: str,
     error_type: str,
-    error_message: str
+    error_message: str,
+    config: RetryConfig = None
 ) -> str:
-    import uuid
+    ensure_migrated()
+    if config is None:
+        config = RetryConfig()
     
     event = RecoveryEvent(
         id=str(uuid.uuid4()),
@@ -74,67 +169,199 @@ def record_failure(
         run_id=run_id,
         step_id=step_id,
         error_type=error_type,
-        error_message=error_message[:500]
+        error_message=(error_message or "")[:500]
     )
+    event.next_attempt_at = event.created_at + calculate_backoff(event.attempt, config)
+    
+    execute_query(
+        """INSERT INTO recovery_events
+           (id, workflow_id, run_id, step_id, error_type, error_message, attempt, status,
+            next_attempt_at, config, created_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (event.id, workflow_id, run_id, step_id, error_type, event.error_message, event.attempt,
+         event.status.value, event.next_attempt_at, json.dumps(asdict(config)), event.created_at),
+        fetch=None
+    )
+    _bump("pending")
+    commit()
     
-    _recovery_queue.append(event)
     log.info(f"Recorded failure for recovery: {event.id} (workflow={workflow_id}, step={step_id})")
     
     return event.id
 
 
-def attempt_retry(event_id: str, config: RetryConfig = None) -> Dict[str, Any]:
-    if config is None:
-        config = RetryConfig()
-    
-    event = None
-    for e in _recovery_queue:
-        if e.id == event_id:
-            event = e
+def _renew_leases():
+    """Extend the lease of every attempt still running here; drop leases another worker took."""
+    with _leases_lock:
+        held = dict(_leases)
+    for event_id, lease in held.items():
+        renewed = time.time() + RECOVERY_LEASE_SECONDS
+        cursor = execute(
+            "UPDATE recovery_events SET next_attempt_at = ? WHERE id = ? AND status = ? AND next_attempt_at = ?",
+            (renewed, event_id, RetryStatus.RETRYING.value, lease)
+        )
+        won = cursor.rowcount == 1
+        commit()
+        with _leases_lock:
+            if event_id not in _leases:
+                continue
+            if won:
+                _leases[event_id] = renewed
+            else:
+                log.warning(f"Lost the lease on recovery event {event_id}")
+                del _leases[event_id]
+
+
+def _keep_leases():
+    while True:
+        time.sleep(RECOVERY_LEASE_SECONDS / 3)
+        try:
+            _renew_leases()
+        except Exception as e:
+            log.error(f"Recovery lease renewal failed: {e}")
+
+
+def _hold_lease(event: RecoveryEvent):
+    global _lease_keeper
+    with _leases_lock:
+        _leases[event.id] = event.next_attempt_at
+        if _lease_keeper is None:
+            _lease_keeper = threading.Thread(target=_keep_leases, name="recovery-leases", daemon=True)
+            _lease_keeper.start()
+
+
+def _release_lease(event: RecoveryEvent):
+    with _leases_lock:
+        _leases.pop(event.id, None)
+
+
+def _claim(row: Dict[str, Any], now: float) -> Optional[RecoveryEvent]:
+    """Take one event for this worker; None if another worker won it."""
+    cursor = execute(
+        """UPDATE recovery_events SET status = ?, next_attempt_at = ?
+           WHERE id = ? AND status = ? AND next_attempt_at = ?""",
+        (RetryStatus.RETRYING.value, now + RECOVERY_LEASE_SECONDS, row["id"], row["status"], row["next_attempt_at"])
+    )
+    won = cursor.rowcount == 1
+    commit()
+    if not won:
+        return None
+    return _event_from_row({**row, "status": RetryStatus.RETRYING.value, "next_attempt_at": now + RECOVERY_LEASE_SECONDS})
+
+
+def claim_due_events(limit: int = RECOVERY_CLAIM_BATCH) -> List[Tuple[RecoveryEvent, RetryConfig]]:
+    """Claim up to limit due events (and attempts whose lease expired)."""
+    ensure_migrated()
+    now = time.time()
+    claimed = []
+    for status in _ACTIVE_STATUSES:
+        if len(claimed) >= limit:
             break
+        rows = execute_query(
+            """SELECT * FROM recovery_events
+               WHERE status = ? AND next_attempt_at <= ?
+               ORDER BY next_attempt_at LIMIT ?""",
+            (status, now, limit - len(claimed))
+        ) or []
+        for row in rows:
+            event = _claim(row, now)
+            if event is not None:
+                claimed.append((event, _config_from_row(row)))
+    return claimed
+
+
+def _finish(event: RecoveryEvent, status: RetryStatus, error: Optional[str] = None):
+    event.status = status
+    event.resolved_at = time.time()
+    execute_query(
+        """UPDATE recovery_events SET status = ?, attempt = ?, resolved_at = ?, escalated = ?, last_error = ?
+           WHERE id = ?""",
+        (status.value, event.attempt, event.resolved_at, event.escalated, error, event.id),
+        fetch=None
+    )
+    _bump("pending", -1)
+    _bump(status.value)
+    if event.escalated:
+        _bump("escalated")
+    commit()
+
+
+def _escalate(event: RecoveryEvent, error: Optional[str]) -> Dict[str, Any]:
+    event.escalated = True
+    log.warning(f"Max retries exceeded for {event.id}, escalating")
+    _finish(event, RetryStatus.FAILED, error)
+    escalate_to_admin(event)
+    return {
+        "success": False,
+        "error": "Max retries exceeded",
+        "escalated": True,
+        "event_id": event.id
+    }
+
+
+def _run_attempt(event: RecoveryEvent, config: RetryConfig) -> Dict[str, Any]:
+    """Run one claimed attempt and record its outcome (never sleeps)."""
+    if event.attempt >= config.max_attempts:
+        return _escalate(event, event.last_error)
     
-    if not event:
-        return {"success": False, "error": "Event not found"}
+    event.attempt += 1
+    log.info(f"Retrying {event.id} (attempt {event.attempt}/{config.max_attempts})")
     
-    if event.attempt >= config.max_attempts:
-        event.status = RetryStatus.FAILED
-        event.escalated = True
-        log.warning(f"Max retries exceeded for {event_id}, escalating")
-        
-        escalate_to_admin(event)
-        
-        _recovery_queue.remove(event)
-        _recovery_history.append(event)
-        
-        return {
-            "success": False,
-            "error": "Max retries exceeded",
-            "escalated": True,
-            "event_id": event_id
-        }
+    _hold_lease(event)
+    try:
+        succeeded, error = (_retry_handler or _rerun_workflow)(event)
+    except Exception as e:
+        succeeded, error = False, str(e)
+    finally:
+        _release_lease(event)
     
-    delay = calculate_backoff(event.attempt, config)
-    log.info(f"Retrying {event_id} (attempt {event.attempt + 1}/{config.max_attempts}) after {delay}s delay")
+    if succeeded:
+        _finish(event, RetryStatus.SUCCEEDED)
+        log.info(f"Retry succeeded for {event.id}")
+        return {"success": True, "event_id": event.id, "attempts": event.attempt}
     
-    event.status = RetryStatus.RETRYING
-    event.attempt += 1
+    if event.attempt >= config.max_attempts:
+        return _escalate(event, error)
     
-    time.sleep(min(delay, 5))
+    event.status = RetryStatus.PENDING
+    event.next_attempt_at = time.time() + calculate_backoff(event.attempt, config)
+    execute_query(
+        "UPDATE recovery_events SET status = ?, attempt = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+        (event.status.value, event.attempt, event.next_attempt_at, (error or "")[:500], event.id),
+        fetch=None,
+        commit=True
+    )
     
-    import random
-    success = random.random() > 0.3
+    return {
+        "success": False,
+        "event_id": event.id,
+        "attempts": event.attempt,
+        "will_retry": True,
+        "next_attempt_at": event.next_attempt_at
+    }
+
+
+def attempt_retry(event_id: str, config: RetryConfig = None) -> Dict[str, Any]:
+    """Retry one event now, ahead of its schedule; config replaces the stored one."""
+    ensure_migrated()
+    row = execute_query("SELECT * FROM recovery_events WHERE id = ?", (event_id,), fetch="one")
+    if not row or row["status"] not in _ACTIVE_STATUSES:
+        return {"success": False, "error": "Event not found"}
     
-    if success:
-        event.status = RetryStatus.SUCCEEDED
-        event.resolved_at = time.time()
-        
-        _recovery_queue.remove(event)
-        _recovery_history.append(event)
-        
-        log.info(f"Retry succeeded for {event_id}")
-        return {"success": True, "event_id": event_id, "attempts": event.attempt}
+    if config is not None:
+        execute_query(
+            "UPDATE recovery_events SET config = ? WHERE id = ?",
+            (json.dumps(asdict(config)), event_id),
+            fetch=None
+        )
+    else:
+        config = _config_from_row(row)
     
-    return {"success": False, "event_id": event_id, "attempts": event.attempt, "will_retry": event.attempt < config.max_attempts}
+    event = _claim(row, time.time())
+    if event is None:
+        return {"success": False, "error": "Retry already in progress", "event_id": event_id}
+    
+    return _run_attempt(event, config)
 
 
 def escalate_to_admin(event: RecoveryEvent):
@@ -147,61 +374,168 @@ def escalate_to_admin(event: RecoveryEvent):
         log.warning(f"Failed to send escalation alert: {e}")
 
 
-def get_pending_recoveries() -> List[Dict[str, Any]]:
-    return [e.to_dict() for e in _recovery_queue]
+def get_pending_recoveries(limit: int = 100) -> List[Dict[str, Any]]:
+    ensure_migrated()
+    events = []
+    for status in _ACTIVE_STATUSES:
+        rows = execute_query(
+            "SELECT * FROM recovery_events WHERE status = ? ORDER BY next_attempt_at LIMIT ?",
+            (status, limit - len(events))
+        ) or []
+        events += [_event_from_row(row).to_dict() for row in rows]
+        if len(events) >= limit:
+            break
+    return events
 
 
 def get_recovery_stats() -> Dict[str, Any]:
-    total_pending = len(_recovery_queue)
-    total_history = len(_recovery_history)
+    ensure_migrated()
+    rows = execute_query("SELECT name, value FROM recovery_counters") or []
+    counters = {row["name"]: int(row["value"]) for row in rows}
     
-    succeeded = sum(1 for e in _recovery_history if e.status == RetryStatus.SUCCEEDED)
-    failed = sum(1 for e in _recovery_history if e.status == RetryStatus.FAILED)
-    escalated = sum(1 for e in _recovery_history if e.escalated)
+    succeeded = counters.get(RetryStatus.SUCCEEDED.value, 0)
+    failed = counters.get(RetryStatus.FAILED.value, 0)
+    total_history = succeeded + failed
     
     return {
-        "pending": total_pending,
+        "pending": counters.get("pending", 0),
         "total_processed": total_history,
         "succeeded": succeeded,
         "failed": failed,
-        "escalated": escalated,
+        "escalated": counters.get("escalated", 0),
         "success_rate": (succeeded / total_history * 100) if total_history > 0 else 0
     }
 
 
-def process_recovery_queue(max_items: int = 10) -> Dict[str, Any]:
-    processed = 0
-    results = []
+class RecoveryWorker:
+    """Polls for due recovery events and retries them on a bounded pool."""
+    
+    def __init__(self, workers: int = RECOVERY_WORKERS, poll_seconds: float = RECOVERY_POLL_SECONDS):
+        self.workers = max(1, workers)
+        self.poll_seconds = poll_seconds
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="recovery")
+        self._in_flight = threading.BoundedSemaphore(self.workers)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._poll_loop, name="recovery-poller", daemon=True)
+        self._thread.start()
+        log.info(f"Recovery worker started ({self.workers} threads)")
     
-    config = RetryConfig()
+    def stop(self):
+        self._stop.set()
     
-    for event in list(_recovery_queue)[:max_items]:
-        result = attempt_retry(event.id, config)
-        results.append(result)
-        processed += 1
+    def _poll_loop(self):
+        while not self._stop.is_set():
+            claimed = 0
+            try:
+                claimed = self.drain(wait=False)
+            except Exception as e:
+                log.error(f"Recovery claim failed: {e}")
+            if not claimed:
+                self._stop.wait(self.poll_seconds)
+    
+    def _run(self, event: RecoveryEvent, config: RetryConfig) -> Dict[str, Any]:
+        try:
+            return _run_attempt(event, config)
+        except Exception as e:
+            log.error(f"Recovery attempt {event.id} failed to complete: {e}")
+            return {"success": False, "event_id": event.id, "error": str(e)}
+        finally:
+            self._in_flight.release()
+    
+    def drain(self, max_items: int = None, wait: bool = True):
+        """
+        Claim due events up to free pool capacity (or max_items) and retry them.
+        Returns the results when wait is True, else the number claimed.
+        """
+        free = 0
+        limit = max_items or RECOVERY_CLAIM_BATCH
+        while free < min(limit, self.workers) and self._in_flight.acquire(blocking=wait and free == 0):
+            free += 1
+        if free == 0:
+            return [] if wait else 0
+        
+        claimed = claim_due_events(free)
+        for _ in range(free - len(claimed)):
+            self._in_flight.release()
+        futures = [self.pool.submit(self._run, event, config) for event, config in claimed]
+        
+        if not wait:
+            return len(claimed)
+        return [f.result() for f in futures]
+
+
+_worker: Optional[RecoveryWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_recovery_worker() -> RecoveryWorker:
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = RecoveryWorker()
+        return _worker
+
+
+def process_recovery_queue(max_items: int = 10) -> Dict[str, Any]:
+    """Retry events that are due now, up to max_items, on the worker pool."""
+    worker = get_recovery_worker()
+    results = []
+    while len(results) < max_items:
+        batch = worker.drain(max_items - len(results))
+        if not batch:
+            break
+        results += batch
     
     return {
-        "processed": processed,
+        "processed": len(results),
         "results": results,
-        "remaining": len(_recovery_queue)
+        "remaining": get_recovery_stats()["pending"]
     }
 
 
-def heal_stalled_workflows(max_age_hours: int = 24) -> Dict[str, Any]:
+def heal_stalled_workflows(max_age_hours: int = 24, limit: int = 100) -> Dict[str, Any]:
+    """Fail runs stuck in 'running' past the cutoff, queue them for retry and drain due retries."""
     try:
-        from modules.workflows.storage import get_stalled_runs
-        
+        ensure_migrated()
         cutoff = time.time() - (max_age_hours * 3600)
         
-        healed = 0
-        failed = 0
-        
         log.info(f"Checking for stalled workflows older than {max_age_hours}h")
         
+        stalled = execute_query(
+            """SELECT id, workflow_id FROM workflow_runs
+               WHERE started_at < ? AND status = 'running'
+               ORDER BY started_at LIMIT ?""",
+            (cutoff, limit)
+        ) or []
+        
+        queued = 0
+        for run in stalled:
+            cursor = execute(
+                "UPDATE workflow_runs SET status = 'failed', ended_at = ?, error = ? WHERE id = ? AND status = 'running'",
+                (time.time(), f"Stalled for more than {max_age_hours}h", run["id"])
+            )
+            commit()
+            if cursor.rowcount != 1:
+                continue
+            existing = execute_query(
+                "SELECT id FROM recovery_events WHERE run_id = ? LIMIT 1", (run["id"],), fetch="one"
+            )
+            if existing is None:
+                record_failure(run["workflow_id"], run["id"], "", "stalled", f"Run stalled for more than {max_age_hours}h")
+                queued += 1
+        
+        processed = process_recovery_queue(RECOVERY_CLAIM_BATCH)
+        
         return {
-            "checked": 0,
-            "healed": healed,
-            "failed": failed,
+            "checked": len(stalled),
+            "queued": queued,
+            "healed": sum(1 for r in processed["results"] if r.get("success")),
+            "failed": sum(1 for r in processed["results"] if not r.get("success")),
             "cutoff_time": cutoff
         }
     except Exception as e:
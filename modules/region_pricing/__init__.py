@@ -6,6 +6,8 @@ import logging
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass
 
+from .ip_index import EU_COUNTRIES, get_ip_index
+
 log = logging.getLogger("levqor.region_pricing")
 
 
@@ -47,11 +49,27 @@ PPP_DISCOUNTS: Dict[str, float] = {
 }
 
 
+DEFAULT_REGION = "US"
+
+
+def region_for_country(country_code: Optional[str]) -> str:
+    if not country_code:
+        return DEFAULT_REGION
+    country_code = country_code.upper()
+    if country_code in REGION_CONFIGS:
+        return country_code
+    if country_code in EU_COUNTRIES:
+        return "EU"
+    return DEFAULT_REGION
+
+
 def detect_region_from_ip(ip_address: str) -> str:
-    if ip_address.startswith("192.168") or ip_address.startswith("10.") or ip_address.startswith("127."):
-        return "US"
+    """Pricing region for a client IP (first entry of an X-Forwarded-For list); local data only."""
+    ip = (ip_address or "").split(",")[0].strip()
+    if not ip:
+        return DEFAULT_REGION
     
-    return "US"
+    return region_for_country(get_ip_index().lookup(ip))
 
 
 def get_region_config(region_code: str) -> RegionConfig:
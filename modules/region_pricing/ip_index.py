@@ -0,0 +1,172 @@
+"""
+IP-to-Region Index
+Resolves client IPs to pricing regions from a local range file, with no
+external geo service.
+
+Data file (REGION_IP_DATA_PATH), CSV with one range per row, either
+    network,country        e.g. 81.2.69.0/24,GB
+or
+    start_ip,end_ip,country
+IPv4 and IPv6 may be mixed; a header row and '#' comments are skipped.
+Ranges must not overlap.
+
+The file is loaded into sorted integer start/end arrays per IP version and
+answered by binary search, with an LRU cache (REGION_IP_CACHE_SIZE) in
+front for hot addresses. The file's mtime/size is checked at most every
+REGION_IP_RELOAD_SECONDS; a changed file is parsed in a background thread
+and swapped in with one reference assignment, so lookups never wait for or
+see a partial index (and the new index starts with an empty cache).
+"""
+import os
+import csv
+import time
+import bisect
+import logging
+import ipaddress
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger("levqor.region_pricing.ip_index")
+
+REGION_IP_DATA_PATH = os.environ.get("REGION_IP_DATA_PATH", "data/ip_regions.csv")
+REGION_IP_CACHE_SIZE = int(os.environ.get("REGION_IP_CACHE_SIZE", "65536"))
+REGION_IP_RELOAD_SECONDS = float(os.environ.get("REGION_IP_RELOAD_SECONDS", "30"))
+
+EU_COUNTRIES = frozenset({
+    "AT", "BE", "BG", "HR", "CY", "CZ", "DK", "EE", "FI", "FR", "DE", "GR", "HU", "IE",
+    "IT", "LV", "LT", "LU", "MT", "NL", "PL", "PT", "RO", "SK", "SI", "ES", "SE",
+})
+
+
+class IpRangeIndex:
+    """Immutable interval index: country code for an address, by binary search."""
+
+    def __init__(self, ranges: Dict[int, List[Tuple[int, int, str]]], cache_size: int = REGION_IP_CACHE_SIZE):
+        self._tables = {}
+        for version, rows in ranges.items():
+            rows.sort()
+            self._tables[version] = (
+                [r[0] for r in rows],
+                [r[1] for r in rows],
+                [r[2] for r in rows],
+            )
+        self.size = sum(len(rows) for rows in ranges.values())
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def _lookup(self, ip: str) -> Optional[str]:
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+
+        table = self._tables.get(address.version)
+        if not table:
+            return None
+        starts, ends, countries = table
+        value = int(address)
+        i = bisect.bisect_right(starts, value) - 1
+        if i >= 0 and value <= ends[i]:
+            return countries[i]
+        return None
+
+    @classmethod
+    def from_csv(cls, path: str, cache_size: int = REGION_IP_CACHE_SIZE) -> "IpRangeIndex":
+        ranges: Dict[int, List[Tuple[int, int, str]]] = {4: [], 6: []}
+        skipped = 0
+        with open(path, newline="") as f:
+            for row in csv.reader(f):
+                if not row or row[0].lstrip().startswith("#"):
+                    continue
+                try:
+                    if len(row) == 2:
+                        network = ipaddress.ip_network(row[0].strip(), strict=False)
+                        first, last = network.network_address, network.broadcast_address
+                    else:
+                        first = ipaddress.ip_address(row[0].strip())
+                        last = ipaddress.ip_address(row[1].strip())
+                        if first.version != last.version:
+                            raise ValueError("mixed IP versions")
+                except ValueError:
+                    skipped += 1  # header or malformed row
+                    continue
+                ranges[first.version].append((int(first), int(last), row[-1].strip().upper()))
+
+        if skipped > 1:
+            log.warning(f"Skipped {skipped} unparseable rows in {path}")
+        return cls(ranges, cache_size)
+
+
+class ReloadingIpIndex:
+    """IpRangeIndex over a file, replaced atomically when the file changes."""
+
+    def __init__(self, path: str = REGION_IP_DATA_PATH, check_seconds: float = REGION_IP_RELOAD_SECONDS):
+        self.path = path
+        self.check_seconds = check_seconds
+        self._index: Optional[IpRangeIndex] = None
+        self._signature: Optional[Tuple[float, int]] = None
+        self._next_check = 0.0
+        self._loaded = False
+        self._reload_lock = threading.Lock()
+        self._missing_logged = False
+
+    def _file_signature(self) -> Optional[Tuple[float, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime, stat.st_size)
+
+    def _reload(self, initial: bool = False):
+        # The first load blocks lookups; later reloads run in the background
+        # while lookups keep using the current index
+        if not self._reload_lock.acquire(blocking=initial):
+            return
+        try:
+            if initial and self._loaded:
+                return
+            signature = self._file_signature()
+            if signature is None:
+                if not self._missing_logged:
+                    log.warning(f"IP region data not found at {self.path}; using the default region")
+                    self._missing_logged = True
+                self._index, self._signature = None, None
+                return
+            if signature == self._signature:
+                return
+            started = time.perf_counter()
+            index = IpRangeIndex.from_csv(self.path)
+            self._index, self._signature = index, signature
+            self._missing_logged = False
+            log.info(f"Loaded {index.size} IP ranges from {self.path} in {(time.perf_counter() - started) * 1000:.0f}ms")
+        except Exception as e:
+            log.error(f"Failed to load IP region data from {self.path}: {e}")
+        finally:
+            self._loaded = True
+            self._reload_lock.release()
+
+    def lookup(self, ip: str) -> Optional[str]:
+        """Country code for ip, or None if unknown/unparseable."""
+        if not self._loaded:
+            self._next_check = time.monotonic() + self.check_seconds
+            self._reload(initial=True)
+        elif time.monotonic() >= self._next_check:
+            self._next_check = time.monotonic() + self.check_seconds
+            threading.Thread(target=self._reload, name="ip-index-reload", daemon=True).start()
+        index = self._index
+        return index.lookup(ip) if index is not None else None
+
+
+_default_index: Optional[ReloadingIpIndex] = None
+_default_lock = threading.Lock()
+
+
+def get_ip_index() -> ReloadingIpIndex:
+    global _default_index
+    if _default_index is None:
+        with _default_lock:
+            if _default_index is None:
+                _default_index = ReloadingIpIndex()
+    return _default_index
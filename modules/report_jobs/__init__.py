@@ -0,0 +1,279 @@
+"""
+Report Jobs
+Background generation of PDF exports (insights reports, evidence packs).
+
+submit_report() records a job and returns at once; a bounded thread pool
+(REPORT_WORKERS) renders it into REPORT_ARTIFACT_DIR, in a file named after
+the job id. Each job has a cache key of (kind, params, data watermark),
+plus the tenant for per-tenant kinds; a request whose key already
+has a finished artifact is answered from that job without rendering, and
+one whose key is already queued or running joins that job.
+
+A report kind is a renderer plus an optional watermark function:
+
+    register_report_kind("insights", render_insights, watermark=insights_watermark)
+
+    render(params, output_path) -> dict   # writes the file, returns result data
+    watermark(params) -> str              # changes whenever the output would
+
+Kinds are global (the same report for every tenant) unless registered with
+per_tenant=True.
+
+Jobs left queued or running by a worker that died are treated as failed
+after REPORT_JOB_TIMEOUT_SECONDS.
+"""
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Callable
+
+from modules.db_wrapper import execute_query
+from modules.migrations import ensure_migrated
+
+log = logging.getLogger("levqor.report_jobs")
+
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", "2"))
+REPORT_ARTIFACT_DIR = os.environ.get("REPORT_ARTIFACT_DIR", "workspace-data/reports")
+REPORT_JOB_TIMEOUT_SECONDS = float(os.environ.get("REPORT_JOB_TIMEOUT_SECONDS", "900"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class ReportKind:
+    name: str
+    render: Callable[[Dict[str, Any], str], Dict[str, Any]]
+    watermark: Optional[Callable[[Dict[str, Any]], str]] = None
+    extension: str = "pdf"
+    per_tenant: bool = False
+
+
+_kinds: Dict[str, ReportKind] = {}
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def register_report_kind(
+    name: str,
+    render: Callable[[Dict[str, Any], str], Dict[str, Any]],
+    watermark: Optional[Callable[[Dict[str, Any]], str]] = None,
+    extension: str = "pdf",
+    per_tenant: bool = False
+):
+    _kinds[name] = ReportKind(name, render, watermark, extension, per_tenant)
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, REPORT_WORKERS), thread_name_prefix="report")
+        return _pool
+
+
+def _cache_key(kind: ReportKind, tenant_id: str, params: Dict[str, Any]) -> str:
+    watermark = kind.watermark(params) if kind.watermark else ""
+    scope = tenant_id if kind.per_tenant else None
+    raw = json.dumps([kind.name, scope, params, watermark], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _job_from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "job_id": row["id"],
+        "kind": row["kind"],
+        "tenant_id": row["tenant_id"],
+        "params": json.loads(row["params"]) if row["params"] else {},
+        "status": row["status"],
+        "size_bytes": row["size_bytes"],
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "created_at": row["created_at"],
+        "started_at": row["started_at"],
+        "finished_at": row["finished_at"]
+    }
+
+
+def _expire_if_stale(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Fail a queued/running job whose worker is gone (past the timeout)."""
+    if row["status"] in (QUEUED, RUNNING) and row["created_at"] < time.time() - REPORT_JOB_TIMEOUT_SECONDS:
+        execute_query(
+            "UPDATE report_jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status = ?",
+            (FAILED, "Timed out", time.time(), row["id"], row["status"]),
+            fetch=None,
+            commit=True
+        )
+        return {**row, "status": FAILED, "error": "Timed out"}
+    return row
+
+
+def _find_reusable(cache_key: str) -> Optional[Dict[str, Any]]:
+    """Latest finished job with an artifact on disk, else a live queued/running job, for cache_key."""
+    for status in (SUCCEEDED, RUNNING, QUEUED):
+        row = execute_query(
+            "SELECT * FROM report_jobs WHERE cache_key = ? AND status = ? ORDER BY created_at DESC LIMIT 1",
+            (cache_key, status),
+            fetch="one"
+        )
+        if not row:
+            continue
+        if status == SUCCEEDED:
+            if row["artifact_path"] and os.path.exists(row["artifact_path"]):
+                return row
+            continue
+        row = _expire_if_stale(row)
+        if row["status"] != FAILED:
+            return row
+    return None
+
+
+def submit_report(kind: str, tenant_id: str = "default", params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Queue a report, or return the cached/in-flight job for the same key.
+
+    Returns:
+        Job dict plus "cached": True when no new render was started
+    Raises:
+        ValueError: unknown kind
+    """
+    ensure_migrated()
+    report_kind = _kinds.get(kind)
+    if report_kind is None:
+        raise ValueError(f"Unknown report kind: {kind}")
+    params = params or {}
+
+    cache_key = _cache_key(report_kind, tenant_id, params)
+    existing = _find_reusable(cache_key)
+    if existing:
+        return {**_job_from_row(existing), "cached": True}
+
+    job_id = str(uuid.uuid4())
+    now = time.time()
+    execute_query(
+        """INSERT INTO report_jobs (id, kind, tenant_id, params, cache_key, status, created_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        (job_id, kind, tenant_id, json.dumps(params), cache_key, QUEUED, now),
+        fetch=None,
+        commit=True
+    )
+    _get_pool().submit(_run_job, job_id, report_kind, params)
+    log.info(f"Report job queued: {job_id} (kind={kind}, tenant={tenant_id})")
+
+    return {**get_job(job_id), "cached": False}
+
+
+def _run_job(job_id: str, kind: ReportKind, params: Dict[str, Any]):
+    execute_query(
+        "UPDATE report_jobs SET status = ?, started_at = ? WHERE id = ?",
+        (RUNNING, time.time(), job_id),
+        fetch=None,
+        commit=True
+    )
+
+    path = os.path.join(REPORT_ARTIFACT_DIR, f"{kind.name}_{job_id}.{kind.extension}")
+    partial = path + ".part"
+    try:
+        os.makedirs(REPORT_ARTIFACT_DIR, exist_ok=True)
+        result = kind.render(params, partial) or {}
+        os.replace(partial, path)
+        execute_query(
+            """UPDATE report_jobs SET status = ?, artifact_path = ?, size_bytes = ?, result = ?, finished_at = ?
+               WHERE id = ?""",
+            (SUCCEEDED, path, os.path.getsize(path), json.dumps(result, default=str), time.time(), job_id),
+            fetch=None,
+            commit=True
+        )
+        log.info(f"Report job finished: {job_id} ({os.path.getsize(path)} bytes)")
+    except Exception as e:
+        log.error(f"Report job {job_id} failed: {e}")
+        if os.path.exists(partial):
+            os.remove(partial)
+        execute_query(
+            "UPDATE report_jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+            (FAILED, str(e)[:500], time.time(), job_id),
+            fetch=None,
+            commit=True
+        )
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    ensure_migrated()
+    row = execute_query("SELECT * FROM report_jobs WHERE id = ?", (job_id,), fetch="one")
+    return _job_from_row(_expire_if_stale(row)) if row else None
+
+
+def get_artifact_path(job_id: str) -> Optional[str]:
+    """Path of a finished job's file, or None if not finished or missing."""
+    ensure_migrated()
+    row = execute_query("SELECT status, artifact_path FROM report_jobs WHERE id = ?", (job_id,), fetch="one")
+    if not row or row["status"] != SUCCEEDED or not row["artifact_path"]:
+        return None
+    return row["artifact_path"] if os.path.exists(row["artifact_path"]) else None
+
+
+# --- built-in kinds ---
+
+def _render_insights(params: Dict[str, Any], output_path: str) -> Dict[str, Any]:
+    from modules.data_insights.aggregator import aggregate
+    from modules.data_insights.report_builder import build_pdf
+    from modules.data_insights.uploader import upload_pdf
+
+    kpis = aggregate(period_days=params.get("period_days", 90))
+    pdf_bytes = build_pdf(kpis)
+    with open(output_path, "wb") as f:
+        f.write(pdf_bytes)
+
+    filename = f"Levqor_Insights_{time.strftime('%Y-%m-%d', time.gmtime())}.pdf"
+    return {
+        "kpis": kpis,
+        "filename": filename,
+        "drive_link": upload_pdf(pdf_bytes, filename)
+    }
+
+
+def _insights_watermark(params: Dict[str, Any]) -> str:
+    from modules.data_insights.aggregator import data_watermark
+    return data_watermark(params.get("period_days", 90))
+
+
+def _render_evidence_pack(params: Dict[str, Any], output_path: str) -> Dict[str, Any]:
+    from modules.integrity_pack.integrity_test import IntegrityTester
+    from modules.integrity_pack.finalizer import Finalizer
+    from modules.integrity_pack.evidence_export import EvidenceExporter
+
+    integrity_results = IntegrityTester().run_all_tests()
+    finalizer_results = Finalizer().validate_all()
+    EvidenceExporter().export_to_pdf(integrity_results, finalizer_results, output_path)
+    return {
+        "filename": f"integrity_evidence_{int(time.time())}.pdf",
+        "summary": {
+            "integrity": integrity_results["summary"],
+            "finalizer": finalizer_results["summary"]
+        }
+    }
+
+
+def _daily_watermark(params: Dict[str, Any]) -> str:
+    # Evidence packs are point-in-time checks: at most one render per day
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+
+register_report_kind("insights", _render_insights, watermark=_insights_watermark)
+register_report_kind("evidence_pack", _render_evidence_pack, watermark=_daily_watermark)
+
+
+__all__ = [
+    "register_report_kind",
+    "submit_report",
+    "get_job",
+    "get_artifact_path",
+]
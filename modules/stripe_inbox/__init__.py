@@ -0,0 +1,380 @@
+"""
+Stripe Webhook Inbox
+Durable, deduplicated intake for Stripe events, handled asynchronously.
+
+enqueue_event() inserts the event into stripe_webhook_inbox, keyed by
+Stripe's event id (ON CONFLICT DO NOTHING, so redeliveries are dropped at
+the door), commits, and returns. Webhook endpoints can answer Stripe as
+soon as the event is durable instead of after the handlers ran.
+
+An InboxWorker handles events on a bounded pool. Events are ordered per
+customer (ordering_key, the event's customer id or else its own id): only
+the oldest unsettled event of a key can be claimed, so a customer's events
+run one at a time, in arrival order, and a failing event holds back the
+ones behind it while it is retried with exponential backoff. After
+STRIPE_INBOX_MAX_ATTEMPTS it is settled as failed and the line moves on.
+A worker that finished an event claims the next one of the same customer
+straight away, so bursts for one customer do not wait for the poll interval.
+
+Claims are conditional UPDATEs with a lease held in next_attempt_at (the
+same scheme as modules.recovery), so several processes can run workers.
+A keeper thread renews the lease every STRIPE_INBOX_LEASE_SECONDS / 3 while
+the handler runs, and the outcome is only recorded while the lease is still
+held, so a worker that lost its event to another cannot overwrite the result.
+Only verified events may be enqueued; the inbox does not authenticate.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Callable
+
+from modules.db_wrapper import execute_query, execute, commit
+from modules.migrations import ensure_migrated
+
+log = logging.getLogger("levqor.stripe_inbox")
+
+STRIPE_INBOX_WORKERS = int(os.environ.get("STRIPE_INBOX_WORKERS", "4"))
+STRIPE_INBOX_POLL_SECONDS = float(os.environ.get("STRIPE_INBOX_POLL_SECONDS", "1"))
+STRIPE_INBOX_LEASE_SECONDS = float(os.environ.get("STRIPE_INBOX_LEASE_SECONDS", "120"))
+STRIPE_INBOX_CLAIM_BATCH = int(os.environ.get("STRIPE_INBOX_CLAIM_BATCH", "20"))
+STRIPE_INBOX_MAX_ATTEMPTS = int(os.environ.get("STRIPE_INBOX_MAX_ATTEMPTS", "8"))
+STRIPE_INBOX_RETRY_BASE_SECONDS = float(os.environ.get("STRIPE_INBOX_RETRY_BASE_SECONDS", "5"))
+STRIPE_INBOX_RETRY_MAX_SECONDS = float(os.environ.get("STRIPE_INBOX_RETRY_MAX_SECONDS", "3600"))
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+_handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+
+_leases: Dict[str, float] = {}
+_leases_lock = threading.Lock()
+_lease_keeper: Optional[threading.Thread] = None
+
+
+def register_handler(event_type: str, handler: Callable[[Dict[str, Any]], Any]):
+    """Handle events of event_type with handler(data_object); raising schedules a retry."""
+    _handlers[event_type] = handler
+
+
+def _ordering_key(event_id: str, data: Optional[Dict[str, Any]]) -> str:
+    customer = (data or {}).get("customer")
+    if isinstance(customer, dict):
+        customer = customer.get("id")
+    return customer if isinstance(customer, str) and customer else event_id
+
+
+def enqueue_event(
+    event_id: str,
+    event_type: str,
+    data: Optional[Dict[str, Any]] = None,
+    created: Optional[float] = None,
+    source: str = "webhook"
+) -> bool:
+    """
+    Durably record an event for handling.
+
+    Returns:
+        True if the event is new, False if this event id was already received
+    """
+    ensure_migrated()
+    now = time.time()
+    cursor = execute(
+        """INSERT INTO stripe_webhook_inbox
+               (event_id, event_type, ordering_key, source, payload, status,
+                next_attempt_at, stripe_created, received_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (event_id) DO NOTHING""",
+        (
+            event_id,
+            event_type,
+            _ordering_key(event_id, data),
+            source,
+            json.dumps(data or {}),
+            PENDING,
+            now,
+            float(created) if created else now,
+            now
+        )
+    )
+    new = cursor.rowcount == 1
+    commit()
+
+    if new:
+        worker = get_inbox_worker()
+        worker.start()
+        worker.wake()
+    else:
+        log.info(f"Duplicate Stripe event ignored: {event_id}")
+    return new
+
+
+def _head(ordering_key: str) -> Optional[Dict[str, Any]]:
+    """The oldest unsettled event of a customer, the only one that may run."""
+    return execute_query(
+        "SELECT event_id, ordering_key, status, next_attempt_at FROM stripe_webhook_inbox "
+        "WHERE ordering_key = ? AND settled = 0 ORDER BY received_at, event_id LIMIT 1",
+        (ordering_key,),
+        fetch="one"
+    )
+
+
+def _claim(row: Dict[str, Any], now: float) -> Optional[Dict[str, Any]]:
+    """Take one event for this worker; None if another worker won it."""
+    cursor = execute(
+        """UPDATE stripe_webhook_inbox SET status = ?, next_attempt_at = ?, attempts = attempts + 1
+           WHERE event_id = ? AND status = ? AND next_attempt_at = ?""",
+        (PROCESSING, now + STRIPE_INBOX_LEASE_SECONDS, row["event_id"], row["status"], row["next_attempt_at"])
+    )
+    won = cursor.rowcount == 1
+    commit()
+    if not won:
+        return None
+    return execute_query("SELECT * FROM stripe_webhook_inbox WHERE event_id = ?", (row["event_id"],), fetch="one")
+
+
+def claim_due_events(limit: int = STRIPE_INBOX_CLAIM_BATCH) -> List[Dict[str, Any]]:
+    """Claim up to limit due events (and events whose lease expired), at most one per customer."""
+    ensure_migrated()
+    now = time.time()
+    claimed = []
+    for status in (PENDING, PROCESSING):
+        if len(claimed) >= limit:
+            break
+        # Only customers' head events are candidates, so a customer whose
+        # head is backing off cannot crowd out other customers' events
+        rows = execute_query(
+            "SELECT event_id, ordering_key, status, next_attempt_at FROM stripe_webhook_inbox e "
+            "WHERE status = ? AND next_attempt_at <= ? AND NOT EXISTS ("
+            "SELECT 1 FROM stripe_webhook_inbox o WHERE o.ordering_key = e.ordering_key AND o.settled = 0 "
+            "AND (o.received_at < e.received_at OR (o.received_at = e.received_at AND o.event_id < e.event_id))"
+            ") ORDER BY next_attempt_at LIMIT ?",
+            (status, now, limit - len(claimed))
+        ) or []
+        for row in rows:
+            event = _claim(row, now)
+            if event is not None:
+                claimed.append(event)
+    return claimed
+
+
+def _claim_next(ordering_key: str) -> Optional[Dict[str, Any]]:
+    """The customer's next event, if it is due now."""
+    row = _head(ordering_key)
+    now = time.time()
+    if row is None or row["status"] != PENDING or row["next_attempt_at"] > now:
+        return None
+    return _claim(row, now)
+
+
+def _renew_leases():
+    """Extend the lease of every event still running here; drop leases another worker took."""
+    # Renew under the lock so _release_lease always returns the lease that is in the row
+    with _leases_lock:
+        for event_id, lease in list(_leases.items()):
+            renewed = time.time() + STRIPE_INBOX_LEASE_SECONDS
+            cursor = execute(
+                "UPDATE stripe_webhook_inbox SET next_attempt_at = ? "
+                "WHERE event_id = ? AND status = ? AND next_attempt_at = ?",
+                (renewed, event_id, PROCESSING, lease)
+            )
+            won = cursor.rowcount == 1
+            commit()
+            if won:
+                _leases[event_id] = renewed
+            else:
+                log.warning(f"Lost the lease on Stripe event {event_id}")
+                del _leases[event_id]
+
+
+def _keep_leases():
+    while True:
+        time.sleep(STRIPE_INBOX_LEASE_SECONDS / 3)
+        try:
+            _renew_leases()
+        except Exception as e:
+            log.error(f"Stripe inbox lease renewal failed: {e}")
+
+
+def _hold_lease(event: Dict[str, Any]):
+    global _lease_keeper
+    with _leases_lock:
+        _leases[event["event_id"]] = event["next_attempt_at"]
+        if _lease_keeper is None:
+            _lease_keeper = threading.Thread(target=_keep_leases, name="stripe-inbox-leases", daemon=True)
+            _lease_keeper.start()
+
+
+def _release_lease(event: Dict[str, Any]) -> Optional[float]:
+    """Stop renewing; returns the lease still held, or None if it was lost."""
+    with _leases_lock:
+        return _leases.pop(event["event_id"], None)
+
+
+def _settle(event_id: str, lease: float, status: str, error: Optional[str] = None) -> bool:
+    """Record a final status; False if the lease is no longer held."""
+    cursor = execute(
+        """UPDATE stripe_webhook_inbox SET status = ?, settled = 1, last_error = ?, processed_at = ?
+           WHERE event_id = ? AND status = ? AND next_attempt_at = ?""",
+        (status, error, time.time(), event_id, PROCESSING, lease)
+    )
+    won = cursor.rowcount == 1
+    commit()
+    return won
+
+
+def _retry_later(event: Dict[str, Any], lease: float, error: str) -> bool:
+    """Schedule the next attempt, or settle as failed; False if the lease is no longer held."""
+    attempts = event["attempts"]
+    if attempts >= STRIPE_INBOX_MAX_ATTEMPTS:
+        log.error(f"Stripe event {event['event_id']} failed after {attempts} attempts: {error}")
+        return _settle(event["event_id"], lease, FAILED, error[:500])
+    delay = min(STRIPE_INBOX_RETRY_BASE_SECONDS * (2 ** (attempts - 1)), STRIPE_INBOX_RETRY_MAX_SECONDS)
+    log.warning(f"Stripe event {event['event_id']} attempt {attempts} failed, retrying in {delay:.0f}s: {error}")
+    cursor = execute(
+        "UPDATE stripe_webhook_inbox SET status = ?, next_attempt_at = ?, last_error = ? "
+        "WHERE event_id = ? AND status = ? AND next_attempt_at = ?",
+        (PENDING, time.time() + delay, error[:500], event["event_id"], PROCESSING, lease)
+    )
+    won = cursor.rowcount == 1
+    commit()
+    return won
+
+
+def handle_event(event: Dict[str, Any]) -> str:
+    """
+    Run the handler for one claimed event and record the outcome; returns its status.
+
+    Returns PROCESSING without recording anything if the lease was lost, since
+    the event then belongs to the worker that claimed it again.
+    """
+    event_id = event["event_id"]
+    event_type = event["event_type"]
+    error = None
+    _hold_lease(event)
+    try:
+        data = json.loads(event["payload"]) if event["payload"] else {}
+        handler = _handlers.get(event_type)
+        if handler is None:
+            log.info(f"Unhandled event type: {event_type}")
+        else:
+            handler(data)
+    except Exception as e:
+        error = str(e) or type(e).__name__
+    finally:
+        lease = _release_lease(event)
+
+    if lease is None:
+        recorded = False
+    elif error is None:
+        recorded = _settle(event_id, lease, DONE)
+    else:
+        recorded = _retry_later(event, lease, error)
+    if not recorded:
+        log.warning(f"Stripe event {event_id} outcome dropped: its lease was taken by another worker")
+        return PROCESSING
+    if error is None:
+        return DONE
+    return FAILED if event["attempts"] >= STRIPE_INBOX_MAX_ATTEMPTS else PENDING
+
+
+class InboxWorker:
+    """Polls the inbox for due events and handles them on a bounded pool."""
+
+    def __init__(self, workers: int = STRIPE_INBOX_WORKERS, poll_seconds: float = STRIPE_INBOX_POLL_SECONDS):
+        self.workers = max(1, workers)
+        self.poll_seconds = poll_seconds
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stripe-inbox")
+        self._in_flight = threading.BoundedSemaphore(self.workers)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._poll_loop, name="stripe-inbox-poller", daemon=True)
+            self._thread.start()
+        log.info(f"Stripe inbox worker started ({self.workers} threads)")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        self._wake.set()
+
+    def _poll_loop(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            claimed = 0
+            try:
+                claimed = self.drain(wait=False)
+            except Exception as e:
+                log.error(f"Stripe inbox claim failed: {e}")
+            if not claimed:
+                self._wake.wait(self.poll_seconds)
+
+    def _run(self, event: Dict[str, Any]) -> List[str]:
+        # Keep the slot while the same customer has more events due
+        statuses = []
+        try:
+            while event is not None and not self._stop.is_set():
+                status = handle_event(event)
+                statuses.append(status)
+                if status in (PENDING, PROCESSING):
+                    break
+                event = _claim_next(event["ordering_key"])
+        except Exception as e:
+            log.error(f"Stripe inbox event {event['event_id'] if event else '?'} failed to complete: {e}")
+        finally:
+            self._in_flight.release()
+        return statuses
+
+    def drain(self, max_items: int = None, wait: bool = True):
+        """
+        Claim due events up to free pool capacity (or max_items) and handle them.
+        Returns the per-event statuses when wait is True, else the number claimed.
+        """
+        free = 0
+        limit = max_items or STRIPE_INBOX_CLAIM_BATCH
+        while free < min(limit, self.workers) and self._in_flight.acquire(blocking=wait and free == 0):
+            free += 1
+        if free == 0:
+            return [] if wait else 0
+
+        claimed = claim_due_events(free)
+        for _ in range(free - len(claimed)):
+            self._in_flight.release()
+        futures = [self.pool.submit(self._run, event) for event in claimed]
+
+        if not wait:
+            return len(claimed)
+        return [status for f in futures for status in f.result()]
+
+
+_worker: Optional[InboxWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_inbox_worker() -> InboxWorker:
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = InboxWorker()
+        return _worker
+
+
+__all__ = [
+    "register_handler",
+    "enqueue_event",
+    "claim_due_events",
+    "handle_event",
+    "InboxWorker",
+    "get_inbox_worker",
+]
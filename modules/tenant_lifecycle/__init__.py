@@ -1,15 +1,31 @@
 """
 Tenant Lifecycle Module - V10 Completion
 Soft delete, suspend, restore functionality for tenants.
+
+State is persisted in tenant_states; tenants without a row are active.
+is_tenant_operational is served from a per-process read-through cache
+(TENANT_LIFECYCLE_CACHE_SECONDS), invalidated locally on every transition.
+Audit entries are appended to tenant_audit_log and pruned after
+TENANT_AUDIT_RETENTION_DAYS.
 """
+import os
+import json
 import time
 import logging
+import threading
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass, field
 from enum import Enum
 
+from modules.db_wrapper import execute_query, execute, commit
+from modules.migrations import ensure_migrated
+
 log = logging.getLogger("levqor.tenant_lifecycle")
 
+TENANT_LIFECYCLE_CACHE_SECONDS = float(os.environ.get("TENANT_LIFECYCLE_CACHE_SECONDS", "30"))
+TENANT_AUDIT_RETENTION_DAYS = int(os.environ.get("TENANT_AUDIT_RETENTION_DAYS", "365"))
+DELETION_BATCH_SIZE = int(os.environ.get("TENANT_DELETION_BATCH_SIZE", "100"))
+
 
 class TenantStatus(str, Enum):
     ACTIVE = "active"
@@ -31,25 +47,72 @@ class TenantState:
     data_retained: bool = True
 
 
-_tenant_states: Dict[str, TenantState] = {}
-_tenant_audit_log: List[Dict[str, Any]] = []
+_STATE_COLUMNS = (
+    "status", "created_at", "suspended_at", "deleted_at", "scheduled_deletion_at",
+    "suspension_reason", "deletion_reason", "data_retained"
+)
+
+_UPSERT_STATE_SQL = f"""
+    INSERT INTO tenant_states (tenant_id, {", ".join(_STATE_COLUMNS)}, updated_at)
+    VALUES (?, {", ".join("?" for _ in _STATE_COLUMNS)}, ?)
+    ON CONFLICT (tenant_id) DO UPDATE SET
+        {", ".join(f"{c} = excluded.{c}" for c in _STATE_COLUMNS if c != "created_at")},
+        updated_at = excluded.updated_at
+"""
+
+# tenant_id -> (operational, monotonic expiry)
+_operational_cache: Dict[str, tuple] = {}
+_cache_lock = threading.Lock()
+
+
+def _invalidate(tenant_id: str):
+    with _cache_lock:
+        _operational_cache.pop(tenant_id, None)
 
 
 def _audit_log(tenant_id: str, action: str, details: Dict[str, Any] = None):
-    entry = {
-        "tenant_id": tenant_id,
-        "action": action,
-        "timestamp": time.time(),
-        "details": details or {}
-    }
-    _tenant_audit_log.append(entry)
+    execute_query(
+        "INSERT INTO tenant_audit_log (tenant_id, action, details, created_at) VALUES (?, ?, ?, ?)",
+        (tenant_id, action, json.dumps(details or {}), time.time()),
+        fetch=None
+    )
     log.info(f"Tenant audit: {tenant_id} - {action}")
 
 
+def _state_from_row(row: Dict[str, Any]) -> TenantState:
+    return TenantState(
+        tenant_id=row["tenant_id"],
+        status=TenantStatus(row["status"]),
+        created_at=row["created_at"],
+        suspended_at=row["suspended_at"],
+        deleted_at=row["deleted_at"],
+        scheduled_deletion_at=row["scheduled_deletion_at"],
+        suspension_reason=row["suspension_reason"],
+        deletion_reason=row["deletion_reason"],
+        data_retained=bool(row["data_retained"])
+    )
+
+
+def _load_state(tenant_id: str) -> Optional[TenantState]:
+    ensure_migrated()
+    row = execute_query("SELECT * FROM tenant_states WHERE tenant_id = ?", (tenant_id,), fetch="one")
+    return _state_from_row(row) if row else None
+
+
+def _save_state(state: TenantState, action: str, details: Dict[str, Any]):
+    """Persist a transition and its audit entry in one transaction."""
+    params = (state.tenant_id, state.status.value) + tuple(
+        getattr(state, c) for c in _STATE_COLUMNS[1:]
+    ) + (time.time(),)
+    execute_query(_UPSERT_STATE_SQL, params, fetch=None)
+    _audit_log(state.tenant_id, action, details)
+    commit()
+    _invalidate(state.tenant_id)
+
+
 def get_or_create_tenant_state(tenant_id: str) -> TenantState:
-    if tenant_id not in _tenant_states:
-        _tenant_states[tenant_id] = TenantState(tenant_id=tenant_id)
-    return _tenant_states[tenant_id]
+    """Current state of a tenant; tenants never seen before are active (not stored until a transition)."""
+    return _load_state(tenant_id) or TenantState(tenant_id=tenant_id)
 
 
 def suspend_tenant(tenant_id: str, reason: str = "Manual suspension") -> Dict[str, Any]:
@@ -63,7 +126,7 @@ def suspend_tenant(tenant_id: str, reason: str = "Manual suspension") -> Dict[st
     state.suspended_at = time.time()
     state.suspension_reason = reason
     
-    _audit_log(tenant_id, "suspend", {
+    _save_state(state, "suspend", {
         "previous_status": previous_status.value,
         "reason": reason
     })
@@ -92,7 +155,7 @@ def restore_tenant(tenant_id: str) -> Dict[str, Any]:
     state.suspension_reason = None
     state.scheduled_deletion_at = None
     
-    _audit_log(tenant_id, "restore", {
+    _save_state(state, "restore", {
         "previous_status": previous_status.value
     })
     
@@ -117,7 +180,7 @@ def soft_delete_tenant(tenant_id: str, reason: str = "User requested", grace_per
     state.scheduled_deletion_at = time.time() + (grace_period_days * 24 * 3600)
     state.data_retained = True
     
-    _audit_log(tenant_id, "soft_delete", {
+    _save_state(state, "soft_delete", {
         "previous_status": previous_status.value,
         "reason": reason,
         "grace_period_days": grace_period_days,
@@ -143,7 +206,7 @@ def hard_delete_tenant(tenant_id: str) -> Dict[str, Any]:
     state.status = TenantStatus.DELETED
     state.data_retained = False
     
-    _audit_log(tenant_id, "hard_delete", {
+    _save_state(state, "hard_delete", {
         "data_purged": True
     })
     
@@ -176,44 +239,96 @@ def get_tenant_status(tenant_id: str) -> Dict[str, Any]:
 
 
 def is_tenant_operational(tenant_id: str) -> bool:
-    state = get_or_create_tenant_state(tenant_id)
-    return state.status == TenantStatus.ACTIVE
+    """O(1) cached check; other workers' transitions are seen within TENANT_LIFECYCLE_CACHE_SECONDS."""
+    cached = _operational_cache.get(tenant_id)
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+    
+    ensure_migrated()
+    row = execute_query("SELECT status FROM tenant_states WHERE tenant_id = ?", (tenant_id,), fetch="one")
+    operational = row is None or row["status"] == TenantStatus.ACTIVE.value
+    with _cache_lock:
+        _operational_cache[tenant_id] = (operational, time.monotonic() + TENANT_LIFECYCLE_CACHE_SECONDS)
+    return operational
 
 
 def get_audit_log(tenant_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+    ensure_migrated()
     if tenant_id:
-        logs = [e for e in _tenant_audit_log if e["tenant_id"] == tenant_id]
+        rows = execute_query(
+            "SELECT tenant_id, action, details, created_at FROM tenant_audit_log "
+            "WHERE tenant_id = ? ORDER BY created_at DESC LIMIT ?",
+            (tenant_id, limit)
+        )
     else:
-        logs = _tenant_audit_log
+        rows = execute_query(
+            "SELECT tenant_id, action, details, created_at FROM tenant_audit_log "
+            "ORDER BY created_at DESC LIMIT ?",
+            (limit,)
+        )
     
-    return sorted(logs, key=lambda x: x["timestamp"], reverse=True)[:limit]
+    return [
+        {
+            "tenant_id": row["tenant_id"],
+            "action": row["action"],
+            "timestamp": row["created_at"],
+            "details": json.loads(row["details"]) if row["details"] else {}
+        }
+        for row in rows or []
+    ]
+
+
+def prune_audit_log(retention_days: Optional[int] = None) -> int:
+    """Delete audit entries older than the retention window. Returns rows deleted."""
+    ensure_migrated()
+    days = TENANT_AUDIT_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = time.time() - days * 86400
+    deleted = execute("DELETE FROM tenant_audit_log WHERE created_at < ?", (cutoff,)).rowcount
+    commit()
+    if deleted:
+        log.info(f"Pruned {deleted} tenant audit entries older than {days} days")
+    return deleted
 
 
 def get_pending_deletions() -> List[Dict[str, Any]]:
+    ensure_migrated()
     now = time.time()
-    pending = []
-    
-    for tenant_id, state in _tenant_states.items():
-        if state.status == TenantStatus.PENDING_DELETION:
-            pending.append({
-                "tenant_id": tenant_id,
-                "scheduled_deletion_at": state.scheduled_deletion_at,
-                "days_remaining": max(0, (state.scheduled_deletion_at - now) / 86400) if state.scheduled_deletion_at else 0,
-                "reason": state.deletion_reason
-            })
+    rows = execute_query(
+        "SELECT tenant_id, scheduled_deletion_at, deletion_reason FROM tenant_states "
+        "WHERE status = ? ORDER BY scheduled_deletion_at",
+        (TenantStatus.PENDING_DELETION.value,)
+    )
     
-    return sorted(pending, key=lambda x: x.get("scheduled_deletion_at", 0))
+    return [
+        {
+            "tenant_id": row["tenant_id"],
+            "scheduled_deletion_at": row["scheduled_deletion_at"],
+            "days_remaining": max(0, (row["scheduled_deletion_at"] - now) / 86400) if row["scheduled_deletion_at"] else 0,
+            "reason": row["deletion_reason"]
+        }
+        for row in rows or []
+    ]
 
 
 def process_scheduled_deletions() -> Dict[str, Any]:
+    """Hard delete tenants whose grace period has ended; only due rows are read (indexed)."""
+    ensure_migrated()
     now = time.time()
     deleted = 0
     
-    for tenant_id, state in list(_tenant_states.items()):
-        if state.status == TenantStatus.PENDING_DELETION:
-            if state.scheduled_deletion_at and state.scheduled_deletion_at <= now:
-                hard_delete_tenant(tenant_id)
-                deleted += 1
+    while True:
+        due = execute_query(
+            "SELECT tenant_id FROM tenant_states WHERE status = ? AND scheduled_deletion_at <= ? "
+            "ORDER BY scheduled_deletion_at LIMIT ?",
+            (TenantStatus.PENDING_DELETION.value, now, DELETION_BATCH_SIZE)
+        ) or []
+        batch_deleted = 0
+        for row in due:
+            if hard_delete_tenant(row["tenant_id"]).get("success"):
+                batch_deleted += 1
+        deleted += batch_deleted
+        if len(due) < DELETION_BATCH_SIZE or batch_deleted == 0:
+            break
     
     return {
         "processed": deleted,
@@ -2,22 +2,48 @@
 Tenant Usage Metering Module - V10 Completion
 Track runs, credits, API calls, and errors per tenant.
 Integrates with tenant_lifecycle to respect suspend/soft-delete status.
+
+Counts are persisted in tenant_usage_counters and shared by all workers;
+increments are buffered in memory and merged write-behind (see metering.py).
 """
 import time
 import logging
 from typing import Dict, Any, Optional
 from dataclasses import dataclass, field
-from collections import defaultdict
+
+from modules.db_wrapper import execute_query
+from modules.migrations import ensure_migrated
+
+from .metering import (
+    RUNS,
+    API_CALLS,
+    AI_CREDITS,
+    ERRORS,
+    get_meter,
+    load_counters,
+)
 
 log = logging.getLogger("levqor.tenant_usage")
 
+DEFAULT_RUN_LIMIT = 1000
+DEFAULT_API_LIMIT = 10000
+DEFAULT_AI_CREDITS_LIMIT = 100.0
+
+_lifecycle_check = None
+
+
 def _is_tenant_operational(tenant_id: str) -> bool:
     """Check if tenant is operational via lifecycle module (lazy import to avoid circular deps)."""
-    try:
-        from modules.tenant_lifecycle import is_tenant_operational
-        return is_tenant_operational(tenant_id)
-    except ImportError:
-        return True
+    global _lifecycle_check
+    if _lifecycle_check is None:
+        try:
+            from modules.tenant_lifecycle import is_tenant_operational
+            _lifecycle_check = is_tenant_operational
+        except ImportError:
+            _lifecycle_check = lambda tenant_id: True
+    return _lifecycle_check(tenant_id)
+
+
 
 
 @dataclass
@@ -30,97 +56,112 @@ class TenantUsage:
     storage_bytes: int = 0
     last_activity: float = field(default_factory=time.time)
     
-    run_limit: int = 1000
-    api_limit: int = 10000
-    ai_credits_limit: float = 100.0
+    run_limit: int = DEFAULT_RUN_LIMIT
+    api_limit: int = DEFAULT_API_LIMIT
+    ai_credits_limit: float = DEFAULT_AI_CREDITS_LIMIT
     
     is_blocked: bool = False
     block_reason: Optional[str] = None
 
 
-_tenant_usage: Dict[str, TenantUsage] = {}
+def _usage_from_row(tenant_id: str, row: Optional[Dict[str, Any]], pending: Optional[list] = None) -> TenantUsage:
+    usage = TenantUsage(tenant_id=tenant_id)
+    if row is not None:
+        usage.workflow_runs = int(row["workflow_runs"] or 0)
+        usage.api_calls = int(row["api_calls"] or 0)
+        usage.ai_credits_used = float(row["ai_credits_used"] or 0)
+        usage.errors_count = int(row["errors_count"] or 0)
+        usage.storage_bytes = int(row["storage_bytes"] or 0)
+        usage.last_activity = row["last_activity"] or usage.last_activity
+        usage.run_limit = int(row["run_limit"])
+        usage.api_limit = int(row["api_limit"])
+        usage.ai_credits_limit = float(row["ai_credits_limit"])
+        usage.is_blocked = bool(row["is_blocked"])
+        usage.block_reason = row["block_reason"]
+    if pending is not None and any(pending):
+        usage.workflow_runs += pending[RUNS]
+        usage.api_calls += pending[API_CALLS]
+        usage.ai_credits_used += pending[AI_CREDITS]
+        usage.errors_count += pending[ERRORS]
+        usage.last_activity = time.time()
+    return usage
 
 
 def get_or_create_tenant(tenant_id: str) -> TenantUsage:
-    if tenant_id not in _tenant_usage:
-        _tenant_usage[tenant_id] = TenantUsage(tenant_id=tenant_id)
-    return _tenant_usage[tenant_id]
+    """Snapshot of a tenant's usage: persisted totals plus this process's unflushed counts."""
+    return _usage_from_row(tenant_id, load_counters(tenant_id), get_meter().counters.pending_for(tenant_id))
+
+
+def _ensure_counters_row(tenant_id: str):
+    ensure_migrated()
+    execute_query(
+        "INSERT INTO tenant_usage_counters (tenant_id, updated_at) VALUES (?, ?) ON CONFLICT (tenant_id) DO NOTHING",
+        (tenant_id, time.time()),
+        fetch=None
+    )
+
+
+def _limit_exceeded(tenant_id: str, reason: str) -> Dict[str, Any]:
+    get_meter().block(tenant_id, reason)
+    log.warning(f"Tenant {tenant_id} blocked: {reason}")
+    return {"success": False, "error": reason}
 
 
 def record_workflow_run(tenant_id: str) -> Dict[str, Any]:
     if not _is_tenant_operational(tenant_id):
         return {"success": False, "error": "Tenant is suspended or deleted", "code": "TENANT_NOT_OPERATIONAL"}
     
-    usage = get_or_create_tenant(tenant_id)
-    
-    if usage.is_blocked:
-        return {"success": False, "error": usage.block_reason or "Tenant is blocked"}
+    allowed, budget = get_meter().consume(tenant_id, RUNS)
     
-    if usage.workflow_runs >= usage.run_limit:
-        usage.is_blocked = True
-        usage.block_reason = f"Workflow run limit ({usage.run_limit}) exceeded"
-        log.warning(f"Tenant {tenant_id} blocked: run limit exceeded")
-        return {"success": False, "error": usage.block_reason}
+    if budget.blocked:
+        return {"success": False, "error": budget.block_reason or "Tenant is blocked"}
     
-    usage.workflow_runs += 1
-    usage.last_activity = time.time()
+    if not allowed:
+        return _limit_exceeded(tenant_id, f"Workflow run limit ({budget.limits[RUNS]}) exceeded")
     
-    return {"success": True, "runs": usage.workflow_runs, "remaining": usage.run_limit - usage.workflow_runs}
+    remaining = budget.remaining[RUNS]
+    return {"success": True, "runs": budget.limits[RUNS] - remaining, "remaining": remaining}
 
 
 def record_api_call(tenant_id: str) -> Dict[str, Any]:
     if not _is_tenant_operational(tenant_id):
         return {"success": False, "error": "Tenant is suspended or deleted", "code": "TENANT_NOT_OPERATIONAL"}
     
-    usage = get_or_create_tenant(tenant_id)
+    allowed, budget = get_meter().consume(tenant_id, API_CALLS)
     
-    if usage.is_blocked:
-        return {"success": False, "error": usage.block_reason or "Tenant is blocked"}
+    if budget.blocked:
+        return {"success": False, "error": budget.block_reason or "Tenant is blocked"}
     
-    if usage.api_calls >= usage.api_limit:
-        usage.is_blocked = True
-        usage.block_reason = f"API call limit ({usage.api_limit}) exceeded"
-        log.warning(f"Tenant {tenant_id} blocked: API limit exceeded")
-        return {"success": False, "error": usage.block_reason}
+    if not allowed:
+        return _limit_exceeded(tenant_id, f"API call limit ({budget.limits[API_CALLS]}) exceeded")
     
-    usage.api_calls += 1
-    usage.last_activity = time.time()
-    
-    return {"success": True, "calls": usage.api_calls, "remaining": usage.api_limit - usage.api_calls}
+    remaining = budget.remaining[API_CALLS]
+    return {"success": True, "calls": budget.limits[API_CALLS] - remaining, "remaining": remaining}
 
 
 def record_ai_credits(tenant_id: str, credits: float) -> Dict[str, Any]:
     if not _is_tenant_operational(tenant_id):
         return {"success": False, "error": "Tenant is suspended or deleted", "code": "TENANT_NOT_OPERATIONAL"}
     
-    usage = get_or_create_tenant(tenant_id)
-    
-    if usage.is_blocked:
-        return {"success": False, "error": usage.block_reason or "Tenant is blocked"}
+    allowed, budget = get_meter().consume(tenant_id, AI_CREDITS, credits)
     
-    if usage.ai_credits_used + credits > usage.ai_credits_limit:
-        usage.is_blocked = True
-        usage.block_reason = f"AI credits limit ({usage.ai_credits_limit}) exceeded"
-        log.warning(f"Tenant {tenant_id} blocked: AI credits exceeded")
-        return {"success": False, "error": usage.block_reason}
+    if budget.blocked:
+        return {"success": False, "error": budget.block_reason or "Tenant is blocked"}
     
-    usage.ai_credits_used += credits
-    usage.last_activity = time.time()
+    if not allowed:
+        return _limit_exceeded(tenant_id, f"AI credits limit ({budget.limits[AI_CREDITS]}) exceeded")
     
-    return {"success": True, "credits_used": usage.ai_credits_used, "remaining": usage.ai_credits_limit - usage.ai_credits_used}
+    remaining = budget.remaining[AI_CREDITS]
+    return {"success": True, "credits_used": budget.limits[AI_CREDITS] - remaining, "remaining": remaining}
 
 
 def record_error(tenant_id: str) -> None:
-    usage = get_or_create_tenant(tenant_id)
-    usage.errors_count += 1
-    usage.last_activity = time.time()
+    get_meter().count(tenant_id, ERRORS)
 
 
-def get_usage_summary(tenant_id: str) -> Dict[str, Any]:
-    usage = get_or_create_tenant(tenant_id)
-    
+def _summary(usage: TenantUsage) -> Dict[str, Any]:
     return {
-        "tenant_id": tenant_id,
+        "tenant_id": usage.tenant_id,
         "workflow_runs": usage.workflow_runs,
         "workflow_runs_limit": usage.run_limit,
         "workflow_runs_pct": (usage.workflow_runs / usage.run_limit * 100) if usage.run_limit > 0 else 0,
@@ -138,20 +179,32 @@ def get_usage_summary(tenant_id: str) -> Dict[str, Any]:
     }
 
 
+def get_usage_summary(tenant_id: str) -> Dict[str, Any]:
+    return _summary(get_or_create_tenant(tenant_id))
+
+
 def set_tenant_limits(
     tenant_id: str,
     run_limit: Optional[int] = None,
     api_limit: Optional[int] = None,
     ai_credits_limit: Optional[float] = None
 ) -> Dict[str, Any]:
-    usage = get_or_create_tenant(tenant_id)
-    
-    if run_limit is not None:
-        usage.run_limit = run_limit
-    if api_limit is not None:
-        usage.api_limit = api_limit
-    if ai_credits_limit is not None:
-        usage.ai_credits_limit = ai_credits_limit
+    _ensure_counters_row(tenant_id)
+    execute_query(
+        """
+        UPDATE tenant_usage_counters SET
+            run_limit = COALESCE(?, run_limit),
+            api_limit = COALESCE(?, api_limit),
+            ai_credits_limit = COALESCE(?, ai_credits_limit),
+            updated_at = ?
+        WHERE tenant_id = ?
+        """,
+        (run_limit, api_limit, ai_credits_limit, time.time(), tenant_id),
+        fetch=None,
+        commit=True
+    )
+    get_meter().invalidate(tenant_id)
+    usage = _usage_from_row(tenant_id, load_counters(tenant_id))
     
     log.info(f"Updated limits for tenant {tenant_id}: runs={usage.run_limit}, api={usage.api_limit}, ai={usage.ai_credits_limit}")
     
@@ -167,36 +220,57 @@ def set_tenant_limits(
 
 
 def unblock_tenant(tenant_id: str) -> Dict[str, Any]:
-    usage = get_or_create_tenant(tenant_id)
-    
-    was_blocked = usage.is_blocked
-    usage.is_blocked = False
-    usage.block_reason = None
+    row = load_counters(tenant_id)
+    was_blocked = bool(row and row["is_blocked"])
     
     if was_blocked:
+        execute_query(
+            "UPDATE tenant_usage_counters SET is_blocked = ?, block_reason = NULL, updated_at = ? WHERE tenant_id = ?",
+            (False, time.time(), tenant_id),
+            fetch=None,
+            commit=True
+        )
         log.info(f"Tenant {tenant_id} unblocked")
+    get_meter().invalidate(tenant_id)
     
     return {"success": True, "tenant_id": tenant_id, "was_blocked": was_blocked}
 
 
 def reset_usage(tenant_id: str) -> Dict[str, Any]:
-    usage = get_or_create_tenant(tenant_id)
-    
-    usage.workflow_runs = 0
-    usage.api_calls = 0
-    usage.ai_credits_used = 0
-    usage.errors_count = 0
-    usage.is_blocked = False
-    usage.block_reason = None
+    meter = get_meter()
+    meter.discard(tenant_id)
+    _ensure_counters_row(tenant_id)
+    execute_query(
+        """
+        UPDATE tenant_usage_counters SET
+            workflow_runs = 0, api_calls = 0, ai_credits_used = 0, errors_count = 0,
+            is_blocked = ?, block_reason = NULL, updated_at = ?
+        WHERE tenant_id = ?
+        """,
+        (False, time.time(), tenant_id),
+        fetch=None,
+        commit=True
+    )
+    meter.invalidate(tenant_id)
     
     log.info(f"Reset usage for tenant {tenant_id}")
     
     return {"success": True, "tenant_id": tenant_id}
 
 
+def flush_usage() -> int:
+    """Merge this process's buffered counts into the database now."""
+    return get_meter().flush()
+
+
 def get_all_tenants_usage() -> Dict[str, Any]:
+    """Usage of every tenant from the persisted aggregates."""
+    flush_usage()
+    ensure_migrated()
+    rows = execute_query("SELECT * FROM tenant_usage_counters ORDER BY tenant_id") or []
+    tenants = [_summary(_usage_from_row(row["tenant_id"], row)) for row in rows]
     return {
-        "tenants": [get_usage_summary(tid) for tid in _tenant_usage.keys()],
-        "total_tenants": len(_tenant_usage),
-        "blocked_tenants": sum(1 for u in _tenant_usage.values() if u.is_blocked)
+        "tenants": tenants,
+        "total_tenants": len(tenants),
+        "blocked_tenants": sum(1 for t in tenants if t["is_blocked"])
     }
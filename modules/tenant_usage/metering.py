@@ -0,0 +1,385 @@
+"""
+Write-behind usage metering for tenant_usage
+
+Hot-path increments only touch process memory, without locks or clock
+reads:
+    - counters are sharded per thread; each thread only bumps its own
+      cumulative counts, and the flusher writes the difference to what it
+      flushed last time
+    - quota checks use a per-tenant remaining budget cached for
+      TENANT_USAGE_LEASE_SECONDS (expired by the flusher), then refreshed
+      from the persisted totals
+
+A daemon thread merges the shards every TENANT_USAGE_FLUSH_SECONDS into
+tenant_usage_counters with one atomic upsert per tenant (count = count +
+delta), so every worker adds to the same row. If a flush fails the flushed
+marks are not advanced and the same deltas go out on the next tick.
+
+Quota overshoot across workers is bounded by what the other workers can
+consume within one lease.
+
+Tuning:
+    TENANT_USAGE_FLUSH_SECONDS - merge interval (default 2)
+    TENANT_USAGE_LEASE_SECONDS - budget cache lifetime (default 5)
+"""
+import os
+import time
+import atexit
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from modules.db_wrapper import execute_query, execute_many, commit, rollback
+from modules.migrations import ensure_migrated
+
+log = logging.getLogger("levqor.tenant_usage.metering")
+
+TENANT_USAGE_FLUSH_SECONDS = float(os.environ.get("TENANT_USAGE_FLUSH_SECONDS", "2"))
+TENANT_USAGE_LEASE_SECONDS = float(os.environ.get("TENANT_USAGE_LEASE_SECONDS", "5"))
+
+# Slots of a counter row
+RUNS, API_CALLS, AI_CREDITS, ERRORS = range(4)
+_SLOTS = 4
+
+_LIMIT_COLUMNS = {RUNS: "run_limit", API_CALLS: "api_limit", AI_CREDITS: "ai_credits_limit"}
+_USED_COLUMNS = {RUNS: "workflow_runs", API_CALLS: "api_calls", AI_CREDITS: "ai_credits_used"}
+# Slots also recorded per UTC day in the usage_daily_rollups ledger
+_LEDGER_SLOTS = (API_CALLS, AI_CREDITS)
+
+_MERGE_SQL = """
+    INSERT INTO tenant_usage_counters
+        (tenant_id, workflow_runs, api_calls, ai_credits_used, errors_count, last_activity, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (tenant_id) DO UPDATE SET
+        workflow_runs = tenant_usage_counters.workflow_runs + excluded.workflow_runs,
+        api_calls = tenant_usage_counters.api_calls + excluded.api_calls,
+        ai_credits_used = tenant_usage_counters.ai_credits_used + excluded.ai_credits_used,
+        errors_count = tenant_usage_counters.errors_count + excluded.errors_count,
+        last_activity = excluded.last_activity,
+        updated_at = excluded.updated_at
+"""
+
+
+def _new_row() -> list:
+    return [0, 0, 0.0, 0]
+
+
+class _Shard:
+    """
+    Cumulative counts written by one thread only. The flusher never mutates
+    them; it keeps its own copy of what was already flushed and writes the
+    difference, so the owning thread needs no lock.
+    """
+    __slots__ = ("thread", "counts", "ledger", "flushed_counts", "flushed_ledger")
+
+    def __init__(self, thread: threading.Thread):
+        self.thread = thread
+        self.counts: Dict[str, list] = {}
+        # (utc day number, tenant_id, slot) -> amount, for the daily usage ledger
+        self.ledger: Dict[Tuple[int, str, int], float] = {}
+        # Flusher-owned
+        self.flushed_counts: Dict[str, list] = {}
+        self.flushed_ledger: Dict[Tuple[int, str, int], float] = {}
+
+
+class ShardedCounters:
+    """Per-thread counters; deltas are taken by the flusher under the caller's lock."""
+
+    def __init__(self):
+        self._shards: List[_Shard] = []
+        self._shards_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _new_shard(self) -> _Shard:
+        shard = _Shard(threading.current_thread())
+        with self._shards_lock:
+            self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+
+    def add(self, tenant_id: str, slot: int, amount=1):
+        try:
+            counts = self._local.shard.counts
+        except AttributeError:
+            counts = self._new_shard().counts
+        row = counts.get(tenant_id)
+        if row is None:
+            row = counts[tenant_id] = _new_row()
+        row[slot] += amount
+
+    def add_ledger(self, tenant_id: str, slot: int, amount):
+        try:
+            ledger = self._local.shard.ledger
+        except AttributeError:
+            ledger = self._new_shard().ledger
+        key = (int(time.time() // 86400), tenant_id, slot)
+        ledger[key] = ledger.get(key, 0) + amount
+
+    def _snapshot(self) -> List[_Shard]:
+        with self._shards_lock:
+            return list(self._shards)
+
+    def pending_for(self, tenant_id: str) -> list:
+        """Unflushed counts of one tenant in this process."""
+        total = _new_row()
+        for shard in self._snapshot():
+            row = shard.counts.get(tenant_id)
+            if row is None:
+                continue
+            flushed = shard.flushed_counts.get(tenant_id) or _new_row()
+            for i in range(_SLOTS):
+                total[i] += row[i] - flushed[i]
+        return total
+
+    def deltas(self) -> Tuple[Dict[str, list], Dict[Tuple[int, str, int], float], list]:
+        """
+        Unflushed deltas of all shards, plus the marks to pass to commit()
+        once they are persisted. Nothing changes if commit() is not called.
+        """
+        pending: Dict[str, list] = {}
+        ledger: Dict[Tuple[int, str, int], float] = {}
+        marks = []
+        for shard in self._snapshot():
+            # dict() copies are atomic under the GIL; rows are copied too
+            # so increments racing with the flush land in the next one
+            counts = {tenant: list(row) for tenant, row in dict(shard.counts).items()}
+            daily = dict(shard.ledger)
+            for tenant_id, row in counts.items():
+                flushed = shard.flushed_counts.get(tenant_id) or _new_row()
+                delta = [row[i] - flushed[i] for i in range(_SLOTS)]
+                if any(delta):
+                    total = pending.setdefault(tenant_id, _new_row())
+                    for i in range(_SLOTS):
+                        total[i] += delta[i]
+            for key, value in daily.items():
+                delta = value - shard.flushed_ledger.get(key, 0.0)
+                if delta:
+                    ledger[key] = ledger.get(key, 0.0) + delta
+            marks.append((shard, counts, daily))
+        return pending, ledger, marks
+
+    def commit(self, marks: list):
+        """Advance the flushed marks and drop shards of finished threads."""
+        finished = []
+        for shard, counts, daily in marks:
+            shard.flushed_counts = counts
+            shard.flushed_ledger = daily
+            if not shard.thread.is_alive() and shard.counts == counts and shard.ledger == daily:
+                finished.append(shard)
+        if finished:
+            with self._shards_lock:
+                self._shards = [s for s in self._shards if s not in finished]
+
+    def discard(self, tenant_id: str):
+        """Mark a tenant's unflushed counts as flushed (used by reset)."""
+        for shard in self._snapshot():
+            row = shard.counts.get(tenant_id)
+            if row is not None:
+                shard.flushed_counts[tenant_id] = list(row)
+            for key, value in list(shard.ledger.items()):
+                if key[1] == tenant_id:
+                    shard.flushed_ledger[key] = value
+
+
+class _Budget:
+    """Remaining quota of one tenant, dropped by the flusher after expires_at (monotonic)."""
+    __slots__ = ("remaining", "limits", "blocked", "block_reason", "expires_at")
+
+    def __init__(self, remaining: list, limits: list, blocked: bool, block_reason: Optional[str], expires_at: float):
+        self.remaining = remaining
+        self.limits = limits
+        self.blocked = blocked
+        self.block_reason = block_reason
+        self.expires_at = expires_at
+
+
+def load_counters(tenant_id: str) -> Optional[Dict[str, Any]]:
+    """Persisted counter row of a tenant, or None."""
+    ensure_migrated()
+    return execute_query(
+        "SELECT * FROM tenant_usage_counters WHERE tenant_id = ?",
+        (tenant_id,),
+        fetch="one"
+    )
+
+
+class UsageMeter:
+    """Process-wide meter: sharded counters, leased budgets and the flusher."""
+
+    def __init__(self):
+        self.counters = ShardedCounters()
+        self._budgets: Dict[str, _Budget] = {}
+        self._flush_lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._flushes = 0
+        self._flush_errors = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="tenant-usage-flusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(TENANT_USAGE_FLUSH_SECONDS):
+            self.expire_budgets()
+            self.flush()
+
+    # --- hot path ---
+
+    def consume(self, tenant_id: str, slot: int, amount=1) -> Tuple[bool, _Budget]:
+        """
+        Charge amount against the tenant's cached budget and count it.
+        Returns (allowed, budget); nothing is counted when not allowed.
+        """
+        budget = self._budgets.get(tenant_id)
+        if budget is None:
+            budget = self.refresh_budget(tenant_id)
+        if budget.blocked or budget.remaining[slot] < amount:
+            return False, budget
+        budget.remaining[slot] -= amount
+        self.counters.add(tenant_id, slot, amount)
+        if slot in _LEDGER_SLOTS:
+            self.counters.add_ledger(tenant_id, slot, amount)
+        return True, budget
+
+    def count(self, tenant_id: str, slot: int, amount=1):
+        """Count without a quota check."""
+        self.counters.add(tenant_id, slot, amount)
+
+    # --- budgets ---
+
+    def refresh_budget(self, tenant_id: str) -> _Budget:
+        """Re-read persisted totals and limits; local unflushed counts are subtracted."""
+        # Hold the flush lock so a batch that is written but not yet marked
+        # flushed is not counted by both the DB read and pending_for()
+        with self._flush_lock:
+            row = load_counters(tenant_id)
+            pending = self.counters.pending_for(tenant_id)
+
+        if row is None:
+            from modules.tenant_usage import DEFAULT_RUN_LIMIT, DEFAULT_API_LIMIT, DEFAULT_AI_CREDITS_LIMIT
+            limits = [DEFAULT_RUN_LIMIT, DEFAULT_API_LIMIT, DEFAULT_AI_CREDITS_LIMIT]
+            used = [0, 0, 0.0]
+            blocked, reason = False, None
+        else:
+            limits = [row[_LIMIT_COLUMNS[i]] for i in (RUNS, API_CALLS, AI_CREDITS)]
+            used = [row[_USED_COLUMNS[i]] or 0 for i in (RUNS, API_CALLS, AI_CREDITS)]
+            blocked, reason = bool(row["is_blocked"]), row["block_reason"]
+
+        remaining = [limits[i] - used[i] - pending[i] for i in (RUNS, API_CALLS, AI_CREDITS)]
+        budget = _Budget(remaining, limits, blocked, reason, time.monotonic() + TENANT_USAGE_LEASE_SECONDS)
+        self._budgets[tenant_id] = budget
+        return budget
+
+    def expire_budgets(self):
+        """Drop budgets past their lease; the next charge re-reads the database."""
+        now = time.monotonic()
+        for tenant_id, budget in list(self._budgets.items()):
+            if budget.expires_at <= now:
+                self._budgets.pop(tenant_id, None)
+
+    def invalidate(self, tenant_id: str):
+        self._budgets.pop(tenant_id, None)
+
+    def block(self, tenant_id: str, reason: str):
+        """Persist a block right away so other workers see it on their next lease."""
+        ensure_migrated()
+        now = time.time()
+        execute_query(
+            """
+            INSERT INTO tenant_usage_counters (tenant_id, is_blocked, block_reason, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (tenant_id) DO UPDATE SET
+                is_blocked = excluded.is_blocked,
+                block_reason = excluded.block_reason,
+                updated_at = excluded.updated_at
+            """,
+            (tenant_id, True, reason, now),
+            fetch=None,
+            commit=True
+        )
+        budget = self._budgets.get(tenant_id)
+        if budget is not None:
+            budget.blocked = True
+            budget.block_reason = reason
+
+    def discard(self, tenant_id: str):
+        """Forget this process's unflushed counts of a tenant."""
+        with self._flush_lock:
+            self.counters.discard(tenant_id)
+
+    # --- write-behind ---
+
+    def flush(self) -> int:
+        """Merge unflushed counts into tenant_usage_counters. Returns tenants written."""
+        with self._flush_lock:
+            pending, ledger, marks = self.counters.deltas()
+            if not pending and not ledger:
+                self.counters.commit(marks)
+                return 0
+
+            now = time.time()
+            rows = [
+                (tenant_id, d[RUNS], d[API_CALLS], d[AI_CREDITS], d[ERRORS], now, now)
+                for tenant_id, d in pending.items()
+            ]
+            try:
+                ensure_migrated()
+                execute_many(_MERGE_SQL, rows)
+                if ledger:
+                    from modules.usage_rollups import add_ledger_usage
+                    daily: Dict[Tuple[int, str], list] = {}
+                    for (day, tenant_id, slot), amount in ledger.items():
+                        daily.setdefault((day, tenant_id), [0, 0.0])[_LEDGER_SLOTS.index(slot)] += amount
+                    add_ledger_usage([
+                        (time.strftime("%Y-%m-%d", time.gmtime(day * 86400)), tenant_id, api_calls, credits)
+                        for (day, tenant_id), (api_calls, credits) in daily.items()
+                    ], commit_now=False)
+                commit()
+            except Exception as e:
+                try:
+                    rollback()
+                except Exception:
+                    pass
+                self._flush_errors += 1
+                log.warning(f"Usage flush failed, {len(rows)} tenant(s) kept for retry: {e}")
+                return 0
+
+            self.counters.commit(marks)
+            self._flushes += 1
+            return len(rows)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "flushes": self._flushes,
+            "flush_errors": self._flush_errors,
+            "cached_budgets": len(self._budgets),
+            "flush_seconds": TENANT_USAGE_FLUSH_SECONDS,
+            "lease_seconds": TENANT_USAGE_LEASE_SECONDS
+        }
+
+
+_meter: Optional[UsageMeter] = None
+_meter_pid: Optional[int] = None
+_meter_lock = threading.Lock()
+
+
+def get_meter() -> UsageMeter:
+    """Return the process-wide meter (recreated after fork), starting its flusher."""
+    global _meter, _meter_pid
+    if _meter is not None and _meter_pid == os.getpid():
+        return _meter
+    with _meter_lock:
+        if _meter is None or _meter_pid != os.getpid():
+            meter = UsageMeter()
+            meter.start()
+            _meter = meter
+            _meter_pid = os.getpid()
+    return _meter
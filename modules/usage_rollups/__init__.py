@@ -0,0 +1,269 @@
+"""
+Daily Usage Rollups
+Per-day workflow, run, API call and AI credit totals for the usage export.
+
+Sources:
+    workflows, runs  - workflow_runs (tenant from the owning workflow)
+    api_calls        - all tenants: api_usage_log (every API key call);
+                       per tenant: usage_daily_rollups ledger, written by
+                       the modules.tenant_usage write-behind flush
+    ai_credits       - usage_daily_rollups ledger, as for tenant api_calls
+
+Closed (UTC) days are rolled up once into usage_daily_rollups by the
+scheduler and listed in usage_rollup_days, together with the day's
+api_usage_log count; iter_daily_usage reads those rows and only aggregates
+the raw tables for days not rolled up yet (today, or a backlog the job has
+not reached).
+
+Ranges are walked in windows of USAGE_EXPORT_WINDOW_DAYS, so memory stays
+bounded by the window no matter how long the requested range is.
+
+Usage:
+    from modules.usage_rollups import iter_daily_usage
+    for row in iter_daily_usage(date(2025, 1, 1), date(2025, 3, 31), tenant_id="acme"):
+        ...
+"""
+import os
+import time
+import calendar
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Any, Iterator, List, Optional
+
+from modules.db_wrapper import execute_query, execute_many, get_db_type, commit
+from modules.migrations import ensure_migrated
+
+log = logging.getLogger("levqor.usage_rollups")
+
+USAGE_EXPORT_WINDOW_DAYS = int(os.environ.get("USAGE_EXPORT_WINDOW_DAYS", "31"))
+USAGE_ROLLUP_MAX_DAYS = int(os.environ.get("USAGE_ROLLUP_MAX_DAYS", "30"))
+
+USAGE_FIELDS = ["date", "workflows", "runs", "api_calls", "ai_credits"]
+
+_UPSERT_ROLLUP_SQL = """
+    INSERT INTO usage_daily_rollups (day, tenant_id, workflows, runs, updated_at)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (day, tenant_id) DO UPDATE SET
+        workflows = excluded.workflows,
+        runs = excluded.runs,
+        updated_at = excluded.updated_at
+"""
+
+_ADD_LEDGER_SQL = """
+    INSERT INTO usage_daily_rollups (day, tenant_id, api_calls, ai_credits, updated_at)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (day, tenant_id) DO UPDATE SET
+        api_calls = usage_daily_rollups.api_calls + excluded.api_calls,
+        ai_credits = usage_daily_rollups.ai_credits + excluded.ai_credits,
+        updated_at = excluded.updated_at
+"""
+
+
+def _day_expr(column: str) -> str:
+    """SQL expression for the UTC calendar day (YYYY-MM-DD) of an epoch column."""
+    if get_db_type() == "postgresql":
+        return f"to_char(to_timestamp({column}) AT TIME ZONE 'UTC', 'YYYY-MM-DD')"
+    return f"strftime('%Y-%m-%d', {column}, 'unixepoch')"
+
+
+def _epoch(day: date) -> float:
+    return float(calendar.timegm(day.timetuple()))
+
+
+def _utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _run_counts(start: date, end: date, tenant_id: Optional[str], by_tenant: bool = False) -> Dict[tuple, Dict[str, int]]:
+    """
+    Aggregate workflow_runs for [start, end] straight from the raw table.
+    Keys are (day,) or (day, tenant_id) when by_tenant.
+    """
+    lo, hi = _epoch(start), _epoch(end + timedelta(days=1))
+    run_tenant = "COALESCE(w.tenant_id, 'default')"
+    run_sql = f"""
+        SELECT {_day_expr('wr.started_at')} AS day,
+               {run_tenant + ' AS tenant_id,' if by_tenant else ''}
+               COUNT(DISTINCT wr.workflow_id) AS workflows,
+               COUNT(*) AS runs
+        FROM workflow_runs wr
+        LEFT JOIN workflows w ON w.id = wr.workflow_id
+        WHERE wr.started_at >= ? AND wr.started_at < ?
+    """
+    run_params: List[Any] = [lo, hi]
+    if tenant_id:
+        run_sql += f" AND {run_tenant} = ?"
+        run_params.append(tenant_id)
+    run_sql += " GROUP BY 1, 2" if by_tenant else " GROUP BY 1"
+
+    counts: Dict[tuple, Dict[str, int]] = {}
+    for row in execute_query(run_sql, tuple(run_params)) or []:
+        key = (row["day"], row["tenant_id"]) if by_tenant else (row["day"],)
+        counts[key] = {"workflows": int(row["workflows"] or 0), "runs": int(row["runs"] or 0)}
+    return counts
+
+
+def _api_calls(start: date, end: date) -> Dict[str, int]:
+    """Platform-wide api_usage_log calls per day for [start, end]."""
+    lo, hi = _epoch(start), _epoch(end + timedelta(days=1))
+    rows = execute_query(f"""
+        SELECT {_day_expr('created_at')} AS day, COUNT(*) AS api_calls
+        FROM api_usage_log
+        WHERE created_at >= ? AND created_at < ?
+        GROUP BY 1
+    """, (lo, hi)) or []
+    return {row["day"]: int(row["api_calls"] or 0) for row in rows}
+
+
+def _iter_window(start: date, end: date, tenant_id: Optional[str]) -> Iterator[Dict[str, Any]]:
+    lo, hi = start.isoformat(), end.isoformat()
+
+    rolled_up = {
+        row["day"]: row for row in execute_query(
+            "SELECT day, api_calls FROM usage_rollup_days WHERE day >= ? AND day <= ?", (lo, hi)
+        ) or []
+    }
+
+    rollup_sql = """
+        SELECT day, SUM(workflows) AS workflows, SUM(runs) AS runs,
+               SUM(api_calls) AS api_calls, SUM(ai_credits) AS ai_credits
+        FROM usage_daily_rollups
+        WHERE {tenant}day >= ? AND day <= ?
+        GROUP BY day ORDER BY day
+    """
+    if tenant_id:
+        rollups = execute_query(rollup_sql.format(tenant="tenant_id = ? AND "), (tenant_id, lo, hi))
+    else:
+        rollups = execute_query(rollup_sql.format(tenant=""), (lo, hi))
+    rollups = {row["day"]: row for row in rollups or []}
+
+    pending = [
+        start + timedelta(days=i)
+        for i in range((end - start).days + 1)
+        if (start + timedelta(days=i)).isoformat() not in rolled_up
+    ]
+    live = _run_counts(pending[0], pending[-1], tenant_id) if pending else {}
+    live_api = _api_calls(pending[0], pending[-1]) if pending and not tenant_id else {}
+
+    day = start
+    while day <= end:
+        key = day.isoformat()
+        rollup = rollups.get(key) or {}
+        counts = rollup if key in rolled_up else live.get((key,), {})
+        if tenant_id:
+            # The tenant's metered calls, from the ledger
+            api_calls = rollup.get("api_calls")
+        elif key in rolled_up:
+            api_calls = rolled_up[key]["api_calls"]
+        else:
+            api_calls = live_api.get(key)
+        yield {
+            "date": key,
+            "workflows": int(counts.get("workflows") or 0),
+            "runs": int(counts.get("runs") or 0),
+            "api_calls": int(api_calls or 0),
+            "ai_credits": round(float(rollup.get("ai_credits") or 0), 4)
+        }
+        day += timedelta(days=1)
+
+
+def iter_daily_usage(start: date, end: date, tenant_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield one usage row per day from start to end (inclusive), oldest first.
+    Days without activity are included with zero counts.
+    """
+    ensure_migrated()
+    window = timedelta(days=max(1, USAGE_EXPORT_WINDOW_DAYS))
+    cursor = start
+    while cursor <= end:
+        window_end = min(end, cursor + window - timedelta(days=1))
+        yield from _iter_window(cursor, window_end, tenant_id)
+        cursor = window_end + timedelta(days=1)
+
+
+def rollup_day(day: date) -> int:
+    """
+    Aggregate one closed day into usage_daily_rollups and mark it rolled up.
+    Re-running a day overwrites its counts (the API call and AI credit
+    ledger is kept).
+
+    Returns:
+        Number of tenant rows written
+    """
+    ensure_migrated()
+    if day >= _utc_today():
+        raise ValueError(f"Day {day.isoformat()} is not closed yet")
+
+    now = time.time()
+    counts = _run_counts(day, day, None, by_tenant=True)
+    rows = [
+        (key[0], key[1] or "default", c["workflows"], c["runs"], now)
+        for key, c in counts.items()
+    ]
+
+    execute_many(_UPSERT_ROLLUP_SQL, rows)
+    execute_query(
+        "INSERT INTO usage_rollup_days (day, api_calls, rolled_up_at) VALUES (?, ?, ?) "
+        "ON CONFLICT (day) DO UPDATE SET api_calls = excluded.api_calls, rolled_up_at = excluded.rolled_up_at",
+        (day.isoformat(), _api_calls(day, day).get(day.isoformat(), 0), now),
+        fetch=None
+    )
+    commit()
+    return len(rows)
+
+
+def rollup_pending_days(max_days: int = None) -> Dict[str, Any]:
+    """
+    Roll up closed days that have no rollup yet, going back at most
+    max_days (USAGE_ROLLUP_MAX_DAYS) from yesterday.
+    """
+    ensure_migrated()
+    max_days = max_days or USAGE_ROLLUP_MAX_DAYS
+    yesterday = _utc_today() - timedelta(days=1)
+    first = yesterday - timedelta(days=max_days - 1)
+
+    done = {
+        row["day"] for row in execute_query(
+            "SELECT day FROM usage_rollup_days WHERE day >= ? AND day <= ?",
+            (first.isoformat(), yesterday.isoformat())
+        ) or []
+    }
+
+    rolled = []
+    day = first
+    while day <= yesterday:
+        if day.isoformat() not in done:
+            rollup_day(day)
+            rolled.append(day.isoformat())
+        day += timedelta(days=1)
+
+    if rolled:
+        log.info(f"Rolled up usage for {len(rolled)} day(s): {rolled[0]}..{rolled[-1]}")
+    return {"rolled_up": rolled, "count": len(rolled)}
+
+
+def add_ledger_usage(rows: List[tuple], commit_now: bool = True) -> int:
+    """
+    Add metered tenant API calls and AI credits to the per-day ledger.
+
+    Args:
+        rows: (day 'YYYY-MM-DD', tenant_id, api_calls, credits) tuples
+        commit_now: False to leave the commit to the caller's transaction
+    """
+    ensure_migrated()
+    now = time.time()
+    written = execute_many(_ADD_LEDGER_SQL, [
+        (day, tenant, int(api_calls), float(credits), now) for day, tenant, api_calls, credits in rows
+    ])
+    if commit_now and written:
+        commit()
+    return written
+
+
+__all__ = [
+    "USAGE_FIELDS",
+    "iter_daily_usage",
+    "rollup_day",
+    "rollup_pending_days",
+    "add_ledger_usage",
+]
@@ -1,14 +1,30 @@
 """
 Workflow Validator Module - V10 Completion
 Deep logic validation, guardrails, schema enforcement.
+
+Step connections are checked in one pass over the step graph (edges are
+next_step_ids, the entry is the first step): a Tarjan SCC walk started at
+the entry yields cycles, unreachable steps and, for acyclic workflows, the
+topological order together in O(steps + edges).
+
+Results are cached by a canonical hash of the workflow's name and steps
+(WORKFLOW_VALIDATION_CACHE_SIZE entries), so re-validating an unchanged
+workflow is a hash and a dict lookup.
 """
+import os
+import json
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
 from typing import Dict, Any, List, Optional
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from enum import Enum
 
 log = logging.getLogger("levqor.workflow_validator")
 
+WORKFLOW_VALIDATION_CACHE_SIZE = int(os.environ.get("WORKFLOW_VALIDATION_CACHE_SIZE", "1024"))
+
 
 class ValidationSeverity(str, Enum):
     ERROR = "error"
@@ -31,6 +47,9 @@ class ValidationResult:
     valid: bool
     issues: List[ValidationIssue] = field(default_factory=list)
     score: int = 100  # 0-100 quality score
+    topological_order: Optional[List[str]] = None  # None when the workflow has cycles
+    unreachable_steps: List[str] = field(default_factory=list)
+    cycles: List[List[str]] = field(default_factory=list)
     
     def add_error(self, code: str, message: str, step_id: Optional[str] = None, field: Optional[str] = None, suggestion: Optional[str] = None):
         self.issues.append(ValidationIssue(ValidationSeverity.ERROR, code, message, step_id, field, suggestion))
@@ -60,14 +79,71 @@ class ValidationResult:
                 for i in self.issues
             ],
             "error_count": sum(1 for i in self.issues if i.severity == ValidationSeverity.ERROR),
-            "warning_count": sum(1 for i in self.issues if i.severity == ValidationSeverity.WARNING)
+            "warning_count": sum(1 for i in self.issues if i.severity == ValidationSeverity.WARNING),
+            "topological_order": self.topological_order,
+            "unreachable_steps": self.unreachable_steps,
+            "cycles": self.cycles
         }
 
 
+@dataclass
+class GraphAnalysis:
+    topological_order: Optional[List[str]]
+    cycles: List[List[str]]
+    unreachable: List[str]
+    invalid_refs: List[tuple]  # (step_id, missing next_step_id)
+
+
 VALID_STEP_TYPES = ["log", "http_request", "email", "delay", "condition", "transform", "webhook", "database"]
 
 
-def validate_workflow(workflow: Dict[str, Any]) -> ValidationResult:
+_cache: "OrderedDict[str, ValidationResult]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def workflow_hash(workflow: Dict[str, Any]) -> str:
+    """Canonical hash of the parts of a workflow that validation reads."""
+    raw = json.dumps(
+        [workflow.get("name"), workflow.get("steps", [])],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def validate_workflow(workflow: Dict[str, Any], use_cache: bool = True) -> ValidationResult:
+    if not use_cache or WORKFLOW_VALIDATION_CACHE_SIZE <= 0:
+        return _validate_workflow(workflow)
+    
+    key = workflow_hash(workflow)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+    if cached is None:
+        cached = _validate_workflow(workflow)
+        with _cache_lock:
+            _cache[key] = cached
+            while len(_cache) > WORKFLOW_VALIDATION_CACHE_SIZE:
+                _cache.popitem(last=False)
+    
+    # Callers may add issues to the result; the cached copy stays untouched
+    return replace(
+        cached,
+        issues=list(cached.issues),
+        topological_order=list(cached.topological_order) if cached.topological_order is not None else None,
+        unreachable_steps=list(cached.unreachable_steps),
+        cycles=[list(cycle) for cycle in cached.cycles]
+    )
+
+
+def clear_validation_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _validate_workflow(workflow: Dict[str, Any]) -> ValidationResult:
     result = ValidationResult(valid=True)
     
     if not workflow.get("name"):
@@ -102,9 +178,23 @@ def validate_workflow(workflow: Dict[str, Any]) -> ValidationResult:
             elif issue.severity == ValidationSeverity.WARNING:
                 result.score -= 5
     
-    validate_step_connections(steps, step_ids, result)
+    graph = analyze_graph(steps)
+    
+    for step_id, next_id in graph.invalid_refs:
+        result.add_error("INVALID_NEXT_STEP", f"Step {step_id} references non-existent step {next_id}",
+                       step_id=step_id, suggestion="Fix step reference")
+    
+    for cycle in graph.cycles:
+        result.add_warning("POTENTIAL_LOOP", f"Potential infinite loop through steps: {' -> '.join(cycle)}",
+                          step_id=cycle[0], suggestion="Review workflow logic")
     
-    detect_infinite_loops(steps, result)
+    for step_id in graph.unreachable:
+        result.add_warning("UNREACHABLE_STEP", f"Step {step_id} is never reached from the first step",
+                          step_id=step_id, suggestion="Connect it via next_step_ids or remove it")
+    
+    result.topological_order = graph.topological_order
+    result.cycles = graph.cycles
+    result.unreachable_steps = graph.unreachable
     
     return result
 
@@ -193,44 +283,109 @@ def validate_condition_step(config: Dict[str, Any], step_id: str, result: Valida
         result.add_warning("CONDITION_NO_BRANCHES", "Condition has no branches defined", step_id=step_id)
 
 
-def validate_step_connections(steps: List[Dict[str, Any]], step_ids: set, result: ValidationResult):
+def analyze_graph(steps: List[Dict[str, Any]]) -> GraphAnalysis:
+    """
+    Cycles, unreachable steps and topological order of the step graph.
+    
+    One adjacency build, then an iterative Tarjan SCC walk rooted at the
+    first step (so the steps visited by that root are the reachable ones).
+    Tarjan emits SCCs in reverse topological order; for an acyclic graph,
+    reversed, that is the execution-safe order of all steps.
+    """
+    ids: List[str] = []
+    index_of: Dict[str, int] = {}
     for step in steps:
-        step_id = step.get("id", "")
-        next_steps = step.get("next_step_ids", [])
-        
-        for next_id in next_steps:
-            if next_id and next_id not in step_ids:
-                result.add_error("INVALID_NEXT_STEP", f"Step {step_id} references non-existent step {next_id}",
-                               step_id=step_id, suggestion="Fix step reference")
-
-
-def detect_infinite_loops(steps: List[Dict[str, Any]], result: ValidationResult):
-    step_map = {s.get("id"): s for s in steps}
+        step_id = step.get("id")
+        if step_id and step_id not in index_of:
+            index_of[step_id] = len(ids)
+            ids.append(step_id)
     
+    n = len(ids)
+    adjacency: List[List[int]] = [[] for _ in range(n)]
+    self_loops = set()
+    invalid_refs = []
     for step in steps:
-        step_id = step.get("id", "")
-        visited = set()
-        
-        def check_path(current_id: str, path: List[str]) -> bool:
-            if current_id in visited:
-                return True  # Loop detected
-            if current_id not in step_map:
-                return False
-            
-            visited.add(current_id)
-            current_step = step_map[current_id]
-            next_steps = current_step.get("next_step_ids", [])
-            
-            for next_id in next_steps:
-                if check_path(next_id, path + [current_id]):
-                    return True
-            
-            return False
-        
-        if check_path(step_id, []):
-            result.add_warning("POTENTIAL_LOOP", f"Potential infinite loop detected starting from {step_id}",
-                              step_id=step_id, suggestion="Review workflow logic")
-            break
+        step_id = step.get("id")
+        if not step_id:
+            continue
+        source = index_of[step_id]
+        for next_id in step.get("next_step_ids") or []:
+            if not next_id:
+                continue
+            target = index_of.get(next_id)
+            if target is None:
+                invalid_refs.append((step_id, next_id))
+                continue
+            if target == source:
+                self_loops.add(source)
+            adjacency[source].append(target)
+    
+    order = [-1] * n  # discovery index
+    low = [0] * n
+    on_stack = [False] * n
+    stack: List[int] = []
+    components: List[List[int]] = []
+    counter = 0
+    reachable = 0
+    
+    for root in range(n):
+        if order[root] != -1:
+            continue
+        work = [(root, 0)]
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            node, edge = work[-1]
+            if edge < len(adjacency[node]):
+                work[-1] = (node, edge + 1)
+                child = adjacency[node][edge]
+                if order[child] == -1:
+                    order[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack[child] = True
+                    work.append((child, 0))
+                elif on_stack[child]:
+                    low[node] = min(low[node], order[child])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == order[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+        if root == 0:
+            reachable = counter
+    
+    cycles = [
+        [ids[i] for i in sorted(component)]
+        for component in components
+        if len(component) > 1 or component[0] in self_loops
+    ]
+    cycles.sort(key=lambda cycle: index_of[cycle[0]])
+    
+    # Discovery indexes below `reachable` belong to the walk from the first step
+    unreachable = [ids[i] for i in range(n) if order[i] >= reachable]
+    
+    topological_order = None
+    if not cycles:
+        topological_order = [ids[component[0]] for component in reversed(components)]
+    
+    return GraphAnalysis(
+        topological_order=topological_order,
+        cycles=cycles,
+        unreachable=unreachable,
+        invalid_refs=invalid_refs
+    )
 
 
 def lint_workflow(workflow: Dict[str, Any]) -> Dict[str, Any]:
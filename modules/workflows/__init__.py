@@ -1,10 +1,12 @@
 """
 Workflow Execution Engine - MEGA PHASE v15-v18
-Provides workflow definition, execution, and event logging
+Provides workflow definition, execution (blocking runner or durable async
+engine), and event logging
 """
 from .models import Workflow, WorkflowStep, WorkflowRun, StepType
 from .runner import run_workflow, WorkflowRunner
-from .events import record_workflow_run_start, record_workflow_run_end, record_workflow_step_event
+from .events import record_workflow_run_start, record_workflow_run_end, record_workflow_step_event, RunEventBuffer
+from .engine import AsyncWorkflowEngine, get_engine, submit_workflow_run
 
 __all__ = [
     'Workflow',
@@ -16,4 +18,8 @@ __all__ = [
     'record_workflow_run_start',
     'record_workflow_run_end',
     'record_workflow_step_event',
+    'RunEventBuffer',
+    'AsyncWorkflowEngine',
+    'get_engine',
+    'submit_workflow_run',
 ]
@@ -0,0 +1,448 @@
+"""
+Async Workflow Engine - MEGA PHASE v15
+Durable state-machine execution for workflow runs.
+
+WorkflowRunner executes a run start to finish on the calling thread, so a
+delay step sleeps on (and pins) a request worker for up to five minutes.
+The engine instead keeps each run as a persisted state machine:
+
+    - the run's cursor (pending step stack), step results and a snapshot of
+      the workflow definition live in workflow_run_state
+    - a delay step parks the run (status='parked', resume_at=now+delay) and
+      frees everything; a timer on the engine loop claims due runs from the
+      table and resumes them, in this or any other process
+    - http_request steps are awaited on the engine's asyncio loop
+      (AsyncHTTPClient); log/email/condition steps run inline
+    - database work runs on a small fixed pool of WORKFLOW_ENGINE_DB_WORKERS
+      threads
+
+One loop thread plus the DB pool carries every in-flight run of the
+process. Runs are claimed with a conditional UPDATE, so several workers can
+share the table; a run whose owner died is reclaimed once its lease
+(WORKFLOW_ENGINE_LEASE_SECONDS) expires and continues from its last saved
+state, so steps after that point may be executed twice.
+
+Enable with WORKFLOW_EXECUTION_MODE=async, or per call via
+POST /api/workflows/<id>/run {"async": true}.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List
+
+from modules.db_wrapper import execute_query, execute, commit
+from modules.migrations import ensure_migrated
+
+from .models import Workflow, WorkflowStep, StepType, RunStatus
+from .events import record_workflow_run_start, RunEventBuffer, WORKFLOW_EVENT_DURABILITY
+from .runner import WorkflowRunner, MAX_STEPS_PER_RUN
+from .http_client import AsyncHTTPClient, httpx
+
+log = logging.getLogger("levqor.workflows.engine")
+
+WORKFLOW_EXECUTION_MODE = os.environ.get("WORKFLOW_EXECUTION_MODE", "sync")
+WORKFLOW_ENGINE_DB_WORKERS = int(os.environ.get("WORKFLOW_ENGINE_DB_WORKERS", "4"))
+WORKFLOW_ENGINE_HTTP_FALLBACK_WORKERS = int(os.environ.get("WORKFLOW_ENGINE_HTTP_FALLBACK_WORKERS", "8"))
+WORKFLOW_ENGINE_POLL_SECONDS = float(os.environ.get("WORKFLOW_ENGINE_POLL_SECONDS", "1.0"))
+WORKFLOW_ENGINE_CLAIM_BATCH = int(os.environ.get("WORKFLOW_ENGINE_CLAIM_BATCH", "100"))
+WORKFLOW_ENGINE_LEASE_SECONDS = float(os.environ.get("WORKFLOW_ENGINE_LEASE_SECONDS", "600"))
+
+STATE_RUNNING = "running"
+STATE_PARKED = "parked"
+
+_UPSERT_STATE_SQL = """INSERT INTO workflow_run_state (run_id, workflow_id, status, resume_at, state, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT (run_id) DO UPDATE SET
+                   status = excluded.status,
+                   resume_at = excluded.resume_at,
+                   state = excluded.state,
+                   updated_at = excluded.updated_at"""
+
+
+def is_async_mode() -> bool:
+    return WORKFLOW_EXECUTION_MODE == "async"
+
+
+class _Run:
+    """In-memory side of one run: the runner (results, events) plus its cursor."""
+    __slots__ = ("runner", "stack", "parked", "saved_at")
+
+    def __init__(self, runner: WorkflowRunner, stack: List[str], parked: Optional[Dict[str, Any]] = None):
+        self.runner = runner
+        self.stack = stack
+        self.parked = parked
+        self.saved_at = 0.0
+
+    def snapshot(self) -> str:
+        runner = self.runner
+        return json.dumps({
+            "workflow": runner.workflow.to_dict(),
+            "context": runner.context,
+            "stack": self.stack,
+            "parked": self.parked,
+            "step_results": runner.step_results,
+            "steps_executed": runner.steps_executed,
+            "pending_approvals": runner.pending_approvals
+        })
+
+
+def _event_buffer(run_id: str, workflow_id: str) -> RunEventBuffer:
+    # Buffers are flushed from the DB pool only (step boundary, park, end),
+    # never from the loop thread, so per-event commits are not available here
+    durability = "step" if WORKFLOW_EVENT_DURABILITY == "immediate" else WORKFLOW_EVENT_DURABILITY
+    return RunEventBuffer(run_id, workflow_id, durability=durability, batch_size=sys.maxsize)
+
+
+def _new_run(workflow: Workflow, context: Dict[str, Any], run_id: str) -> _Run:
+    runner = WorkflowRunner(workflow, context)
+    runner.run_id = run_id
+    runner.events = _event_buffer(run_id, workflow.id)
+    stack = [workflow.steps[0].id] if workflow.steps else []
+    return _Run(runner, stack)
+
+
+def _restore_run(row: Dict[str, Any]) -> _Run:
+    data = json.loads(row["state"])
+    workflow = Workflow.from_dict(data["workflow"])
+    runner = WorkflowRunner(workflow, data.get("context") or {})
+    runner.run_id = row["run_id"]
+    runner.events = _event_buffer(row["run_id"], workflow.id)
+    runner.step_results = data.get("step_results") or {}
+    runner.steps_executed = int(data.get("steps_executed") or 0)
+    runner.pending_approvals = data.get("pending_approvals") or []
+    return _Run(runner, list(data.get("stack") or []), data.get("parked"))
+
+
+# ---- persistence (called on the DB pool) ----
+
+def _save_state(run: _Run, status: str, resume_at: Optional[float] = None):
+    now = time.time()
+    execute_query(
+        _UPSERT_STATE_SQL,
+        (run.runner.run_id, run.runner.workflow.id, status, resume_at, run.snapshot(), now),
+        fetch=None,
+        commit=True
+    )
+    run.saved_at = now
+
+
+def _delete_state(run_id: str):
+    execute_query("DELETE FROM workflow_run_state WHERE run_id = ?", (run_id,), fetch=None, commit=True)
+
+
+def _park(run: _Run, resume_at: float):
+    run.runner.events.flush()
+    _save_state(run, STATE_PARKED, resume_at)
+    execute_query(
+        "UPDATE workflow_runs SET status = ? WHERE id = ?",
+        (RunStatus.WAITING.value, run.runner.run_id),
+        fetch=None,
+        commit=True
+    )
+
+
+def _step_boundary(run: _Run):
+    run.runner.events.step_boundary()
+    if time.time() - run.saved_at > WORKFLOW_ENGINE_LEASE_SECONDS / 2:
+        # Checkpoint and renew the lease so other workers leave the run alone
+        _save_state(run, STATE_RUNNING)
+
+
+def _finish(run: _Run, status: str, result: Dict[str, Any] = None, error: str = None):
+    run.runner.events.close(status, result=result, error=error)
+    _delete_state(run.runner.run_id)
+
+
+def _claim_due_runs(limit: int) -> List[_Run]:
+    """Claim parked runs that are due and running runs whose lease expired."""
+    ensure_migrated()
+    now = time.time()
+    candidates = execute_query(
+        """SELECT run_id, status, updated_at FROM workflow_run_state
+           WHERE status = 'parked' AND resume_at <= ?
+           ORDER BY resume_at LIMIT ?""",
+        (now, limit)
+    ) or []
+    stale_before = now - WORKFLOW_ENGINE_LEASE_SECONDS
+    candidates += execute_query(
+        """SELECT run_id, status, updated_at FROM workflow_run_state
+           WHERE status = 'running' AND updated_at < ?
+           LIMIT ?""",
+        (stale_before, limit)
+    ) or []
+
+    claimed = []
+    for row in candidates:
+        # Conditional update: only one worker wins each run
+        cursor = execute(
+            """UPDATE workflow_run_state SET status = 'running', updated_at = ?
+               WHERE run_id = ? AND status = ? AND updated_at = ?""",
+            (now, row["run_id"], row["status"], row["updated_at"])
+        )
+        won = cursor.rowcount == 1
+        commit()
+        if not won:
+            continue
+
+        state_row = execute_query(
+            "SELECT run_id, state FROM workflow_run_state WHERE run_id = ?",
+            (row["run_id"],),
+            fetch='one'
+        )
+        if state_row:
+            run = _restore_run(state_row)
+            run.saved_at = now
+            claimed.append(run)
+    return claimed
+
+
+class AsyncWorkflowEngine:
+    """Runs workflow state machines on one asyncio loop thread."""
+
+    def __init__(self, db_workers: int = WORKFLOW_ENGINE_DB_WORKERS,
+                 poll_seconds: float = WORKFLOW_ENGINE_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._db_pool = ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix="wf-engine-db")
+        self._http_fallback_pool = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        self._tasks: set = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._next_wake: Optional[float] = None
+        self._http: Optional[AsyncHTTPClient] = None
+        self.runs_completed = 0
+
+    # ---- lifecycle ----
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            ensure_migrated()
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._run_loop, name="wf-engine-loop", daemon=True)
+            self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        if httpx is None:
+            self._http_fallback_pool = ThreadPoolExecutor(
+                max_workers=WORKFLOW_ENGINE_HTTP_FALLBACK_WORKERS,
+                thread_name_prefix="wf-engine-http"
+            )
+        self._http = AsyncHTTPClient(fallback_executor=self._http_fallback_pool)
+        loop.create_task(self._timer_loop())
+        self._ready.set()
+        log.info(f"Workflow engine started (db_workers={self._db_pool._max_workers})")
+        loop.run_forever()
+
+    async def _db(self, fn, *args):
+        return await self._loop.run_in_executor(self._db_pool, fn, *args)
+
+    def _spawn(self, coro):
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # ---- submission ----
+
+    def submit(self, workflow: Workflow, context: Dict[str, Any] = None) -> str:
+        """Start a run and return its run_id without waiting for any step."""
+        self.start()
+        context = context or {}
+        run_id = record_workflow_run_start(workflow.id, context)
+        run = _new_run(workflow, context, run_id)
+
+        if not workflow.steps:
+            run.runner.events.close("completed", {"message": "No steps to execute"})
+            return run_id
+
+        _save_state(run, STATE_RUNNING)
+        self._loop.call_soon_threadsafe(self._spawn, self._drive(run))
+        return run_id
+
+    # ---- timer ----
+
+    async def _timer_loop(self):
+        while True:
+            try:
+                for run in await self._db(_claim_due_runs, WORKFLOW_ENGINE_CLAIM_BATCH):
+                    self._spawn(self._drive(run))
+            except Exception as e:
+                log.error(f"Workflow engine claim failed: {e}")
+
+            timeout = self.poll_seconds
+            if self._next_wake is not None:
+                timeout = max(0.0, min(timeout, self._next_wake - time.time()))
+                self._next_wake = None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _schedule_wake(self, resume_at: float):
+        if self._next_wake is None or resume_at < self._next_wake:
+            self._next_wake = resume_at
+            self._wakeup.set()
+
+    # ---- execution ----
+
+    async def _drive(self, run: _Run):
+        runner = run.runner
+        try:
+            status = await self._advance(run)
+            if status != RunStatus.WAITING.value:
+                self.runs_completed += 1
+        except Exception as e:
+            error_msg = str(e)
+            log.error(f"Workflow run {runner.run_id} failed: {error_msg}")
+            try:
+                await self._db(_finish, run, "failed", None, error_msg)
+            except Exception as finish_error:
+                log.error(f"Could not record failure of run {runner.run_id}: {finish_error}")
+
+    async def _advance(self, run: _Run) -> str:
+        runner = run.runner
+
+        if run.parked:
+            parked, run.parked = run.parked, None
+            step = runner._find_step(parked["step_id"])
+            if step is not None:
+                runner.events.record(step.id, "step_completed", parked["result"])
+                await self._complete_step(run, step, parked["result"])
+
+        while run.stack:
+            if runner.steps_executed >= MAX_STEPS_PER_RUN:
+                log.warning(f"Max steps ({MAX_STEPS_PER_RUN}) reached for workflow {runner.workflow.id}")
+                break
+
+            step = runner._find_step(run.stack.pop())
+            if step is None:
+                continue
+
+            runner.events.record(
+                step.id,
+                "step_started",
+                {"step_type": step.type.value if isinstance(step.type, StepType) else step.type}
+            )
+
+            try:
+                step_type = step.type if isinstance(step.type, StepType) else StepType(step.type)
+
+                if step_type == StepType.DELAY:
+                    seconds = runner._delay_seconds(step)
+                    resume_at = time.time() + seconds
+                    run.parked = {"step_id": step.id, "result": {"status": "success", "delayed_seconds": seconds}}
+                    await self._db(_park, run, resume_at)
+                    self._schedule_wake(resume_at)
+                    return RunStatus.WAITING.value
+
+                if step_type == StepType.HTTP_REQUEST:
+                    result = await self._execute_http_request(runner, step)
+                elif step_type == StepType.LOG:
+                    result = runner._execute_log(step)
+                elif step_type == StepType.EMAIL:
+                    result = runner._execute_email(step)
+                elif step_type == StepType.CONDITION:
+                    result = runner._execute_condition(step)
+                else:
+                    result = {"status": "skipped", "reason": f"Unknown step type: {step.type}"}
+
+                runner.events.record(step.id, "step_completed", result)
+            except Exception as e:
+                result = {"status": "error", "error": str(e)}
+                runner.events.record(step.id, "step_failed", result)
+
+            await self._complete_step(run, step, result)
+
+        final_status = runner._final_status()
+        await self._db(_finish, run, final_status, runner.step_results, None)
+        return final_status
+
+    async def _complete_step(self, run: _Run, step: WorkflowStep, result: Dict[str, Any]):
+        runner = run.runner
+        runner.step_results[step.id] = result
+        runner.steps_executed += 1
+        # Reversed so successors pop in declaration order, matching the
+        # depth-first order of WorkflowRunner._execute_step_chain
+        run.stack.extend(reversed(step.next_step_ids))
+
+        lease_due = time.time() - run.saved_at > WORKFLOW_ENGINE_LEASE_SECONDS / 2
+        if runner.events.durability == "step" or lease_due:
+            await self._db(_step_boundary, run)
+
+    async def _execute_http_request(self, runner: WorkflowRunner, step: WorkflowStep) -> Dict[str, Any]:
+        request_kwargs = runner._prepare_http_request(step)
+        if "error" in request_kwargs:
+            return {"status": "error", "error": request_kwargs["error"]}
+
+        url = request_kwargs["url"]
+        log.info(f"Executing HTTP {request_kwargs['method']} to {url} (async)")
+        try:
+            response = await self._http.request(**request_kwargs)
+            return runner._http_step_result(url, response)
+        except Exception as e:
+            return {"status": "error", "error": str(e), "url": url}
+
+    # ---- introspection ----
+
+    def wait_idle(self, timeout: float = 30.0) -> bool:
+        """Block until no run is executing on the loop (parked runs don't count)."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if not self._tasks:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        parked = 0
+        try:
+            row = execute_query(
+                "SELECT COUNT(*) AS cnt FROM workflow_run_state WHERE status = 'parked'",
+                fetch='one'
+            )
+            parked = int((row or {}).get("cnt") or 0)
+        except Exception as e:
+            log.debug(f"Could not count parked runs: {e}")
+        return {
+            "mode": WORKFLOW_EXECUTION_MODE,
+            "started": self._thread is not None and self._thread.is_alive(),
+            "executing": len(self._tasks),
+            "parked": parked,
+            "runs_completed": self.runs_completed,
+            "db_workers": self._db_pool._max_workers,
+            "async_http": httpx is not None
+        }
+
+
+_engine: Optional[AsyncWorkflowEngine] = None
+_engine_pid: Optional[int] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> AsyncWorkflowEngine:
+    """Process-wide engine (a fresh one after fork; threads do not survive fork)."""
+    global _engine, _engine_pid
+    with _engine_lock:
+        if _engine is None or _engine_pid != os.getpid():
+            _engine = AsyncWorkflowEngine()
+            _engine_pid = os.getpid()
+        return _engine
+
+
+def submit_workflow_run(workflow: Workflow, context: Dict[str, Any] = None) -> str:
+    """Start a run on the async engine. Returns run_id."""
+    return get_engine().submit(workflow, context)
@@ -1,94 +1,56 @@
 """
 Workflow Events - MEGA PHASE v15
 Event logging for workflow runs and steps
+
+Step events of a run can be collected in a RunEventBuffer and written with
+one executemany per flush instead of one INSERT + commit per event.
+WORKFLOW_EVENT_DURABILITY picks when the buffer flushes:
+    immediate - every event committed as it happens (debugging)
+    step      - at every step boundary
+    run       - once, together with the run end (default)
+Runs also flush whenever WORKFLOW_EVENT_BATCH_SIZE events are pending.
 """
+import os
 import uuid
 import time
 import json
 import logging
-from typing import Dict, Any, Optional, List
-from modules.db_wrapper import execute_query, get_db_type
+from typing import Dict, Any, Optional, List, Tuple
+from modules.db_wrapper import execute_query, execute_many
+from modules.migrations import ensure_migrated
 
 log = logging.getLogger("levqor.workflows.events")
 
 WORKFLOW_RUNS_TABLE = "workflow_runs"
 WORKFLOW_EVENTS_TABLE = "workflow_events"
 
+DURABILITY_MODES = ("immediate", "step", "run")
+WORKFLOW_EVENT_DURABILITY = os.environ.get("WORKFLOW_EVENT_DURABILITY", "run")
+WORKFLOW_EVENT_BATCH_SIZE = int(os.environ.get("WORKFLOW_EVENT_BATCH_SIZE", "200"))
 
-def _ensure_tables():
-    """Ensure workflow tables exist (simple idempotent check)"""
-    db_type = get_db_type()
-    
-    if db_type == "postgresql":
-        execute_query("""
-            CREATE TABLE IF NOT EXISTS workflow_runs (
-                id VARCHAR(64) PRIMARY KEY,
-                workflow_id VARCHAR(64) NOT NULL,
-                status VARCHAR(32) NOT NULL DEFAULT 'pending',
-                started_at REAL NOT NULL,
-                ended_at REAL,
-                context TEXT,
-                result TEXT,
-                error TEXT,
-                created_at REAL DEFAULT EXTRACT(EPOCH FROM NOW())
-            )
-        """, commit=True)
-        
-        execute_query("""
-            CREATE TABLE IF NOT EXISTS workflow_events (
-                id VARCHAR(64) PRIMARY KEY,
-                run_id VARCHAR(64) NOT NULL,
-                workflow_id VARCHAR(64) NOT NULL,
-                step_id VARCHAR(64),
-                event_type VARCHAR(64) NOT NULL,
-                payload TEXT,
-                created_at REAL DEFAULT EXTRACT(EPOCH FROM NOW())
-            )
-        """, commit=True)
-    else:
-        execute_query("""
-            CREATE TABLE IF NOT EXISTS workflow_runs (
-                id TEXT PRIMARY KEY,
-                workflow_id TEXT NOT NULL,
-                status TEXT NOT NULL DEFAULT 'pending',
-                started_at REAL NOT NULL,
-                ended_at REAL,
-                context TEXT,
-                result TEXT,
-                error TEXT,
-                created_at REAL DEFAULT (strftime('%s', 'now'))
-            )
-        """, commit=True)
-        
-        execute_query("""
-            CREATE TABLE IF NOT EXISTS workflow_events (
-                id TEXT PRIMARY KEY,
-                run_id TEXT NOT NULL,
-                workflow_id TEXT NOT NULL,
-                step_id TEXT,
-                event_type TEXT NOT NULL,
-                payload TEXT,
-                created_at REAL DEFAULT (strftime('%s', 'now'))
-            )
-        """, commit=True)
+_INSERT_EVENT_SQL = """INSERT INTO workflow_events (id, run_id, workflow_id, step_id, event_type, payload, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)"""
 
+_UPDATE_RUN_END_SQL = """UPDATE workflow_runs 
+               SET status = ?, ended_at = ?, result = ?, error = ?
+               WHERE id = ?"""
 
-_tables_initialized = False
 
+def _event_row(run_id: str, workflow_id: str, step_id: str, event_type: str,
+               payload: Dict[str, Any] = None) -> Tuple:
+    # created_at is set here rather than by the column default so buffered
+    # events keep their real order and sub-second timing
+    return (str(uuid.uuid4()), run_id, workflow_id, step_id, event_type,
+            json.dumps(payload or {}), time.time())
 
-def _init_tables():
-    global _tables_initialized
-    if not _tables_initialized:
-        try:
-            _ensure_tables()
-            _tables_initialized = True
-        except Exception as e:
-            log.warning(f"Could not initialize workflow tables: {e}")
+
+def _run_end_params(run_id: str, status: str, result: Dict[str, Any] = None, error: str = None) -> Tuple:
+    return (status, time.time(), json.dumps(result or {}), error, run_id)
 
 
 def record_workflow_run_start(workflow_id: str, context: Dict[str, Any] = None) -> str:
     """Record the start of a workflow run. Returns run_id."""
-    _init_tables()
+    ensure_migrated()
     
     run_id = str(uuid.uuid4())
     started_at = time.time()
@@ -110,17 +72,12 @@ def record_workflow_run_start(workflow_id: str, context: Dict[str, Any] = None)
 
 def record_workflow_run_end(run_id: str, status: str, result: Dict[str, Any] = None, error: str = None):
     """Record the end of a workflow run."""
-    _init_tables()
-    
-    ended_at = time.time()
-    result_json = json.dumps(result or {})
+    ensure_migrated()
     
     try:
         execute_query(
-            """UPDATE workflow_runs 
-               SET status = ?, ended_at = ?, result = ?, error = ?
-               WHERE id = ?""",
-            (status, ended_at, result_json, error, run_id),
+            _UPDATE_RUN_END_SQL,
+            _run_end_params(run_id, status, result, error),
             commit=True
         )
         log.info(f"Workflow run ended: {run_id} with status {status}")
@@ -136,16 +93,12 @@ def record_workflow_step_event(
     payload: Dict[str, Any] = None
 ):
     """Record a workflow step event."""
-    _init_tables()
-    
-    event_id = str(uuid.uuid4())
-    payload_json = json.dumps(payload or {})
+    ensure_migrated()
     
     try:
         execute_query(
-            """INSERT INTO workflow_events (id, run_id, workflow_id, step_id, event_type, payload)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (event_id, run_id, workflow_id, step_id, event_type, payload_json),
+            _INSERT_EVENT_SQL,
+            _event_row(run_id, workflow_id, step_id, event_type, payload),
             commit=True
         )
         log.debug(f"Workflow event recorded: {event_type} for step {step_id}")
@@ -153,9 +106,95 @@ def record_workflow_step_event(
         log.error(f"Failed to record workflow step event: {e}")
 
 
+class RunEventBuffer:
+    """
+    Run-scoped buffer of step events.
+
+    Usage:
+        events = RunEventBuffer(run_id, workflow.id)
+        events.record(step.id, "step_started", {...})
+        events.step_boundary()
+        events.close("completed", result=...)
+    """
+
+    def __init__(self, run_id: str, workflow_id: str, durability: Optional[str] = None,
+                 batch_size: int = WORKFLOW_EVENT_BATCH_SIZE):
+        durability = durability or WORKFLOW_EVENT_DURABILITY
+        if durability not in DURABILITY_MODES:
+            log.warning(f"Unknown workflow event durability '{durability}', using 'run'")
+            durability = "run"
+        self.run_id = run_id
+        self.workflow_id = workflow_id
+        self.durability = durability
+        self.batch_size = max(1, batch_size)
+        self.pending: List[Tuple] = []
+        self.flushes = 0
+        self.closed = False
+
+    def record(self, step_id: str, event_type: str, payload: Dict[str, Any] = None):
+        """Record a step event (buffered unless durability is 'immediate')."""
+        if self.durability == "immediate":
+            record_workflow_step_event(self.run_id, self.workflow_id, step_id, event_type, payload)
+            return
+        self.pending.append(_event_row(self.run_id, self.workflow_id, step_id, event_type, payload))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def step_boundary(self):
+        """Called after each step; flushes in 'step' durability mode."""
+        if self.durability == "step":
+            self.flush()
+
+    def flush(self, run_end: Optional[Tuple] = None) -> Optional[int]:
+        """
+        Write pending events (and optionally the run end update) in one
+        transaction. On failure the events stay pending for the next flush.
+        Returns the number of events written, or None if the write failed.
+        """
+        if not self.pending and run_end is None:
+            return 0
+        ensure_migrated()
+
+        batch = self.pending
+        try:
+            if run_end is None:
+                execute_many(_INSERT_EVENT_SQL, batch, commit=True)
+            else:
+                execute_many(_INSERT_EVENT_SQL, batch)
+                execute_query(_UPDATE_RUN_END_SQL, run_end, fetch=None, commit=True)
+        except Exception as e:
+            log.error(f"Failed to flush {len(batch)} workflow events for run {self.run_id}: {e}")
+            return None
+
+        self.pending = []
+        self.flushes += 1
+        log.debug(f"Flushed {len(batch)} workflow events for run {self.run_id}")
+        return len(batch)
+
+    def close(self, status: str, result: Dict[str, Any] = None, error: str = None):
+        """Flush remaining events and record the run end in the same transaction."""
+        if self.closed:
+            return
+        self.closed = True
+
+        if self.durability == "immediate":
+            record_workflow_run_end(self.run_id, status, result, error)
+            return
+
+        run_end = _run_end_params(self.run_id, status, result, error)
+        if self.flush(run_end=run_end) is None:
+            # Batch failed; still try to close the run so it is not left 'running'
+            if self.pending:
+                log.error(f"Dropping {len(self.pending)} unflushed workflow events for run {self.run_id}")
+                self.pending = []
+            record_workflow_run_end(self.run_id, status, result, error)
+            return
+        log.info(f"Workflow run ended: {self.run_id} with status {status}")
+
+
 def get_workflow_runs(workflow_id: str = None, limit: int = 50) -> List[Dict[str, Any]]:
     """Get recent workflow runs, optionally filtered by workflow_id."""
-    _init_tables()
+    ensure_migrated()
     
     try:
         if workflow_id:
@@ -179,7 +218,7 @@ def get_workflow_runs(workflow_id: str = None, limit: int = 50) -> List[Dict[str
 
 def get_workflow_events(run_id: str) -> List[Dict[str, Any]]:
     """Get all events for a workflow run."""
-    _init_tables()
+    ensure_migrated()
     
     try:
         result = execute_query(
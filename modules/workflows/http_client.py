@@ -0,0 +1,229 @@
+"""
+Workflow HTTP Client - pooled connections for http_request steps
+
+One requests.Session per process with a bounded keep-alive pool per host,
+so workflows that hit the same API reuse TCP/TLS connections (and skip
+the DNS lookup that comes with every new connection) instead of paying a
+fresh handshake per step.
+
+Limits:
+    WORKFLOW_HTTP_POOL_HOSTS        - hosts kept in the pool (default 32)
+    WORKFLOW_HTTP_POOL_PER_HOST     - max open connections per host (default 10);
+                                      further requests wait for a free one
+    WORKFLOW_HTTP_TENANT_CONCURRENCY - in-flight requests per tenant (default 4)
+    WORKFLOW_HTTP_TENANT_WAIT       - seconds to wait for a tenant slot (default 10)
+    WORKFLOW_HTTP_MAX_RESPONSE_BYTES - bytes read before a body is cut off (default 10MB)
+
+Response bodies are streamed and only counted, never held in memory.
+
+AsyncHTTPClient is the event-loop counterpart used by the async workflow
+engine: httpx.AsyncClient with the same pool and tenant limits, or the
+blocking pool on an executor if httpx is not installed.
+"""
+import os
+import asyncio
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+log = logging.getLogger("levqor.workflows.http_client")
+
+WORKFLOW_HTTP_POOL_HOSTS = int(os.environ.get("WORKFLOW_HTTP_POOL_HOSTS", "32"))
+WORKFLOW_HTTP_POOL_PER_HOST = int(os.environ.get("WORKFLOW_HTTP_POOL_PER_HOST", "10"))
+WORKFLOW_HTTP_TENANT_CONCURRENCY = int(os.environ.get("WORKFLOW_HTTP_TENANT_CONCURRENCY", "4"))
+WORKFLOW_HTTP_TENANT_WAIT = float(os.environ.get("WORKFLOW_HTTP_TENANT_WAIT", "10"))
+WORKFLOW_HTTP_MAX_RESPONSE_BYTES = int(os.environ.get("WORKFLOW_HTTP_MAX_RESPONSE_BYTES", str(10 * 1024 * 1024)))
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+_tenant_slots: Dict[str, threading.BoundedSemaphore] = {}
+_tenant_lock = threading.Lock()
+
+
+class TenantConcurrencyExceeded(Exception):
+    """Raised when a tenant has too many HTTP steps in flight."""
+
+
+def get_http_session() -> requests.Session:
+    """Return the process-wide pooled session (recreated after fork)."""
+    global _session, _session_pid
+    if _session is not None and _session_pid == os.getpid():
+        return _session
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=WORKFLOW_HTTP_POOL_HOSTS,
+                pool_maxsize=WORKFLOW_HTTP_POOL_PER_HOST,
+                pool_block=True,
+                max_retries=0
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+            _session_pid = os.getpid()
+    return _session
+
+
+def _tenant_slot(tenant_id: str) -> threading.BoundedSemaphore:
+    with _tenant_lock:
+        slot = _tenant_slots.get(tenant_id)
+        if slot is None:
+            slot = threading.BoundedSemaphore(WORKFLOW_HTTP_TENANT_CONCURRENCY)
+            _tenant_slots[tenant_id] = slot
+        return slot
+
+
+def pooled_request(
+    method: str,
+    url: str,
+    tenant_id: str = "default",
+    headers: Dict[str, str] = None,
+    json_body: Any = None,
+    timeout: float = 30
+) -> Dict[str, Any]:
+    """
+    Send a request over the shared pool and stream-count the response body.
+
+    Raises:
+        TenantConcurrencyExceeded: no tenant slot freed up within WORKFLOW_HTTP_TENANT_WAIT
+        requests.RequestException: transport errors
+
+    Returns:
+        Dict with http_status, response_length and truncated
+    """
+    slot = _tenant_slot(tenant_id or "default")
+    if not slot.acquire(timeout=WORKFLOW_HTTP_TENANT_WAIT):
+        raise TenantConcurrencyExceeded(
+            f"Tenant {tenant_id} has {WORKFLOW_HTTP_TENANT_CONCURRENCY} HTTP requests in flight"
+        )
+
+    try:
+        response = get_http_session().request(
+            method,
+            url,
+            headers=headers,
+            json=json_body,
+            timeout=timeout,
+            stream=True
+        )
+        with response:
+            length = 0
+            truncated = False
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                length += len(chunk)
+                if length > WORKFLOW_HTTP_MAX_RESPONSE_BYTES:
+                    truncated = True
+                    break
+            return {
+                "http_status": response.status_code,
+                "response_length": length,
+                "truncated": truncated
+            }
+    finally:
+        slot.release()
+
+
+def get_http_pool_stats() -> Dict[str, Any]:
+    """Pool configuration and tenants with requests currently in flight."""
+    with _tenant_lock:
+        in_flight = {
+            tenant: WORKFLOW_HTTP_TENANT_CONCURRENCY - slot._value
+            for tenant, slot in _tenant_slots.items()
+            if slot._value < WORKFLOW_HTTP_TENANT_CONCURRENCY
+        }
+    return {
+        "pool_hosts": WORKFLOW_HTTP_POOL_HOSTS,
+        "pool_per_host": WORKFLOW_HTTP_POOL_PER_HOST,
+        "tenant_concurrency": WORKFLOW_HTTP_TENANT_CONCURRENCY,
+        "tenants_in_flight": in_flight
+    }
+
+
+class AsyncHTTPClient:
+    """
+    Pooled HTTP client bound to one event loop.
+    Same return shape and errors as pooled_request.
+    """
+
+    def __init__(self, fallback_executor=None):
+        self._client = None
+        self._fallback_executor = fallback_executor
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=WORKFLOW_HTTP_POOL_HOSTS * WORKFLOW_HTTP_POOL_PER_HOST,
+                    max_keepalive_connections=WORKFLOW_HTTP_POOL_HOSTS * WORKFLOW_HTTP_POOL_PER_HOST
+                )
+            )
+        return self._client
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        tenant_id: str = "default",
+        headers: Dict[str, str] = None,
+        json_body: Any = None,
+        timeout: float = 30
+    ) -> Dict[str, Any]:
+        if httpx is None:
+            # The blocking pool enforces the tenant limit itself
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._fallback_executor,
+                lambda: pooled_request(method, url, tenant_id, headers, json_body, timeout)
+            )
+
+        tenant_id = tenant_id or "default"
+        slot = self._slots.get(tenant_id)
+        if slot is None:
+            slot = self._slots[tenant_id] = asyncio.Semaphore(WORKFLOW_HTTP_TENANT_CONCURRENCY)
+        try:
+            await asyncio.wait_for(slot.acquire(), timeout=WORKFLOW_HTTP_TENANT_WAIT)
+        except asyncio.TimeoutError:
+            raise TenantConcurrencyExceeded(
+                f"Tenant {tenant_id} has {WORKFLOW_HTTP_TENANT_CONCURRENCY} HTTP requests in flight"
+            )
+
+        try:
+            async with self._get_client().stream(
+                method, url, headers=headers, json=json_body, timeout=timeout
+            ) as response:
+                length = 0
+                truncated = False
+                async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                    length += len(chunk)
+                    if length > WORKFLOW_HTTP_MAX_RESPONSE_BYTES:
+                        truncated = True
+                        break
+                return {
+                    "http_status": response.status_code,
+                    "response_length": length,
+                    "truncated": truncated
+                }
+        except httpx.HTTPError as e:
+            # Surface transport errors the same way as the blocking client
+            raise requests.RequestException(str(e)) from e
+        finally:
+            slot.release()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -10,13 +10,15 @@ from typing import Dict, Any, Optional
 from dataclasses import dataclass, field
 
 from .models import Workflow, WorkflowStep, StepType, RunStatus
-from .events import record_workflow_run_start, record_workflow_run_end, record_workflow_step_event
+from .events import record_workflow_run_start, RunEventBuffer
+from .http_client import pooled_request, TenantConcurrencyExceeded
 
 log = logging.getLogger("levqor.workflows.runner")
 
 MAX_DELAY_SECONDS = 300
 MAX_HTTP_TIMEOUT = 30
 MAX_STEPS_PER_RUN = 50
+SUPPORTED_HTTP_METHODS = ("GET", "POST", "PUT", "DELETE")
 
 
 @dataclass
@@ -30,12 +32,18 @@ class RunResult:
 
 
 class WorkflowRunner:
-    """Executes workflows step by step with event logging."""
+    """
+    Executes workflows step by step with event logging.
+    Step events are buffered per run; durability overrides
+    WORKFLOW_EVENT_DURABILITY ("immediate", "step" or "run").
+    """
     
-    def __init__(self, workflow: Workflow, context: Dict[str, Any] = None):
+    def __init__(self, workflow: Workflow, context: Dict[str, Any] = None, durability: Optional[str] = None):
         self.workflow = workflow
         self.context = context or {}
+        self.durability = durability
         self.run_id: str = ""
+        self.events: Optional[RunEventBuffer] = None
         self.steps_executed = 0
         self.step_results: Dict[str, Any] = {}
         self.pending_approvals: list = []
@@ -43,10 +51,11 @@ class WorkflowRunner:
     def run(self) -> RunResult:
         """Execute the workflow and return results."""
         self.run_id = record_workflow_run_start(self.workflow.id, self.context)
+        self.events = RunEventBuffer(self.run_id, self.workflow.id, durability=self.durability)
         
         try:
             if not self.workflow.steps:
-                record_workflow_run_end(self.run_id, "completed", {"message": "No steps to execute"})
+                self.events.close("completed", {"message": "No steps to execute"})
                 return RunResult(
                     run_id=self.run_id,
                     status="completed",
@@ -57,15 +66,9 @@ class WorkflowRunner:
             first_step = self.workflow.steps[0]
             self._execute_step_chain(first_step)
             
-            final_status = "completed"
-            if self.pending_approvals:
-                final_status = "pending_approval"
+            final_status = self._final_status()
             
-            record_workflow_run_end(
-                self.run_id,
-                final_status,
-                result=self.step_results
-            )
+            self.events.close(final_status, result=self.step_results)
             
             return RunResult(
                 run_id=self.run_id,
@@ -78,7 +81,7 @@ class WorkflowRunner:
         except Exception as e:
             error_msg = str(e)
             log.error(f"Workflow run failed: {error_msg}")
-            record_workflow_run_end(self.run_id, "failed", error=error_msg)
+            self.events.close("failed", error=error_msg)
             
             return RunResult(
                 run_id=self.run_id,
@@ -87,6 +90,9 @@ class WorkflowRunner:
                 error=error_msg
             )
     
+    def _final_status(self) -> str:
+        return "pending_approval" if self.pending_approvals else "completed"
+    
     def _execute_step_chain(self, step: WorkflowStep):
         """Execute a step and its successors."""
         if self.steps_executed >= MAX_STEPS_PER_RUN:
@@ -96,6 +102,7 @@ class WorkflowRunner:
         step_result = self._execute_single_step(step)
         self.step_results[step.id] = step_result
         self.steps_executed += 1
+        self.events.step_boundary()
         
         for next_id in step.next_step_ids:
             next_step = self._find_step(next_id)
@@ -111,9 +118,7 @@ class WorkflowRunner:
     
     def _execute_single_step(self, step: WorkflowStep) -> Dict[str, Any]:
         """Execute a single workflow step."""
-        record_workflow_step_event(
-            self.run_id,
-            self.workflow.id,
+        self.events.record(
             step.id,
             "step_started",
             {"step_type": step.type.value if isinstance(step.type, StepType) else step.type}
@@ -135,9 +140,7 @@ class WorkflowRunner:
             else:
                 result = {"status": "skipped", "reason": f"Unknown step type: {step.type}"}
             
-            record_workflow_step_event(
-                self.run_id,
-                self.workflow.id,
+            self.events.record(
                 step.id,
                 "step_completed",
                 result
@@ -147,54 +150,69 @@ class WorkflowRunner:
             
         except Exception as e:
             error_result = {"status": "error", "error": str(e)}
-            record_workflow_step_event(
-                self.run_id,
-                self.workflow.id,
+            self.events.record(
                 step.id,
                 "step_failed",
                 error_result
             )
             return error_result
     
-    def _execute_http_request(self, step: WorkflowStep) -> Dict[str, Any]:
-        """Execute an HTTP request step."""
+    def _prepare_http_request(self, step: WorkflowStep) -> Dict[str, Any]:
+        """
+        Validate an HTTP step's config.
+        Returns request kwargs for pooled_request, or {"error": ...}.
+        """
         config = step.config
         method = config.get("method", "GET").upper()
         url = config.get("url", "")
-        headers = config.get("headers", {})
         body = config.get("body")
-        timeout = min(config.get("timeout", MAX_HTTP_TIMEOUT), MAX_HTTP_TIMEOUT)
         
         if not url:
-            return {"status": "error", "error": "No URL specified"}
+            return {"error": "No URL specified"}
         
-        log.info(f"Executing HTTP {method} to {url}")
+        if method not in SUPPORTED_HTTP_METHODS:
+            return {"error": f"Unsupported method: {method}"}
+        
+        return {
+            "method": method,
+            "url": url,
+            "tenant_id": self.workflow.tenant_id,
+            "headers": config.get("headers", {}),
+            "json_body": body if method in ("POST", "PUT") else None,
+            "timeout": min(config.get("timeout", MAX_HTTP_TIMEOUT), MAX_HTTP_TIMEOUT)
+        }
+    
+    @staticmethod
+    def _http_step_result(url: str, response: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "status": "success",
+            "http_status": response["http_status"],
+            "response_length": response["response_length"],
+            "truncated": response["truncated"],
+            "url": url
+        }
+    
+    def _execute_http_request(self, step: WorkflowStep) -> Dict[str, Any]:
+        """Execute an HTTP request step."""
+        request_kwargs = self._prepare_http_request(step)
+        if "error" in request_kwargs:
+            return {"status": "error", "error": request_kwargs["error"]}
+        
+        url = request_kwargs["url"]
+        log.info(f"Executing HTTP {request_kwargs['method']} to {url}")
         
         try:
-            if method == "GET":
-                response = requests.get(url, headers=headers, timeout=timeout)
-            elif method == "POST":
-                response = requests.post(url, headers=headers, json=body, timeout=timeout)
-            elif method == "PUT":
-                response = requests.put(url, headers=headers, json=body, timeout=timeout)
-            elif method == "DELETE":
-                response = requests.delete(url, headers=headers, timeout=timeout)
-            else:
-                return {"status": "error", "error": f"Unsupported method: {method}"}
-            
-            return {
-                "status": "success",
-                "http_status": response.status_code,
-                "response_length": len(response.content),
-                "url": url
-            }
-        except requests.RequestException as e:
+            return self._http_step_result(url, pooled_request(**request_kwargs))
+        except (TenantConcurrencyExceeded, requests.RequestException) as e:
             return {"status": "error", "error": str(e), "url": url}
     
+    @staticmethod
+    def _delay_seconds(step: WorkflowStep) -> float:
+        return min(step.config.get("seconds", 1), MAX_DELAY_SECONDS)
+    
     def _execute_delay(self, step: WorkflowStep) -> Dict[str, Any]:
         """Execute a delay step (with safety cap)."""
-        config = step.config
-        seconds = min(config.get("seconds", 1), MAX_DELAY_SECONDS)
+        seconds = self._delay_seconds(step)
         
         log.info(f"Delaying for {seconds} seconds")
         time.sleep(seconds)
@@ -236,9 +254,7 @@ class WorkflowRunner:
         
         self.pending_approvals.append(pending_email)
         
-        record_workflow_step_event(
-            self.run_id,
-            self.workflow.id,
+        self.events.record(
             step.id,
             "PENDING_EMAIL_SEND",
             pending_email
@@ -7,65 +7,17 @@ import time
 import json
 import logging
 from typing import Dict, Any, Optional, List
-from modules.db_wrapper import execute_query, get_db_type
+from modules.db_wrapper import execute_query
+from modules.migrations import ensure_migrated
 
 from .models import Workflow, WorkflowStep, ScheduleConfig
 
 log = logging.getLogger("levqor.workflows.storage")
 
 
-def _ensure_workflows_table():
-    """Ensure workflows table exists."""
-    db_type = get_db_type()
-    
-    if db_type == "postgresql":
-        execute_query("""
-            CREATE TABLE IF NOT EXISTS workflows (
-                id VARCHAR(64) PRIMARY KEY,
-                name VARCHAR(255) NOT NULL,
-                description TEXT,
-                steps TEXT NOT NULL,
-                owner_id VARCHAR(64),
-                tenant_id VARCHAR(64) DEFAULT 'default',
-                is_active BOOLEAN DEFAULT FALSE,
-                schedule_config TEXT,
-                created_at REAL DEFAULT EXTRACT(EPOCH FROM NOW()),
-                updated_at REAL DEFAULT EXTRACT(EPOCH FROM NOW())
-            )
-        """, commit=True)
-    else:
-        execute_query("""
-            CREATE TABLE IF NOT EXISTS workflows (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                description TEXT,
-                steps TEXT NOT NULL,
-                owner_id TEXT,
-                tenant_id TEXT DEFAULT 'default',
-                is_active INTEGER DEFAULT 0,
-                schedule_config TEXT,
-                created_at REAL DEFAULT (strftime('%s', 'now')),
-                updated_at REAL DEFAULT (strftime('%s', 'now'))
-            )
-        """, commit=True)
-
-
-_table_initialized = False
-
-
-def _init_table():
-    global _table_initialized
-    if not _table_initialized:
-        try:
-            _ensure_workflows_table()
-            _table_initialized = True
-        except Exception as e:
-            log.warning(f"Could not initialize workflows table: {e}")
-
-
 def create_workflow(workflow: Workflow) -> str:
     """Create a new workflow. Returns workflow ID."""
-    _init_table()
+    ensure_migrated()
     
     workflow_id = workflow.id or str(uuid.uuid4())
     steps_json = json.dumps([s.to_dict() for s in workflow.steps])
@@ -90,7 +42,7 @@ def create_workflow(workflow: Workflow) -> str:
 
 def get_workflow_by_id(workflow_id: str) -> Optional[Workflow]:
     """Get a workflow by ID."""
-    _init_table()
+    ensure_migrated()
     
     try:
         result = execute_query(
@@ -110,7 +62,7 @@ def get_workflow_by_id(workflow_id: str) -> Optional[Workflow]:
 
 def list_workflows(tenant_id: str = None, owner_id: str = None, active_only: bool = False, limit: int = 100) -> List[Workflow]:
     """List workflows with optional filters."""
-    _init_table()
+    ensure_migrated()
     
     conditions = []
     params = []
@@ -145,7 +97,7 @@ def list_workflows(tenant_id: str = None, owner_id: str = None, active_only: boo
 
 def update_workflow(workflow_id: str, updates: Dict[str, Any]) -> bool:
     """Update a workflow."""
-    _init_table()
+    ensure_migrated()
     
     set_clauses = []
     params = []
@@ -201,7 +153,7 @@ def update_workflow(workflow_id: str, updates: Dict[str, Any]) -> bool:
 
 def delete_workflow(workflow_id: str) -> bool:
     """Delete a workflow."""
-    _init_table()
+    ensure_migrated()
     
     try:
         execute_query(
@@ -218,7 +170,7 @@ def delete_workflow(workflow_id: str) -> bool:
 
 def get_scheduled_workflows() -> List[Workflow]:
     """Get all active workflows with scheduling enabled."""
-    _init_table()
+    ensure_migrated()
     
     try:
         result = execute_query(
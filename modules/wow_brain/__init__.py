@@ -0,0 +1,284 @@
+"""
+WOW Brain State
+Per-user onboarding/engagement state behind the /api/wow/brain endpoints.
+
+Every event is appended to user_brain_events, and the same transaction
+applies it to a small per-user row in user_brain_summary with atomic
+column updates (count = count + 1, step = CASE ...). Concurrent events for
+one user never overwrite each other, and nothing rewrites history.
+Viewed templates are a set keyed by (email, template_id).
+
+Recommendations read only the summary row. The full state adds the viewed
+templates and the last BRAIN_STATE_EVENTS events, both read by index. Like
+the legacy blob, only the last BRAIN_STATE_EVENTS events per user are
+kept: each append deletes the ones that fell out of that window.
+
+Users whose state is still in the legacy user_brain_state JSON blob are
+seeded from it on their first access.
+"""
+import os
+import json
+import time
+import logging
+from typing import Dict, Any, List, Optional
+
+from modules.db_wrapper import execute_query, execute, commit, rollback
+from modules.migrations import ensure_migrated
+
+log = logging.getLogger("levqor.wow_brain")
+
+BRAIN_STATE_EVENTS = int(os.environ.get("BRAIN_STATE_EVENTS", "100"))
+
+# Column sizes of user_brain_events.event_type / user_brain_templates.template_id
+MAX_EVENT_TYPE_LENGTH = 64
+MAX_TEMPLATE_ID_LENGTH = 255
+
+STATE_VERSION = 1
+
+DEFAULT_PREFERENCES = {
+    "theme": "dark",
+    "notifications": True,
+    "ai_suggestions": True
+}
+
+
+def get_default_state() -> Dict[str, Any]:
+    return {
+        "version": STATE_VERSION,
+        "onboarding_complete": False,
+        "onboarding_step": 0,
+        "first_workflow_created": False,
+        "templates_viewed": [],
+        "builder_sessions": 0,
+        "ai_interactions": 0,
+        "last_activity": None,
+        "preferences": dict(DEFAULT_PREFERENCES),
+        "milestones": [],
+        "events": []
+    }
+
+
+def _insert_event(email: str, event_type: str, data: Dict[str, Any], created_at: float):
+    execute(
+        "INSERT INTO user_brain_events (email, event_type, data, created_at) VALUES (?, ?, ?, ?)",
+        (email, event_type, json.dumps(data or {}), created_at)
+    )
+
+
+def _prune_events(email: str):
+    execute(
+        "DELETE FROM user_brain_events WHERE email = ? AND id <= ("
+        "SELECT id FROM user_brain_events WHERE email = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+        (email, email, BRAIN_STATE_EVENTS)
+    )
+
+
+def _add_template(email: str, template_id: str, viewed_at: float) -> bool:
+    cursor = execute(
+        "INSERT INTO user_brain_templates (email, template_id, viewed_at) VALUES (?, ?, ?) "
+        "ON CONFLICT (email, template_id) DO NOTHING",
+        (email, template_id, viewed_at)
+    )
+    return cursor.rowcount == 1
+
+
+def _seq_at(base: float, i: int) -> float:
+    # Legacy lists carry no timestamps; seed them just before the current
+    # event, in list order, since they are read back ordered by time
+    return base - 1 + i * 1e-6
+
+
+def _milestone_at(milestones: List[str], name: str, reached: bool, now: float) -> Optional[float]:
+    if name in milestones:
+        return _seq_at(now, milestones.index(name))
+    return _seq_at(now, len(milestones)) if reached else None
+
+
+def _seed_summary(email: str, now: float):
+    """Create the summary row, from the legacy JSON blob if there is one."""
+    legacy = execute_query("SELECT json_state FROM user_brain_state WHERE email = ?", (email,), fetch="one")
+    state = get_default_state()
+    if legacy:
+        try:
+            state.update(json.loads(legacy["json_state"]))
+        except (TypeError, ValueError):
+            log.warning(f"Ignoring unreadable legacy brain state for {email}")
+
+    milestones = state.get("milestones") or []
+    cursor = execute(
+        """INSERT INTO user_brain_summary (email, onboarding_complete, onboarding_step, onboarding_at,
+               first_workflow_at, templates_viewed, builder_sessions, ai_interactions, last_activity,
+               preferences, updated_at)
+           VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?) ON CONFLICT (email) DO NOTHING""",
+        (
+            email,
+            1 if state.get("onboarding_complete") else 0,
+            int(state.get("onboarding_step") or 0),
+            _milestone_at(milestones, "onboarding", state.get("onboarding_complete"), now),
+            _milestone_at(milestones, "first_workflow", state.get("first_workflow_created"), now),
+            int(state.get("builder_sessions") or 0),
+            int(state.get("ai_interactions") or 0),
+            state.get("last_activity"),
+            json.dumps(state["preferences"]) if legacy else None,
+            now
+        )
+    )
+    if cursor.rowcount != 1 or not legacy:
+        return
+
+    templates = 0
+    for i, template_id in enumerate(state.get("templates_viewed") or []):
+        if len(str(template_id)) > MAX_TEMPLATE_ID_LENGTH:
+            log.warning(f"Skipping over-long legacy template id for {email}")
+            continue
+        templates += _add_template(email, str(template_id), _seq_at(now, i))
+    if templates:
+        execute("UPDATE user_brain_summary SET templates_viewed = ? WHERE email = ?", (templates, email))
+    for event in (state.get("events") or [])[-BRAIN_STATE_EVENTS:]:
+        _insert_event(
+            email, str(event.get("type", ""))[:MAX_EVENT_TYPE_LENGTH], event.get("data"), event.get("timestamp") or now
+        )
+    log.info(f"Seeded brain summary for {email} from legacy state")
+
+
+def record_brain_event(email: str, event_type: str, data: Optional[Dict[str, Any]] = None,
+                       now: Optional[float] = None) -> int:
+    """
+    Append an event and apply it to the user's summary; returns the state version.
+
+    Raises:
+        ValueError: event_type or template_id longer than its column
+    """
+    ensure_migrated()
+    data = data or {}
+    now = now or time.time()
+    template_id = data.get("template_id") if event_type == "template_viewed" else None
+    if len(event_type) > MAX_EVENT_TYPE_LENGTH:
+        raise ValueError(f"event_type longer than {MAX_EVENT_TYPE_LENGTH} characters")
+    if template_id and len(str(template_id)) > MAX_TEMPLATE_ID_LENGTH:
+        raise ValueError(f"template_id longer than {MAX_TEMPLATE_ID_LENGTH} characters")
+
+    updates = ["ai_interactions = ai_interactions + 1", "last_activity = ?", "updated_at = ?"]
+    params: List[Any] = [now, now]
+    if event_type == "onboarding_step_complete":
+        step = data.get("step", 0) + 1
+        updates.append("onboarding_step = CASE WHEN onboarding_step < ? THEN ? ELSE onboarding_step END")
+        params += [step, step]
+    elif event_type == "onboarding_complete":
+        updates += ["onboarding_complete = 1", "onboarding_at = COALESCE(onboarding_at, ?)"]
+        params.append(now)
+    elif event_type == "workflow_created":
+        updates.append("first_workflow_at = COALESCE(first_workflow_at, ?)")
+        params.append(now)
+    elif event_type == "builder_session_start":
+        updates.append("builder_sessions = builder_sessions + 1")
+    update_sql = f"UPDATE user_brain_summary SET {', '.join(updates)} WHERE email = ?"
+    params.append(email)
+
+    try:
+        if execute(update_sql, tuple(params)).rowcount == 0:
+            _seed_summary(email, now)
+            execute(update_sql, tuple(params))
+
+        if template_id and _add_template(email, str(template_id), now):
+            execute(
+                "UPDATE user_brain_summary SET templates_viewed = templates_viewed + 1 WHERE email = ?",
+                (email,)
+            )
+
+        _insert_event(email, event_type, data, now)
+        _prune_events(email)
+        commit()
+    except Exception:
+        rollback()
+        raise
+
+    return STATE_VERSION
+
+
+def get_brain_summary(email: str) -> Optional[Dict[str, Any]]:
+    """The materialized summary row, or None for a user with no state yet."""
+    ensure_migrated()
+    row = execute_query("SELECT * FROM user_brain_summary WHERE email = ?", (email,), fetch="one")
+    if row is None:
+        legacy = execute_query("SELECT 1 FROM user_brain_state WHERE email = ?", (email,), fetch="one")
+        if not legacy:
+            return None
+        try:
+            _seed_summary(email, time.time())
+            commit()
+        except Exception:
+            rollback()
+            raise
+        row = execute_query("SELECT * FROM user_brain_summary WHERE email = ?", (email,), fetch="one")
+    return row
+
+
+def get_brain_state(email: str) -> Optional[Dict[str, Any]]:
+    """
+    Full state in the shape of get_default_state(), or None for a new user.
+
+    Includes "updated_at" (epoch seconds of the last change).
+    """
+    summary = get_brain_summary(email)
+    if summary is None:
+        return None
+
+    templates = execute_query(
+        "SELECT template_id FROM user_brain_templates WHERE email = ? ORDER BY viewed_at",
+        (email,)
+    ) or []
+    events = execute_query(
+        "SELECT event_type, data, created_at FROM user_brain_events WHERE email = ? ORDER BY id DESC LIMIT ?",
+        (email, BRAIN_STATE_EVENTS)
+    ) or []
+    milestones = sorted(
+        (at, name)
+        for name, at in (("onboarding", summary["onboarding_at"]), ("first_workflow", summary["first_workflow_at"]))
+        if at is not None
+    )
+
+    return {
+        "version": STATE_VERSION,
+        "onboarding_complete": bool(summary["onboarding_complete"]),
+        "onboarding_step": summary["onboarding_step"],
+        "first_workflow_created": summary["first_workflow_at"] is not None,
+        "templates_viewed": [t["template_id"] for t in templates],
+        "builder_sessions": summary["builder_sessions"],
+        "ai_interactions": summary["ai_interactions"],
+        "last_activity": summary["last_activity"],
+        "preferences": json.loads(summary["preferences"]) if summary["preferences"] else dict(DEFAULT_PREFERENCES),
+        "milestones": [name for _, name in milestones],
+        "events": [
+            {"type": e["event_type"], "data": json.loads(e["data"]) if e["data"] else {}, "timestamp": e["created_at"]}
+            for e in reversed(events)
+        ],
+        "updated_at": summary["updated_at"]
+    }
+
+
+def reset_brain_state(email: str) -> Dict[str, Any]:
+    """Drop a user's events and summary (including any legacy blob); returns the default state."""
+    ensure_migrated()
+    now = time.time()
+    try:
+        for table in ("user_brain_events", "user_brain_templates", "user_brain_summary", "user_brain_state"):
+            execute(f"DELETE FROM {table} WHERE email = ?", (email,))
+        execute(
+            "INSERT INTO user_brain_summary (email, updated_at) VALUES (?, ?)",
+            (email, now)
+        )
+        commit()
+    except Exception:
+        rollback()
+        raise
+    return get_default_state()
+
+
+__all__ = [
+    "get_default_state",
+    "record_brain_event",
+    "get_brain_summary",
+    "get_brain_state",
+    "reset_brain_state",
+]
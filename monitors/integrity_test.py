@@ -85,7 +85,7 @@ def main():
     tests = [
         ("GET", f"{API_BASE}/health", None, "Health endpoint"),
         ("GET", f"{API_BASE}/api/usage/summary", None, "Usage summary"),
-        ("GET", f"{API_BASE}/api/usage/export", None, "Usage CSV export"),
+        # /api/usage/export is admin-only and not checked here
     ]
     
     for method, url, data, desc in tests:
@@ -10,7 +10,6 @@ MEGA-PHASE Ω - Legal Omega Phase
 
 import os
 import json
-import hashlib
 import logging
 from datetime import datetime
 from pathlib import Path
@@ -36,16 +35,10 @@ STATE_FILE = "legal_file_checksums.json"
 
 
 def compute_sha256(file_path: str) -> Optional[str]:
-    """Compute SHA-256 checksum of a file."""
+    """Compute SHA-256 checksum of a file (re-hashed only if its stat changed)."""
     try:
-        if not os.path.exists(file_path):
-            return None
-        
-        sha256_hash = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+        from security_core.integrity_scanner import get_scanner
+        return get_scanner().digest(file_path)
     except Exception as e:
         log.warning(f"Failed to compute checksum for {file_path}: {e}")
         return None
@@ -96,8 +89,11 @@ def audit_legal_files() -> Dict[str, Any]:
     changes = []
     files_checked = 0
     
+    from security_core.integrity_scanner import get_scanner
+    scanned = get_scanner().scan(MONITORED_LEGAL_FILES)
+    
     for file_path in MONITORED_LEGAL_FILES:
-        checksum = compute_sha256(file_path)
+        checksum = scanned.get(file_path)
         if checksum is None:
             log.warning(f"⚠️  Legal file not found: {file_path}")
             continue
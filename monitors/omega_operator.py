@@ -8,6 +8,8 @@ import json
 from datetime import datetime
 from pathlib import Path
 
+from api.utils.log_tail import read_last_entry
+
 log = logging.getLogger("levqor.omega.operator")
 
 # Use workspace-data for task outputs
@@ -23,11 +25,9 @@ def read_monitor_log():
         return {"SUMMARY": "No data yet"}
     
     try:
-        content = log_file.read_text()
-        # Parse the last entry (simple approach: split by separator)
-        entries = content.split("========================================")
-        if len(entries) > 1:
-            last_entry = entries[-1].strip()
+        # Seek back from the end to the last separator instead of reading the whole log
+        last_entry = read_last_entry(log_file, "========================================")
+        if last_entry is not None:
             # Extract basic status info
             lines = last_entry.split("\n")
             status_data = {}
@@ -57,6 +57,37 @@ def run_retention_aggregation():
     except Exception as e:
         log.error(f"Retention aggregation error: {e}")
 
+def run_usage_rollup():
+    """Daily - Roll up closed days of usage for the CSV export"""
+    log.info("Running usage rollup...")
+    try:
+        from modules.usage_rollups import rollup_pending_days
+        result = rollup_pending_days()
+        log.info(f"✅ Usage rollup complete ({result['count']} day(s))")
+    except Exception as e:
+        log.error(f"Usage rollup error: {e}")
+
+def run_tenant_lifecycle_maintenance():
+    """Hourly - Hard delete tenants past their grace period, prune audit log"""
+    try:
+        from modules.tenant_lifecycle import process_scheduled_deletions, prune_audit_log
+        result = process_scheduled_deletions()
+        pruned = prune_audit_log()
+        if result["processed"] or pruned:
+            log.info(f"✅ Tenant lifecycle: {result['processed']} deleted, {pruned} audit entries pruned")
+    except Exception as e:
+        log.error(f"Tenant lifecycle maintenance error: {e}")
+
+def run_recovery_queue():
+    """Every minute - Retry workflow failures whose backoff has elapsed"""
+    try:
+        from modules.recovery import process_recovery_queue
+        result = process_recovery_queue(max_items=50)
+        if result["processed"]:
+            log.info(f"✅ Recovery queue: {result['processed']} retried, {result['remaining']} pending")
+    except Exception as e:
+        log.error(f"Recovery queue error: {e}")
+
 def run_slo_watchdog():
     """Every 5 minutes SLO check"""
     from monitors.slo_watchdog import get_watchdog
@@ -968,8 +999,35 @@ def init_scheduler():
             replace_existing=True
         )
         
+        # Usage export rollups (daily at 00:15 UTC, after the day closes)
+        scheduler.add_job(
+            run_usage_rollup,
+            CronTrigger(hour=0, minute=15, timezone='UTC'),
+            id='usage_daily_rollup',
+            name='Usage daily rollup',
+            replace_existing=True
+        )
+        
+        scheduler.add_job(
+            run_tenant_lifecycle_maintenance,
+            'interval',
+            hours=1,
+            id='tenant_lifecycle_maintenance',
+            name='Tenant deletions and audit retention',
+            replace_existing=True
+        )
+        
+        scheduler.add_job(
+            run_recovery_queue,
+            'interval',
+            minutes=1,
+            id='recovery_queue',
+            name='Workflow recovery retries',
+            replace_existing=True
+        )
+        
         scheduler.start()
-        log.info("✅ APScheduler initialized with 30 jobs (including 6 monitoring + 1 security + 4 omega + 6 guardian/wave jobs)")
+        log.info("✅ APScheduler initialized with 33 jobs (including 6 monitoring + 1 security + 4 omega + 6 guardian/wave jobs)")
         return scheduler
         
     except ImportError:
@@ -61,12 +61,48 @@ except Exception as e:
     log.error(f"Failed to import database wrapper: {e}")
     raise
 
+# Apply versioned schema migrations (tables + hot-path indexes) once at startup
+try:
+    from modules.migrations import run_migrations
+    _migration_result = run_migrations()
+    log.info(f"Schema at migration version {_migration_result['current_version']} (applied: {_migration_result['applied']})")
+except Exception as e:
+    log.warning(f"Schema migrations failed (non-critical): {e}")
+
+# Durable async workflow engine: resumes parked runs (delay steps) left by any worker
+if os.environ.get("WORKFLOW_EXECUTION_MODE", "sync") == "async":
+    try:
+        from modules.workflows.engine import get_engine
+        get_engine().start()
+    except Exception as e:
+        log.warning(f"Workflow engine startup failed (non-critical): {e}")
+
+# Recovery retry worker: polls recovery_events for due retries (otherwise drained by the scheduler job)
+if os.environ.get("RECOVERY_WORKER_ENABLED", "false").lower() == "true":
+    try:
+        from modules.recovery import get_recovery_worker
+        get_recovery_worker().start()
+    except Exception as e:
+        log.warning(f"Recovery worker startup failed (non-critical): {e}")
+
+# Stripe inbox worker: handles queued webhook events (also started by the first new event)
+if os.environ.get("STRIPE_INBOX_WORKER_ENABLED", "true").lower() == "true":
+    try:
+        from modules.stripe_inbox import get_inbox_worker
+        get_inbox_worker().start()
+    except Exception as e:
+        log.warning(f"Stripe inbox worker startup failed (non-critical): {e}")
+
 app = Flask(__name__, 
     static_folder='public',
     static_url_path='/public')
 
 app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_CONTENT_LENGTH", 512 * 1024))
 
+# Opt-in sampling profiler (PROFILER_ENABLED=1); registered first so it wraps all other hooks
+from modules.profiling import init_profiler
+init_profiler(app)
+
 # Initialize API Gateway (MEGA-PHASE 9)
 try:
     api_gateway.init_api_gateway(app)
@@ -650,21 +686,16 @@ def admin_analytics():
     if token != ADMIN_TOKEN:
         return jsonify({"error": "forbidden"}), 403
     
+    from modules.analytics.windowed import get_window_counts
+    
     now = time()
-    seven_days_ago = now - (7 * 24 * 60 * 60)
     thirty_days_ago = now - (30 * 24 * 60 * 60)
     
-    cursor = execute("SELECT COUNT(*) FROM users")
-    result = cursor.fetchone()
-    total_users = result[0] if result else 0
-    
-    cursor = execute("SELECT COUNT(*) FROM users WHERE created_at >= ?", (seven_days_ago,))
-    result = cursor.fetchone()
-    new_users_7d = result[0] if result else 0
-    
-    cursor = execute("SELECT COUNT(*) FROM users WHERE created_at >= ?", (thirty_days_ago,))
-    result = cursor.fetchone()
-    new_users_30d = result[0] if result else 0
+    # One conditional-aggregation scan per table, shared with the guardian KPIs
+    user_counts = get_window_counts("users")
+    total_users = user_counts["total"]
+    new_users_7d = user_counts["7d"]
+    new_users_30d = user_counts["30d"]
     
     cursor = execute("""
         SELECT source, COUNT(*) as count 
@@ -676,13 +707,9 @@ def admin_analytics():
     """, (thirty_days_ago,))
     top_referrals = [{"source": row[0], "count": row[1]} for row in cursor.fetchall()]
     
-    cursor = execute("SELECT COUNT(*) FROM referrals WHERE created_at >= ?", (seven_days_ago,))
-    result = cursor.fetchone()
-    referrals_7d = result[0] if result else 0
-    
-    cursor = execute("SELECT COUNT(*) FROM referrals WHERE created_at >= ?", (thirty_days_ago,))
-    result = cursor.fetchone()
-    referrals_30d = result[0] if result else 0
+    referral_counts = get_window_counts("referrals")
+    referrals_7d = referral_counts["7d"]
+    referrals_30d = referral_counts["30d"]
     
     return jsonify({
         "users": {
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Levqor Query Index Check
+========================
+Applies the schema migrations to a scratch SQLite database and runs
+EXPLAIN QUERY PLAN over the hot query shapes (modules/migrations/plan_check.py).
+Fails if any of them would scan a table or sort without an index.
+
+Set DATABASE_URL to run the same check against a PostgreSQL database
+(migrations are applied to it, so use a disposable one).
+
+Exit codes:
+- 0: All hot queries are index-driven
+- 1: One or more hot queries are not
+
+Usage:
+    python scripts/ci/check_query_indexes.py
+"""
+import os
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_ROOT)
+
+
+def main():
+    scratch_dir = None
+    if not os.environ.get("DATABASE_URL"):
+        scratch_dir = tempfile.mkdtemp(prefix="levqor-plan-check-")
+        os.environ["SQLITE_PATH"] = os.path.join(scratch_dir, "plan_check.db")
+
+    from modules.migrations import run_migrations, find_unindexed_queries, HOT_QUERIES
+
+    result = run_migrations()
+    print(f"Schema at version {result['current_version']} ({result['db_type']})")
+
+    failures = find_unindexed_queries()
+    for name in HOT_QUERIES:
+        status = "FAIL" if any(f["name"] == name for f in failures) else "OK"
+        print(f"[{status}] {name}")
+
+    for failure in failures:
+        print()
+        print(f"{failure['name']}: {failure['query']}")
+        for problem in failure["problems"]:
+            print(f"    {problem}")
+
+    if scratch_dir:
+        import shutil
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    if failures:
+        print(f"\n{len(failures)} hot query(s) not index-driven")
+        sys.exit(1)
+    print(f"\nAll {len(HOT_QUERIES)} hot queries use an index")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Levqor Cold Start Check
+=======================
+Imports run.py in fresh interpreters under `python -X importtime` and fails
+if the import regresses:
+
+1. Cumulative import time of run.py (median of --runs) exceeds the budget
+2. A deferred SDK (openai, stripe, reportlab, psycopg2) is imported at startup
+
+The slowest top-level imports are printed to help find the regression.
+
+Exit codes:
+- 0: Within budget
+- 1: Over budget or a deferred SDK was imported
+
+Usage:
+    python scripts/ci/check_startup_time.py [--budget-ms 1000] [--runs 3]
+"""
+import os
+import re
+import sys
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_BUDGET_MS = float(os.environ.get("STARTUP_IMPORT_BUDGET_MS", "1000"))
+
+# Must only be imported on first use (see modules/lazy_import.py)
+DEFERRED_MODULES = ("openai", "stripe", "reportlab", "psycopg2")
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure_once(env: dict) -> list:
+    """Return [(cumulative_us, depth, module)] for one cold import of run.py."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import run"],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=300
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import run failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            depth = len(match.group(3)) // 2
+            rows.append((int(match.group(2)), depth, match.group(4)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Levqor cold start import budget")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    scratch_dir = tempfile.mkdtemp(prefix="levqor-startup-")
+    env = dict(os.environ)
+    env.pop("DATABASE_URL", None)
+    env["SQLITE_PATH"] = os.path.join(scratch_dir, "startup.db")
+
+    totals = []
+    rows = []
+    try:
+        for _ in range(max(1, args.runs)):
+            rows = measure_once(env)
+            run_row = [r for r in rows if r[2] == "run" and r[1] == 0]
+            if not run_row:
+                raise RuntimeError("no importtime entry for run")
+            totals.append(run_row[-1][0] / 1000)
+    finally:
+        import shutil
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    median_ms = statistics.median(totals)
+    print(f"run.py import: median {median_ms:.0f}ms over {len(totals)} run(s) "
+          f"({', '.join(f'{t:.0f}' for t in totals)}), budget {args.budget_ms:.0f}ms")
+
+    print("\nSlowest top-level imports:")
+    top_level = sorted(((cum, name) for cum, depth, name in rows if depth == 1), reverse=True)
+    for cum, name in top_level[:10]:
+        print(f"  {cum / 1000:8.1f}ms  {name}")
+
+    imported = {name.split(".")[0] for _, _, name in rows}
+    eager = [m for m in DEFERRED_MODULES if m in imported]
+
+    failed = False
+    if eager:
+        print(f"\nFAIL: deferred SDK(s) imported at startup: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"\nFAIL: cold start import {median_ms:.0f}ms exceeds budget {args.budget_ms:.0f}ms")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("\nCold start within budget")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,9 @@ Levqor Master Safety Command
 Runs all checks required before deployment:
 1. Frontend lint/type checks
 2. Backend syntax validation
-3. Safety gate (production endpoints)
+3. Query index check (EXPLAIN over hot queries)
+4. Cold start import budget (python -X importtime)
+5. Safety gate (production endpoints)
 
 Exit codes:
 - 0: All checks passed
@@ -117,6 +119,43 @@ def check_backend_syntax() -> CheckResult:
     
     return CheckResult("Backend Syntax", True, f"All {checked} Python files OK", duration)
 
+def check_query_indexes() -> CheckResult:
+    """EXPLAIN hot queries against a migrated scratch database"""
+    print("  Checking hot query plans...")
+    start = datetime.now()
+    
+    check_script = os.path.join(REPO_ROOT, "scripts", "ci", "check_query_indexes.py")
+    env = dict(os.environ)
+    # Always check against a scratch SQLite DB, never the live database
+    env.pop("DATABASE_URL", None)
+    
+    try:
+        result = subprocess.run(
+            ["python", check_script],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            timeout=120,
+            env=env
+        )
+        success, output = result.returncode == 0, result.stdout + result.stderr
+    except subprocess.TimeoutExpired:
+        success, output = False, "Command timed out after 120s"
+    duration = (datetime.now() - start).total_seconds()
+    
+    return CheckResult("Query Indexes", success, output, duration)
+
+def check_startup_time() -> CheckResult:
+    """Import run.py cold and compare against the startup budget"""
+    print("  Measuring cold start import time...")
+    start = datetime.now()
+    
+    check_script = os.path.join(REPO_ROOT, "scripts", "ci", "check_startup_time.py")
+    success, output = run_command(["python", check_script], timeout=600)
+    duration = (datetime.now() - start).total_seconds()
+    
+    return CheckResult("Cold Start", success, output, duration)
+
 def check_safety_gate() -> CheckResult:
     """Run the production safety gate checks"""
     print("  Running safety gate...")
@@ -141,16 +180,22 @@ def main():
     
     results = []
     
-    print("[1/4] Frontend Lint")
+    print("[1/6] Frontend Lint")
     results.append(check_frontend_lint())
     
-    print("[2/4] Frontend Build")
+    print("[2/6] Frontend Build")
     results.append(check_frontend_build())
     
-    print("[3/4] Backend Syntax")
+    print("[3/6] Backend Syntax")
     results.append(check_backend_syntax())
     
-    print("[4/4] Safety Gate")
+    print("[4/6] Query Indexes")
+    results.append(check_query_indexes())
+    
+    print("[5/6] Cold Start")
+    results.append(check_startup_time())
+    
+    print("[6/6] Safety Gate")
     results.append(check_safety_gate())
     
     print()
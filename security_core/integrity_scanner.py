@@ -0,0 +1,273 @@
+"""
+Incremental file integrity scanner shared by the tamper check and the
+legal auditor.
+
+A persistent manifest (INTEGRITY_MANIFEST_PATH) records, per path, the
+stat signature (inode, size, mtime_ns, ctime_ns) seen when the file was
+last hashed and the resulting SHA-256. A scan only re-hashes files whose
+signature changed; unchanged files cost one stat. ctime cannot be set from
+user space, so restoring the mtime after an edit still changes the
+signature. Hashing is streamed in INTEGRITY_HASH_CHUNK_BYTES chunks.
+
+Every file is hashed again at least every INTEGRITY_FULL_VERIFY_SECONDS
+(0 disables), whatever its signature says.
+
+A file modified within INTEGRITY_RACY_SECONDS of being hashed may change
+again without changing its mtime (coarse timestamps), so such entries are
+not trusted and are hashed again on the next scan.
+
+With INTEGRITY_INOTIFY=true on Linux, the directories of scanned files are
+watched through inotify and files without events since they were last
+verified skip even the stat. A file with an event is always re-hashed. Any
+watch overflow or failure falls back to stat checks.
+"""
+import os
+import json
+import time
+import errno
+import struct
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+INTEGRITY_MANIFEST_PATH = os.getenv("INTEGRITY_MANIFEST_PATH", "integrity_manifest.json")
+INTEGRITY_HASH_CHUNK_BYTES = int(os.getenv("INTEGRITY_HASH_CHUNK_BYTES", str(1024 * 1024)))
+INTEGRITY_RACY_SECONDS = float(os.getenv("INTEGRITY_RACY_SECONDS", "2"))
+INTEGRITY_INOTIFY = os.getenv("INTEGRITY_INOTIFY", "false").lower() == "true"
+INTEGRITY_FULL_VERIFY_SECONDS = float(os.getenv("INTEGRITY_FULL_VERIFY_SECONDS", "86400"))
+
+MANIFEST_VERSION = 1
+
+
+def hash_file(path: str, chunk_size: int = INTEGRITY_HASH_CHUNK_BYTES) -> str:
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+class _InotifyHints:
+    """Change hints from Linux inotify (via libc), per watched directory."""
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+                  | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[str, int] = {}
+        self._wds: Dict[int, str] = {}
+
+    def watch(self, directory: str) -> bool:
+        if directory in self._dirs:
+            return True
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self.WATCH_MASK)
+        if wd < 0:
+            return False
+        self._dirs[directory] = wd
+        self._wds[wd] = directory
+        return True
+
+    def drain(self) -> Tuple[Set[str], bool]:
+        """Paths with events since the last drain, and whether hints were lost."""
+        changed: Set[str] = set()
+        lost = False
+        while True:
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            offset = 0
+            while offset + self._EVENT.size <= len(buf):
+                wd, mask, _cookie, length = self._EVENT.unpack_from(buf, offset)
+                name = buf[offset + self._EVENT.size:offset + self._EVENT.size + length].rstrip(b"\0")
+                offset += self._EVENT.size + length
+                if mask & self.IN_Q_OVERFLOW:
+                    lost = True
+                    continue
+                directory = self._wds.get(wd)
+                if directory is None:
+                    continue
+                if mask & (self.IN_IGNORED | self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+                    # Watch gone: files in this directory need stat checks again
+                    self._wds.pop(wd, None)
+                    self._dirs.pop(directory, None)
+                    lost = True
+                    continue
+                if name:
+                    changed.add(os.path.join(directory, os.fsdecode(name)))
+        return changed, lost
+
+
+class IntegrityScanner:
+    """SHA-256 digests of files, re-hashed only when their stat signature changes."""
+
+    def __init__(self, manifest_path: str = INTEGRITY_MANIFEST_PATH, use_inotify: bool = INTEGRITY_INOTIFY):
+        self.manifest_path = manifest_path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = self._load()
+        self._dirty = False
+        self._hints: Optional[_InotifyHints] = None
+        # Paths verified since their directory has been watched
+        self._clean: Set[str] = set()
+        # Paths with inotify events since they were last hashed
+        self._changed: Set[str] = set()
+        self.stats = {"hashed": 0, "stat_only": 0, "hinted": 0}
+
+        if use_inotify:
+            try:
+                self._hints = _InotifyHints()
+            except Exception as e:
+                logger.warning(f"integrity_scanner: inotify unavailable, using stat checks: {e}")
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.manifest_path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                return data.get("files", {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"integrity_scanner: ignoring unreadable manifest {self.manifest_path}: {e}")
+        return {}
+
+    def _save(self):
+        temp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump({"version": MANIFEST_VERSION, "files": self._entries}, f)
+            os.replace(temp_path, self.manifest_path)
+            self._dirty = False
+        except Exception as e:
+            logger.error(f"integrity_scanner: failed to save manifest {self.manifest_path}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _apply_hints(self):
+        if self._hints is None:
+            return
+        try:
+            changed, lost = self._hints.drain()
+        except Exception as e:
+            logger.warning(f"integrity_scanner: inotify failed, using stat checks: {e}")
+            self._hints = None
+            changed, lost = set(), True
+        self._changed.update(changed & self._clean)
+        if lost:
+            self._clean.clear()
+        else:
+            self._clean.difference_update(changed)
+
+    @staticmethod
+    def _verify_due(entry: Dict) -> bool:
+        return (
+            INTEGRITY_FULL_VERIFY_SECONDS > 0
+            and time.time_ns() - entry["hashed_at_ns"] > INTEGRITY_FULL_VERIFY_SECONDS * 1e9
+        )
+
+    def _digest(self, path: str) -> Optional[str]:
+        abs_path = os.path.abspath(path)
+        entry = self._entries.get(path)
+
+        if self._hints is not None:
+            if entry and abs_path in self._clean and not self._verify_due(entry):
+                self.stats["hinted"] += 1
+                return entry["digest"]
+            # Watch before stat so a change after the stat is still reported
+            watched = self._hints.watch(os.path.dirname(abs_path))
+        else:
+            watched = False
+
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            if self._entries.pop(path, None) is not None:
+                self._dirty = True
+            self._clean.discard(abs_path)
+            self._changed.discard(abs_path)
+            return None
+
+        signature = [st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns]
+        if (
+            entry
+            and entry["signature"] == signature
+            and abs_path not in self._changed
+            and st.st_mtime_ns < entry["hashed_at_ns"] - INTEGRITY_RACY_SECONDS * 1e9
+            and not self._verify_due(entry)
+        ):
+            self.stats["stat_only"] += 1
+            digest = entry["digest"]
+        else:
+            hashed_at_ns = time.time_ns()
+            self._changed.discard(abs_path)
+            digest = hash_file(path)
+            self.stats["hashed"] += 1
+            self._entries[path] = {"signature": signature, "digest": digest, "hashed_at_ns": hashed_at_ns}
+            self._dirty = True
+
+        if watched:
+            self._clean.add(abs_path)
+        return digest
+
+    def digest(self, path: str) -> Optional[str]:
+        """SHA-256 of path, or None if it does not exist."""
+        return self.scan([path]).get(path)
+
+    def scan(self, paths: Iterable[str]) -> Dict[str, str]:
+        """Digests of the existing files among paths; the manifest is saved if anything changed."""
+        with self._lock:
+            self._apply_hints()
+            digests = {}
+            for path in paths:
+                try:
+                    digest = self._digest(path)
+                except Exception as e:
+                    logger.error(f"integrity_scanner: cannot hash {path}: {e}")
+                    continue
+                if digest is not None:
+                    digests[path] = digest
+            if self._dirty:
+                self._save()
+            return digests
+
+
+_scanner: Optional[IntegrityScanner] = None
+_scanner_lock = threading.Lock()
+
+
+def get_scanner() -> IntegrityScanner:
+    global _scanner
+    with _scanner_lock:
+        if _scanner is None:
+            _scanner = IntegrityScanner()
+        return _scanner
@@ -1,32 +1,29 @@
-import hashlib
 import logging
 from typing import Dict, List
 
+from security_core.integrity_scanner import get_scanner
+
 logger = logging.getLogger(__name__)
 
 
 def compute_file_checksum(file_path: str) -> str:
     try:
-        with open(file_path, "rb") as f:
-            file_hash = hashlib.sha256()
-            while chunk := f.read(8192):
-                file_hash.update(chunk)
-            return file_hash.hexdigest()
-    except FileNotFoundError:
-        logger.warning(f"compute_file_checksum: file not found: {file_path}")
-        return ""
+        checksum = get_scanner().digest(file_path)
     except Exception as e:
         logger.error(f"compute_file_checksum error for {file_path}: {e}")
         return ""
+    if checksum is None:
+        logger.warning(f"compute_file_checksum: file not found: {file_path}")
+        return ""
+    return checksum
 
 
 def compute_config_checksum(config_paths: List[str]) -> Dict[str, str]:
-    checksums = {}
+    checksums = get_scanner().scan(config_paths)
     
     for path in config_paths:
-        checksum = compute_file_checksum(path)
-        if checksum:
-            checksums[path] = checksum
+        if path not in checksums:
+            logger.warning(f"compute_config_checksum: file not found or unreadable: {path}")
     
     return checksums
 
@@ -0,0 +1,62 @@
+"""
+Stripe inbox ordering: run with
+    SQLITE_PATH=/tmp/inbox_test.db python -m pytest tests/test_stripe_inbox.py
+"""
+import os
+import tempfile
+
+os.environ.setdefault("SQLITE_PATH", os.path.join(tempfile.mkdtemp(), "inbox_test.db"))
+os.environ.pop("DATABASE_URL", None)
+
+from modules.migrations import run_migrations
+from modules import stripe_inbox
+
+
+def test_failing_customer_does_not_block_others(monkeypatch):
+    run_migrations()
+    # enqueue_event wakes the shared worker; keep it idle so drain() below sees every event
+    idle = stripe_inbox.InboxWorker(workers=1)
+    idle.stop()
+    monkeypatch.setattr(stripe_inbox, "_worker", idle)
+    handled = []
+
+    def handler(data):
+        if data["customer"] == "cus_A":
+            raise RuntimeError("customer A is broken")
+        handled.append(data["customer"])
+
+    stripe_inbox.register_handler("invoice.paid", handler)
+    for i in range(stripe_inbox.STRIPE_INBOX_CLAIM_BATCH):
+        stripe_inbox.enqueue_event(f"evt_A{i:03d}", "invoice.paid", {"customer": "cus_A"}, source="test")
+    stripe_inbox.enqueue_event("evt_B000", "invoice.paid", {"customer": "cus_B"}, source="test")
+
+    # Only the head of cus_A is a candidate, so cus_B is claimed alongside it
+    worker = stripe_inbox.InboxWorker(workers=2, poll_seconds=60)
+    statuses = worker.drain()
+
+    assert sorted(statuses) == ["done", "pending"]
+    assert handled == ["cus_B"]
+
+
+def test_outcome_is_dropped_when_the_lease_was_taken(monkeypatch):
+    run_migrations()
+    idle = stripe_inbox.InboxWorker(workers=1)
+    idle.stop()
+    monkeypatch.setattr(stripe_inbox, "_worker", idle)
+
+    def handler(data):
+        # Another worker reclaims the event after its lease expired
+        stripe_inbox.execute_query(
+            "UPDATE stripe_webhook_inbox SET next_attempt_at = next_attempt_at + 1 WHERE event_id = ?",
+            ("evt_L000",), fetch=None, commit=True
+        )
+
+    stripe_inbox.register_handler("customer.updated", handler)
+    stripe_inbox.enqueue_event("evt_L000", "customer.updated", {"customer": "cus_L"}, source="test")
+    (event,) = [e for e in stripe_inbox.claim_due_events() if e["event_id"] == "evt_L000"]
+
+    assert stripe_inbox.handle_event(event) == "processing"
+    row = stripe_inbox.execute_query(
+        "SELECT status, settled FROM stripe_webhook_inbox WHERE event_id = ?", ("evt_L000",), fetch="one"
+    )
+    assert (row["status"], row["settled"]) == ("processing", 0)